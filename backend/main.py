@@ -6,16 +6,22 @@ from contextlib import asynccontextmanager
 from datetime import date
 from pathlib import Path
 
-from alembic import command
-from alembic.config import Config
 from fastapi import APIRouter, Depends, FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 
 from sqlalchemy import func, select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.models import Base, Holiday, VisitLog, engine, get_session
+from src.database.bootstrap import prepare_database, verify_schema
+from src.database.models import VisitLog, engine, get_session
+from src.database.pool import pool_status
+from src.database.replica import replica_router
+from src.models.inference_worker import inference_status
+from src.models.llm_runtime import runtime_status
+from src.models.warmup import model_state, warm_up, warmup_models, warmup_status
+from src.services.llm_cache import cache_stats
 from src.middleware.main import AdvancedMiddleware
+from src.routes.analytics import router as analytics_router
 from src.routes.benchmark import router as benchmark_router
 from src.routes.export import router as export_router
 from src.routes.import_excel import router as import_router
@@ -24,6 +30,7 @@ from src.routes.insights import router as insights_router
 from src.routes.llama import router as llama_router
 from src.routes.locations import router as locations_router
 from src.routes.metrics import router as metrics_router
+from src.routes.profiles import router as profiles_router
 from src.routes.optimize import router as optimize_router
 from src.routes.qwen import router as qwen_router
 from src.routes.reps import router as reps_router
@@ -53,83 +60,33 @@ import uvicorn
 
 from src.config import settings
 from src.logging_config import setup_logging
+from src.utils.optional_deps import available_features
+from src.utils.timing import PhaseTimer
 
 setup_logging(settings.debug)
 logger = logging.getLogger(__name__)
 
 
-def _run_alembic_migrations() -> None:
-    alembic_ini = Path(__file__).resolve().parent / "src" / "database" / "alembic.ini"
-    if not alembic_ini.exists():
-        raise FileNotFoundError(f"Alembic config not found: {alembic_ini}")
-
-    config = Config(str(alembic_ini))
-    config.set_main_option("script_location", "src/database/migrations")
-    command.upgrade(config, "head")
-
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    logger.info("Starting up: applying database migrations...")
-    await asyncio.to_thread(_run_alembic_migrations)
-    logger.info("Database migrations are up to date.")
-
-    logger.info("Starting up: ensuring database tables and compatibility columns...")
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        # Добавляем колонку model_used если её нет (для существующих БД)
-        try:
-            await conn.execute(text(
-                "ALTER TABLE routes ADD COLUMN IF NOT EXISTS "
-                "model_used VARCHAR DEFAULT 'unknown'"
-            ))
-            logger.info("Column routes.model_used ensured.")
-        except Exception as e:
-            logger.warning(f"Could not alter routes table: {e}")
-        # Добавляем новые колонки в locations если их нет
-        for col_def in [
-            "category VARCHAR(1)",
-            "city VARCHAR(255)",
-            "district VARCHAR(255)",
-            "address VARCHAR(500)",
-        ]:
-            col_name = col_def.split()[0]
-            try:
-                await conn.execute(text(
-                    f"ALTER TABLE locations ADD COLUMN IF NOT EXISTS {col_def}"
-                ))
-            except Exception as e:
-                logger.warning(f"Could not add column locations.{col_name}: {e}")
-        for col_def in [
-            "home_lat FLOAT NOT NULL DEFAULT 54.1871",
-            "home_lon FLOAT NOT NULL DEFAULT 45.1749",
-        ]:
-            col_name = col_def.split()[0]
-            try:
-                await conn.execute(text(
-                    f"ALTER TABLE sales_reps ADD COLUMN IF NOT EXISTS {col_def}"
-                ))
-            except Exception as e:
-                logger.warning(f"Could not add column sales_reps.{col_name}: {e}")
-    # Сидирование праздников 2026 (если таблица пуста)
-    try:
-        from sqlalchemy import text as sql_text
-        from src.services.schedule_planner import HOLIDAYS_2026
-        from src.database.models import new_session
-        async with new_session() as session:
-            count_result = await session.execute(sql_text("SELECT COUNT(*) FROM holidays"))
-            count = count_result.scalar() or 0
-            if count == 0:
-                for h_date, h_name in HOLIDAYS_2026:
-                    session.add(Holiday(date=h_date, name=h_name, is_working=False))
-                await session.commit()
-                logger.info("Сидировано %d праздников 2026.", len(HOLIDAYS_2026))
-            else:
-                logger.info("Таблица holidays уже содержит %d записей, сидирование пропущено.", count)
-    except Exception as e:
-        logger.warning("Не удалось сидировать праздники: %s", e)
+    timer = PhaseTimer("startup")
+    if settings.db_startup_mode == "verify":
+        # Схему готовит отдельный job (python -m src.database.bootstrap migrate)
+        with timer.phase("schema_verify"):
+            revision = await verify_schema(engine)
+        logger.info("Database schema is at revision %s.", revision)
+    else:
+        logger.info("Starting up: preparing database schema (DB_STARTUP_MODE=migrate)...")
+        await prepare_database(engine, settings.db_partition_months_ahead, timer)
+    app.state.startup = timer.summary()
+    logger.info("Startup finished in %.1f ms: %s", timer.total_ms(), timer.phases)
+
+    # Модели грузятся в фоне — приложение принимает запросы сразу
+    warmup_task = asyncio.create_task(warm_up()) if warmup_models() else None
 
     yield
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
     logger.info("Shutting down: Closing database engine...")
     await engine.dispose()
 
@@ -165,8 +122,10 @@ api_v1_router.include_router(optimize_router)
 api_v1_router.include_router(qwen_router)
 api_v1_router.include_router(llama_router)
 api_v1_router.include_router(metrics_router)
+api_v1_router.include_router(profiles_router)
 api_v1_router.include_router(benchmark_router)
 api_v1_router.include_router(insights_router)
+api_v1_router.include_router(analytics_router)
 api_v1_router.include_router(routes_router)
 api_v1_router.include_router(routing_router)
 # Новые роутеры (Фаза 4–8)
@@ -202,8 +161,10 @@ async def _health_response(session: AsyncSession):
         await session.execute(text("SELECT 1"))
         from src.models.qwen_client import QwenClient
         from src.models.llama_client import LlamaClient
-        qwen_loaded = QwenClient._llm is not None
-        llama_loaded = LlamaClient._llm is not None
+        # LLM_BACKEND=mock: заглушка всегда «загружена»
+        mock_backend = settings.llm_backend == "mock"
+        qwen_loaded = mock_backend or QwenClient._llm is not None
+        llama_loaded = mock_backend or LlamaClient._llm is not None
 
         # Disk free (в MB)
         try:
@@ -228,11 +189,28 @@ async def _health_response(session: AsyncSession):
             "database": "connected",
             "services": {
                 "database": "connected",
-                "qwen": {"status": "loaded" if qwen_loaded else "not_loaded", "optional": True},
-                "llama": {"status": "loaded" if llama_loaded else "not_loaded", "optional": True},
+                "qwen": {
+                    "status": "loaded" if qwen_loaded else "not_loaded",
+                    "state": model_state("qwen"),
+                    "optional": True,
+                },
+                "llama": {
+                    "status": "loaded" if llama_loaded else "not_loaded",
+                    "state": model_state("llama"),
+                    "optional": True,
+                },
             },
             "disk_free_mb": disk_free_mb,
             "visits_today": visits_today,
+            "db_pool": pool_status(engine),
+            "db_replica": replica_router.status(),
+            "llm_queue": inference_status(),
+            "llm_backend": settings.llm_backend,
+            "llm_runtime": runtime_status(),
+            "llm_warmup": warmup_status(),
+            "llm_cache": cache_stats.snapshot(),
+            "startup": getattr(app.state, "startup", None),
+            "features": available_features(),
             "version": "1.2.0",
             "last_optimization_ms": get_last_timing("optimization"),
             "last_schedule_gen_ms": get_last_timing("schedule_gen"),
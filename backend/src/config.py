@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal
 
 from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -27,9 +28,108 @@ class Settings(BaseSettings):
     database_port: int = 5432
     database_name: str = "t2"
 
+    # Пул соединений async-движка (src/database/pool.py)
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout_s: float = 30.0
+    db_pool_recycle_s: int = 1800
+    db_pool_pre_ping: bool = True
+    # Кэш подготовленных выражений asyncpg на соединение; 0 — для pgbouncer
+    db_statement_cache_size: int = 100
+    # statement_timeout на стороне Postgres, мс; 0 — без ограничения
+    db_statement_timeout_ms: int = 0
+    # Старт приложения: migrate — alembic + DDL + сиды (под advisory-lock);
+    # verify — только проверка ревизии схемы, миграции делает отдельный job
+    db_startup_mode: Literal["migrate", "verify"] = "migrate"
+    # Read-реплика для GET-эндпоинтов (src/database/replica.py); пусто — всё на primary
+    database_replica_url: str | None = None
+    # Допустимое отставание реплики, с; больше — чтения уходят на primary
+    db_replica_max_lag_s: float = 5.0
+    # Как часто перепроверять отставание/доступность реплики, с
+    db_replica_check_interval_s: float = 10.0
+    # Сколько соединений пула может занять один GET /insights (запросы параллельно)
+    insights_max_parallel_queries: int = 2
+    # Одна и та же форма SQL столько раз за HTTP-запрос — WARNING о N+1
+    # (src/database/query_stats.py)
+    db_repeat_warn_threshold: int = 10
+    # Сколько будущих месяцев держать секциями visit_schedule/visit_log заранее
+    db_partition_months_ahead: int = 3
+    # Сколько последних месяцев визитов держать в горячих таблицах (src/services/archive.py)
+    archive_horizon_months: int = 12
+
+    # Загрузка локальных моделей (src/models/llm_runtime.py);
+    # <MODEL>_N_CTX=0 — контекст по профилю длин промптов из бенчмарка
+    qwen_n_ctx: int = 8192
+    qwen_n_threads: int = 4
+    qwen_n_batch: int = 512
+    qwen_n_gpu_layers: int = 0
+    llama_n_ctx: int = 8192
+    llama_n_threads: int = 8
+    llama_n_batch: int = 512
+    llama_n_gpu_layers: int = 0
+    llm_use_mmap: bool = True
+    llm_use_mlock: bool = False
+    # Тип KV-кэша: q8_0 / q4_0 — в 2 / 4 раза меньше памяти на токен контекста
+    llm_kv_cache_type: Literal["f16", "q8_0", "q4_0"] = "f16"
+    # JSON профиля (ml/benchmarks/prompt_profile.json по умолчанию) и границы авто-подбора
+    llm_prompt_profile_path: str | None = None
+    llm_n_ctx_headroom: float = 1.25
+    llm_n_ctx_min: int = 2048
+    llm_n_ctx_max: int = 32768
+
+    # Фоновая загрузка и прогрев моделей при старте (src/models/warmup.py):
+    # список через запятую (qwen,llama); пусто — модели грузятся первым запросом
+    llm_warmup_models: str = ""
+    llm_warmup_timeout_s: float = 120.0
+
+    # Выбор модели по латентности, model="auto" (src/services/model_selector.py)
+    llm_latency_slo_ms: int = 30_000
+    llm_selector_window: int = 50
+    llm_selector_min_samples: int = 5
+    llm_selector_min_quality: float = 50.0
+    llm_selector_refresh_s: float = 60.0
+    llm_selector_history_days: int = 14
+
+    # Очередь инференса на модель (ожидающие + выполняемый); сверх — 429 / без pros/cons
+    llm_queue_max: int = 4
+    # Генерация JSON по грамматике из схемы ответа (src/models/grammars.py)
+    llm_constrained_decoding: bool = True
+    # Память состояний llama.cpp после системных префиксов промптов (по одному
+    # на шаблон), МБ; 0 — выкл. (src/models/prompt_cache.py)
+    llm_prompt_cache_mb: int = 64
+    # Кэш оценок вариантов маршрута (src/services/llm_cache.py)
+    llm_cache_enabled: bool = True
+    llm_cache_ttl_s: int = 7 * 24 * 3600
+    llm_cache_max_entries: int = 5000
+    # Бэкенд LLM: local — GGUF через llama.cpp; mock — детерминированная
+    # заглушка для нагрузочных прогонов без моделей (src/models/mock_client.py)
+    llm_backend: Literal["local", "mock"] = "local"
+    # Латентность заглушки: логнормальная, медиана <MODEL>_MOCK_LATENCY_MS,
+    # разброс LLM_MOCK_LATENCY_SIGMA (0 — фиксированная)
+    qwen_mock_latency_ms: float = 800.0
+    llama_mock_latency_ms: float = 2500.0
+    llm_mock_latency_sigma: float = 0.4
+    # Доли ответов заглушки с ошибкой и с зависанием до дедлайна
+    llm_mock_failure_rate: float = 0.0
+    llm_mock_timeout_rate: float = 0.0
+    llm_mock_seed: int = 0
+
+    # Профилирование запросов (src/utils/profiler.py): PROFILING_TOKEN
+    # включает X-Profile: <token> / ?profile=<token> и /admin/profiles;
+    # PROFILING_SAMPLE_N — профилировать каждый N-й запрос (0 — выкл.)
+    profiling_token: str | None = None
+    profiling_sample_n: int = 0
+    profiling_interval_ms: float = 5.0
+    # Куда писать профили; пусто — backend/profiles
+    profiling_dir: str | None = None
+    profiling_max_files: int = 200
+
     debug: bool = False
     perf_warn_threshold_ms: int = 10_000
 
+    # JSON-справочник мест для геокодера импорта (дополняет встроенную Мордовию)
+    geocoder_gazetteer_path: str | None = None
+
     @field_validator("debug", mode="before")
     @classmethod
     def _parse_debug(cls, value):
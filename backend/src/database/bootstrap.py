@@ -0,0 +1,200 @@
+"""
+Подготовка схемы БД: миграции, совместимые колонки, секции, сиды.
+
+Раньше всё это выполнял lifespan каждого воркера при каждом старте —
+рестарты шли медленно, а несколько воркеров гонялись на DDL. Теперь
+схему готовит отдельный запуск (job перед деплоем):
+
+    python -m src.database.bootstrap migrate   # alembic + DDL + сиды
+    python -m src.database.bootstrap check     # ревизия БД == head?
+
+Приложение по DB_STARTUP_MODE:
+- migrate (по умолчанию, локальная разработка) — prepare_database()
+  под advisory-lock PostgreSQL, как раньше;
+- verify — один SELECT version_num FROM alembic_version; если ревизия
+  не head, старт падает с SchemaRevisionMismatch.
+"""
+
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from src.database.models import Base, Holiday, new_session
+from src.database.partitions import ensure_month_partitions
+from src.utils.timing import PhaseTimer
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parent / "alembic.ini"
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+# Ключ pg_advisory_lock: один подготовитель схемы на кластер
+SCHEMA_LOCK_KEY = 0x7432_5343
+
+# Колонки, добавленные в модели раньше, чем появились миграции
+_COMPAT_COLUMNS = [
+    ("routes", "model_used VARCHAR DEFAULT 'unknown'"),
+    ("locations", "category VARCHAR(1)"),
+    ("locations", "city VARCHAR(255)"),
+    ("locations", "district VARCHAR(255)"),
+    ("locations", "address VARCHAR(500)"),
+    ("sales_reps", "home_lat FLOAT NOT NULL DEFAULT 54.1871"),
+    ("sales_reps", "home_lon FLOAT NOT NULL DEFAULT 45.1749"),
+]
+
+
+class SchemaRevisionMismatch(RuntimeError):
+    """Ревизия схемы в БД не совпадает с head миграций."""
+
+
+def _alembic_config():
+    from alembic.config import Config
+
+    if not ALEMBIC_INI.exists():
+        raise FileNotFoundError(f"Alembic config not found: {ALEMBIC_INI}")
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(MIGRATIONS_DIR))
+    return config
+
+
+def head_revision() -> Optional[str]:
+    """Head по файлам миграций (без обращения к БД)."""
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(_alembic_config()).get_current_head()
+
+
+def run_migrations() -> None:
+    """alembic upgrade head (синхронно; env.py поднимает свой event loop)."""
+    from alembic import command
+
+    command.upgrade(_alembic_config(), "head")
+
+
+async def current_revision(conn: AsyncConnection) -> Optional[str]:
+    """Ревизия схемы из alembic_version; None — миграции не применялись."""
+    try:
+        return (await conn.execute(text("SELECT version_num FROM alembic_version"))).scalar()
+    except Exception:
+        await conn.rollback()
+        return None
+
+
+async def verify_schema(engine: AsyncEngine, expected: Optional[str] = None) -> str:
+    """Проверяет, что БД на head; SchemaRevisionMismatch — если нет."""
+    expected = expected or head_revision()
+    async with engine.connect() as conn:
+        revision = await current_revision(conn)
+    if revision != expected:
+        raise SchemaRevisionMismatch(
+            f"Database schema revision is {revision or 'missing'}, expected {expected}. "
+            "Run `python -m src.database.bootstrap migrate` before starting the app."
+        )
+    return revision
+
+
+async def ensure_compat_schema(conn: AsyncConnection) -> None:
+    """create_all + ADD COLUMN IF NOT EXISTS для баз, созданных до миграций."""
+    await conn.run_sync(Base.metadata.create_all)
+    for table, col_def in _COMPAT_COLUMNS:
+        try:
+            async with conn.begin_nested():
+                await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {col_def}"))
+        except Exception as e:
+            logger.warning("Could not add column %s.%s: %s", table, col_def.split()[0], e)
+
+
+async def seed_holidays() -> int:
+    """Праздники 2026, если таблица пуста; возвращает число добавленных."""
+    from src.services.schedule_planner import HOLIDAYS_2026
+
+    async with new_session() as session:
+        count = (await session.execute(text("SELECT COUNT(*) FROM holidays"))).scalar() or 0
+        if count:
+            logger.info("Таблица holidays уже содержит %d записей, сидирование пропущено.", count)
+            return 0
+        for h_date, h_name in HOLIDAYS_2026:
+            session.add(Holiday(date=h_date, name=h_name, is_working=False))
+        await session.commit()
+    logger.info("Сидировано %d праздников 2026.", len(HOLIDAYS_2026))
+    return len(HOLIDAYS_2026)
+
+
+async def prepare_database(
+    engine: AsyncEngine, months_ahead: int, timer: Optional[PhaseTimer] = None,
+) -> None:
+    """
+    Полная подготовка схемы: миграции, совместимые колонки, секции, сиды.
+
+    На PostgreSQL выполняется под pg_advisory_lock — параллельные
+    подготовители (воркеры в режиме migrate, job) ждут друг друга.
+    """
+    timer = timer or PhaseTimer("migrate")
+    async with engine.connect() as lock_conn:
+        is_pg = lock_conn.dialect.name == "postgresql"
+        if is_pg:
+            with timer.phase("schema_lock"):
+                await lock_conn.execute(
+                    text("SELECT pg_advisory_lock(:key)"), {"key": SCHEMA_LOCK_KEY},
+                )
+                await lock_conn.commit()
+        try:
+            with timer.phase("alembic"):
+                await asyncio.to_thread(run_migrations)
+            with timer.phase("compat_ddl"):
+                async with engine.begin() as conn:
+                    await ensure_compat_schema(conn)
+            with timer.phase("partitions"):
+                try:
+                    created = await ensure_month_partitions(engine, months_ahead)
+                    if created:
+                        logger.info("Created visit partitions: %s", ", ".join(created))
+                except Exception as e:
+                    logger.warning("Could not ensure visit partitions: %s", e)
+            with timer.phase("seed_holidays"):
+                try:
+                    await seed_holidays()
+                except Exception as e:
+                    logger.warning("Не удалось сидировать праздники: %s", e)
+        finally:
+            if is_pg:
+                await lock_conn.execute(
+                    text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEMA_LOCK_KEY},
+                )
+                await lock_conn.commit()
+
+
+async def _cli(args: argparse.Namespace) -> int:
+    from src.config import settings
+    from src.database.models import engine
+
+    try:
+        if args.command == "migrate":
+            timer = PhaseTimer("migrate")
+            await prepare_database(engine, settings.db_partition_months_ahead, timer)
+            print(f"Schema is at {head_revision()} ({timer.total_ms():.0f} ms)")
+            return 0
+        try:
+            revision = await verify_schema(engine)
+        except SchemaRevisionMismatch as e:
+            print(e)
+            return 1
+        print(f"Schema is at {revision}")
+        return 0
+    finally:
+        await engine.dispose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Миграции и проверка схемы БД")
+    parser.add_argument("command", choices=["migrate", "check"])
+    return asyncio.run(_cli(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(main())
@@ -0,0 +1,61 @@
+"""009 add monthly visit rollup
+
+Revision ID: 009_add_monthly_visit_rollup
+Revises: 008_add_home_coords_to_sales_reps
+Create Date: 2026-10-19
+
+Добавляет:
+- Таблицу monthly_visit_rollup — месячные агрегаты визитов по
+  (месяц, сотрудник, категория ТТ, район). Заполняется командой
+  python -m src.services.analytics_rollup
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "009_add_monthly_visit_rollup"
+down_revision = "008_add_home_coords_to_sales_reps"
+branch_labels = None
+depends_on = None
+
+TABLE_NAME = "monthly_visit_rollup"
+
+
+def _table_exists() -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return TABLE_NAME in inspector.get_table_names()
+
+
+def upgrade() -> None:
+    if _table_exists():
+        return
+    op.create_table(
+        TABLE_NAME,
+        sa.Column("month", sa.Date(), nullable=False),
+        sa.Column("rep_id", sa.String(), nullable=False),
+        sa.Column("category", sa.String(length=1), nullable=False),
+        sa.Column("district", sa.String(length=255), nullable=False),
+        sa.Column("planned", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("completed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("skipped", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("cancelled", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("unique_tt", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("visited_tt", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("visits", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("onsite_minutes", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["rep_id"], ["sales_reps.id"], ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("month", "rep_id", "category", "district"),
+    )
+    op.create_index(
+        "ix_monthly_visit_rollup_rep_id", TABLE_NAME, ["rep_id"],
+    )
+
+
+def downgrade() -> None:
+    if not _table_exists():
+        return
+    op.drop_index("ix_monthly_visit_rollup_rep_id", table_name=TABLE_NAME)
+    op.drop_table(TABLE_NAME)
@@ -0,0 +1,38 @@
+"""010 add duration digest to monthly visit rollup
+
+Revision ID: 010_add_rollup_duration_digest
+Revises: 009_add_monthly_visit_rollup
+Create Date: 2026-10-19
+
+Добавляет monthly_visit_rollup.duration_digest — t-digest длительностей
+визитов группы. Для заполнения существующих сводок:
+python -m src.services.analytics_rollup
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "010_add_rollup_duration_digest"
+down_revision = "009_add_monthly_visit_rollup"
+branch_labels = None
+depends_on = None
+
+TABLE_NAME = "monthly_visit_rollup"
+
+
+def _get_columns() -> set[str]:
+    inspector = sa.inspect(op.get_bind())
+    return {column["name"] for column in inspector.get_columns(TABLE_NAME)}
+
+
+def upgrade() -> None:
+    if "duration_digest" not in _get_columns():
+        op.add_column(
+            TABLE_NAME,
+            sa.Column("duration_digest", sa.JSON(), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    if "duration_digest" in _get_columns():
+        op.drop_column(TABLE_NAME, "duration_digest")
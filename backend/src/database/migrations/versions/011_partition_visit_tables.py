@@ -0,0 +1,145 @@
+"""011 partition visit_schedule and visit_log by month
+
+Revision ID: 011_partition_visit_tables
+Revises: 010_add_rollup_duration_digest
+Create Date: 2026-10-19
+
+Переводит visit_schedule (по planned_date) и visit_log (по visited_date)
+на помесячное RANGE-секционирование (только PostgreSQL):
+- секции на все месяцы с данными + текущий и 3 следующих + DEFAULT;
+- первичный ключ становится (id, дата) — PostgreSQL требует ключ
+  секционирования в уникальных ограничениях;
+- внешние ключи на visit_schedule.id (visit_log.schedule_id,
+  skipped_visit_stash.*) невозможны — ON DELETE SET NULL переносится
+  в триггер visit_schedule_set_null_refs.
+
+Дальнейшие секции создаёт src/database/partitions.py.
+"""
+
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.database.partitions import (
+    create_month_partition,
+    ensure_default_partition,
+    is_partitioned,
+    months_from,
+)
+
+revision = "011_partition_visit_tables"
+down_revision = "010_add_rollup_duration_digest"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+# Таблица → ключ секционирования; visit_log первой при снятии секций
+TABLES = {"visit_schedule": "planned_date", "visit_log": "visited_date"}
+
+# (таблица, колонка) со ссылкой на visit_schedule.id
+SCHEDULE_REFS = [
+    ("visit_log", "schedule_id"),
+    ("skipped_visit_stash", "visit_schedule_id"),
+    ("skipped_visit_stash", "resolved_schedule_id"),
+]
+
+SET_NULL_FUNCTION = """
+CREATE OR REPLACE FUNCTION visit_schedule_set_null_refs() RETURNS trigger AS $$
+BEGIN
+    -- Перенос строки между секциями (смена месяца planned_date) — не удаление
+    IF EXISTS (SELECT 1 FROM visit_schedule WHERE id = OLD.id) THEN
+        RETURN OLD;
+    END IF;
+    UPDATE visit_log SET schedule_id = NULL WHERE schedule_id = OLD.id;
+    UPDATE skipped_visit_stash SET visit_schedule_id = NULL WHERE visit_schedule_id = OLD.id;
+    UPDATE skipped_visit_stash SET resolved_schedule_id = NULL WHERE resolved_schedule_id = OLD.id;
+    RETURN OLD;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def _rebuild_table(table: str, column: str, partitioned: bool) -> None:
+    """Пересоздаёт таблицу (с секциями или без) с сохранением данных, индексов и FK."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    indexes = inspector.get_indexes(table)
+    foreign_keys = [
+        fk for fk in inspector.get_foreign_keys(table)
+        if fk["referred_table"] != "visit_schedule"
+    ]
+    old = f"{table}_old"
+
+    op.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    if partitioned:
+        op.execute(
+            f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE ({column})"
+        )
+        months = {
+            row[0] for row in bind.execute(sa.text(
+                f"SELECT DISTINCT date_trunc('month', {column})::date FROM {old}"
+            ))
+        }
+        months.update(months_from(date.today(), MONTHS_AHEAD + 1))
+        for month in sorted(months):
+            create_month_partition(bind, table, month)
+        ensure_default_partition(bind, table)
+    else:
+        op.execute(f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS)")
+
+    op.execute(f"INSERT INTO {table} SELECT * FROM {old}")
+    op.execute(f"DROP TABLE {old} CASCADE")
+
+    pk_columns = ["id", column] if partitioned else ["id"]
+    op.create_primary_key(f"{table}_pkey", table, pk_columns)
+    for index in indexes:
+        op.create_index(index["name"], table, index["column_names"], unique=False)
+    for fk in foreign_keys:
+        op.create_foreign_key(
+            fk["name"], table, fk["referred_table"],
+            fk["constrained_columns"], fk["referred_columns"],
+            ondelete=fk.get("options", {}).get("ondelete"),
+        )
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or is_partitioned(bind, "visit_schedule"):
+        return
+
+    inspector = sa.inspect(bind)
+    for ref_table in {ref for ref, _ in SCHEDULE_REFS}:
+        for fk in inspector.get_foreign_keys(ref_table):
+            if fk["referred_table"] == "visit_schedule":
+                op.drop_constraint(fk["name"], ref_table, type_="foreignkey")
+
+    for table, column in TABLES.items():
+        _rebuild_table(table, column, partitioned=True)
+
+    op.execute(SET_NULL_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER trg_visit_schedule_set_null_refs "
+        "AFTER DELETE ON visit_schedule "
+        "FOR EACH ROW EXECUTE FUNCTION visit_schedule_set_null_refs()"
+    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or not is_partitioned(bind, "visit_schedule"):
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS trg_visit_schedule_set_null_refs ON visit_schedule")
+    op.execute("DROP FUNCTION IF EXISTS visit_schedule_set_null_refs()")
+
+    for table, column in reversed(list(TABLES.items())):
+        _rebuild_table(table, column, partitioned=False)
+
+    for ref_table, ref_column in SCHEDULE_REFS:
+        op.create_foreign_key(
+            f"{ref_table}_{ref_column}_fkey", ref_table, "visit_schedule",
+            [ref_column], ["id"], ondelete="SET NULL",
+        )
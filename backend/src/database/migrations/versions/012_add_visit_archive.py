@@ -0,0 +1,47 @@
+"""012 add visit archive
+
+Revision ID: 012_add_visit_archive
+Revises: 011_partition_visit_tables
+Create Date: 2026-10-19
+
+Добавляет таблицу visit_archive — сжатые (zlib) план и журнал визитов
+закрытых месяцев. Заполняется командой python -m src.services.archive
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "012_add_visit_archive"
+down_revision = "011_partition_visit_tables"
+branch_labels = None
+depends_on = None
+
+TABLE_NAME = "visit_archive"
+
+
+def _table_exists() -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return TABLE_NAME in inspector.get_table_names()
+
+
+def upgrade() -> None:
+    if _table_exists():
+        return
+    op.create_table(
+        TABLE_NAME,
+        sa.Column("month", sa.Date(), nullable=False),
+        sa.Column("schedule_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("log_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("raw_bytes", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("payload", sa.LargeBinary(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("month"),
+    )
+    if op.get_bind().dialect.name == "postgresql":
+        # payload уже сжат — без повторного pglz при TOAST
+        op.execute(f"ALTER TABLE {TABLE_NAME} ALTER COLUMN payload SET STORAGE EXTERNAL")
+
+
+def downgrade() -> None:
+    if _table_exists():
+        op.drop_table(TABLE_NAME)
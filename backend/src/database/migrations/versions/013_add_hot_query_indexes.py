@@ -0,0 +1,62 @@
+"""013 add indexes for hot queries
+
+Revision ID: 013_add_hot_query_indexes
+Revises: 012_add_visit_archive
+Create Date: 2026-10-19
+
+Индексы под фильтры горячих эндпоинтов, подобранные по форме запросов.
+Планы на PostgreSQL не замерялись: tests/test_query_plans.py без
+PLAN_TEST_DATABASE_URL пропускается, а базовая линия
+tests/query_plan_baseline.json не записана (PLAN_BASELINE_UPDATE=1).
+- visit_log (rep_id, visited_date) — визиты сотрудника за период;
+- visit_schedule (planned_date) WHERE status IN активные — проверка
+  существующего плана перед генерацией, перенос стеша;
+- skipped_visit_stash (original_date, created_at) WHERE resolution IS NULL
+  — очередь нерешённых записей;
+- audit_log (created_at) — журнал за период.
+На секционированных таблицах индекс создаётся на родителе и
+наследуется всеми секциями.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "013_add_hot_query_indexes"
+down_revision = "012_add_visit_archive"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_visit_log_rep_date", "visit_log", ["rep_id", "visited_date"], None),
+    (
+        "ix_visit_schedule_active_date", "visit_schedule", ["planned_date"],
+        "status IN ('planned', 'rescheduled', 'skipped')",
+    ),
+    (
+        "ix_skipped_stash_pending", "skipped_visit_stash", ["original_date", "created_at"],
+        "resolution IS NULL",
+    ),
+    ("ix_audit_log_created_at", "audit_log", ["created_at"], None),
+]
+
+
+def _index_names(table: str) -> set[str]:
+    inspector = sa.inspect(op.get_bind())
+    return {index["name"] for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    for name, table, columns, where in INDEXES:
+        if name in _index_names(table):
+            continue
+        op.create_index(
+            name, table, columns,
+            postgresql_where=sa.text(where) if where else None,
+            sqlite_where=sa.text(where) if where else None,
+        )
+
+
+def downgrade() -> None:
+    for name, table, _, _ in reversed(INDEXES):
+        if name in _index_names(table):
+            op.drop_index(name, table_name=table)
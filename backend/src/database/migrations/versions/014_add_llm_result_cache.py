@@ -0,0 +1,50 @@
+"""014 add llm result cache
+
+Revision ID: 014_add_llm_result_cache
+Revises: 013_add_hot_query_indexes
+Create Date: 2026-10-19
+
+Добавляет таблицу llm_result_cache — кэш ответов локальных LLM
+(оценка вариантов маршрута) по хэшу модели и нормализованного промпта.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "014_add_llm_result_cache"
+down_revision = "013_add_hot_query_indexes"
+branch_labels = None
+depends_on = None
+
+TABLE_NAME = "llm_result_cache"
+
+
+def _table_exists() -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return TABLE_NAME in inspector.get_table_names()
+
+
+def upgrade() -> None:
+    if _table_exists():
+        return
+    op.create_table(
+        TABLE_NAME,
+        sa.Column("key", sa.String(length=64), nullable=False),
+        sa.Column("model_id", sa.String(), nullable=False),
+        sa.Column("task", sa.String(length=32), nullable=False),
+        sa.Column("result", sa.JSON(), nullable=False),
+        sa.Column("hits", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_used_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("key"),
+    )
+    op.create_index("ix_llm_result_cache_expires_at", TABLE_NAME, ["expires_at"])
+    op.create_index("ix_llm_result_cache_last_used_at", TABLE_NAME, ["last_used_at"])
+
+
+def downgrade() -> None:
+    if _table_exists():
+        op.drop_index("ix_llm_result_cache_last_used_at", table_name=TABLE_NAME)
+        op.drop_index("ix_llm_result_cache_expires_at", table_name=TABLE_NAME)
+        op.drop_table(TABLE_NAME)
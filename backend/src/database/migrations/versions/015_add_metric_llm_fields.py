@@ -0,0 +1,51 @@
+"""015 add llm call fields to metrics
+
+Revision ID: 015_add_metric_llm_fields
+Revises: 014_add_llm_result_cache
+Create Date: 2026-10-19
+
+Добавляет metrics.task и metrics.num_locations — замеры вызовов LLM, по
+которым селектор моделей (src/services/model_selector.py) считает
+латентность и качество по размеру запроса, и индекс под его выборку.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "015_add_metric_llm_fields"
+down_revision = "014_add_llm_result_cache"
+branch_labels = None
+depends_on = None
+
+TABLE_NAME = "metrics"
+INDEX_NAME = "ix_metrics_task_model_timestamp"
+
+
+def _get_columns() -> set[str]:
+    inspector = sa.inspect(op.get_bind())
+    return {column["name"] for column in inspector.get_columns(TABLE_NAME)}
+
+
+def _get_indexes() -> set[str]:
+    inspector = sa.inspect(op.get_bind())
+    return {index["name"] for index in inspector.get_indexes(TABLE_NAME)}
+
+
+def upgrade() -> None:
+    columns = _get_columns()
+    if "task" not in columns:
+        op.add_column(TABLE_NAME, sa.Column("task", sa.String(length=32), nullable=True))
+    if "num_locations" not in columns:
+        op.add_column(TABLE_NAME, sa.Column("num_locations", sa.Integer(), nullable=True))
+    if INDEX_NAME not in _get_indexes():
+        op.create_index(INDEX_NAME, TABLE_NAME, ["task", "model_name", "timestamp"])
+
+
+def downgrade() -> None:
+    if INDEX_NAME in _get_indexes():
+        op.drop_index(INDEX_NAME, table_name=TABLE_NAME)
+    columns = _get_columns()
+    if "num_locations" in columns:
+        op.drop_column(TABLE_NAME, "num_locations")
+    if "task" in columns:
+        op.drop_column(TABLE_NAME, "task")
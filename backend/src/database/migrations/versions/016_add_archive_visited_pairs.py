@@ -0,0 +1,63 @@
+"""016 add visited pairs to visit archive
+
+Revision ID: 016_add_archive_visited_pairs
+Revises: 015_add_metric_llm_fields
+Create Date: 2026-10-19
+
+Добавляет visit_archive.visited_pairs — уникальные пары (сотрудник, ТТ)
+визитов месяца. По ним /visits/stats считает уникальные ТТ архивных
+месяцев, не распаковывая payload. Существующие архивы заполняются из
+payload здесь же.
+"""
+
+import json
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "016_add_archive_visited_pairs"
+down_revision = "015_add_metric_llm_fields"
+branch_labels = None
+depends_on = None
+
+TABLE_NAME = "visit_archive"
+COLUMN_NAME = "visited_pairs"
+
+
+def _get_columns() -> set[str]:
+    inspector = sa.inspect(op.get_bind())
+    return {column["name"] for column in inspector.get_columns(TABLE_NAME)}
+
+
+def upgrade() -> None:
+    if COLUMN_NAME in _get_columns():
+        return
+    op.add_column(TABLE_NAME, sa.Column(COLUMN_NAME, sa.JSON(), nullable=True))
+
+    archive = sa.table(
+        TABLE_NAME,
+        sa.column("month", sa.Date()),
+        sa.column("payload", sa.LargeBinary()),
+        sa.column(COLUMN_NAME, sa.JSON()),
+    )
+    bind = op.get_bind()
+    months = bind.execute(sa.select(archive.c.month)).scalars().all()
+    for month in months:
+        payload = bind.execute(
+            sa.select(archive.c.payload).where(archive.c.month == month)
+        ).scalar_one()
+        data = json.loads(zlib.decompress(payload))
+        rep_idx = data["log_fields"].index("rep_id")
+        loc_idx = data["log_fields"].index("location_id")
+        pairs = sorted({(row[rep_idx], row[loc_idx]) for row in data["logs"]})
+        bind.execute(
+            archive.update()
+            .where(archive.c.month == month)
+            .values({COLUMN_NAME: [list(pair) for pair in pairs]})
+        )
+
+
+def downgrade() -> None:
+    if COLUMN_NAME in _get_columns():
+        op.drop_column(TABLE_NAME, COLUMN_NAME)
@@ -6,10 +6,15 @@ from dotenv import load_dotenv
 
 from sqlalchemy import (
     Boolean, Column, Date, DateTime, Float,
-    ForeignKey, Index, Integer, JSON, String, Text, Time, UniqueConstraint)
+    ForeignKey, Index, Integer, JSON, LargeBinary, String, Text, Time,
+    UniqueConstraint, text)
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, relationship
 
+from src.config import settings
+from src.database.pool import engine_options
+from src.database.query_stats import instrument_engine
+
 
 load_dotenv()
 
@@ -21,8 +26,20 @@ DATABASE_URL = (
     f"{os.getenv('DATABASE_NAME', 't2')}"
 )
 
-engine = create_async_engine(DATABASE_URL)
+engine = create_async_engine(DATABASE_URL, **engine_options(settings, DATABASE_URL))
 new_session = async_sessionmaker(engine, expire_on_commit=False)
+instrument_engine(engine)
+
+# Необязательная read-реплика: маршрутизация чтений — src/database/replica.py
+read_engine = (
+    create_async_engine(
+        settings.database_replica_url,
+        **engine_options(settings, settings.database_replica_url),
+    )
+    if settings.database_replica_url else None
+)
+if read_engine is not None:
+    instrument_engine(read_engine)
 Base = declarative_base()
 
 
@@ -80,8 +97,14 @@ class SalesRep(Base):
 class VisitSchedule(Base):
     """Плановый визит торгового представителя к ТТ."""
     __tablename__ = "visit_schedule"
+    # В PostgreSQL — помесячные секции по planned_date (src/database/partitions.py)
     __table_args__ = (
         Index("ix_visit_schedule_rep_date_status", "rep_id", "planned_date", "status"),
+        # Активные визиты месяца (проверка перед генерацией, перенос стеша)
+        Index("ix_visit_schedule_active_date", "planned_date",
+              postgresql_where=text("status IN ('planned', 'rescheduled', 'skipped')"),
+              sqlite_where=text("status IN ('planned', 'rescheduled', 'skipped')")),
+        {"postgresql_partition_by": "RANGE (planned_date)"},
     )
 
     id = Column(String, primary_key=True, index=True,
@@ -89,7 +112,8 @@ class VisitSchedule(Base):
     location_id = Column(String, ForeignKey("locations.id"), nullable=False, index=True)
     rep_id = Column(String, ForeignKey("sales_reps.id", ondelete="CASCADE"),
                     nullable=False, index=True)
-    planned_date = Column(Date, nullable=False, index=True)
+    # Ключ секционирования входит в PK таблицы; для ORM идентичность — id
+    planned_date = Column(Date, primary_key=True, nullable=False, index=True)
     status = Column(String, nullable=False, default="planned")
     # planned | completed | skipped | rescheduled | cancelled
     created_at = Column(DateTime(timezone=True),
@@ -97,9 +121,13 @@ class VisitSchedule(Base):
 
     location = relationship("Location")
     rep = relationship("SalesRep", back_populates="schedules")
+    # Без FK в БД (секционированная таблица) — связь задана явно
     visit_log = relationship("VisitLog", back_populates="schedule",
+                             primaryjoin="foreign(VisitLog.schedule_id) == VisitSchedule.id",
                              cascade="all, delete-orphan")
 
+    __mapper_args__ = {"primary_key": [id]}
+
     def __repr__(self):
         return (f"<VisitSchedule(rep={self.rep_id}, loc={self.location_id},"
                 f" date={self.planned_date}, status={self.status})>")
@@ -137,25 +165,34 @@ class DailyRouteOverride(Base):
 class VisitLog(Base):
     """Фактический визит торгового представителя к ТТ."""
     __tablename__ = "visit_log"
+    # В PostgreSQL — помесячные секции по visited_date (src/database/partitions.py)
+    __table_args__ = (
+        # Визиты сотрудника за период (сводки, /visits?rep_id=)
+        Index("ix_visit_log_rep_date", "rep_id", "visited_date"),
+        {"postgresql_partition_by": "RANGE (visited_date)"},
+    )
 
     id = Column(String, primary_key=True, index=True,
                 default=lambda: str(uuid.uuid4()))
-    schedule_id = Column(String, ForeignKey("visit_schedule.id", ondelete="SET NULL"),
-                         nullable=True, index=True)
+    # visit_schedule.id; ON DELETE SET NULL — триггер в БД (миграция 011)
+    schedule_id = Column(String, nullable=True, index=True)
     location_id = Column(String, ForeignKey("locations.id"), nullable=False, index=True)
     rep_id = Column(String, ForeignKey("sales_reps.id", ondelete="CASCADE"),
                     nullable=False, index=True)
-    visited_date = Column(Date, nullable=False, index=True)
+    visited_date = Column(Date, primary_key=True, nullable=False, index=True)
     time_in = Column(Time, nullable=True)
     time_out = Column(Time, nullable=True)
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True),
                         default=lambda: datetime.now(timezone.utc))
 
-    schedule = relationship("VisitSchedule", back_populates="visit_log")
+    schedule = relationship("VisitSchedule", back_populates="visit_log",
+                            primaryjoin="foreign(VisitLog.schedule_id) == VisitSchedule.id")
     location = relationship("Location")
     rep = relationship("SalesRep", back_populates="visits")
 
+    __mapper_args__ = {"primary_key": [id]}
+
     def __repr__(self):
         return (f"<VisitLog(rep={self.rep_id}, loc={self.location_id},"
                 f" date={self.visited_date})>")
@@ -189,12 +226,17 @@ class ForceMajeureEvent(Base):
 class SkippedVisitStash(Base):
     """Стеш пропущенных визитов, ожидающих перераспределения."""
     __tablename__ = "skipped_visit_stash"
+    __table_args__ = (
+        # Очередь стеша: только нерешённые записи
+        Index("ix_skipped_stash_pending", "original_date", "created_at",
+              postgresql_where=text("resolution IS NULL"),
+              sqlite_where=text("resolution IS NULL")),
+    )
 
     id = Column(String, primary_key=True, index=True,
                 default=lambda: str(uuid.uuid4()))
-    visit_schedule_id = Column(
-        String, ForeignKey("visit_schedule.id", ondelete="SET NULL"), nullable=True
-    )
+    # Ссылки на visit_schedule.id без FK (секционированная таблица, миграция 011)
+    visit_schedule_id = Column(String, nullable=True)
     location_id = Column(
         String, ForeignKey("locations.id"), nullable=False, index=True
     )
@@ -204,9 +246,7 @@ class SkippedVisitStash(Base):
     original_date = Column(Date, nullable=False, index=True)
     resolution = Column(String, nullable=True)  # manual | ai | carry_over | NULL = pending
     resolved_at = Column(DateTime(timezone=True), nullable=True)
-    resolved_schedule_id = Column(
-        String, ForeignKey("visit_schedule.id", ondelete="SET NULL"), nullable=True
-    )
+    resolved_schedule_id = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True),
                         default=lambda: datetime.now(timezone.utc))
 
@@ -218,6 +258,64 @@ class SkippedVisitStash(Base):
                 f" date={self.original_date}, resolution={self.resolution})>")
 
 
+class MonthlyVisitRollup(Base):
+    """
+    Месячная сводка визитов по (месяц, сотрудник, категория ТТ, район).
+
+    Поддерживается в тех же транзакциях, что меняют визиты
+    (src/services/analytics_rollup.py), и пересобирается из сырых таблиц
+    командой rebuild — аналитика читает группы, а не все визиты.
+    """
+    __tablename__ = "monthly_visit_rollup"
+
+    month = Column(Date, primary_key=True)              # 1-е число месяца
+    rep_id = Column(String, ForeignKey("sales_reps.id", ondelete="CASCADE"),
+                    primary_key=True, index=True)
+    category = Column(String(1), primary_key=True)      # A | B | C | D | "?"
+    district = Column(String(255), primary_key=True)    # "" — район не указан
+    planned = Column(Integer, nullable=False, default=0)     # все записи плана
+    completed = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    cancelled = Column(Integer, nullable=False, default=0)
+    unique_tt = Column(Integer, nullable=False, default=0)   # ТТ в плане
+    visited_tt = Column(Integer, nullable=False, default=0)  # ТТ с фактом
+    visits = Column(Integer, nullable=False, default=0)      # записи visit_log
+    onsite_minutes = Column(Integer, nullable=False, default=0)
+    # t-digest длительностей визитов, мин (src/utils/tdigest.py)
+    duration_digest = Column(JSON, nullable=True)
+    updated_at = Column(DateTime(timezone=True),
+                        default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return (f"<MonthlyVisitRollup(month={self.month}, rep={self.rep_id},"
+                f" cat={self.category}, district={self.district})>")
+
+
+class VisitArchive(Base):
+    """
+    Архив закрытого месяца: план и журнал визитов одним сжатым блоком.
+
+    Пишется src/services/archive.py; строки месяца из visit_schedule /
+    visit_log при этом удаляются, чтения месяца идут из архива.
+    """
+    __tablename__ = "visit_archive"
+
+    month = Column(Date, primary_key=True)              # 1-е число месяца
+    schedule_count = Column(Integer, nullable=False, default=0)
+    log_count = Column(Integer, nullable=False, default=0)
+    raw_bytes = Column(Integer, nullable=False, default=0)  # JSON до сжатия
+    payload = Column(LargeBinary, nullable=False)            # zlib(JSON)
+    # Уникальные пары [rep_id, location_id] визитов месяца — /visits/stats
+    # считает уникальные ТТ архивных месяцев без распаковки payload
+    visited_pairs = Column(JSON, nullable=True)
+    archived_at = Column(DateTime(timezone=True),
+                         default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return (f"<VisitArchive(month={self.month}, schedules={self.schedule_count},"
+                f" logs={self.log_count})>")
+
+
 class Route(Base):
     """SQLAlchemy model for logistics routes."""
     __tablename__ = "routes"
@@ -254,9 +352,16 @@ class Metric(Base):
     cost = Column(Float, nullable=False)
     timestamp = Column(DateTime(timezone=True),
                        default=lambda: datetime.now(timezone.utc))
+    # Замеры вызовов LLM (src/services/model_selector.py): задача и размер запроса
+    task = Column(String(32), nullable=True)
+    num_locations = Column(Integer, nullable=True)
 
     route = relationship("Route", back_populates="metrics")
 
+    __table_args__ = (
+        Index("ix_metrics_task_model_timestamp", "task", "model_name", "timestamp"),
+    )
+
     def __repr__(self):
         return f"<Metric(model={self.model_name}, score={self.quality_score})>"
 
@@ -288,6 +393,32 @@ class OptimizationResult(Base):
         return "<OptimizationResult(imp={self.improvement_percentage}%)>"
 
 
+class LLMResultCache(Base):
+    """
+    Кэш ответов локальных LLM (src/services/llm_cache.py).
+
+    Ключ — sha256 от (модель, нормализованный промпт): одинаковые варианты
+    маршрута дают одинаковый промпт оценки, и повторная оценка не
+    запускает инференс. Записи живут LLM_CACHE_TTL_S, число записей
+    ограничено LLM_CACHE_MAX_ENTRIES (вытесняются давно не использованные).
+    """
+    __tablename__ = "llm_result_cache"
+
+    key = Column(String(64), primary_key=True)          # sha256 hex
+    model_id = Column(String, nullable=False)
+    task = Column(String(32), nullable=False)           # evaluate_variants | …
+    result = Column(JSON, nullable=False)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True),
+                        default=lambda: datetime.now(timezone.utc))
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    last_used_at = Column(DateTime(timezone=True), nullable=False, index=True,
+                          default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<LLMResultCache(model={self.model_id}, task={self.task}, hits={self.hits})>"
+
+
 class Holiday(Base):
     """Праздничный день с возможностью ручного управления статусом."""
     __tablename__ = "holidays"
@@ -304,6 +435,9 @@ class Holiday(Base):
 class AuditLog(Base):
     """Журнал изменений — логирует ключевые действия в системе."""
     __tablename__ = "audit_log"
+    __table_args__ = (
+        Index("ix_audit_log_created_at", "created_at"),
+    )
 
     id = Column(String, primary_key=True, index=True,
                 default=lambda: str(uuid.uuid4()))
@@ -0,0 +1,270 @@
+"""
+Помесячное секционирование visit_schedule и visit_log (PostgreSQL).
+
+Обе таблицы — RANGE-секционированы по дате визита (миграция
+011_partition_visit_tables): секция на каждый месяц
+(visit_schedule_y2026m03, …) плюс DEFAULT-секция для дат, под
+которые секции ещё нет. Горячие запросы фильтруют по месяцу и
+читают одну секцию.
+
+Секции на текущий и DB_PARTITION_MONTHS_AHEAD следующих месяцев
+создаются при старте приложения и перед генерацией плана. Если
+строки месяца уже попали в DEFAULT, они переносятся в новую секцию.
+
+Старый месяц снимается целиком: DETACH (таблица остаётся для
+архива) или DROP — вместо массового DELETE. Месячные сводки
+(monthly_visit_rollup) при этом не трогаются.
+
+    python -m src.database.partitions list
+    python -m src.database.partitions ensure [--ahead 3]
+    python -m src.database.partitions detach --month 2024-01
+    python -m src.database.partitions drop --month 2024-01
+
+На других СУБД (SQLite в тестах) функции ничего не делают.
+"""
+
+import argparse
+import asyncio
+import re
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Таблица → колонка-ключ секционирования
+PARTITIONED_TABLES: Dict[str, str] = {
+    "visit_schedule": "planned_date",
+    "visit_log": "visited_date",
+}
+
+_MONTH_SUFFIX = re.compile(r"_y(\d{4})m(\d{2})$")
+
+
+def _check_table(table: str) -> str:
+    if table not in PARTITIONED_TABLES:
+        raise ValueError(f"Таблица {table!r} не секционируется")
+    return PARTITIONED_TABLES[table]
+
+
+def partition_name(table: str, month: date) -> str:
+    _check_table(table)
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def default_partition_name(table: str) -> str:
+    _check_table(table)
+    return f"{table}_default"
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def months_from(start: date, count: int) -> List[date]:
+    """count месяцев подряд, начиная с месяца start."""
+    months, month = [], start.replace(day=1)
+    for _ in range(count):
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def is_postgres(conn: Connection) -> bool:
+    return conn.dialect.name == "postgresql"
+
+
+def _table_exists(conn: Connection, name: str) -> bool:
+    return conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    if not is_postgres(conn):
+        return False
+    return conn.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+        ),
+        {"table": table},
+    ).scalar() is not None
+
+
+def list_partitions(conn: Connection, table: str) -> List[Tuple[str, Optional[date]]]:
+    """[(имя секции, месяц | None для DEFAULT)] по возрастанию месяца."""
+    _check_table(table)
+    if not is_partitioned(conn, table):
+        return []
+    rows = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table AND pg_table_is_visible(p.oid)"
+        ),
+        {"table": table},
+    ).scalars().all()
+
+    result: List[Tuple[str, Optional[date]]] = []
+    for name in rows:
+        match = _MONTH_SUFFIX.search(name)
+        result.append((name, date(int(match[1]), int(match[2]), 1) if match else None))
+    return sorted(result, key=lambda item: (item[1] is None, item[1] or date.min))
+
+
+def ensure_default_partition(conn: Connection, table: str) -> None:
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {default_partition_name(table)} "
+        f"PARTITION OF {table} DEFAULT"
+    ))
+
+
+def create_month_partition(conn: Connection, table: str, month: date) -> bool:
+    """Создаёт секцию месяца; False — если она уже есть."""
+    column = _check_table(table)
+    name = partition_name(table, month)
+    if _table_exists(conn, name):
+        return False
+
+    lo, hi = month.replace(day=1).isoformat(), next_month(month).isoformat()
+    default = default_partition_name(table)
+    if _table_exists(conn, default):
+        # Строки месяца могли лечь в DEFAULT — тогда PARTITION OF упадёт.
+        # Создаём таблицу отдельно, переносим строки и подключаем секцией.
+        conn.execute(text(
+            f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        ))
+        conn.execute(text(
+            f"WITH moved AS (DELETE FROM {default} "
+            f"WHERE {column} >= '{lo}' AND {column} < '{hi}' RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ))
+        conn.execute(text(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ('{lo}') TO ('{hi}')"
+        ))
+    else:
+        conn.execute(text(
+            f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ('{lo}') TO ('{hi}')"
+        ))
+    return True
+
+
+def ensure_partitions(
+    conn: Connection,
+    months_ahead: int,
+    start: Optional[date] = None,
+) -> List[str]:
+    """
+    Секции на месяц start (по умолчанию — текущий) и months_ahead следующих.
+
+    Возвращает имена созданных секций. Таблицы без секционирования
+    (не применена миграция, не Postgres) пропускаются.
+    """
+    if not is_postgres(conn):
+        return []
+    created: List[str] = []
+    months = months_from(start or date.today(), months_ahead + 1)
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(conn, table):
+            continue
+        ensure_default_partition(conn, table)
+        for month in months:
+            if create_month_partition(conn, table, month):
+                created.append(partition_name(table, month))
+    return created
+
+
+def _clear_schedule_refs(conn: Connection, partition: str) -> None:
+    # FK на visit_schedule нет (секционированная таблица), ON DELETE SET NULL
+    # делает триггер — но на DETACH/DROP секции он не срабатывает
+    conn.execute(text(
+        f"UPDATE visit_log SET schedule_id = NULL "
+        f"WHERE schedule_id IN (SELECT id FROM {partition})"
+    ))
+    for column in ("visit_schedule_id", "resolved_schedule_id"):
+        conn.execute(text(
+            f"UPDATE skipped_visit_stash SET {column} = NULL "
+            f"WHERE {column} IN (SELECT id FROM {partition})"
+        ))
+
+
+def detach_month(conn: Connection, month: date) -> List[str]:
+    """
+    Отключает секции месяца от visit_log и visit_schedule.
+
+    Таблицы остаются как обычные (для архива/выгрузки); имена возвращаются.
+    """
+    detached: List[str] = []
+    for table in ("visit_log", "visit_schedule"):
+        name = partition_name(table, month)
+        if not is_partitioned(conn, table) or not _table_exists(conn, name):
+            continue
+        if table == "visit_schedule":
+            _clear_schedule_refs(conn, name)
+        conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        detached.append(name)
+    return detached
+
+
+def drop_month(conn: Connection, month: date) -> List[str]:
+    """Удаляет визиты месяца целиком — DROP секций вместо DELETE."""
+    dropped = detach_month(conn, month)
+    for name in dropped:
+        conn.execute(text(f"DROP TABLE {name}"))
+    return dropped
+
+
+async def ensure_month_partitions(
+    engine: AsyncEngine,
+    months_ahead: int,
+    start: Optional[date] = None,
+) -> List[str]:
+    """ensure_partitions в отдельной короткой транзакции (DDL блокирует родителя)."""
+    async with engine.begin() as conn:
+        return await conn.run_sync(ensure_partitions, months_ahead, start)
+
+
+async def _cli(args: argparse.Namespace) -> None:
+    from src.config import settings
+    from src.database.models import engine
+    from src.services.analytics_rollup import parse_month
+
+    try:
+        if args.command == "ensure":
+            ahead = settings.db_partition_months_ahead if args.ahead is None else args.ahead
+            created = await ensure_month_partitions(engine, ahead)
+            print(f"Created partitions: {', '.join(created) or 'none'}")
+            return
+
+        async with engine.begin() as conn:
+            if args.command == "list":
+                for table in PARTITIONED_TABLES:
+                    parts = await conn.run_sync(list_partitions, table)
+                    print(f"{table}: {len(parts)} partitions")
+                    for name, _ in parts:
+                        print(f"  {name}")
+            elif args.command in ("detach", "drop"):
+                action = detach_month if args.command == "detach" else drop_month
+                names = await conn.run_sync(action, parse_month(args.month))
+                print(f"{args.command}: {', '.join(names) or 'nothing to do'}")
+    finally:
+        await engine.dispose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Секции visit_schedule / visit_log")
+    parser.add_argument("command", choices=["list", "ensure", "detach", "drop"])
+    parser.add_argument("--month", help="Месяц YYYY-MM (для detach/drop)")
+    parser.add_argument("--ahead", type=int, default=None,
+                        help="Сколько будущих месяцев создать (ensure)")
+    args = parser.parse_args()
+    if args.command in ("detach", "drop") and not args.month:
+        parser.error("--month обязателен для detach/drop")
+    asyncio.run(_cli(args))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,127 @@
+"""
+Настройки пула соединений async-движка и телеметрия пула.
+
+Параметры берутся из Settings (DB_POOL_SIZE, DB_MAX_OVERFLOW, …).
+InstrumentedAsyncQueuePool замеряет время выдачи соединения из пула
+(ожидание свободного слота + pre-ping / создание нового соединения)
+и считает таймауты — утренние всплески видны в /health и
+GET /metrics/db-pool, а не только по росту latency.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from src.config import Settings
+
+# Верхние границы корзин гистограммы ожидания, мс (последняя — +Inf)
+CHECKOUT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class PoolStats:
+    """Счётчики выдачи соединений (потокобезопасно, копится с запуска процесса)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_sum_ms = 0.0
+            self.wait_max_ms = 0.0
+            self.buckets = [0] * (len(CHECKOUT_BUCKETS_MS) + 1)
+
+    def observe(self, wait_ms: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_sum_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+            self.buckets[bisect_left(CHECKOUT_BUCKETS_MS, wait_ms)] += 1
+
+    def observe_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            cumulative, histogram = 0, {}
+            for bound, count in zip(CHECKOUT_BUCKETS_MS + ("+Inf",), self.buckets):
+                cumulative += count
+                histogram[str(bound)] = cumulative
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_sum_ms / self.checkouts, 2) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max_ms, 2),
+                "wait_sum_ms": round(self.wait_sum_ms, 2),
+                # Кумулятивная гистограмма: кол-во выдач с ожиданием <= границы
+                "wait_histogram_ms": histogram,
+            }
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool с замером времени выдачи соединения."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        t0 = time.perf_counter()
+        try:
+            conn = super().connect()
+        except exc.TimeoutError:
+            self.stats.observe_timeout()
+            raise
+        self.stats.observe((time.perf_counter() - t0) * 1000)
+        return conn
+
+
+def engine_options(settings: Settings, url: str) -> Dict[str, Any]:
+    """kwargs для create_async_engine по настройкам пула."""
+    options: Dict[str, Any] = {
+        "poolclass": InstrumentedAsyncQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout_s,
+        "pool_recycle": settings.db_pool_recycle_s,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    if url.startswith("postgresql+asyncpg"):
+        connect_args: Dict[str, Any] = {
+            # Кэш подготовленных выражений: SQLAlchemy и сам asyncpg.
+            # 0 — для pgbouncer в режиме transaction pooling.
+            "prepared_statement_cache_size": settings.db_statement_cache_size,
+            "statement_cache_size": settings.db_statement_cache_size,
+        }
+        if settings.db_statement_timeout_ms:
+            connect_args["server_settings"] = {
+                "statement_timeout": str(settings.db_statement_timeout_ms),
+            }
+        options["connect_args"] = connect_args
+    return options
+
+
+def pool_status(engine) -> Dict[str, Any]:
+    """Текущее состояние пула + накопленная статистика выдачи соединений."""
+    pool = engine.pool
+    status: Dict[str, Any] = {"class": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            # QueuePool считает overflow от -pool_size, пока пул не заполнен
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout_s": pool.timeout(),
+        })
+    if isinstance(pool, InstrumentedAsyncQueuePool):
+        status.update(pool.stats.snapshot())
+    return status
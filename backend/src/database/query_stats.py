@@ -0,0 +1,129 @@
+"""
+Счётчик SQL-запросов на HTTP-запрос и детектор N+1.
+
+События before/after_cursor_execute движков (primary и реплики) пишут
+в QueryStats текущего запроса (contextvar, ставит AdvancedMiddleware):
+число выражений, суммарное время в БД и «форму» каждого выражения —
+SQL без значений параметров и с IN (...) любой длины, свёрнутым в
+IN (?). Форма, повторившаяся DB_REPEAT_WARN_THRESHOLD раз за запрос,
+почти всегда означает запрос в цикле (N+1) — это пишется в лог
+WARNING вместе с request_id.
+
+Итоги — в заголовках ответа X-DB-Queries / X-DB-Time и в строке
+access-лога middleware. В тестах бюджет запросов фиксирует
+query_budget():
+
+    with query_budget(max_queries=3, max_repeats=1):
+        await upload_locations(...)
+"""
+
+import contextlib
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from src.logging_config import request_id_var
+
+_PARAM = r"(?:\?|%s|%\(\w+\)s|\$\d+)"
+_PARAM_LIST_RE = re.compile(rf"\(\s*{_PARAM}(?:\s*,\s*{_PARAM})*\s*\)")
+_PARAM_RE = re.compile(_PARAM)
+_SPACE_RE = re.compile(r"\s+")
+
+_current: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+
+def statement_shape(statement: str) -> str:
+    """SQL без конкретных параметров: одинаковые запросы в цикле дают одну форму."""
+    shape = _PARAM_RE.sub("?", _SPACE_RE.sub(" ", statement).strip())
+    return _PARAM_LIST_RE.sub("(?)", shape)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Запросов к БД больше, чем зафиксировано в тесте."""
+
+
+class QueryStats:
+    """SQL-выражения одного HTTP-запроса (или блока query_budget)."""
+
+    def __init__(self):
+        self.request_id = request_id_var.get()
+        self.count = 0
+        self.time_ms = 0.0
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.time_ms += elapsed_ms
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Формы, выполненные не меньше threshold раз, самые частые первыми."""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    @property
+    def max_repeats(self) -> int:
+        return max(self.shapes.values(), default=0)
+
+
+@contextlib.contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Считать выражения, выполненные в этом контексте (и в задачах, созданных из него)."""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def query_budget(max_queries: int, max_repeats: Optional[int] = None) -> Iterator[QueryStats]:
+    """
+    Тестовый помощник: QueryBudgetExceeded, если блок выполнил больше
+    max_queries выражений или одну форму больше max_repeats раз.
+    """
+    with track_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        raise QueryBudgetExceeded(
+            f"{stats.count} queries, budget {max_queries}: "
+            + "; ".join(f"{n}x {shape}" for shape, n in stats.shapes.most_common(5))
+        )
+    if max_repeats is not None and stats.max_repeats > max_repeats:
+        shape, n = stats.shapes.most_common(1)[0]
+        raise QueryBudgetExceeded(f"{n}x repeated query, budget {max_repeats}: {shape}")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = conn.info.get("query_started")
+    if stats is not None and started:
+        stats.record(statement, (time.perf_counter() - started.pop()) * 1000)
+
+
+def _handle_error(exception_context):
+    # Упавшее выражение тоже считается — и не оставляет время старта в стеке
+    conn = exception_context.connection
+    stats = _current.get()
+    started = conn.info.get("query_started") if conn is not None else None
+    if stats is not None and started and exception_context.statement:
+        stats.record(exception_context.statement, (time.perf_counter() - started.pop()) * 1000)
+
+
+def instrument_engine(engine) -> None:
+    """Подключает счётчик к движку (async или sync); повторный вызов безопасен."""
+    target = getattr(engine, "sync_engine", engine)
+    if event.contains(target, "after_cursor_execute", _after_cursor_execute):
+        return
+    event.listen(target, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target, "after_cursor_execute", _after_cursor_execute)
+    event.listen(target, "handle_error", _handle_error)
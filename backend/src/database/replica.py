@@ -0,0 +1,180 @@
+"""
+Маршрутизация чтений на read-реплику.
+
+GET-эндпоинты, которым не нужна свежайшая запись (план на месяц,
+маршруты дня, журнал визитов, /insights, выгрузка в Excel), берут
+сессию через get_read_session вместо get_session. Если реплика не
+задана (DATABASE_REPLICA_URL), недоступна или отстаёт больше
+DB_REPLICA_MAX_LAG_S — сессия открывается на primary, так что
+эндпоинты работают одинаково с репликой и без неё.
+
+Отставание проверяется не чаще раза в DB_REPLICA_CHECK_INTERVAL_S
+(одним запросом на реплике), а не на каждый запрос.
+
+Клиент, который только что записал данные и сразу их перечитывает,
+шлёт заголовок X-Read-Your-Writes: 1 — такой запрос читает с primary.
+Фактический источник виден в заголовке ответа X-DB-Read.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, async_sessionmaker
+
+from src.config import settings
+from src.database.models import new_session, read_engine
+from src.database.pool import pool_status
+
+logger = logging.getLogger("db_replica")
+
+READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes"
+READ_TARGET_HEADER = "X-DB-Read"
+
+PRIMARY = "primary"
+REPLICA = "replica"
+
+# Отставание реплики в секундах. Если всё полученное WAL уже применено —
+# реплика догнала primary (иначе на простаивающей базе replay_timestamp
+# «стареет» и даёт ложное отставание). На primary (не в recovery) — 0.
+_PG_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+async def measure_replica_lag(conn: AsyncConnection) -> float:
+    """Отставание реплики, с. Для не-Postgres баз — только проверка связи."""
+    if conn.dialect.name != "postgresql":
+        await conn.execute(text("SELECT 1"))
+        return 0.0
+    value = (await conn.execute(_PG_LAG_SQL)).scalar()
+    return float(value or 0.0)
+
+
+class ReplicaRouter:
+    """Выбирает фабрику сессий для чтения: реплика или primary."""
+
+    def __init__(
+        self,
+        primary_factory: async_sessionmaker,
+        replica_engine: Optional[AsyncEngine] = None,
+        max_lag_s: float = 5.0,
+        check_interval_s: float = 10.0,
+    ):
+        self.primary_factory = primary_factory
+        self.replica_engine = replica_engine
+        self.replica_factory = (
+            async_sessionmaker(replica_engine, expire_on_commit=False)
+            if replica_engine is not None else None
+        )
+        self.max_lag_s = max_lag_s
+        self.check_interval_s = check_interval_s
+
+        self._lock = asyncio.Lock()
+        self._checked_at: Optional[float] = None
+        self.healthy = False
+        self.lag_s: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.reads = {REPLICA: 0, PRIMARY: 0, "fallback": 0, "read_your_writes": 0}
+
+    @property
+    def configured(self) -> bool:
+        return self.replica_factory is not None
+
+    def _check_due(self) -> bool:
+        return (
+            self._checked_at is None
+            or time.monotonic() - self._checked_at >= self.check_interval_s
+        )
+
+    async def check(self, force: bool = False) -> bool:
+        """Годна ли реплика для чтения; результат кэшируется на check_interval_s."""
+        if not self.configured:
+            return False
+        if not force and not self._check_due():
+            return self.healthy
+
+        async with self._lock:
+            # Пока ждали lock, проверку мог сделать параллельный запрос
+            if not force and not self._check_due():
+                return self.healthy
+            try:
+                async with self.replica_engine.connect() as conn:
+                    lag = await measure_replica_lag(conn)
+            except Exception as exc:
+                if self.healthy or self._checked_at is None:
+                    logger.warning(f"Read replica unavailable, reading from primary: {exc}")
+                self.healthy, self.lag_s, self.last_error = False, None, str(exc)
+            else:
+                if lag > self.max_lag_s and (self.healthy or self._checked_at is None):
+                    logger.warning(
+                        f"Read replica lag {lag:.1f}s > {self.max_lag_s}s, reading from primary"
+                    )
+                self.healthy, self.lag_s, self.last_error = lag <= self.max_lag_s, lag, None
+            self._checked_at = time.monotonic()
+        return self.healthy
+
+    async def choose(self, read_your_writes: bool = False) -> Tuple[async_sessionmaker, str]:
+        """(фабрика сессий, PRIMARY | REPLICA) для очередного чтения."""
+        if not self.configured:
+            self.reads[PRIMARY] += 1
+            return self.primary_factory, PRIMARY
+        if read_your_writes:
+            self.reads["read_your_writes"] += 1
+            self.reads[PRIMARY] += 1
+            return self.primary_factory, PRIMARY
+        if await self.check():
+            self.reads[REPLICA] += 1
+            return self.replica_factory, REPLICA
+        self.reads["fallback"] += 1
+        self.reads[PRIMARY] += 1
+        return self.primary_factory, PRIMARY
+
+    def status(self) -> Dict[str, Any]:
+        if not self.configured:
+            return {"configured": False, "reads": dict(self.reads)}
+        return {
+            "configured": True,
+            "healthy": self.healthy,
+            "lag_s": round(self.lag_s, 3) if self.lag_s is not None else None,
+            "max_lag_s": self.max_lag_s,
+            "last_error": self.last_error,
+            "reads": dict(self.reads),
+            "pool": pool_status(self.replica_engine),
+        }
+
+
+replica_router = ReplicaRouter(
+    new_session,
+    read_engine,
+    max_lag_s=settings.db_replica_max_lag_s,
+    check_interval_s=settings.db_replica_check_interval_s,
+)
+
+
+def wants_read_your_writes(request: Request) -> bool:
+    value = request.headers.get(READ_YOUR_WRITES_HEADER, "")
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+async def get_read_session_factory(request: Request, response: Response) -> async_sessionmaker:
+    """Фабрика сессий для чтения — для эндпоинтов с параллельными запросами."""
+    factory, target = await replica_router.choose(wants_read_your_writes(request))
+    response.headers[READ_TARGET_HEADER] = target
+    return factory
+
+
+async def get_read_session(request: Request, response: Response):
+    """Как get_session, но для чтения: реплика, если она свежая, иначе primary."""
+    factory = await get_read_session_factory(request, response)
+    async with factory() as session:
+        yield session
@@ -23,6 +23,10 @@ class JsonFormatter(logging.Formatter):
             "request_id": record.request_id,
             "msg": record.getMessage(),
         }
+        # logger.info(..., extra={"fields": {...}}) — отдельные поля JSON
+        fields = getattr(record, "fields", None)
+        if isinstance(fields, dict):
+            payload.update(fields)
         if record.exc_info:
             payload["exc"] = self.formatException(record.exc_info)
         return json.dumps(payload, ensure_ascii=False)
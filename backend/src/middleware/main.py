@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import time
 import uuid
@@ -7,10 +8,32 @@ from fastapi.responses import JSONResponse
 
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from src.config import settings
+from src.database.query_stats import track_queries
 from src.logging_config import request_id_var
+from src.utils import profiler as request_profiler
+from src.utils.metrics import registry
 
 logger = logging.getLogger(__name__)
 
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+HTTP_IN_PROGRESS = registry.gauge(
+    "http_requests_in_progress",
+    "HTTP requests being processed",
+    ("method",),
+)
+
+
+def _route_label(request: Request) -> str:
+    # Шаблон пути (/api/v1/routes/{route_id}), а не сам путь — иначе
+    # каждый id порождает свою серию
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
 
 class AdvancedMiddleware(BaseHTTPMiddleware):
     """Middleware for logging, performance monitoring, and error handling."""
@@ -19,21 +42,50 @@ class AdvancedMiddleware(BaseHTTPMiddleware):
         request_id = str(uuid.uuid4())
         token = request_id_var.set(request_id)
         start_time = time.time()
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        HTTP_IN_PROGRESS.inc(method=request.method)
+        profiler = None
+        if request_profiler.profiling_enabled() and request_profiler.should_profile(
+            request.headers, request.query_params,
+        ):
+            profiler = request_profiler.try_start()
+
+        db_stats = None
 
         try:
-            response = await call_next(request)
+            # Тело StreamingResponse читается уже после call_next — его
+            # запросы в заголовки не попадают
+            with track_queries() as db_stats:
+                response = await call_next(request)
             process_time = time.time() - start_time
+            status_code = response.status_code
 
             response.headers["X-Request-ID"] = request_id
             response.headers["X-Process-Time"] = f"{process_time:.4f}s"
+            response.headers["X-DB-Queries"] = str(db_stats.count)
+            response.headers["X-DB-Time"] = f"{db_stats.time_ms:.1f}ms"
+            if profiler is not None:
+                # Профиль: GET /api/v1/admin/profiles/{X-Request-ID}
+                response.headers["X-Profiled"] = "1"
 
             logger.info(
-                "%s %s → %d (%.0fms) rid=%s",
+                "%s %s → %d (%.0fms, db %d/%.0fms) rid=%s",
                 request.method,
                 request.url.path,
                 response.status_code,
                 process_time * 1000,
+                db_stats.count,
+                db_stats.time_ms,
                 request_id,
+                extra={"fields": {
+                    "method": request.method,
+                    "path": request.url.path,
+                    "status": response.status_code,
+                    "duration_ms": round(process_time * 1000, 1),
+                    "db_queries": db_stats.count,
+                    "db_time_ms": round(db_stats.time_ms, 1),
+                    "db_max_repeats": db_stats.max_repeats,
+                }},
             )
             return response
 
@@ -48,4 +100,25 @@ class AdvancedMiddleware(BaseHTTPMiddleware):
                 },
             )
         finally:
+            if db_stats is not None:
+                for shape, repeats in db_stats.repeated(settings.db_repeat_warn_threshold):
+                    logger.warning(
+                        "Possible N+1: %d× %s on %s %s",
+                        repeats, shape[:300], request.method, _route_label(request),
+                    )
+            HTTP_IN_PROGRESS.dec(method=request.method)
+            HTTP_REQUEST_SECONDS.observe(
+                time.time() - start_time,
+                method=request.method,
+                route=_route_label(request),
+                status=str(status_code),
+            )
+            if profiler is not None:
+                await asyncio.to_thread(request_profiler.finish, profiler, request_id, {
+                    "method": request.method,
+                    "path": request.url.path,
+                    "route": _route_label(request),
+                    "status": status_code,
+                    "duration_ms": round((time.time() - start_time) * 1000, 1),
+                })
             request_id_var.reset(token)
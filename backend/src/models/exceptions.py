@@ -29,6 +29,11 @@ class QwenValidationError(QwenError):
     pass
 
 
+class QwenUnavailableError(QwenError):
+    """Модель ещё загружается (фоновый прогрев)"""
+    pass
+
+
 class TProError(Exception):
     """Базовый класс ошибок T-Pro"""
     def __init__(self, message):
@@ -95,3 +100,8 @@ class LlamaServerError(LlamaError):
 class LlamaValidationError(LlamaError):
     """Ошибка валидации данных Llama"""
     pass
+
+
+class LlamaUnavailableError(LlamaError):
+    """Модель ещё загружается (фоновый прогрев)"""
+    pass
@@ -0,0 +1,142 @@
+"""
+Ограниченная декодировка ответов локальных моделей (llama.cpp).
+
+Вместо «попросить JSON и надеяться» модель генерирует по грамматике
+GBNF, построенной из JSON-схемы ответа: невалидный JSON (markdown,
+COMPUTE вместо чисел, обрыв массива, чужие ID) не может появиться,
+поэтому ответ разбирается с первой попытки и циклы повторов в
+generate_route не срабатывают.
+
+Схемы строятся под конкретный запрос: в маршруте — ровно n ID из
+входных точек, в оценке — ровно по одной записи на вариант с 2–3
+плюсами и минусами. Грамматики кэшируются по тексту схемы.
+
+LLM_CONSTRAINED_DECODING=false — старое поведение (без грамматики).
+"""
+
+import json
+import logging
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+from src.utils.optional_deps import MissingDependency, require
+
+logger = logging.getLogger(__name__)
+
+# Длина одного плюса/минуса в символах — «короткая фраза до 8 слов»
+MAX_POINT_CHARS = 80
+# Плюсов и минусов на вариант — не больше
+MAX_POINTS = 3
+
+
+def route_schema(location_ids: Sequence[str]) -> Dict[str, Any]:
+    """
+    Схема ответа generate_route: ровно n ID из входных точек и итоговые
+    метрики. Повторы ID грамматика не исключает (uniqueItems в GBNF не
+    выражается), так что это не обязательно перестановка; _parse_response
+    последовательность не использует — маршрут строится из входных точек.
+    """
+    n = len(location_ids)
+    return {
+        "type": "object",
+        "properties": {
+            "locations_sequence": {
+                "type": "array",
+                "items": {"enum": list(location_ids)},
+                "minItems": n,
+                "maxItems": n,
+            },
+            "total_distance_km": {"type": "number"},
+            "total_time_hours": {"type": "number"},
+            "total_cost_rub": {"type": "number"},
+        },
+        "required": ["locations_sequence", "total_distance_km", "total_time_hours", "total_cost_rub"],
+        "additionalProperties": False,
+    }
+
+
+def evaluation_schema(variant_ids: Sequence[Any]) -> Dict[str, Any]:
+    """Схема ответа evaluate_variants: [{id, pros[2..3], cons[2..3]}] на каждый вариант."""
+    points = {
+        "type": "array",
+        "items": {"type": "string", "minLength": 1, "maxLength": MAX_POINT_CHARS},
+        "minItems": 2,
+        "maxItems": MAX_POINTS,
+    }
+    return {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {"id": {"enum": list(variant_ids)}, "pros": points, "cons": points},
+            "required": ["id", "pros", "cons"],
+            "additionalProperties": False,
+        },
+        "minItems": len(variant_ids),
+        "maxItems": len(variant_ids),
+    }
+
+
+def route_max_tokens(n_locations: int, base: int) -> int:
+    """
+    Лимит токенов для маршрута по грамматике.
+
+    Грамматика не даёт модели «сократить» ответ, поэтому лимит должен
+    вмещать все n ID (~12 токенов на ID с кавычками) — иначе ответ
+    оборвётся посреди массива.
+    """
+    return max(base, 12 * n_locations + 96)
+
+
+def evaluation_max_tokens(n_variants: int, base: int) -> int:
+    """
+    Лимит токенов для оценки по грамматике — из evaluation_schema.
+
+    На вариант до 2 × MAX_POINTS фраз по MAX_POINT_CHARS символов
+    (кириллица — ~2 символа на токен, плюс кавычки и запятая) и ~16
+    токенов на id и ключи; иначе ответ оборвётся посреди массива.
+    """
+    per_variant = 2 * MAX_POINTS * (MAX_POINT_CHARS // 2 + 4) + 16
+    return max(base, per_variant * n_variants + 16)
+
+
+@lru_cache(maxsize=64)
+def _grammar_from_schema(schema_json: str):
+    return require("llama_cpp").LlamaGrammar.from_json_schema(schema_json, verbose=False)
+
+
+def json_schema_grammar(schema: Dict[str, Any]) -> Optional[Any]:
+    """
+    LlamaGrammar по JSON-схеме или None, если ограничение выключено или
+    грамматику построить нельзя (тогда генерация идёт без ограничений).
+    """
+    from src.config import settings
+
+    if not settings.llm_constrained_decoding:
+        return None
+    try:
+        return _grammar_from_schema(json.dumps(schema, ensure_ascii=False, sort_keys=True))
+    except MissingDependency:
+        return None
+    except Exception as exc:
+        logger.warning("Could not build JSON grammar, decoding unconstrained: %s", exc)
+        return None
+
+
+def completion_kwargs(grammar: Optional[Any], cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """
+    Доп. аргументы create_chat_completion: grammar только если она есть;
+    cancel — остановка генерации на следующем токене (см. InferenceWorker.run).
+    """
+    kwargs: Dict[str, Any] = {"grammar": grammar} if grammar is not None else {}
+    if cancel is not None:
+        try:
+            criteria = require("llama_cpp").StoppingCriteriaList
+        except MissingDependency:
+            return kwargs
+        kwargs["stopping_criteria"] = criteria([lambda input_ids, logits: cancel.is_set()])
+    return kwargs
+
+
+def location_ids(locations: List[Dict[str, Any]]) -> List[str]:
+    return [str(loc["ID"]) for loc in locations]
@@ -0,0 +1,237 @@
+"""
+Выделенный исполнитель инференса для локальных GGUF-моделей.
+
+Контекст llama.cpp (QwenClient._llm / LlamaClient._llm) один на процесс
+и не потокобезопасен, а вызовы через run_in_executor(None, ...) шли в
+общий пул потоков — несколько /optimize/variants забивали его и
+сталкивались на одном контексте. Теперь у каждой модели свой
+однопоточный исполнитель: вызовы create_chat_completion идут строго
+по одному.
+
+- Очередь ограничена (LLM_QUEUE_MAX: ожидающие + выполняемый): сверх
+  лимита запрос сразу отклоняется InferenceQueueFullError. Запрос
+  отклоняется и тогда, когда по средней длительности инференса он
+  заведомо не дождётся своей очереди до дедлайна.
+- У каждого запроса дедлайн: если он истёк, пока запрос ждал в очереди,
+  инференс не запускается; вызывающий получает InferenceDeadlineError.
+  Уже начатый инференс прерывается, только если вызывающий передал
+  cancel (threading.Event, который проверяет stopping_criteria
+  llama.cpp) — тогда генерация останавливается на следующем токене и
+  при истечении дедлайна, и при отмене запроса (клиент SSE отключился).
+  Без cancel инференс доработает, но ответ будет отброшен.
+- Метрики (глубина очереди, ожидание, длительность, отказы) — в
+  /metrics/llm-queue и /health.
+"""
+
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+# Верхние границы корзин гистограмм, мс (последняя — +Inf)
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 20000, 30000, 60000, 120000)
+# Вес нового замера в скользящем среднем длительности инференса
+_EWMA_ALPHA = 0.3
+
+
+class InferenceQueueFullError(Exception):
+    """Очередь инференса модели заполнена — запрос не принят."""
+
+
+class InferenceDeadlineError(Exception):
+    """Дедлайн запроса истёк в очереди или во время инференса."""
+
+
+@dataclass
+class _Job:
+    fn: Callable[[], Any]
+    deadline: float
+    enqueued_at: float = field(default_factory=time.monotonic)
+    abandoned: bool = False
+
+
+def _histogram(buckets: list) -> Dict[str, int]:
+    cumulative, histogram = 0, {}
+    for bound, count in zip(LATENCY_BUCKETS_MS + ("+Inf",), buckets):
+        cumulative += count
+        histogram[str(bound)] = cumulative
+    return histogram
+
+
+class InferenceWorker:
+    """Однопоточный исполнитель инференса одной модели с ограниченной очередью."""
+
+    def __init__(self, name: str, max_queue: int):
+        self.name = name
+        self.max_queue = max(1, max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"llm-{name}")
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._running = False
+        self._avg_run_s: Optional[float] = None
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.submitted = 0
+            self.completed = 0
+            self.failed = 0
+            self.rejected = 0
+            self.expired = 0
+            self.timeouts = 0
+            self.cancelled = 0
+            self.max_depth = 0
+            self.wait_sum_ms = 0.0
+            self.run_sum_ms = 0.0
+            self.wait_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+            self.run_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    def _admit(self, timeout_s: float) -> None:
+        with self._lock:
+            if self._depth >= self.max_queue:
+                self.rejected += 1
+                raise InferenceQueueFullError(
+                    f"{self.name}: inference queue is full ({self._depth}/{self.max_queue})"
+                )
+            if self._avg_run_s is not None and self._depth * self._avg_run_s > timeout_s:
+                self.rejected += 1
+                raise InferenceQueueFullError(
+                    f"{self.name}: expected queue wait {self._depth * self._avg_run_s:.1f}s "
+                    f"exceeds deadline {timeout_s:.1f}s"
+                )
+            self._depth += 1
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, self._depth)
+
+    def _release(self, _future: Future) -> None:
+        with self._lock:
+            self._depth -= 1
+
+    def _execute(self, job: _Job) -> Any:
+        started = time.monotonic()
+        wait_ms = (started - job.enqueued_at) * 1000
+        with self._lock:
+            self.wait_sum_ms += wait_ms
+            self.wait_buckets[bisect_left(LATENCY_BUCKETS_MS, wait_ms)] += 1
+            if job.abandoned or started >= job.deadline:
+                self.expired += 1
+                raise InferenceDeadlineError(f"{self.name}: deadline expired in queue")
+            self._running = True
+        try:
+            result = job.fn()
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            run_s = time.monotonic() - started
+            with self._lock:
+                self._running = False
+                self.run_sum_ms += run_s * 1000
+                self.run_buckets[bisect_left(LATENCY_BUCKETS_MS, run_s * 1000)] += 1
+                self._avg_run_s = run_s if self._avg_run_s is None else (
+                    _EWMA_ALPHA * run_s + (1 - _EWMA_ALPHA) * self._avg_run_s
+                )
+        with self._lock:
+            self.completed += 1
+        return result
+
+    async def run(
+        self,
+        fn: Callable[[], Any],
+        timeout_s: float,
+        cancel: Optional[threading.Event] = None,
+    ) -> Any:
+        """
+        Выполняет fn в потоке модели, не дольше timeout_s с момента вызова.
+
+        InferenceQueueFullError — запрос не принят;
+        InferenceDeadlineError — не уложился в дедлайн (в очереди или в работе).
+        cancel выставляется, если ожидание прервано (дедлайн или отмена задачи).
+        """
+        self._admit(timeout_s)
+        job = _Job(fn=fn, deadline=time.monotonic() + timeout_s)
+        try:
+            future = self._executor.submit(self._execute, job)
+        except BaseException:
+            with self._lock:
+                self._depth -= 1
+            raise
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout_s)
+        except asyncio.TimeoutError as exc:
+            self._abandon(job, cancel)
+            with self._lock:
+                self.timeouts += 1
+            raise InferenceDeadlineError(
+                f"{self.name}: inference exceeded deadline of {timeout_s:.0f}s"
+            ) from exc
+        except asyncio.CancelledError:
+            self._abandon(job, cancel)
+            with self._lock:
+                self.cancelled += 1
+            raise
+
+    @staticmethod
+    def _abandon(job: _Job, cancel: Optional[threading.Event]) -> None:
+        job.abandoned = True
+        if cancel is not None:
+            cancel.set()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self.completed + self.failed
+            started = done + self.expired
+            return {
+                "queue_depth": self._depth,
+                "queue_max": self.max_queue,
+                "running": self._running,
+                "max_depth": self.max_depth,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "expired": self.expired,
+                "timeouts": self.timeouts,
+                "cancelled": self.cancelled,
+                "wait_avg_ms": round(self.wait_sum_ms / started, 1) if started else 0.0,
+                "run_avg_ms": round(self.run_sum_ms / done, 1) if done else 0.0,
+                "wait_sum_ms": round(self.wait_sum_ms, 1),
+                "run_sum_ms": round(self.run_sum_ms, 1),
+                # Кумулятивные гистограммы: кол-во запросов с временем <= границы
+                "wait_histogram_ms": _histogram(self.wait_buckets),
+                "run_histogram_ms": _histogram(self.run_buckets),
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_workers: Dict[str, InferenceWorker] = {}
+_workers_lock = threading.Lock()
+
+
+def get_worker(name: str) -> InferenceWorker:
+    """Исполнитель модели name (создаётся при первом обращении)."""
+    with _workers_lock:
+        worker = _workers.get(name)
+        if worker is None:
+            from src.config import settings
+
+            worker = _workers[name] = InferenceWorker(name, settings.llm_queue_max)
+        return worker
+
+
+def inference_status() -> Dict[str, Any]:
+    """Состояние исполнителей всех моделей, к которым были запросы."""
+    with _workers_lock:
+        workers = dict(_workers)
+    return {name: worker.snapshot() for name, worker in workers.items()}
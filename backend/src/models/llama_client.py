@@ -1,21 +1,17 @@
-import asyncio
 import json
 import logging
+import threading
 import uuid
 from datetime import datetime
 from time import time
 from typing import Dict, List
 
-try:
-    from llama_cpp import Llama
-except ImportError as exc:
-    raise ImportError(
-        "Please install llama-cpp-python: pip install llama-cpp-python",
-    ) from exc
-
 from src.config import settings
 from src.models.exceptions import (
+    LlamaRateLimitError,
     LlamaServerError,
+    LlamaTimeoutError,
+    LlamaUnavailableError,
     LlamaValidationError,
 )
 from src.models.geo_utils import (
@@ -26,14 +22,40 @@ from src.models.geo_utils import (
     format_locations_compact,
     format_nearest_neighbors,
 )
+from src.models.grammars import (
+    completion_kwargs,
+    evaluation_max_tokens,
+    evaluation_schema,
+    json_schema_grammar,
+    location_ids,
+    route_max_tokens,
+    route_schema,
+)
+from src.models.inference_worker import (
+    InferenceDeadlineError,
+    InferenceQueueFullError,
+    get_worker,
+)
 from src.models.llm_client import LLMClient
+from src.models.llm_runtime import load_model
+from src.models.prompt_cache import (
+    attach_prompt_cache,
+    cached_chat_completion,
+    evaluation_messages,
+    route_messages,
+)
 from src.models.schemas import (
     Location,
     Route,
 )
+from src.models.warmup import is_loading
+from src.utils.optional_deps import require
 
 logger = logging.getLogger("llama_client")
 
+# llama_cpp.Llama — импортируется при первой загрузке модели
+Llama = None
+
 
 class LlamaClient(LLMClient):
     _llm = None
@@ -51,6 +73,15 @@ class LlamaClient(LLMClient):
 
     def _get_generator(self):
         """Lazy loading модели через llama.cpp."""
+        if LlamaClient._llm is None:
+            if is_loading("llama"):
+                # Идёт фоновый прогрев — не ждём загрузку в запросе
+                raise LlamaUnavailableError("Llama model is still loading")
+            self._load_model()
+        return LlamaClient._llm
+
+    def _load_model(self):
+        """Загрузка GGUF (вызывается и из фонового прогрева, src/models/warmup.py)."""
         if LlamaClient._llm is None:
             if not self.model_path:
                 raise LlamaServerError(
@@ -63,15 +94,9 @@ class LlamaClient(LLMClient):
                     "Loading GGUF model from %s...",
                     self.model_path,
                 )
-                LlamaClient._llm = Llama(
-                    model_path=self.model_path,
-                    n_threads=8,
-                    n_threads_batch=8,
-                    n_gpu_layers=-1,
-                    n_batch=512,
-                    n_ctx=49152,  # 48K — достаточно для 50 точек (~40K токенов)
-                    verbose=True,
-                )
+                llama_cls = Llama or require("llama_cpp").Llama
+                LlamaClient._llm = load_model("llama", llama_cls, self.model_path)
+                attach_prompt_cache(LlamaClient._llm, "llama")
                 logger.info("Llama GGUF model loaded successfully.")
             except Exception as exc:
                 logger.error(
@@ -124,6 +149,9 @@ class LlamaClient(LLMClient):
 
                 return result
 
+            except (LlamaRateLimitError, LlamaTimeoutError, LlamaUnavailableError):
+                # Очередь полна / дедлайн истёк — повтор только удлинит ожидание
+                raise
             except Exception as exc:
                 if attempt <= max_retries:
                     logger.warning(
@@ -145,34 +173,34 @@ class LlamaClient(LLMClient):
     ) -> str:
         llm = self._get_generator()
 
-        system_prompt = (
-            "You are a route optimizer. "
-            "Output ONLY valid JSON, no text."
-        )
         user_prompt = self._construct_prompt(
             locations_data,
             constraints,
         )
+        messages = route_messages(user_prompt)
+        # Грамматика по схеме ответа — JSON валиден с первой попытки
+        grammar = json_schema_grammar(route_schema(location_ids(locations_data)))
+        max_tokens = route_max_tokens(len(locations_data), 1024) if grammar is not None else 1024
 
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ]
-
-        loop = asyncio.get_event_loop()
-
-        output = await asyncio.wait_for(
-            loop.run_in_executor(
-                None,
-                lambda: llm.create_chat_completion(
-                    messages=messages,
+        try:
+            cancel = threading.Event()
+            output = await get_worker("llama").run(
+                lambda: cached_chat_completion(
+                    llm, "llama", messages,
                     temperature=0.1,
-                    max_tokens=1024,
+                    max_tokens=max_tokens,
                     repeat_penalty=1.2,
+                    **completion_kwargs(grammar, cancel),
                 ),
-            ),
-            timeout=self.timeout,
-        )
+                timeout_s=self.timeout,
+                cancel=cancel,
+            )
+        except InferenceQueueFullError as exc:
+            raise LlamaRateLimitError(f"Inference queue is full: {exc}") from exc
+        except InferenceDeadlineError as exc:
+            raise LlamaTimeoutError(
+                f"Generation exceeded timeout of {self.timeout}s",
+            ) from exc
 
         content = output["choices"][0]["message"]["content"]
 
@@ -286,29 +314,21 @@ class LlamaClient(LLMClient):
 
         try:
             llm = self._get_generator()
-            messages = [
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a logistics analyst. "
-                        "Output ONLY valid JSON array, no text."
-                    ),
-                },
-                {"role": "user", "content": prompt},
-            ]
+            messages = evaluation_messages(prompt)
 
-            loop = asyncio.get_event_loop()
-            output = await asyncio.wait_for(
-                loop.run_in_executor(
-                    None,
-                    lambda: llm.create_chat_completion(
-                        messages=messages,
-                        max_tokens=512,
-                        temperature=0.3,
-                        repeat_penalty=1.2,
-                    ),
+            grammar = json_schema_grammar(evaluation_schema([v["id"] for v in variants]))
+            max_tokens = evaluation_max_tokens(len(variants), 512) if grammar is not None else 512
+            cancel = threading.Event()
+            output = await get_worker("llama").run(
+                lambda: cached_chat_completion(
+                    llm, "llama", messages,
+                    max_tokens=max_tokens,
+                    temperature=0.3,
+                    repeat_penalty=1.2,
+                    **completion_kwargs(grammar, cancel),
                 ),
-                timeout=90,
+                timeout_s=90,
+                cancel=cancel,
             )
 
             content = output["choices"][0]["message"]["content"] or ""  # type: ignore[union-attr]
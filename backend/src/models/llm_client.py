@@ -82,3 +82,25 @@ class LLMClient(ABC):
         :return: True если модель доступна / True if model is healthy
         """
         raise NotImplementedError
+
+
+def create_client(model: str) -> LLMClient:
+    """
+    Клиент модели ("qwen" | "llama") по LLM_BACKEND: local — GGUF через
+    llama.cpp, mock — заглушка src/models/mock_client.py.
+    """
+    from src.config import settings
+
+    if settings.llm_backend == "mock":
+        from src.models.mock_client import MockLLMClient
+
+        return MockLLMClient(model)
+    if model == "qwen":
+        from src.models.qwen_client import QwenClient
+
+        return QwenClient()
+    if model == "llama":
+        from src.models.llama_client import LlamaClient
+
+        return LlamaClient()
+    raise ValueError(f"Unknown model: {model}")
@@ -0,0 +1,160 @@
+"""
+Параметры загрузки локальных моделей llama.cpp и их учёт.
+
+Контекст, потоки, размер батча, mmap/mlock и тип KV-кэша берутся из
+Settings (QWEN_* / LLAMA_* / LLM_*). Память KV-кэша растёт линейно с
+n_ctx, поэтому контекст должен соответствовать реальным промптам, а не
+«с запасом»: при <MODEL>_N_CTX=0 он подбирается по профилю длин
+(промпт + лимит ответа, в токенах), который пишет
+`ml/benchmarks/llm_benchmark.py --prompt-profile` — p99 × LLM_N_CTX_HEADROOM,
+округлённый вверх до 512, в пределах [LLM_N_CTX_MIN, LLM_N_CTX_MAX].
+
+Время загрузки, фактические параметры и RSS процесса попадают в /health.
+"""
+
+import json
+import logging
+import math
+import threading
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Контекст, если авто-подбор включён, а профиля нет
+DEFAULT_N_CTX = 8192
+N_CTX_STEP = 512
+# Тип KV-кэша -> GGML_TYPE_* (квантованный V требует flash attention)
+KV_CACHE_TYPES = {"f16": 1, "q8_0": 8, "q4_0": 2}
+
+DEFAULT_PROFILE_PATH = (
+    Path(__file__).resolve().parents[3] / "ml" / "benchmarks" / "prompt_profile.json"
+)
+
+_lock = threading.Lock()
+_loaded: Dict[str, Dict[str, Any]] = {}
+
+
+def _percentile(values: List[int], q: float) -> int:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+def load_prompt_profile(path: Optional[str] = None) -> Dict[str, Dict[str, List[int]]]:
+    """{модель: {задача: [токены промпта + ответа, ...]}} или {} если профиля нет."""
+    profile_path = Path(path) if path else DEFAULT_PROFILE_PATH
+    try:
+        with open(profile_path, encoding="utf-8") as f:
+            profile = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as exc:
+        logger.warning("Prompt profile %s is unreadable: %s", profile_path, exc)
+        return {}
+    if profile.get("use_mock"):
+        # Длины из заглушки токенизатора — не основание для размера контекста
+        logger.warning("Prompt profile %s was recorded with --mock, ignored", profile_path)
+        return {}
+    return profile.get("models", {})
+
+
+def auto_n_ctx(samples: List[int], headroom: float, min_ctx: int, max_ctx: int) -> int:
+    """Контекст под p99 длины запроса с запасом headroom."""
+    needed = _percentile(samples, 0.99) * headroom
+    n_ctx = math.ceil(needed / N_CTX_STEP) * N_CTX_STEP
+    return max(min_ctx, min(max_ctx, n_ctx))
+
+
+def resolve_n_ctx(model: str) -> Tuple[int, str]:
+    """(n_ctx, источник): settings | profile | default."""
+    from src.config import settings
+
+    configured = getattr(settings, f"{model}_n_ctx")
+    if configured > 0:
+        return configured, "settings"
+
+    tasks = load_prompt_profile(settings.llm_prompt_profile_path).get(model, {})
+    samples = [int(n) for values in tasks.values() for n in values]
+    if not samples:
+        logger.warning("No prompt profile for %s, n_ctx=%d", model, DEFAULT_N_CTX)
+        return DEFAULT_N_CTX, "default"
+    n_ctx = auto_n_ctx(
+        samples, settings.llm_n_ctx_headroom, settings.llm_n_ctx_min, settings.llm_n_ctx_max,
+    )
+    return n_ctx, "profile"
+
+
+def llama_kwargs(model: str, model_path: str, n_ctx: Optional[int] = None) -> Dict[str, Any]:
+    """Аргументы llama_cpp.Llama для модели model ("qwen" | "llama")."""
+    from src.config import settings
+
+    if n_ctx is None:
+        n_ctx, _ = resolve_n_ctx(model)
+    n_threads = getattr(settings, f"{model}_n_threads")
+    kwargs: Dict[str, Any] = {
+        "model_path": model_path,
+        "n_ctx": n_ctx,
+        "n_threads": n_threads,
+        "n_threads_batch": n_threads,
+        "n_batch": getattr(settings, f"{model}_n_batch"),
+        "n_gpu_layers": getattr(settings, f"{model}_n_gpu_layers"),
+        "use_mmap": settings.llm_use_mmap,
+        "use_mlock": settings.llm_use_mlock,
+        "verbose": True,
+    }
+    if settings.llm_kv_cache_type != "f16":
+        kv_type = KV_CACHE_TYPES[settings.llm_kv_cache_type]
+        kwargs.update(type_k=kv_type, type_v=kv_type, flash_attn=True)
+    return kwargs
+
+
+def load_model(model: str, llama_cls, model_path: str):
+    """Создаёт Llama с параметрами из Settings и запоминает время загрузки."""
+    from src.config import settings
+
+    n_ctx, source = resolve_n_ctx(model)
+    kwargs = llama_kwargs(model, model_path, n_ctx)
+    started = perf_counter()
+    llm = llama_cls(**kwargs)
+    load_s = perf_counter() - started
+    with _lock:
+        _loaded[model] = {
+            "load_s": round(load_s, 2),
+            "n_ctx": kwargs["n_ctx"],
+            "n_ctx_source": source,
+            "n_threads": kwargs["n_threads"],
+            "n_batch": kwargs["n_batch"],
+            "n_gpu_layers": kwargs["n_gpu_layers"],
+            "kv_cache_type": settings.llm_kv_cache_type,
+            "use_mmap": kwargs["use_mmap"],
+            "use_mlock": kwargs["use_mlock"],
+        }
+    logger.info("%s loaded in %.2fs (n_ctx=%d from %s)", model, load_s, kwargs["n_ctx"], source)
+    return llm
+
+
+def process_rss_mb() -> Optional[float]:
+    """Текущий RSS процесса (Linux /proc), иначе пиковый через resource."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+        import sys
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except Exception:
+        return None
+
+
+def runtime_status() -> Dict[str, Any]:
+    """RSS процесса и параметры/время загрузки моделей — для /health."""
+    with _lock:
+        models = {name: dict(info) for name, info in _loaded.items()}
+    return {"rss_mb": process_rss_mb(), "models": models}
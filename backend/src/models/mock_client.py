@@ -0,0 +1,184 @@
+"""
+Детерминированная заглушка LLM для нагрузочных прогонов без GGUF.
+
+LLM_BACKEND=mock подменяет QwenClient/LlamaClient (create_client в
+src/models/llm_client.py) на MockLLMClient: ответы валидны по схемам
+настоящих клиентов, а инференс идёт через тот же исполнитель модели
+(src/models/inference_worker.py) — очередь, дедлайны, отмена и 429/504
+на /qwen, /llama ведут себя как с моделью. Так api_benchmark.py против
+запущенного API на CI меряет backend, а не отказы загрузки моделей.
+
+- Латентность — логнормальная: медиана <MODEL>_MOCK_LATENCY_MS, разброс
+  LLM_MOCK_LATENCY_SIGMA (0 — фиксированная).
+- LLM_MOCK_FAILURE_RATE — доля ответов с ошибкой инференса,
+  LLM_MOCK_TIMEOUT_RATE — доля «зависших» генераций, которые доходят до
+  дедлайна клиента (120 с маршрут, 90 с оценка).
+- Случайность детерминирована: N-й вызов модели при одном LLM_MOCK_SEED
+  всегда получает одну и ту же латентность и исход.
+
+Повторов с backoff, как у настоящих клиентов, нет: ошибка сразу уходит
+вызывающему. Оценки кэшируются под именем mock-<model>; для прогонов
+латентности выключайте кэш (LLM_CACHE_ENABLED=false).
+"""
+
+import math
+import random
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+from src.config import settings
+from src.models import exceptions
+from src.models.geo_utils import compute_route_metrics
+from src.models.inference_worker import (
+    InferenceDeadlineError,
+    InferenceQueueFullError,
+    get_worker,
+)
+from src.models.llm_client import LLMClient
+from src.models.qwen_client import QwenClient
+from src.models.schemas import Location, Route
+
+OUTCOME_OK = "ok"
+OUTCOME_FAILURE = "failure"
+OUTCOME_TIMEOUT = "timeout"
+
+# Дедлайны как у настоящих клиентов
+ROUTE_TIMEOUT_S = 120
+EVALUATION_TIMEOUT_S = 90
+
+_PREFIX = {"qwen": "Qwen", "llama": "Llama"}
+
+_lock = threading.Lock()
+_calls: Dict[str, int] = {}
+
+
+def draw(model: str) -> Tuple[float, str]:
+    """(латентность, с; исход) для очередного вызова модели."""
+    with _lock:
+        n = _calls.get(model, 0)
+        _calls[model] = n + 1
+    rng = random.Random(f"{settings.llm_mock_seed}:{model}:{n}")
+
+    median_s = getattr(settings, f"{model}_mock_latency_ms") / 1000
+    sigma = settings.llm_mock_latency_sigma
+    latency_s = median_s * math.exp(rng.gauss(0.0, sigma)) if sigma > 0 else median_s
+
+    roll = rng.random()
+    if roll < settings.llm_mock_failure_rate:
+        return latency_s, OUTCOME_FAILURE
+    if roll < settings.llm_mock_failure_rate + settings.llm_mock_timeout_rate:
+        return latency_s, OUTCOME_TIMEOUT
+    return latency_s, OUTCOME_OK
+
+
+def reset_calls() -> None:
+    with _lock:
+        _calls.clear()
+
+
+def mock_evaluation(variants: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """pros/cons по сравнению метрик вариантов между собой."""
+    labels = (
+        ("distance_km", "Самый короткий путь", "Самый длинный путь"),
+        ("time_hours", "Быстрее остальных", "Дольше остальных"),
+        ("cost_rub", "Дешевле остальных", "Дороже остальных"),
+    )
+    result = []
+    for v in variants:
+        m = v.get("metrics", {})
+        pros, cons = [], []
+        for key, best, worst in labels:
+            values = [other.get("metrics", {}).get(key, 0) for other in variants]
+            if m.get(key, 0) == min(values):
+                pros.append(best)
+            elif m.get(key, 0) == max(values):
+                cons.append(worst)
+        result.append({
+            "id": v["id"],
+            "pros": (pros or ["Сбалансированный вариант"])[:2],
+            "cons": (cons or ["Не лидирует ни по одной метрике"])[:2],
+        })
+    return result
+
+
+class MockLLMClient(LLMClient):
+    """Заглушка QwenClient/LlamaClient: тот же контракт и те же исключения."""
+
+    # Тот же промпт оценки — тот же ключ кэша, что и у настоящего клиента
+    _construct_evaluation_prompt = QwenClient._construct_evaluation_prompt
+
+    def __init__(self, model: str):
+        if model not in _PREFIX:
+            raise ValueError(f"Unknown model: {model}")
+        self.model = model
+        self.model_name = f"mock-{model}"
+        self.timeout = ROUTE_TIMEOUT_S
+
+    def _error(self, kind: str) -> type:
+        return getattr(exceptions, f"{_PREFIX[self.model]}{kind}Error")
+
+    async def _infer(self, build: Callable[[], Any], timeout_s: float) -> Any:
+        latency_s, outcome = draw(self.model)
+        cancel = threading.Event()
+
+        def generate():
+            # «Зависшая» генерация ждёт дедлайна; отмена прерывает ожидание,
+            # как stopping_criteria у llama.cpp
+            wait_s = timeout_s + 1 if outcome == OUTCOME_TIMEOUT else latency_s
+            if cancel.wait(wait_s):
+                raise RuntimeError("mock inference cancelled")
+            if outcome == OUTCOME_FAILURE:
+                raise RuntimeError("mock inference failure")
+            return build()
+
+        try:
+            return await get_worker(self.model).run(generate, timeout_s=timeout_s, cancel=cancel)
+        except InferenceQueueFullError as e:
+            raise self._error("RateLimit")(f"Inference queue is full: {e}")
+        except InferenceDeadlineError:
+            raise self._error("Timeout")(f"Generation exceeded timeout of {timeout_s}s")
+        except Exception as e:
+            raise self._error("Server")(f"Inference error: {e}")
+
+    async def generate_route(
+        self,
+        locations: List[Location],
+        constraints: Dict | None = None,
+    ) -> Route:
+        if not locations:
+            raise self._error("Validation")("Locations list is empty")
+
+        locations_data = [loc.model_dump() for loc in locations]
+        ids = [loc["ID"] for loc in locations_data]
+
+        def build() -> Route:
+            distance, hours, cost = compute_route_metrics(locations_data, ids, constraints)
+            return Route(
+                ID=str(uuid.uuid5(uuid.NAMESPACE_URL, f"{self.model_name}:{','.join(ids)}")),
+                name=f"Оптимизированный маршрут ({self.model_name})",
+                locations=locations,
+                total_distance_km=distance,
+                total_time_hours=hours,
+                total_cost_rub=cost,
+                model_used=self.model_name,
+                created_at=datetime.now(),
+            )
+
+        return await self._infer(build, self.timeout)
+
+    async def evaluate_variants(self, variants: List[Dict]) -> List[Dict]:
+        if not variants:
+            return []
+        try:
+            return await self._infer(lambda: mock_evaluation(variants), EVALUATION_TIMEOUT_S)
+        except Exception:
+            # Как у настоящих клиентов: варианты остаются без pros/cons
+            return []
+
+    async def analyze_metrics(self, data: Dict) -> str:
+        return "Not implemented"
+
+    async def health_check(self) -> bool:
+        return True
@@ -0,0 +1,246 @@
+"""
+Переиспользование KV-кэша общего префикса промптов (llama.cpp).
+
+Каждый запрос к Qwen/Llama начинается с одинакового системного
+сообщения и служебной разметки чат-шаблона. llama.cpp сам пропускает
+уже вычисленный префикс, только если предыдущий запрос к модели начинался
+так же; при чередовании маршрута и оценки вариантов префикс каждый раз
+пересчитывается с нуля.
+
+Поэтому на каждый системный промпт хранится одно состояние контекста —
+сразу после префикса (PrefixStateCache). Состояние снимается один раз:
+при прогреве (src/models/warmup.py) или при первом запросе шаблона.
+Перед генерацией cached_chat_completion восстанавливает состояние, если
+в контексте модели сейчас другой префикс; остаток промпта llama.cpp
+вычисляет сам. Сохранять состояние после каждой генерации (как делает
+LlamaRAMCache) дорого: save_state копирует логиты n_batch × n_vocab
+(~300 МБ для словарей Qwen2/Llama-3) на каждый вызов.
+
+LLM_PROMPT_CACHE_MB ограничивает всю память состояний (KV, логиты,
+токены); состояние, которое не помещается, не сохраняется.
+LLM_PROMPT_CACHE_MB=0 — без кэша (старое поведение). Системные
+промпты — константы модуля, чтобы префикс совпадал байт в байт у обоих
+клиентов.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ROUTE_SYSTEM_PROMPT = (
+    "You are a route optimizer. "
+    "Output ONLY valid JSON, no text."
+)
+EVALUATION_SYSTEM_PROMPT = (
+    "You are a logistics analyst. "
+    "Output ONLY valid JSON array, no text."
+)
+
+
+def route_messages(prompt: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": ROUTE_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def evaluation_messages(prompt: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": EVALUATION_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _common_prefix(a, b) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class PromptCacheStats:
+    """
+    Обращения, попадания и переиспользованные токены по моделям (потокобезопасно).
+
+    Попадание — только реально восстановленное состояние префикса; если
+    префикс уже был в контексте, обращение попаданием не считается.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[str, Dict[str, int]] = {}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._models = {}
+
+    def record(self, model: str, reused_tokens: Optional[int]) -> None:
+        with self._lock:
+            stats = self._models.setdefault(
+                model, {"lookups": 0, "hits": 0, "reused_tokens": 0},
+            )
+            stats["lookups"] += 1
+            if reused_tokens:
+                stats["hits"] += 1
+                stats["reused_tokens"] += reused_tokens
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._models.items()}
+
+
+prompt_cache_stats = PromptCacheStats()
+_attached: Dict[str, "PrefixStateCache"] = {}
+
+# Текст пользователя для снятия префикса: общая часть токенов двух
+# генераций — системное сообщение и разметка шаблона до текста пользователя
+_PROBE_TEXTS = (".", "")
+
+
+@dataclass
+class PrefixState:
+    state: Any
+    tokens: List[int]
+    nbytes: int
+
+
+def _state_nbytes(state) -> int:
+    return int(state.llama_state_size) + sum(
+        getattr(getattr(state, name, None), "nbytes", 0) for name in ("scores", "input_ids")
+    )
+
+
+class PrefixStateCache:
+    """Состояния контекста после системных префиксов одной модели."""
+
+    def __init__(self, model: str, capacity_bytes: int):
+        self.model = model
+        self.capacity_bytes = capacity_bytes
+        self._states: Dict[str, PrefixState] = {}
+        self._rejected: set = set()
+
+    @property
+    def cache_size(self) -> int:
+        return sum(entry.nbytes for entry in self._states.values())
+
+    def get(self, system_prompt: str) -> Optional[PrefixState]:
+        return self._states.get(system_prompt)
+
+    def needs_state(self, system_prompt: str) -> bool:
+        return system_prompt not in self._states and system_prompt not in self._rejected
+
+    def reject(self, system_prompt: str) -> None:
+        """Префикс не кэшируется — повторно состояние не снимаем."""
+        self._rejected.add(system_prompt)
+
+    def put(self, system_prompt: str, entry: PrefixState) -> bool:
+        if self.cache_size + entry.nbytes > self.capacity_bytes:
+            self.reject(system_prompt)
+            logger.warning(
+                "Prompt prefix state of %s (%.1f MB) exceeds LLM_PROMPT_CACHE_MB, not cached",
+                self.model, entry.nbytes / (1024 * 1024),
+            )
+            return False
+        self._states[system_prompt] = entry
+        return True
+
+
+def _context_tokens(llm) -> List[int]:
+    return [int(token) for token in llm.input_ids[: llm.n_tokens]]
+
+
+def _capture_prefix(llm, cache: PrefixStateCache, system_message: Dict[str, str]) -> None:
+    """Две генерации по одному токену → длина префикса и состояние после него."""
+    runs = []
+    for text in _PROBE_TEXTS:
+        llm.create_chat_completion(
+            messages=[system_message, {"role": "user", "content": text}],
+            max_tokens=1,
+            temperature=0.0,
+        )
+        runs.append(_context_tokens(llm))
+    prefix = runs[-1][:_common_prefix(*runs)]
+    if not prefix:
+        cache.reject(system_message["content"])
+        return
+
+    state = llm.save_state()
+    # Логиты префикса не читаются: хвост промпта llama.cpp всегда вычисляет
+    # заново (минимум последний токен), а load_state растягивает одну строку
+    scores = getattr(state, "scores", None)
+    if scores is not None and len(scores) > 1:
+        state.scores = scores[-1:].copy()
+    cache.put(system_message["content"], PrefixState(state, prefix, _state_nbytes(state)))
+
+
+def capture_prefix(llm, model: str, messages: List[Dict[str, str]]) -> bool:
+    """
+    Снимает состояние системного префикса шаблона, если его ещё нет.
+    False — кэш у модели выключен. Вызывать в потоке инференса модели.
+    """
+    cache = _attached.get(model)
+    if cache is None or not messages or messages[0].get("role") != "system":
+        return False
+    if cache.needs_state(messages[0]["content"]):
+        _capture_prefix(llm, cache, messages[0])
+    return True
+
+
+def prepare_prefix(llm, model: str, messages: List[Dict[str, str]]) -> None:
+    """
+    Перед генерацией: восстанавливает состояние системного префикса, если
+    контекст модели сейчас начинается иначе. Вызывать в потоке инференса модели.
+    """
+    if not capture_prefix(llm, model, messages):
+        return
+    entry = _attached[model].get(messages[0]["content"])
+    if entry is None:
+        return
+    shared = _common_prefix(_context_tokens(llm), entry.tokens)
+    if shared < len(entry.tokens):
+        llm.load_state(entry.state)
+        prompt_cache_stats.record(model, len(entry.tokens) - shared)
+    else:
+        # Префикс уже в контексте — llama.cpp пропустит его сам
+        prompt_cache_stats.record(model, None)
+
+
+def cached_chat_completion(llm, model: str, messages: List[Dict[str, str]], **kwargs: Any):
+    """llm.create_chat_completion с восстановлением префикса (prepare_prefix)."""
+    prepare_prefix(llm, model, messages)
+    return llm.create_chat_completion(messages=messages, **kwargs)
+
+
+def attach_prompt_cache(llm, model: str) -> bool:
+    """
+    Заводит кэш префиксов для только что загруженной модели.
+    Возвращает False, если кэш выключен.
+    """
+    from src.config import settings
+
+    if settings.llm_prompt_cache_mb <= 0:
+        _attached.pop(model, None)
+        return False
+    _attached[model] = PrefixStateCache(model, settings.llm_prompt_cache_mb * 1024 * 1024)
+    return True
+
+
+def prompt_cache_status() -> Dict[str, Any]:
+    from src.config import settings
+
+    stats = prompt_cache_stats.snapshot()
+    return {
+        "capacity_mb": settings.llm_prompt_cache_mb,
+        "models": {
+            model: {
+                **stats.get(model, {"lookups": 0, "hits": 0, "reused_tokens": 0}),
+                "size_mb": round(cache.cache_size / (1024 * 1024), 1),
+            }
+            for model, cache in _attached.items()
+        },
+    }
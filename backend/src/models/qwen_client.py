@@ -2,6 +2,7 @@ import asyncio
 import json
 import logging
 import re
+import threading
 import uuid
 from datetime import datetime
 from time import time
@@ -10,18 +11,13 @@ from typing import (
     List,
 )
 
-try:
-    from llama_cpp import Llama
-except ImportError:
-    raise ImportError(
-        "Please install llama-cpp-python: pip install llama-cpp-python",
-    )
-
 from src.config import settings
 from src.models.exceptions import (
     QwenError,
+    QwenRateLimitError,
     QwenServerError,
     QwenTimeoutError,
+    QwenUnavailableError,
     QwenValidationError,
 )
 from src.models.geo_utils import (
@@ -32,15 +28,41 @@ from src.models.geo_utils import (
     format_locations_compact,
     format_nearest_neighbors,
 )
+from src.models.grammars import (
+    completion_kwargs,
+    evaluation_max_tokens,
+    evaluation_schema,
+    json_schema_grammar,
+    location_ids,
+    route_max_tokens,
+    route_schema,
+)
+from src.models.inference_worker import (
+    InferenceDeadlineError,
+    InferenceQueueFullError,
+    get_worker,
+)
 from src.models.llm_client import LLMClient
+from src.models.llm_runtime import load_model
+from src.models.prompt_cache import (
+    attach_prompt_cache,
+    cached_chat_completion,
+    evaluation_messages,
+    route_messages,
+)
 from src.models.schemas import (
     Location,
     Route,
 )
+from src.models.warmup import is_loading
+from src.utils.optional_deps import require
 
 
 logger = logging.getLogger("qwen_client")
 
+# llama_cpp.Llama — импортируется при первой загрузке модели
+Llama = None
+
 
 class QwenClient(LLMClient):
     _llm = None
@@ -56,6 +78,15 @@ class QwenClient(LLMClient):
 
     def _get_generator(self):
         """Lazy Loading модели через llama.cpp."""
+        if QwenClient._llm is None:
+            if is_loading("qwen"):
+                # Идёт фоновый прогрев — не ждём загрузку в запросе
+                raise QwenUnavailableError("Qwen model is still loading")
+            self._load_model()
+        return QwenClient._llm
+
+    def _load_model(self):
+        """Загрузка GGUF (вызывается и из фонового прогрева, src/models/warmup.py)."""
         if QwenClient._llm is None:
             if not self.model_path:
                 raise QwenServerError(
@@ -64,14 +95,9 @@ class QwenClient(LLMClient):
 
             try:
                 logger.info(f"Loading Qwen GGUF from {self.model_path}...")
-                QwenClient._llm = Llama(
-                    model_path=self.model_path,
-                    n_threads=4,
-                    n_gpu_layers=0,
-                    n_ctx=8192,   # 8K — достаточно для 50 точек с запасом
-                    n_batch=512,
-                    verbose=True,
-                )
+                llama_cls = Llama or require("llama_cpp").Llama
+                QwenClient._llm = load_model("qwen", llama_cls, self.model_path)
+                attach_prompt_cache(QwenClient._llm, "qwen")
                 logger.info("Qwen GGUF model loaded successfully.")
             except Exception as e:
                 logger.error(f"Critical error loading Qwen GGUF: {e}")
@@ -123,6 +149,9 @@ class QwenClient(LLMClient):
                 )
                 return result
 
+            except (QwenRateLimitError, QwenTimeoutError, QwenUnavailableError):
+                # Очередь полна / дедлайн истёк — повтор только удлинит ожидание
+                raise
             except Exception as e:
                 if attempt <= max_retries:
                     sleep_time = backoff_factor * (2 ** (attempt - 1))
@@ -145,39 +174,34 @@ class QwenClient(LLMClient):
         locations_data: List[Dict],
         constraints: Dict | None,
     ) -> str:
-        """Запуск инференса в отдельном потоке."""
+        """Запуск инференса в потоке модели (src/models/inference_worker.py)."""
         llm = self._get_generator()
         prompt = self._construct_prompt(locations_data, constraints)
 
-        messages = [
-            {
-                "role": "system",
-                "content": (
-                    "You are a route optimizer. "
-                    "Output ONLY valid JSON, no text."
-                ),
-            },
-            {"role": "user", "content": prompt},
-        ]
+        messages = route_messages(prompt)
+        # Грамматика по схеме ответа — JSON валиден с первой попытки
+        grammar = json_schema_grammar(route_schema(location_ids(locations_data)))
+        max_tokens = route_max_tokens(len(locations_data), 512) if grammar is not None else 512
 
-        loop = asyncio.get_event_loop()
         try:
-            output = await asyncio.wait_for(
-                loop.run_in_executor(
-                    None,
-                    lambda: llm.create_chat_completion(
-                        messages=messages,
-                        max_tokens=512,
-                        temperature=0.1,
-                        stop=["<|im_end|>"],
-                    ),
+            cancel = threading.Event()
+            output = await get_worker("qwen").run(
+                lambda: cached_chat_completion(
+                    llm, "qwen", messages,
+                    max_tokens=max_tokens,
+                    temperature=0.1,
+                    stop=["<|im_end|>"],
+                    **completion_kwargs(grammar, cancel),
                 ),
-                timeout=self.timeout,
+                timeout_s=self.timeout,
+                cancel=cancel,
             )
 
             return output["choices"][0]["message"]["content"]
 
-        except asyncio.TimeoutError:
+        except InferenceQueueFullError as e:
+            raise QwenRateLimitError(f"Inference queue is full: {e}")
+        except InferenceDeadlineError:
             raise QwenTimeoutError(
                 f"Generation exceeded timeout of {self.timeout}s",
             )
@@ -279,29 +303,21 @@ class QwenClient(LLMClient):
 
         try:
             llm = self._get_generator()
-            messages = [
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a logistics analyst. "
-                        "Output ONLY valid JSON array, no text."
-                    ),
-                },
-                {"role": "user", "content": prompt},
-            ]
-
-            loop = asyncio.get_event_loop()
-            output = await asyncio.wait_for(
-                loop.run_in_executor(
-                    None,
-                    lambda: llm.create_chat_completion(
-                        messages=messages,
-                        max_tokens=512,
-                        temperature=0.3,
-                        stop=["<|im_end|>"],
-                    ),
+            messages = evaluation_messages(prompt)
+
+            grammar = json_schema_grammar(evaluation_schema([v["id"] for v in variants]))
+            max_tokens = evaluation_max_tokens(len(variants), 512) if grammar is not None else 512
+            cancel = threading.Event()
+            output = await get_worker("qwen").run(
+                lambda: cached_chat_completion(
+                    llm, "qwen", messages,
+                    max_tokens=max_tokens,
+                    temperature=0.3,
+                    stop=["<|im_end|>"],
+                    **completion_kwargs(grammar, cancel),
                 ),
-                timeout=90,
+                timeout_s=90,
+                cancel=cancel,
             )
 
             content = output["choices"][0]["message"]["content"] or ""  # type: ignore[union-attr]
@@ -0,0 +1,130 @@
+"""
+Фоновая загрузка и прогрев локальных моделей при старте.
+
+Без прогрева GGUF грузится первым запросом (_get_generator), и первый
+/optimize/variants после деплоя ждёт загрузку + инференс и упирается в
+таймаут. LLM_WARMUP_MODELS=qwen,llama запускает в lifespan фоновую задачу:
+модель грузится в отдельном потоке (event loop не блокируется), затем
+в потоке инференса модели выполняются короткие генерации — они же
+снимают состояния системных префиксов промптов (src/models/prompt_cache.py).
+
+Состояния: not_loaded → loading → ready | failed. Пока модель в loading,
+клиенты не ждут её, а сразу отвечают <Model>UnavailableError:
+evaluate_variants возвращает [] (варианты без pros/cons — только
+алгоритмы), /qwen и /llama — 503.
+"""
+
+import asyncio
+import logging
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+
+from src.models.prompt_cache import capture_prefix, evaluation_messages, route_messages
+
+logger = logging.getLogger(__name__)
+
+STATE_NOT_LOADED = "not_loaded"
+STATE_LOADING = "loading"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+_states: Dict[str, Dict[str, Any]] = {}
+
+
+def _clients() -> Dict[str, Any]:
+    from src.models.llama_client import LlamaClient
+    from src.models.qwen_client import QwenClient
+
+    return {"qwen": QwenClient, "llama": LlamaClient}
+
+
+def warmup_models() -> List[str]:
+    """Модели из LLM_WARMUP_MODELS (через запятую); пусто — прогрев выключен."""
+    from src.config import settings
+
+    names = [name.strip().lower() for name in settings.llm_warmup_models.split(",")]
+    return [name for name in names if name]
+
+
+def model_state(name: str) -> str:
+    return _states.get(name, {}).get("state", STATE_NOT_LOADED)
+
+
+def is_loading(name: str) -> bool:
+    return model_state(name) == STATE_LOADING
+
+
+def _set_state(name: str, state: str, **info: Any) -> None:
+    _states[name] = {**_states.get(name, {}), "state": state, **info}
+
+
+def _warmup_completion(llm, name: str) -> None:
+    # Генерации по одному токену на каждый шаблон: прогрев потоков/памяти;
+    # с кэшем префиксов это пробы, снимающие состояние префикса
+    for messages in (route_messages(""), evaluation_messages("")):
+        if not capture_prefix(llm, name, messages):
+            llm.create_chat_completion(messages=messages, max_tokens=1, temperature=0.0)
+
+
+async def warm_up_model(name: str) -> str:
+    """Загружает и прогревает одну модель; возвращает итоговое состояние."""
+    from src.config import settings
+    from src.models.inference_worker import get_worker
+
+    client_cls = _clients().get(name)
+    if client_cls is None:
+        logger.warning("Unknown model in LLM_WARMUP_MODELS: %s", name)
+        return model_state(name)
+    if client_cls._llm is not None or settings.llm_backend == "mock":
+        # Модель уже загружена или LLM_BACKEND=mock — грузить нечего
+        _set_state(name, STATE_READY)
+        return STATE_READY
+
+    _set_state(name, STATE_LOADING, error=None)
+    started = perf_counter()
+    try:
+        client = client_cls()
+        llm = await asyncio.to_thread(client._load_model)
+        load_s = perf_counter() - started
+
+        started = perf_counter()
+        await get_worker(name).run(
+            lambda: _warmup_completion(llm, name),
+            timeout_s=settings.llm_warmup_timeout_s,
+        )
+    except asyncio.CancelledError:
+        _set_state(name, STATE_NOT_LOADED)
+        raise
+    except Exception as exc:
+        logger.error("Warm-up of %s failed: %s", name, exc)
+        # Модель могла загрузиться, а упасть только прогрев
+        state = STATE_READY if client_cls._llm is not None else STATE_FAILED
+        _set_state(name, state, error=str(exc))
+        return state
+
+    warmup_ms = (perf_counter() - started) * 1000
+    _set_state(name, STATE_READY, load_s=round(load_s, 2), warmup_ms=round(warmup_ms, 1))
+    logger.info("%s is ready: loaded in %.1fs, warm-up %.0fms", name, load_s, warmup_ms)
+    return STATE_READY
+
+
+async def warm_up(names: Optional[List[str]] = None) -> Dict[str, str]:
+    """
+    Прогрев моделей по очереди: две модели параллельно удвоили бы пик
+    памяти и делили бы ядра с обработкой запросов.
+    """
+    names = warmup_models() if names is None else names
+    for name in names:
+        _set_state(name, STATE_LOADING)
+    return {name: await warm_up_model(name) for name in names}
+
+
+def warmup_status() -> Dict[str, Any]:
+    return {
+        "models": warmup_models(),
+        "states": {name: dict(info) for name, info in _states.items()},
+    }
+
+
+def reset_states() -> None:
+    _states.clear()
@@ -0,0 +1,149 @@
+"""
+Аналитика по месячным сводкам визитов (monthly_visit_rollup).
+
+GET  /analytics/monthly?month=YYYY-MM[&month_to=YYYY-MM][&rep_id=...]
+     — группы сводки и суммы по сотрудникам/категориям; O(групп), не O(визитов)
+GET  /analytics/durations?month=YYYY-MM[&month_to=...][&group_by=rep_id|category|district]
+     — p50/p90/… длительности визитов слиянием t-digest скетчей сводок
+POST /analytics/rollup/rebuild[?month=YYYY-MM]
+     — пересобрать сводки из visit_schedule / visit_log
+"""
+
+from collections import defaultdict
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import get_session
+from src.schemas.analytics import (
+    DurationQuantilesGroup,
+    DurationQuantilesResponse,
+    MonthlyRollupItem,
+    MonthlyRollupResponse,
+    RollupCounters,
+    RollupRebuildResponse,
+)
+from src.services.analytics_rollup import (
+    load_duration_quantiles,
+    load_rollups,
+    parse_month,
+    rebuild_rollups,
+)
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+_COUNTERS = tuple(RollupCounters.model_fields)
+
+
+def _parse_month_param(value: str):
+    try:
+        return parse_month(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Неверный формат месяца. Используй YYYY-MM")
+
+
+def _parse_period(month: str, month_to: Optional[str]):
+    month_from = _parse_month_param(month)
+    month_until = _parse_month_param(month_to) if month_to else month_from
+    if month_until < month_from:
+        raise HTTPException(status_code=400, detail="month_to раньше month")
+    return month_from, month_until
+
+
+def _parse_quantiles(value: str) -> list[float]:
+    try:
+        quantiles = [float(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        quantiles = []
+    if not quantiles or any(not 0 < q < 1 for q in quantiles):
+        raise HTTPException(status_code=400, detail="quantiles: числа из (0, 1) через запятую")
+    return quantiles
+
+
+def _quantile_label(q: float) -> str:
+    return f"p{q * 100:g}"
+
+
+@router.get("/monthly", response_model=MonthlyRollupResponse)
+async def get_monthly_rollup(
+    month: str = Query(..., description="Месяц YYYY-MM (начало периода)"),
+    month_to: Optional[str] = Query(None, description="Конец периода YYYY-MM включительно"),
+    rep_id: Optional[str] = Query(None),
+    session: AsyncSession = Depends(get_session),
+):
+    """Месячные сводки визитов за период с суммами по сотрудникам и категориям."""
+    month_from, month_until = _parse_period(month, month_to)
+
+    rows = await load_rollups(session, month_from, month_until, rep_id)
+
+    totals: dict = defaultdict(int)
+    by_rep: dict = defaultdict(lambda: defaultdict(int))
+    by_category: dict = defaultdict(lambda: defaultdict(int))
+    for row in rows:
+        for field in _COUNTERS:
+            value = getattr(row, field)
+            totals[field] += value
+            by_rep[row.rep_id][field] += value
+            by_category[row.category][field] += value
+
+    return MonthlyRollupResponse(
+        month_from=month_from.strftime("%Y-%m"),
+        month_to=month_until.strftime("%Y-%m"),
+        totals=RollupCounters(**totals),
+        by_rep={k: RollupCounters(**v) for k, v in by_rep.items()},
+        by_category={k: RollupCounters(**v) for k, v in sorted(by_category.items())},
+        groups=[MonthlyRollupItem.model_validate(row) for row in rows],
+    )
+
+
+@router.get("/durations", response_model=DurationQuantilesResponse)
+async def get_visit_duration_quantiles(
+    month: str = Query(..., description="Месяц YYYY-MM (начало периода)"),
+    month_to: Optional[str] = Query(None, description="Конец периода YYYY-MM включительно"),
+    group_by: Optional[Literal["rep_id", "category", "district"]] = Query(None),
+    quantiles: str = Query("0.5,0.9", description="Квантили через запятую"),
+    rep_id: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    district: Optional[str] = Query(None, description="Район; пустая строка — без района"),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Распределение времени на точке (мин) за диапазон месяцев.
+
+    Квантили оцениваются по t-digest скетчам сводок — строки visit_log
+    не читаются, стоимость зависит от числа групп, а не визитов.
+    """
+    month_from, month_until = _parse_period(month, month_to)
+    qs = _parse_quantiles(quantiles)
+    groups = await load_duration_quantiles(
+        session, month_from, month_until, qs,
+        group_by=group_by, rep_id=rep_id, category=category, district=district,
+    )
+    return DurationQuantilesResponse(
+        month_from=month_from.strftime("%Y-%m"),
+        month_to=month_until.strftime("%Y-%m"),
+        group_by=group_by,
+        groups=[
+            DurationQuantilesGroup(
+                key=g["key"],
+                count=g["count"],
+                min=g["min"],
+                max=g["max"],
+                quantiles={_quantile_label(q): v for q, v in g["quantiles"].items()},
+            )
+            for g in groups
+        ],
+    )
+
+
+@router.post("/rollup/rebuild", response_model=RollupRebuildResponse)
+async def rebuild_monthly_rollup(
+    month: Optional[str] = Query(None, description="Месяц YYYY-MM; без параметра — все месяцы"),
+    session: AsyncSession = Depends(get_session),
+):
+    """Пересобрать сводки из сырых таблиц (после правок в обход API, например прямым SQL)."""
+    month_start = _parse_month_param(month) if month else None
+    written = await rebuild_rollups(session, month_start)
+    await session.commit()
+    return RollupRebuildResponse(month=month, groups=written)
@@ -1,6 +1,10 @@
-from typing import Type
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select
+import base64
+import json
+from datetime import date, datetime, time
+from typing import Any, Dict, List, Optional, Type, Union
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
+from sqlalchemy import and_, inspect, insert, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import (
@@ -19,6 +23,8 @@ from src.database.models import (
     Vehicle,
     get_session,
 )
+from src.services.analytics_rollup import month_of, refresh_rollups
+from src.services.archive import ArchivedMonthError, ensure_hot_months
 
 # ==========================================
 # ALL CRUD ROUTERS WILL BE GROUPED IN SWAGGER
@@ -26,6 +32,118 @@ from src.database.models import (
 # ==========================================
 CRUD_TAG = "Tables"
 
+MAX_PAGE_SIZE = 1000
+MAX_BULK_ROWS = 5000
+# Служебные query-параметры списка; остальные — фильтры по колонкам
+_LIST_PARAMS = {"limit", "cursor", "order_by", "fields"}
+# Дата строки, по которой она попадает в месяц холодного архива (src/services/archive.py)
+# и в месячную сводку (src/services/analytics_rollup.py)
+_ARCHIVE_DATE_KEYS = {VisitSchedule: "planned_date", VisitLog: "visited_date"}
+
+
+def _column_types(model: Type) -> Dict[str, Any]:
+    """Колонки модели: ключ атрибута → Column."""
+    return {attr.key: attr.columns[0] for attr in inspect(model).column_attrs}
+
+
+def filterable_columns(model: Type) -> List[str]:
+    """
+    Колонки, по которым разрешён фильтр: первичный ключ и ведущие
+    колонки индексов — фильтр по ним идёт по индексу, а не сканом.
+    """
+    table = model.__table__
+    names = {column.name for column in table.primary_key}
+    for index in table.indexes:
+        names.add(list(index.columns)[0].name)
+    return sorted(key for key, column in _column_types(model).items() if column.name in names)
+
+
+def _coerce(column, value: Any) -> Any:
+    """Строку из query/JSON → тип колонки (дата, время, число, bool)."""
+    if not isinstance(value, str):
+        return value
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    try:
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        if python_type is date:
+            return date.fromisoformat(value)
+        if python_type is time:
+            return time.fromisoformat(value)
+        if python_type is bool:
+            return value.strip().lower() in {"1", "true", "yes", "on"}
+        if python_type in (int, float):
+            return python_type(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неверное значение {value!r} для {column.name}",
+        )
+    return value
+
+
+def _json_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, (date, time)) else value
+
+
+def encode_cursor(values: List[Any]) -> str:
+    raw = json.dumps([_json_value(v) for v in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Неверный cursor")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Неверный cursor")
+    return values
+
+
+def _check_payload_keys(model: Type, columns: Dict[str, Any], row: dict) -> dict:
+    unknown = set(row) - set(columns)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестные поля {model.__name__}: {', '.join(sorted(unknown))}",
+        )
+    return {key: _coerce(columns[key], value) for key, value in row.items()}
+
+
+async def _reject_archived(db: AsyncSession, model: Type, rows: List[dict]) -> None:
+    """409 на запись в архивный месяц: такие строки скрыло бы чтение из архива."""
+    key = _ARCHIVE_DATE_KEYS.get(model)
+    if key is None:
+        return
+    try:
+        await ensure_hot_months(db, [row.get(key) for row in rows])
+    except ArchivedMonthError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+async def _refresh_rollups(db: AsyncSession, model: Type, rows: List[dict]) -> None:
+    """Пересчёт месячных сводок для (месяц, сотрудник) изменённых строк — до commit."""
+    key = _ARCHIVE_DATE_KEYS.get(model)
+    if key is None:
+        return
+    await refresh_rollups(db, {
+        (month_of(row[key]), row["rep_id"])
+        for row in rows
+        if isinstance(row.get(key), date) and row.get("rep_id")
+    })
+
+
+def _rollup_row(model: Type, item: Any) -> dict:
+    key = _ARCHIVE_DATE_KEYS.get(model)
+    if key is None:
+        return {}
+    return {key: getattr(item, key), "rep_id": item.rep_id}
+
 
 def create_crud_router(model: Type, prefix: str) -> APIRouter:
     """
@@ -35,16 +153,26 @@ def create_crud_router(model: Type, prefix: str) -> APIRouter:
 
     router = APIRouter(tags=[CRUD_TAG])
 
+    columns = _column_types(model)
+    filters = filterable_columns(model)
+    order_keys = ["id"] + (["created_at"] if "created_at" in columns else [])
+
     # =========================
-    # CREATE
+    # CREATE (объект или массив объектов)
     # =========================
     @router.post(f"/{prefix}")
     async def create_item(
-        payload: dict,
+        payload: Union[dict, List[dict]] = Body(...),
         db: AsyncSession = Depends(get_session),
     ):
-        obj = model(**payload)
+        if isinstance(payload, list):
+            return await _bulk_create(db, payload)
+
+        values = _check_payload_keys(model, columns, payload)
+        await _reject_archived(db, model, [values])
+        obj = model(**values)
         db.add(obj)
+        await _refresh_rollups(db, model, [values])
         await db.commit()
         await db.refresh(obj)
 
@@ -57,27 +185,111 @@ def create_crud_router(model: Type, prefix: str) -> APIRouter:
             },
         }
 
+    async def _bulk_create(db: AsyncSession, rows: List[dict]):
+        if not rows:
+            raise HTTPException(status_code=400, detail="Пустой массив")
+        if len(rows) > MAX_BULK_ROWS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Не больше {MAX_BULK_ROWS} объектов за запрос",
+            )
+        keys = set(rows[0])
+        if any(set(row) != keys for row in rows):
+            raise HTTPException(
+                status_code=400,
+                detail="У всех объектов массива должен быть одинаковый набор полей",
+            )
+        values = [_check_payload_keys(model, columns, row) for row in rows]
+        await _reject_archived(db, model, values)
+
+        # Один INSERT … VALUES (…), (…) … RETURNING (insertmanyvalues), без ORM-объектов
+        result = await db.execute(
+            insert(model).returning(*(getattr(model, key) for key in columns)),
+            values,
+        )
+        created = [dict(row._mapping) for row in result.all()]
+        await _refresh_rollups(db, model, created)
+        await db.commit()
+
+        return {
+            "message": f"{len(created)} {model.__name__} created successfully",
+            "data": created,
+        }
+
     # =========================
-    # READ ALL
+    # READ ALL (keyset-пагинация, проекция, фильтры)
     # =========================
     @router.get(f"/{prefix}")
     async def get_all_items(
-        limit: int = Query(100),
+        request: Request,
+        limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="next_cursor предыдущей страницы"),
+        order_by: str = Query("id", description=f"Ключ пагинации: {' | '.join(order_keys)}"),
+        fields: Optional[str] = Query(None, description="Колонки через запятую"),
         db: AsyncSession = Depends(get_session),
     ):
-        stmt = select(model).limit(limit)
-        result = await db.execute(stmt)
-        items = result.scalars().all()
+        """
+        Страница записей по возрастанию order_by.
+
+        Фильтры на равенство — query-параметрами по индексным колонкам
+        (см. filterable_columns). Следующая страница — ?cursor=next_cursor.
+        """
+        if order_by not in order_keys:
+            raise HTTPException(
+                status_code=400,
+                detail=f"order_by: одно из {', '.join(order_keys)}",
+            )
+        selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(columns)
+        unknown = [f for f in selected if f not in columns]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Неизвестные поля: {', '.join(unknown)}",
+            )
+
+        # Ключи пагинации: (order_by, id) — id разрешает равные created_at
+        sort_keys = [order_by] if order_by == "id" else [order_by, "id"]
+        stmt = select(*(getattr(model, key) for key in dict.fromkeys(selected + sort_keys)))
+
+        for name, raw in request.query_params.items():
+            if name in _LIST_PARAMS:
+                continue
+            if name not in filters:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Фильтр по {name!r} недоступен; доступны: {', '.join(filters)}",
+                )
+            stmt = stmt.where(getattr(model, name) == _coerce(columns[name], raw))
+
+        sort_cols = [getattr(model, key) for key in sort_keys]
+        if order_by != "id":
+            # NULL не сравним с курсором — такие записи в этой сортировке не отдаются
+            stmt = stmt.where(sort_cols[0].is_not(None))
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != len(sort_keys):
+                raise HTTPException(status_code=400, detail="Неверный cursor")
+            after = [_coerce(columns[key], v) for key, v in zip(sort_keys, values)]
+            if len(sort_cols) == 1:
+                stmt = stmt.where(sort_cols[0] > after[0])
+            else:
+                stmt = stmt.where(or_(
+                    sort_cols[0] > after[0],
+                    and_(sort_cols[0] == after[0], sort_cols[1] > after[1]),
+                ))
+        stmt = stmt.order_by(*sort_cols).limit(limit + 1)
+
+        rows = (await db.execute(stmt)).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = (
+            encode_cursor([getattr(rows[-1], key) for key in sort_keys])
+            if has_more else None
+        )
 
         return {
-            prefix: [
-                {
-                    key: value
-                    for key, value in item.__dict__.items()
-                    if not key.startswith("_")
-                }
-                for item in items
-            ]
+            prefix: [{key: getattr(row, key) for key in selected} for row in rows],
+            "next_cursor": next_cursor,
         }
 
     # =========================
@@ -125,8 +337,20 @@ def create_crud_router(model: Type, prefix: str) -> APIRouter:
                 detail=f"{model.__name__} not found",
             )
 
-        for key, value in payload.items():
+        values = _check_payload_keys(model, columns, payload)
+        date_key = _ARCHIVE_DATE_KEYS.get(model)
+        if date_key is not None:
+            # И старая, и новая дата строки должны быть в горячих месяцах
+            await _reject_archived(db, model, [
+                {date_key: getattr(item, date_key)},
+                {date_key: values.get(date_key)},
+            ])
+
+        before = _rollup_row(model, item)
+        for key, value in values.items():
             setattr(item, key, value)
+        # Сводки — и для старой пары (месяц, сотрудник), и для новой
+        await _refresh_rollups(db, model, [before, _rollup_row(model, item)])
 
         await db.commit()
         await db.refresh(item)
@@ -158,7 +382,9 @@ def create_crud_router(model: Type, prefix: str) -> APIRouter:
                 detail=f"{model.__name__} not found",
             )
 
+        before = _rollup_row(model, item)
         await db.delete(item)
+        await _refresh_rollups(db, model, [before])
         await db.commit()
 
         return {
@@ -28,16 +28,13 @@ from src.database.models import (
     SalesRep,
     VisitLog,
     VisitSchedule,
-    get_session,
 )
+from src.database.replica import get_read_session
+from src.services.archive import load_archived_month
+from src.utils.optional_deps import has_module
 
-try:
-    import openpyxl
-    from openpyxl.styles import Alignment, Font, PatternFill
-    from openpyxl.utils import get_column_letter
-    XLSX_AVAILABLE = True
-except ImportError:
-    XLSX_AVAILABLE = False
+# openpyxl импортируется при первой выгрузке
+XLSX_AVAILABLE = has_module("openpyxl")
 
 router = APIRouter(prefix="/export", tags=["Export"])
 logger = logging.getLogger("export")
@@ -61,22 +58,27 @@ CAT_COLORS = {
     "C": "FFEAB308",  # жёлтый
     "D": "FF6B7280",  # серый
 }
-HEADER_FILL = PatternFill("solid", fgColor="FF1D4ED8") if XLSX_AVAILABLE else None
-HEADER_FONT = Font(color="FFFFFFFF", bold=True) if XLSX_AVAILABLE else None
+HEADER_FILL_COLOR = "FF1D4ED8"
 
 
 def _apply_header(ws, row: int, cols: list[str]) -> None:
     """Записывает строку заголовков с форматированием."""
+    from openpyxl.styles import Alignment, Font, PatternFill
+
+    header_font = Font(color="FFFFFFFF", bold=True)
+    header_fill = PatternFill("solid", fgColor=HEADER_FILL_COLOR)
     for c, label in enumerate(cols, start=1):
         cell = ws.cell(row=row, column=c, value=label)
-        cell.font = HEADER_FONT
-        cell.fill = HEADER_FILL
+        cell.font = header_font
+        cell.fill = header_fill
         cell.alignment = Alignment(horizontal="center", vertical="center")
     ws.row_dimensions[row].height = 20
 
 
 def _autofit(ws) -> None:
     """Авто-ширина столбцов (по максимальной длине значения)."""
+    from openpyxl.utils import get_column_letter
+
     col_widths: dict[int, int] = {}
     for row in ws.iter_rows():
         for cell in row:
@@ -107,7 +109,7 @@ def _sort_schedules_by_location_order(
 @router.get("/schedule")
 async def export_schedule(
     month: str = Query(..., description="Месяц YYYY-MM"),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """
     Выгружает план расписания и аналитику визитов в Excel.
@@ -120,6 +122,8 @@ async def export_schedule(
     """
     if not XLSX_AVAILABLE:
         raise HTTPException(status_code=500, detail="openpyxl не установлен")
+    import openpyxl
+    from openpyxl.styles import Alignment, Font, PatternFill
 
     try:
         year, m = map(int, month.split("-"))
@@ -131,18 +135,23 @@ async def export_schedule(
     month_end = date(year, m, last_day)
 
     # ── Загружаем данные ─────────────────────────────────────────────────────
-    sched_q = (
-        select(VisitSchedule)
-        .where(
-            VisitSchedule.planned_date >= month_start,
-            VisitSchedule.planned_date <= month_end,
-        )
-        .options(
-            selectinload(VisitSchedule.location),
-            selectinload(VisitSchedule.rep),
+    # Закрытый месяц читается из холодного архива (src/services/archive.py)
+    archived = await load_archived_month(session, month_start)
+    if archived is not None:
+        schedules = archived.schedules
+    else:
+        sched_q = (
+            select(VisitSchedule)
+            .where(
+                VisitSchedule.planned_date >= month_start,
+                VisitSchedule.planned_date <= month_end,
+            )
+            .options(
+                selectinload(VisitSchedule.location),
+                selectinload(VisitSchedule.rep),
+            )
         )
-    )
-    schedules = (await session.execute(sched_q)).scalars().all()
+        schedules = (await session.execute(sched_q)).scalars().all()
     overrides = (
         await session.execute(
             select(DailyRouteOverride).where(
@@ -155,14 +164,17 @@ async def export_schedule(
         (override.rep_id, override.route_date): override for override in overrides
     }
 
-    log_q = (
-        select(VisitLog)
-        .where(
-            VisitLog.visited_date >= month_start,
-            VisitLog.visited_date <= month_end,
+    if archived is not None:
+        logs = archived.logs
+    else:
+        log_q = (
+            select(VisitLog)
+            .where(
+                VisitLog.visited_date >= month_start,
+                VisitLog.visited_date <= month_end,
+            )
         )
-    )
-    logs = (await session.execute(log_q)).scalars().all()
+        logs = (await session.execute(log_q)).scalars().all()
     logs_by_sched: dict[str, VisitLog] = {lg.schedule_id: lg for lg in logs}
 
     all_locs = (await session.execute(select(Location))).scalars().all()
@@ -10,6 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import AuditLog, ForceMajeureEvent, get_session
 from src.schemas.force_majeure import ForceMajeureRequest, ForceMajeureResponse, RedistributedItem
+from src.services.archive import ArchivedMonthError
 from src.services.force_majeure_service import ForceMajeureService
 
 router = APIRouter(prefix="/force_majeure", tags=["Force Majeure"])
@@ -30,6 +31,8 @@ async def create_force_majeure(
             description=req.description,
             return_time=req.return_time,
         )
+    except ArchivedMonthError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
@@ -15,13 +15,12 @@ from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.models import Location, SalesRep, VisitLog, VisitSchedule, get_session
+from src.database.models import Location, SalesRep, VisitArchive, VisitLog, VisitSchedule, get_session
+from src.services.analytics_rollup import month_of, refresh_rollups, rollup_keys
+from src.utils.optional_deps import has_module
 
-try:
-    import openpyxl
-    XLSX_AVAILABLE = True
-except ImportError:
-    XLSX_AVAILABLE = False
+# openpyxl импортируется при первом импорте файла
+XLSX_AVAILABLE = has_module("openpyxl")
 
 router = APIRouter(prefix="/import", tags=["Import"])
 logger = logging.getLogger("import_excel")
@@ -116,6 +115,7 @@ async def import_schedule_excel(
     """
     if not XLSX_AVAILABLE:
         raise HTTPException(status_code=500, detail="openpyxl не установлен")
+    import openpyxl
 
     content = await file.read()
     try:
@@ -149,10 +149,13 @@ async def import_schedule_excel(
         loc.name: loc
         for loc in (await session.execute(select(Location))).scalars().all()
     }
+    # Архивные месяцы только читаются (src/services/archive.py)
+    archived = set((await session.execute(select(VisitArchive.month))).scalars())
 
     updated = 0
     skipped = 0
     errors: list[str] = []
+    touched: list[VisitSchedule] = []
 
     # Строки начинаются с 3 (1 — заголовок отчёта, 2 — шапка таблицы)
     for row_num, row in enumerate(ws.iter_rows(min_row=3, values_only=True), start=3):
@@ -175,6 +178,10 @@ async def import_schedule_excel(
             skipped += 1
             errors.append(f"Стр.{row_num}: неверный формат даты '{raw_date}'")
             continue
+        if month_of(planned_date) in archived:
+            skipped += 1
+            errors.append(f"Стр.{row_num}: месяц {planned_date:%Y-%m} в архиве, сначала restore")
+            continue
 
         internal_status = STATUS_MAP.get(status_ru)
         if not internal_status:
@@ -255,9 +262,11 @@ async def import_schedule_excel(
                         time_out=t_out,
                     ))
 
+        touched.append(sched)
         updated += 1
 
     try:
+        await refresh_rollups(session, rollup_keys(*touched))
         await session.commit()
     except Exception as exc:
         await session.rollback()
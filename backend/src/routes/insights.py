@@ -1,184 +1,239 @@
+import asyncio
 from calendar import monthrange
 from collections import defaultdict
 from datetime import date, datetime, timezone
 
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy import distinct, func, select
 
+from src.config import settings
 from src.database.models import (
     ForceMajeureEvent,
     Location,
     SalesRep,
     VisitLog,
     VisitSchedule,
-    get_session,
 )
+from src.database.replica import get_read_session_factory
+from src.services.archive import ArchivedMonth, load_archived_month
 
 router = APIRouter(tags=["Insights"])
 
+_CATEGORIES = ["A", "B", "C", "D"]
+_UNKNOWN_CATEGORY = "?"
+_UNKNOWN_DISTRICT = "Неизвестно"
 
-@router.get("/insights")
-async def get_insights(
-    month: str = Query(
-        None,
-        description="Месяц YYYY-MM. По умолчанию — текущий месяц",
-    ),
-    session: AsyncSession = Depends(get_session),
-):
+
+def _insights_statements(month_start: date, month_end: date) -> dict:
     """
-    Реальная аналитика по торговым точкам, сотрудникам и визитам.
+    Агрегирующие запросы для /insights.
 
-    Возвращает:
-    - Общее кол-во ТТ и % охвата
-    - Визиты план/факт за месяц
-    - Разбивку по категориям A/B/C/D
-    - Покрытие по районам
-    - Активность сотрудников
-    - Кол-во форс-мажоров за месяц
+    Всё считается в БД через GROUP BY — в Python приходят только
+    итоговые строки (десятки), а не все ТТ/визиты месяца.
+    ТТ принадлежит ровно одной паре (категория, район), поэтому
+    COUNT(DISTINCT location_id) по группам можно суммировать.
+    Флаг known отделяет записи без ТТ в справочнике (outer join).
     """
-    # --- Определяем период ---
-    now = datetime.now(timezone.utc)
-    if month:
-        try:
-            year, m = map(int, month.split("-"))
-        except ValueError:
-            year, m = now.year, now.month
-    else:
-        year, m = now.year, now.month
+    loc_known = Location.id.is_not(None).label("known")
+
+    locations = (
+        select(Location.category, Location.district, func.count(Location.id))
+        .group_by(Location.category, Location.district)
+    )
+    planned = (
+        select(
+            Location.category,
+            Location.district,
+            loc_known,
+            func.count(VisitSchedule.id),
+            func.count(distinct(VisitSchedule.location_id)),
+        )
+        .select_from(VisitSchedule)
+        .outerjoin(Location, Location.id == VisitSchedule.location_id)
+        .where(
+            VisitSchedule.planned_date >= month_start,
+            VisitSchedule.planned_date <= month_end,
+        )
+        .group_by(Location.category, Location.district, loc_known)
+    )
+    completed = (
+        select(
+            Location.category,
+            loc_known,
+            func.count(VisitLog.id),
+            func.count(distinct(VisitLog.location_id)),
+        )
+        .select_from(VisitLog)
+        .outerjoin(Location, Location.id == VisitLog.location_id)
+        .where(
+            VisitLog.visited_date >= month_start,
+            VisitLog.visited_date <= month_end,
+        )
+        .group_by(Location.category, loc_known)
+    )
+    reps = (
+        select(
+            VisitLog.rep_id,
+            SalesRep.name,
+            func.count(distinct(VisitLog.visited_date)),
+            func.count(distinct(VisitLog.location_id)),
+        )
+        .outerjoin(SalesRep, SalesRep.id == VisitLog.rep_id)
+        .where(
+            VisitLog.visited_date >= month_start,
+            VisitLog.visited_date <= month_end,
+        )
+        .group_by(VisitLog.rep_id, SalesRep.name)
+        .order_by(VisitLog.rep_id)
+    )
+    force_majeure = select(func.count(ForceMajeureEvent.id)).where(
+        ForceMajeureEvent.event_date >= month_start,
+        ForceMajeureEvent.event_date <= month_end,
+    )
+    return {
+        "locations": locations,
+        "planned": planned,
+        "completed": completed,
+        "reps": reps,
+        "force_majeure": force_majeure,
+    }
+
+
+async def _fetch_all(session_factory, stmt, limit: asyncio.Semaphore) -> list:
+    # Отдельная сессия на запрос: AsyncSession не допускает параллельных execute;
+    # семафор ограничивает, сколько соединений пула занимает один /insights
+    async with limit, session_factory() as session:
+        return (await session.execute(stmt)).all()
+
+
+def _archived_rows(archived: ArchivedMonth) -> dict:
+    """Строки planned/completed/reps как у _insights_statements, но из архива месяца."""
+    planned: dict = defaultdict(lambda: [0, set()])
+    for s in archived.schedules:
+        loc = s.location
+        group = planned[(loc.category if loc else None, loc.district if loc else None, loc is not None)]
+        group[0] += 1
+        group[1].add(s.location_id)
+
+    completed: dict = defaultdict(lambda: [0, set()])
+    reps: dict = defaultdict(lambda: [None, set(), set()])
+    for lg in archived.logs:
+        loc = lg.location
+        group = completed[(loc.category if loc else None, loc is not None)]
+        group[0] += 1
+        group[1].add(lg.location_id)
+        rep = reps[lg.rep_id]
+        rep[0] = lg.rep.name if lg.rep else None
+        rep[1].add(lg.visited_date)
+        rep[2].add(lg.location_id)
+
+    return {
+        "planned": [(*key, cnt, len(locs)) for key, (cnt, locs) in planned.items()],
+        "completed": [(*key, cnt, len(locs)) for key, (cnt, locs) in completed.items()],
+        "reps": [
+            (rep_id, name, len(days), len(locs))
+            for rep_id, (name, days, locs) in sorted(reps.items())
+        ],
+    }
+
+
+async def _load_archive(session_factory, month_start: date, limit: asyncio.Semaphore):
+    async with limit, session_factory() as session:
+        return await load_archived_month(session, month_start)
 
+
+async def collect_insights(session_factory, year: int, m: int) -> dict:
+    """
+    Считает ответ /insights за месяц; запросы к БД идут параллельно, но не
+    больше INSIGHTS_MAX_PARALLEL_QUERIES соединений одновременно.
+    """
     _, last_day = monthrange(year, m)
     month_start = date(year, m, 1)
     month_end = date(year, m, last_day)
-    month_str = f"{year:04d}-{m:02d}"
 
-    # --- Все ТТ ---
-    loc_result = await session.execute(select(Location))
-    all_locations = loc_result.scalars().all()
-    total_tt = len(all_locations)
+    statements = _insights_statements(month_start, month_end)
+    limit = asyncio.Semaphore(max(1, settings.insights_max_parallel_queries))
+    archived, *fetched = await asyncio.gather(
+        _load_archive(session_factory, month_start, limit),
+        *(_fetch_all(session_factory, stmt, limit) for stmt in statements.values()),
+    )
+    rows = dict(zip(statements, fetched))
+    if archived is not None:
+        # Закрытый месяц — визиты из холодного архива (src/services/archive.py)
+        rows.update(_archived_rows(archived))
 
-    # Мап location_id → category/district
-    loc_map = {loc.id: loc for loc in all_locations}
+    # --- Все ТТ ---
+    cat_totals: dict = defaultdict(int)
+    district_totals: dict = defaultdict(int)
+    for category, district, cnt in rows["locations"]:
+        cat_totals[category or _UNKNOWN_CATEGORY] += cnt
+        district_totals[district or _UNKNOWN_DISTRICT] += cnt
+    total_tt = sum(cat_totals.values())
 
     # --- Плановые визиты за месяц ---
-    sched_stmt = select(VisitSchedule).where(
-        VisitSchedule.planned_date >= month_start,
-        VisitSchedule.planned_date <= month_end,
-    )
-    sched_result = await session.execute(sched_stmt)
-    schedules = sched_result.scalars().all()
-    total_planned = len(schedules)
+    total_planned = 0
+    planned_locs = 0
+    cat_planned: dict = defaultdict(int)
+    district_planned_locs: dict = defaultdict(int)
+    for category, district, known, cnt, locs in rows["planned"]:
+        total_planned += cnt
+        planned_locs += locs
+        if known:
+            cat_planned[category or _UNKNOWN_CATEGORY] += cnt
+            district_planned_locs[district or _UNKNOWN_DISTRICT] += locs
 
     # --- Фактические визиты за месяц ---
-    visit_stmt = (
-        select(VisitLog)
-        .where(
-            VisitLog.visited_date >= month_start,
-            VisitLog.visited_date <= month_end,
-        )
-        .options(selectinload(VisitLog.rep))
-    )
-    visit_result = await session.execute(visit_stmt)
-    visits = visit_result.scalars().all()
-    total_completed = len(visits)
+    total_completed = 0
+    cat_completed: dict = defaultdict(int)
+    for category, known, cnt, locs in rows["completed"]:
+        total_completed += cnt
+        if known:
+            cat_completed[category or _UNKNOWN_CATEGORY] += locs
 
     completion_rate = (
         round(total_completed / total_planned * 100, 1) if total_planned else 0.0
     )
 
     # --- % охвата ТТ (хотя бы 1 плановый визит в месяце) ---
-    planned_loc_ids = {s.location_id for s in schedules}
-    coverage_pct = round(len(planned_loc_ids) / total_tt * 100, 1) if total_tt else 0.0
+    coverage_pct = round(planned_locs / total_tt * 100, 1) if total_tt else 0.0
 
     # --- По категориям ---
-    cat_totals = defaultdict(int)
-    cat_planned = defaultdict(int)
-    cat_completed = defaultdict(set)  # set location_ids
-
-    for loc in all_locations:
-        cat = loc.category or "?"
-        cat_totals[cat] += 1
-
-    for sched in schedules:
-        cat = loc_map.get(sched.location_id, None)
-        if cat:
-            cat_planned[cat.category or "?"] += 1
-
-    for visit in visits:
-        loc = loc_map.get(visit.location_id)
-        if loc:
-            cat_completed[loc.category or "?"].add(visit.location_id)
-
     by_category = {}
-    for cat in ["A", "B", "C", "D"]:
+    for cat in _CATEGORIES:
         total_c = cat_totals.get(cat, 0)
-        planned_c = cat_planned.get(cat, 0)
-        completed_c = len(cat_completed.get(cat, set()))
+        completed_c = cat_completed.get(cat, 0)
         by_category[cat] = {
             "total": total_c,
-            "planned": planned_c,
+            "planned": cat_planned.get(cat, 0),
             "completed": completed_c,
             "pct": round(completed_c / total_c * 100, 1) if total_c else 0.0,
         }
 
     # --- По районам ---
-    district_totals: dict = defaultdict(int)
-    district_planned_locs: dict = defaultdict(set)
-
-    for loc in all_locations:
-        dist = loc.district or "Неизвестно"
-        district_totals[dist] += 1
-
-    for sched in schedules:
-        loc = loc_map.get(sched.location_id)
-        if loc:
-            dist = loc.district or "Неизвестно"
-            district_planned_locs[dist].add(sched.location_id)
-
     by_district = [
         {
             "district": dist,
             "total": district_totals[dist],
             "coverage_pct": round(
-                len(district_planned_locs.get(dist, set())) / district_totals[dist] * 100, 1
+                district_planned_locs.get(dist, 0) / district_totals[dist] * 100, 1
             ),
         }
         for dist in sorted(district_totals.keys())
     ]
 
     # --- Активность сотрудников ---
-    rep_result = await session.execute(select(SalesRep))
-    all_reps = rep_result.scalars().all()
-    rep_map = {r.id: r.name for r in all_reps}
-
-    rep_outings: dict = defaultdict(set)   # rep_id → set of dates
-    rep_locs: dict = defaultdict(set)      # rep_id → set of location_ids
-
-    for visit in visits:
-        rep_outings[visit.rep_id].add(visit.visited_date)
-        rep_locs[visit.rep_id].add(visit.location_id)
-
     rep_activity = [
         {
             "rep_id": rep_id,
-            "rep_name": rep_map.get(rep_id, rep_id),
-            "outings_count": len(dates),
-            "tt_visited": len(rep_locs[rep_id]),
+            "rep_name": rep_name or rep_id,
+            "outings_count": outings,
+            "tt_visited": locs,
         }
-        for rep_id, dates in rep_outings.items()
+        for rep_id, rep_name, outings, locs in rows["reps"]
     ]
 
-    # --- Форс-мажоры за месяц ---
-    fm_stmt = select(ForceMajeureEvent).where(
-        ForceMajeureEvent.event_date >= month_start,
-        ForceMajeureEvent.event_date <= month_end,
-    )
-    fm_result = await session.execute(fm_stmt)
-    fm_count = len(fm_result.scalars().all())
-
     return {
-        "month": month_str,
+        "month": f"{year:04d}-{m:02d}",
         "total_tt": total_tt,
         "coverage_pct": coverage_pct,
         "visits_this_month": {
@@ -189,5 +244,37 @@ async def get_insights(
         "by_category": by_category,
         "by_district": by_district,
         "rep_activity": rep_activity,
-        "force_majeure_count": fm_count,
+        "force_majeure_count": rows["force_majeure"][0][0],
     }
+
+
+@router.get("/insights")
+async def get_insights(
+    month: str = Query(
+        None,
+        description="Месяц YYYY-MM. По умолчанию — текущий месяц",
+    ),
+    session_factory=Depends(get_read_session_factory),
+):
+    """
+    Реальная аналитика по торговым точкам, сотрудникам и визитам.
+
+    Возвращает:
+    - Общее кол-во ТТ и % охвата
+    - Визиты план/факт за месяц
+    - Разбивку по категориям A/B/C/D
+    - Покрытие по районам
+    - Активность сотрудников
+    - Кол-во форс-мажоров за месяц
+    """
+    # --- Определяем период ---
+    now = datetime.now(timezone.utc)
+    if month:
+        try:
+            year, m = map(int, month.split("-"))
+        except ValueError:
+            year, m = now.year, now.month
+    else:
+        year, m = now.year, now.month
+
+    return await collect_insights(session_factory, year, m)
@@ -7,9 +7,10 @@ from src.models.exceptions import (
     LlamaRateLimitError,
     LlamaServerError,
     LlamaTimeoutError,
+    LlamaUnavailableError,
     LlamaValidationError,
 )
-from src.models.llama_client import LlamaClient
+from src.models.llm_client import create_client
 from src.models.schemas import Location, Route
 
 
@@ -19,7 +20,7 @@ router = APIRouter(prefix="/llama", tags=["Llama LLM"])
 @router.post("/optimize", response_model=Route, status_code=status.HTTP_200_OK)
 async def optimize_route_llama(locations: List[Location],
                                constraints: Dict | None = None):
-    client = LlamaClient()
+    client = create_client("llama")
     try:
         return await client.generate_route(locations, constraints)
 
@@ -43,6 +44,12 @@ async def optimize_route_llama(locations: List[Location],
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail="Llama API не ответил вовремя (timeout > 20s)",
         )
+    except LlamaUnavailableError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Модель Llama ещё загружается",
+            headers={"Retry-After": "30"},
+        )
     except LlamaServerError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
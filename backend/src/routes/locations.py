@@ -1,9 +1,7 @@
 import csv
 import io
 import json
-from typing import List
-
-from openpyxl import load_workbook
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, status
 from sqlalchemy import delete, func, select, text
@@ -16,6 +14,9 @@ from src.schemas.locations import (
     LocationUpdate,
     UploadLocationsResponse,
 )
+from src.services.analytics_rollup import affected_rollup_keys, refresh_rollups
+from src.services.geocoder import CONFIDENCE_EXACT, GeocodeResult, get_geocoder
+from src.utils.optional_deps import has_module
 
 
 router = APIRouter(prefix="/locations", tags=["Locations"])
@@ -81,8 +82,18 @@ async def update_location(
     location = await session.get(Location, location_id)
     if not location:
         raise HTTPException(status_code=404, detail="Локация не найдена")
-    for field, value in data.model_dump(exclude_none=True).items():
+    changes = data.model_dump(exclude_none=True)
+    regrouped = any(
+        field in changes and changes[field] != getattr(location, field)
+        for field in ("category", "district")
+    )
+    for field, value in changes.items():
         setattr(location, field, value)
+    if regrouped:
+        # Группы сводок — по категории и району ТТ: пересчёт всех её пар (месяц, сотрудник)
+        await refresh_rollups(session, await affected_rollup_keys(
+            session, VisitSchedule.location_id == location_id, VisitLog.location_id == location_id,
+        ))
     await session.commit()
     await session.refresh(location)
     return LocationResponse.model_validate(location)
@@ -123,9 +134,13 @@ async def delete_location(
     ).scalar() or 0
 
     if force:
+        rollup_keys = await affected_rollup_keys(
+            session, VisitSchedule.location_id == location_id, VisitLog.location_id == location_id,
+        )
         await session.execute(delete(VisitLog).where(VisitLog.location_id == location_id))
         await session.execute(delete(SkippedVisitStash).where(SkippedVisitStash.location_id == location_id))
         await session.execute(delete(VisitSchedule).where(VisitSchedule.location_id == location_id))
+        await refresh_rollups(session, rollup_keys)
         await session.delete(location)
         await session.commit()
         return
@@ -172,6 +187,8 @@ async def upload_locations(
     elif filename.endswith(".csv"):
         rows = _parse_csv(content)
     elif filename.endswith(".xlsx"):
+        if not has_module("openpyxl"):
+            raise HTTPException(status_code=500, detail="openpyxl не установлен")
         rows = _parse_xlsx(content)
     else:
         raise HTTPException(
@@ -182,8 +199,12 @@ async def upload_locations(
     created: list[Location] = []
     errors: list[dict] = []
     skipped: list[str] = []
+    geocoded: list[dict] = []
 
     for idx, row in enumerate(rows):
+        geocode = row.pop("geocode", None)
+        if geocode:
+            geocoded.append({"row": idx + 1, "name": row.get("name"), **geocode})
         try:
             loc_data = LocationCreate(**row)
             data = loc_data.model_dump()
@@ -220,6 +241,7 @@ async def upload_locations(
         created=[LocationResponse.model_validate(loc) for loc in created],
         errors=errors,
         skipped=skipped,
+        geocoded=geocoded,
         total_processed=len(rows),
     )
 
@@ -259,10 +281,16 @@ async def clear_all_locations(
             "message": "Передай ?confirm=true для выполнения удаления",
         }
 
+    rollup_keys = await affected_rollup_keys(
+        session,
+        VisitSchedule.location_id.in_(select(Location.id)),
+        VisitLog.location_id.in_(select(Location.id)),
+    )
     # Каскадное удаление в правильном порядке зависимостей
     await session.execute(text("DELETE FROM visit_log WHERE location_id IN (SELECT id FROM locations)"))
     await session.execute(text("DELETE FROM skipped_visit_stash WHERE location_id IN (SELECT id FROM locations)"))
     await session.execute(text("DELETE FROM visit_schedule WHERE location_id IN (SELECT id FROM locations)"))
+    await refresh_rollups(session, rollup_keys)
     await session.execute(text("DELETE FROM locations"))
     await session.commit()
 
@@ -336,76 +364,30 @@ _XLSX_COLUMN_MAP = {
     "адрес тт": "address",
 }
 
-# Справочник координат районов и городов Республики Мордовия.
-# Используется когда в файле есть название района, но нет координат.
-_MORDOVIA_COORDS: dict[str, tuple[float, float]] = {
-    # Городской округ
-    "г.о. саранск":         (54.1871, 45.1749),
-    "саранск":              (54.1871, 45.1749),
-    # Районы
-    "ардатовский":          (54.8490, 46.2360),
-    "ардатовский район":    (54.8490, 46.2360),
-    "атюрьевский":          (54.0310, 43.6820),
-    "атюрьевский район":    (54.0310, 43.6820),
-    "атяшевский":           (54.5980, 45.8880),
-    "атяшевский район":     (54.5980, 45.8880),
-    "большеберезниковский": (54.2670, 45.7650),
-    "большеберезниковский район": (54.2670, 45.7650),
-    "большеигнатовский":    (54.4810, 44.8710),
-    "большеигнатовский район": (54.4810, 44.8710),
-    "дубёнский":            (54.2650, 46.0880),
-    "дубенский":            (54.2650, 46.0880),
-    "дубёнский район":      (54.2650, 46.0880),
-    "дубенский район":      (54.2650, 46.0880),
-    "ельниковский":         (54.3900, 43.5550),
-    "ельниковский район":   (54.3900, 43.5550),
-    "зубово-полянский":     (54.0520, 42.8310),
-    "зубово-полянский район": (54.0520, 42.8310),
-    "инсарский":            (53.8760, 44.3770),
-    "инсарский район":      (53.8760, 44.3770),
-    "ичалковский":          (54.1260, 46.5840),
-    "ичалковский район":    (54.1260, 46.5840),
-    "кадошкинский":         (54.0200, 43.5360),
-    "кадошкинский район":   (54.0200, 43.5360),
-    "ковылкинский":         (53.9060, 43.9190),
-    "ковылкинский район":   (53.9060, 43.9190),
-    "кочкуровский":         (54.0500, 45.5710),
-    "кочкуровский район":   (54.0500, 45.5710),
-    "краснослободский":     (54.4190, 43.7770),
-    "краснослободский район": (54.4190, 43.7770),
-    "лямбирский":           (54.2350, 45.6250),
-    "лямбирский район":     (54.2350, 45.6250),
-    "ромодановский":        (54.4300, 45.3710),
-    "ромодановский район":  (54.4300, 45.3710),
-    "рузаевский":           (54.0570, 44.9520),
-    "рузаевский район":     (54.0570, 44.9520),
-    "старошайговский":      (54.3500, 44.2580),
-    "старошайговский район": (54.3500, 44.2580),
-    "темниковский":         (54.6360, 43.1990),
-    "темниковский район":   (54.6360, 43.1990),
-    "теньгушевский":        (54.8440, 43.6140),
-    "теньгушевский район":  (54.8440, 43.6140),
-    "торбеевский":          (54.0880, 43.0920),
-    "торбеевский район":    (54.0880, 43.0920),
-    "чамзинский":           (54.2310, 46.2890),
-    "чамзинский район":     (54.2310, 46.2890),
-}
-
-# Центр Саранска — запасные координаты если район не найден в справочнике
-_DEFAULT_LAT = 54.1871
-_DEFAULT_LON = 45.1749
+# Колонки, по которым геокодер ищет место, если координат нет (в порядке приоритета:
+# район и город — географические, название ТТ совпадает со справочником разве что случайно)
+_GEOCODE_FIELDS = ("district", "city", "address", "name")
 
 
-def _lookup_coords(name: str) -> tuple[float, float] | None:
-    """Ищет координаты по нормализованному названию района."""
-    key = name.strip().lower()
-    if key in _MORDOVIA_COORDS:
-        return _MORDOVIA_COORDS[key]
-    # Попытка частичного совпадения (без слова "район")
-    for k, v in _MORDOVIA_COORDS.items():
-        if key in k or k in key:
-            return v
-    return None
+def _geocode_row(parsed: dict) -> GeocodeResult:
+    """
+    Координаты строки по справочнику: самое уверенное совпадение по всем
+    колонкам (при равной уверенности — по приоритету колонки), чтобы
+    префикс в названии не перебивал точный район. Без совпадения —
+    детерминированный fallback.
+    """
+    geocoder = get_geocoder()
+    best: Optional[GeocodeResult] = None
+    for field in _GEOCODE_FIELDS:
+        value = parsed.get(field)
+        if not value:
+            continue
+        result = geocoder.lookup(value)
+        if result is not None and (best is None or result.confidence > best.confidence):
+            best = result
+            if best.confidence >= CONFIDENCE_EXACT:
+                break
+    return best or geocoder.fallback(parsed["name"])
 
 
 def _parse_xlsx(content: bytes) -> list[dict]:
@@ -413,10 +395,13 @@ def _parse_xlsx(content: bytes) -> list[dict]:
 
     Читает первый лист, первая строка = заголовки.
     Поддерживает русские псевдонимы колонок.
-    Если координаты отсутствуют — ищет в справочнике районов Мордовии,
-    при отсутствии совпадения — расставляет точки вокруг центра Саранска.
+    Если координаты отсутствуют — ищет название в индексе геокодера,
+    при отсутствии совпадения — ставит точку рядом с центром региона
+    (детерминированно: повторный импорт даёт те же координаты).
+    Результат геокодирования кладётся в строку под ключом "geocode".
     """
-    import random
+    from openpyxl import load_workbook
+
     wb = load_workbook(filename=io.BytesIO(content), read_only=True)
     # Берём первый лист по индексу, не wb.active (может быть неверным)
     ws = wb.worksheets[0]
@@ -457,18 +442,15 @@ def _parse_xlsx(content: bytes) -> list[dict]:
         if "name" not in parsed or not parsed["name"]:
             continue
 
-        # Координаты: сначала справочник, потом случайный разброс
+        # Координаты: индекс справочника, затем детерминированный fallback
         if "lat" not in parsed or "lon" not in parsed:
-            coords = _lookup_coords(parsed["name"])
-            if coords:
-                parsed["lat"], parsed["lon"] = coords
-            else:
-                parsed["lat"] = round(
-                    _DEFAULT_LAT + random.uniform(-0.02, 0.02), 6
-                )
-                parsed["lon"] = round(
-                    _DEFAULT_LON + random.uniform(-0.02, 0.02), 6
-                )
+            geocoded = _geocode_row(parsed)
+            parsed["lat"], parsed["lon"] = geocoded.lat, geocoded.lon
+            parsed["geocode"] = {
+                "confidence": geocoded.confidence,
+                "method": geocoded.method,
+                "matched": geocoded.matched,
+            }
 
         parsed.setdefault("time_window_start", "09:00")
         parsed.setdefault("time_window_end", "18:00")
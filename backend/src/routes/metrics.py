@@ -1,13 +1,21 @@
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import (Metric as DBMetric,
+                                 engine,
                                  get_session,
                                  )
+from src.database.pool import pool_status
+from src.models.inference_worker import inference_status
+from src.models.prompt_cache import prompt_cache_status
+from src.services.llm_cache import cache_status
+from src.services.model_selector import refresh_stats, selector
+from src.services.prometheus import CONTENT_TYPE, render_metrics
 
 router = APIRouter(tags=["Metrics"])
 
@@ -52,3 +60,62 @@ async def get_all_metrics(
             status_code=500,
             detail=f"Failed to fetch metrics: {exc}",
         ) from exc
+
+
+@router.get("/metrics/db-pool")
+async def get_db_pool_metrics():
+    """
+    Состояние пула соединений БД: занятые/свободные соединения, overflow,
+    таймауты и гистограмма времени выдачи соединения (мс, кумулятивная).
+    """
+    return pool_status(engine)
+
+
+@router.get("/metrics/prometheus", response_class=PlainTextResponse)
+async def get_prometheus_metrics():
+    """
+    Метрики процесса в текстовом формате Prometheus: гистограммы
+    HTTP-латентности по маршрутам и операций timed_log, пул БД, очереди
+    инференса LLM, кэши LLM (попадания и hit ratio).
+    """
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+
+@router.get("/metrics/llm-queue")
+async def get_llm_queue_metrics():
+    """
+    Очереди инференса локальных моделей: глубина, отказы (очередь полна),
+    истёкшие дедлайны и гистограммы ожидания/длительности инференса (мс).
+    """
+    return inference_status()
+
+
+@router.get("/metrics/llm-prompt-cache")
+async def get_llm_prompt_cache_metrics():
+    """
+    Кэш общего префикса промптов llama.cpp: обращения, попадания
+    (восстановленные состояния префикса), переиспользованные токены
+    (не вычислялись заново) и занятая память.
+    """
+    return prompt_cache_status()
+
+
+@router.get("/metrics/model-selection")
+async def get_model_selection_report(
+    db: AsyncSession = Depends(get_session),
+    limit: int = Query(50, ge=1, le=500, description="Сколько последних решений вернуть"),
+):
+    """
+    Контрфактический отчёт селектора моделей (model="auto"): выбранные
+    модели, прогнозы латентности всех моделей на момент решения,
+    фактическая латентность и сколько запросов уложились бы в SLO при
+    постоянном использовании каждой модели.
+    """
+    await refresh_stats(db)
+    return selector.report(limit)
+
+
+@router.get("/metrics/llm-cache")
+async def get_llm_cache_metrics(db: AsyncSession = Depends(get_session)):
+    """Кэш оценок LLM: попадания/промахи (hit_rate), записи, вытеснения."""
+    return await cache_status(db)
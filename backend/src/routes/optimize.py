@@ -1,6 +1,9 @@
+import json
+import logging
 import time
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -16,6 +19,8 @@ from src.schemas.optimize import (
 from src.schemas.vehicle import Vehicle as VehicleSchema
 from src.services.optimize import Optimizer
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(tags=['Optimization'])
 ALLOWED_TRANSPORT_MODES = {"car", "taxi", "bus"}
 
@@ -140,6 +145,91 @@ async def get_optimization_variants(
     Генерирует 3 варианта оптимизации маршрута без сохранения в БД.
     LLM выбранной модели оценивает каждый вариант и добавляет pros/cons.
     """
+    ordered_locations, transport_mode, vehicle_schema = (
+        await _load_variant_inputs(payload, db)
+    )
+    optimizer = Optimizer(db)
+
+    try:
+        return await optimizer.generate_variants(
+            db_locations=ordered_locations,
+            vehicle=vehicle_schema,
+            model=payload.model,
+            transport_mode=transport_mode,
+            latency_slo_ms=payload.latency_slo_ms,
+        )
+    except Exception as exc:
+        raise HTTPException(
+            status_code=500,
+            detail=f'Variants generation failed: {str(exc)}',
+        )
+
+
+def _sse_event(event: str, data: object) -> str:
+    if hasattr(data, 'model_dump'):
+        data = data.model_dump()
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f'event: {event}\ndata: {payload}\n\n'
+
+
+@router.post('/optimize/variants/stream')
+async def stream_optimization_variants(
+    payload: OptimizeVariantsRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_session),
+):
+    """
+    То же, что /optimize/variants, но фазы отдаются по мере готовности
+    (text/event-stream):
+
+    - candidate — метрики каждого из 3 вариантов;
+    - best — лучший вариант без pros/cons (можно показывать сразу);
+    - evaluation — pros/cons от LLM, model_used, llm_evaluation_success;
+    - done — итоговый OptimizeVariantsResponse;
+    - error — генерация упала, поток завершается.
+
+    Если клиент закрыл соединение, генерация отменяется вместе с
+    инференсом LLM — модель освобождается для следующих запросов.
+    """
+    ordered_locations, transport_mode, vehicle_schema = (
+        await _load_variant_inputs(payload, db)
+    )
+    optimizer = Optimizer(db)
+
+    async def events():
+        phases = optimizer.iter_variants(
+            db_locations=ordered_locations,
+            vehicle=vehicle_schema,
+            model=payload.model,
+            transport_mode=transport_mode,
+            latency_slo_ms=payload.latency_slo_ms,
+        )
+        try:
+            async for event, data in phases:
+                yield _sse_event(event, data)
+                if await request.is_disconnected():
+                    logger.info('Variants stream: client disconnected')
+                    break
+        except Exception as exc:
+            logger.warning('Variants stream failed: %s', exc)
+            yield _sse_event(
+                'error',
+                {'detail': f'Variants generation failed: {str(exc)}'},
+            )
+        finally:
+            await phases.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+async def _load_variant_inputs(
+    payload: OptimizeVariantsRequest,
+    db: AsyncSession,
+) -> tuple[list[DBLocation], str, VehicleSchema | None]:
     if len(payload.location_ids) < 2:
         raise HTTPException(
             status_code=422,
@@ -168,21 +258,7 @@ async def get_optimization_variants(
         payload.constraints,
         db,
     )
-
-    optimizer = Optimizer(db)
-
-    try:
-        return await optimizer.generate_variants(
-            db_locations=ordered_locations,
-            vehicle=vehicle_schema,
-            model=payload.model,
-            transport_mode=transport_mode,
-        )
-    except Exception as exc:
-        raise HTTPException(
-            status_code=500,
-            detail=f'Variants generation failed: {str(exc)}',
-        )
+    return ordered_locations, transport_mode, vehicle_schema
 
 
 @router.post('/optimize/confirm', response_model=OptimizeResponse)
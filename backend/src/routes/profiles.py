@@ -0,0 +1,47 @@
+"""
+Профили запросов (src/utils/profiler.py).
+
+GET /admin/profiles              — сохранённые профили, новые первыми
+GET /admin/profiles/{request_id} — collapsed stacks (flamegraph.pl, speedscope)
+
+Доступ — заголовок X-Profile: <PROFILING_TOKEN>; без токена в настройках
+эндпоинты закрыты.
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from src.utils.profiler import PROFILE_HEADER, list_profiles, load_profile, token_matches
+
+router = APIRouter(prefix="/admin/profiles", tags=["Profiling"])
+
+
+def require_profiling_token(
+    x_profile: Optional[str] = Header(None, alias=PROFILE_HEADER),
+) -> None:
+    if not token_matches(x_profile):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Profiling token required",
+        )
+
+
+@router.get("", dependencies=[Depends(require_profiling_token)])
+async def get_profiles():
+    return {"profiles": list_profiles()}
+
+
+@router.get(
+    "/{request_id}",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(require_profiling_token)],
+)
+async def get_profile(request_id: str):
+    collapsed = load_profile(request_id)
+    if collapsed is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found",
+        )
+    return PlainTextResponse(collapsed)
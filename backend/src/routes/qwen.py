@@ -1,8 +1,9 @@
 from typing import Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, status
 
-from src.models.qwen_client import QwenClient
+from src.models.exceptions import QwenRateLimitError, QwenTimeoutError, QwenUnavailableError
+from src.models.llm_client import create_client
 from src.models.schemas import Location, Route
 from src.services.model_selector import get_model_recommendation
 
@@ -20,12 +21,22 @@ async def optimize_route(
                                            description="urgent |"
                                            "quality | reliability"),
 ):
-    client = QwenClient()
+    client = create_client("qwen")
     try:
         route = await client.generate_route(locations, constraints)
         if include_recommendation:
             rec = get_model_recommendation(len(locations), time_constraint)
             route = route.model_copy(update={"recommendation": rec})
         return route
+    except QwenRateLimitError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+    except QwenTimeoutError as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+    except QwenUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "30"},
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
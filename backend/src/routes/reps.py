@@ -17,6 +17,7 @@ from src.database.models import (
     get_session,
 )
 from src.schemas.reps import SalesRepCreate, SalesRepResponse, SalesRepUpdate
+from src.services.analytics_rollup import affected_rollup_keys, refresh_rollups
 
 router = APIRouter(prefix="/reps", tags=["Sales Reps"])
 
@@ -158,11 +159,16 @@ async def delete_rep(
         schedules_count + visits_count + fm_count + overrides_count + stash_count
     )
     if force:
+        rollup_keys = await affected_rollup_keys(
+            session, VisitSchedule.rep_id == rep_id, VisitLog.rep_id == rep_id,
+        )
         await session.execute(delete(VisitLog).where(VisitLog.rep_id == rep_id))
         await session.execute(delete(DailyRouteOverride).where(DailyRouteOverride.rep_id == rep_id))
         await session.execute(delete(ForceMajeureEvent).where(ForceMajeureEvent.rep_id == rep_id))
         await session.execute(delete(SkippedVisitStash).where(SkippedVisitStash.rep_id == rep_id))
         await session.execute(delete(VisitSchedule).where(VisitSchedule.rep_id == rep_id))
+        # Сводки сотрудника пустеют в той же транзакции
+        await refresh_rollups(session, rollup_keys)
         await session.delete(rep)
         await session.commit()
         return
@@ -3,7 +3,8 @@ from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from src.database.models import Location, OptimizationResult, Route, get_session
+from src.database.models import Location, OptimizationResult, Route
+from src.database.replica import get_read_session
 from src.schemas.locations import LocationResponse
 from src.schemas.routes import (
     ComparisonDiff,
@@ -74,7 +75,7 @@ async def load_latest_comparison_results(
 async def get_routes(
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(10, ge=1, le=100, description="Max records to return"),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """Get paginated list of all routes."""
     count_stmt = select(func.count(Route.id))
@@ -127,7 +128,7 @@ async def get_routes(
 )
 async def get_route_detail(
     route_id: str,
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """Get detailed information about a specific route."""
     stmt = (
@@ -199,7 +200,7 @@ async def get_route_detail(
 )
 async def get_route_comparison(
     route_id: str,
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """Return original vs current location order with diff metrics."""
     route_stmt = select(Route).where(Route.id == route_id)
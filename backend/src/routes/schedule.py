@@ -22,6 +22,8 @@ from src.database.models import (
     VisitSchedule,
     get_session,
 )
+from src.database.partitions import ensure_month_partitions
+from src.database.replica import get_read_session
 from src.schemas.schedule import (
     DayRouteOverrideRequest,
     DailyRoute,
@@ -40,6 +42,8 @@ from src.models.schedule_schemas import (
     GenerateOptimizedScheduleRequest,
     GenerateOptimizedScheduleResult,
 )
+from src.services.analytics_rollup import rebuild_rollups, refresh_rollups, rollup_keys
+from src.services.archive import ArchivedMonthError, ensure_hot_months, load_archived_month
 from src.services.osrm_service import osrm_trip_order
 from src.services.schedule_planner import (
     AVG_TRAVEL_MIN_PER_TT,
@@ -327,6 +331,13 @@ async def generate_schedule(
     _, last_day = monthrange(year, m)
     month_start = date(year, m, 1)
     month_end = date(year, m, last_day)
+    # Архивный месяц только читается (src/services/archive.py)
+    try:
+        await ensure_hot_months(session, [month_start])
+    except ArchivedMonthError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    # Секция месяца — до вставки плана, чтобы строки не легли в DEFAULT
+    await ensure_month_partitions(session.bind, 0, month_start)
 
     _ACTIVE_STATUSES = ("planned", "rescheduled", "skipped")
     existing_q = await session.execute(
@@ -436,6 +447,7 @@ async def generate_schedule(
         }, ensure_ascii=False),
     )
     session.add(audit)
+    await rebuild_rollups(session, month_start)
     await session.commit()
 
     return result
@@ -465,6 +477,10 @@ async def update_visit_status(
     )
     if not sched:
         raise HTTPException(status_code=404, detail="Визит не найден")
+    try:
+        await ensure_hot_months(session, [sched.planned_date])
+    except ArchivedMonthError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
 
     # ── Проверка машины состояний ────────────────────────────────────────────
     current_status = sched.status
@@ -522,6 +538,7 @@ async def update_visit_status(
     )
     session.add(audit)
 
+    await refresh_rollups(session, rollup_keys(sched))
     await session.commit()
     await session.refresh(sched, ["location", "rep"])
     # Загружаем связанный VisitLog чтобы вернуть time_in/time_out
@@ -689,6 +706,10 @@ async def resolve_stash_manual(
         raise HTTPException(status_code=404, detail="Запись стеша не найдена")
     if entry.resolution is not None:
         raise HTTPException(status_code=409, detail="Запись уже решена")
+    try:
+        await ensure_hot_months(session, [payload.target_date])
+    except ArchivedMonthError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
 
     new_sched = VisitSchedule(
         id=str(uuid_mod.uuid4()),
@@ -704,6 +725,7 @@ async def resolve_stash_manual(
     entry.resolved_at = datetime.now(tz.utc)
     entry.resolved_schedule_id = new_sched.id
 
+    await refresh_rollups(session, rollup_keys(new_sched))
     await session.commit()
     await session.refresh(entry, ["location", "rep"])
     return _stash_to_item(entry)
@@ -743,6 +765,13 @@ async def resolve_stash_carry_over(
     entry.resolved_at = datetime.now(tz.utc)
     entry.resolved_schedule_id = new_schedule_id
 
+    if new_schedule_id:
+        new_sched = await session.get(VisitSchedule, new_schedule_id)
+        try:
+            await ensure_hot_months(session, [new_sched.planned_date])
+        except ArchivedMonthError as exc:
+            raise HTTPException(status_code=409, detail=str(exc))
+        await refresh_rollups(session, rollup_keys(new_sched))
     await session.commit()
     await session.refresh(entry, ["location", "rep"])
     return _stash_to_item(entry)
@@ -786,6 +815,7 @@ async def resolve_stash_ai(
 
     # Chunk stash entries directly (not location_ids) to handle duplicate location_ids correctly
     entry_chunks = _chunked_round_robin(list(entries), len(active_reps))
+    new_schedules: List[VisitSchedule] = []
 
     for target_rep, chunk_entries in zip(active_reps, entry_chunks):
         for entry in chunk_entries:
@@ -803,10 +833,16 @@ async def resolve_stash_ai(
             )
             session.add(new_sched)
             await session.flush()
+            new_schedules.append(new_sched)
             entry.resolution = "ai"
             entry.resolved_at = datetime.now(tz.utc)
             entry.resolved_schedule_id = new_sched.id
 
+    try:
+        await ensure_hot_months(session, [s.planned_date for s in new_schedules])
+    except ArchivedMonthError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    await refresh_rollups(session, rollup_keys(*new_schedules))
     await session.commit()
     for e in entries:
         await session.refresh(e)
@@ -832,7 +868,7 @@ async def discard_stash_entry(
 @router.get("/daily", response_model=List[DailyRoute])
 async def get_daily_schedule(
     date_str: str = Query(..., alias="date", description="Дата YYYY-MM-DD"),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """Маршруты всех сотрудников на конкретный день."""
     try:
@@ -881,7 +917,7 @@ async def get_daily_schedule(
 async def get_rep_schedule(
     rep_id: str,
     month: str = Query(..., description="Месяц YYYY-MM"),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """План конкретного сотрудника на месяц."""
     return await _build_monthly_plan_response(session, month, rep_id=rep_id)
@@ -892,7 +928,7 @@ async def get_monthly_schedule(
     month: str = Query(..., description="Месяц YYYY-MM"),
     from_date: Optional[str] = Query(None, description="Фильтр с даты YYYY-MM-DD"),
     to_date: Optional[str] = Query(None, description="Фильтр по дату YYYY-MM-DD"),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """Полный план всех сотрудников на месяц с опциональной фильтрацией по датам."""
     return await _build_monthly_plan_response(session, month, from_date=from_date, to_date=to_date)
@@ -932,24 +968,35 @@ async def _build_monthly_plan_response(
         except ValueError:
             raise HTTPException(status_code=400, detail="Неверный формат to_date. Используй YYYY-MM-DD")
 
-    stmt = (
-        select(VisitSchedule)
-        .where(
-            VisitSchedule.planned_date >= effective_start,
-            VisitSchedule.planned_date <= effective_end,
+    archived = await load_archived_month(session, month_start)
+    if archived is not None:
+        # Закрытый месяц из холодного архива (src/services/archive.py);
+        # строки там уже в порядке planned_date, rep_id, created_at, id
+        schedules = [
+            s for s in archived.schedules
+            if effective_start <= s.planned_date <= effective_end
+            and (not rep_id or s.rep_id == rep_id)
+        ]
+        logs_by_schedule = {lg.schedule_id: lg for lg in archived.logs if lg.schedule_id}
+    else:
+        stmt = (
+            select(VisitSchedule)
+            .where(
+                VisitSchedule.planned_date >= effective_start,
+                VisitSchedule.planned_date <= effective_end,
+            )
+            .order_by(VisitSchedule.planned_date, VisitSchedule.rep_id, VisitSchedule.created_at, VisitSchedule.id)
+            .options(selectinload(VisitSchedule.location), selectinload(VisitSchedule.rep))
         )
-        .order_by(VisitSchedule.planned_date, VisitSchedule.rep_id, VisitSchedule.created_at, VisitSchedule.id)
-        .options(selectinload(VisitSchedule.location), selectinload(VisitSchedule.rep))
-    )
-    if rep_id:
-        stmt = stmt.where(VisitSchedule.rep_id == rep_id)
+        if rep_id:
+            stmt = stmt.where(VisitSchedule.rep_id == rep_id)
 
-    result = await session.execute(stmt)
-    schedules = result.scalars().all()
+        result = await session.execute(stmt)
+        schedules = result.scalars().all()
 
-    # Загружаем VisitLog для всех найденных визитов одним запросом
-    schedule_ids = [s.id for s in schedules]
-    logs_by_schedule = await _load_logs_by_schedule(session, schedule_ids)
+        # Загружаем VisitLog для всех найденных визитов одним запросом
+        schedule_ids = [s.id for s in schedules]
+        logs_by_schedule = await _load_logs_by_schedule(session, schedule_ids)
 
     # Только ТТ с категорией A/B/C/D — знаменатель совпадает с тем, что планирует planner
     total_tt_result = await session.execute(
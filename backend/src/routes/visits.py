@@ -1,15 +1,17 @@
 from calendar import monthrange
 from collections import defaultdict
 from datetime import date
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import select
+from sqlalchemy import distinct, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from src.database.models import VisitLog, get_session
+from src.database.models import MonthlyVisitRollup, VisitArchive, VisitLog, get_session
+from src.database.replica import get_read_session
 from src.schemas.visits import VisitCreate, VisitResponse, VisitStats
+from src.services.analytics_rollup import month_of, refresh_rollups
+from src.services.archive import ArchivedMonthError, ensure_hot_months
 
 router = APIRouter(prefix="/visits", tags=["Visits"])
 
@@ -20,6 +22,10 @@ async def create_visit(
     session: AsyncSession = Depends(get_session),
 ):
     """Отметить фактический визит."""
+    try:
+        await ensure_hot_months(session, [data.visited_date])
+    except ArchivedMonthError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
     visit = VisitLog(
         location_id=data.location_id,
         rep_id=data.rep_id,
@@ -30,75 +36,136 @@ async def create_visit(
         notes=data.notes,
     )
     session.add(visit)
+    await refresh_rollups(session, {(month_of(visit.visited_date), visit.rep_id)})
     await session.commit()
     await session.refresh(visit)
     return visit
 
 
-@router.get("/stats", response_model=VisitStats)
-async def get_visit_stats(
-    month: str = Query(..., description="Месяц YYYY-MM"),
-    session: AsyncSession = Depends(get_session),
-):
-    """Статистика посещаемости за месяц."""
+def _month_range(month: str, month_to: Optional[str]) -> tuple[date, date]:
+    """'YYYY-MM' [+ 'YYYY-MM'] → (первый день первого месяца, последний день последнего)."""
     try:
         year, m = map(int, month.split("-"))
+        year_to, m_to = map(int, month_to.split("-")) if month_to else (year, m)
+        start, end_month = date(year, m, 1), date(year_to, m_to, 1)
     except ValueError:
         raise HTTPException(status_code=400, detail="Неверный формат месяца. Используй YYYY-MM")
+    if end_month < start:
+        raise HTTPException(status_code=400, detail="month_to раньше month")
+    _, last_day = monthrange(end_month.year, end_month.month)
+    return start, end_month.replace(day=last_day)
 
-    _, last_day = monthrange(year, m)
-    month_start = date(year, m, 1)
-    month_end = date(year, m, last_day)
 
-    # Загружаем визиты с локациями
-    stmt = (
-        select(VisitLog)
+@router.get("/stats", response_model=VisitStats)
+async def get_visit_stats(
+    month: str = Query(..., description="Месяц YYYY-MM (начало периода)"),
+    month_to: Optional[str] = Query(None, description="Конец периода YYYY-MM включительно"),
+    rep_id: Optional[str] = Query(None, description="Только визиты сотрудника"),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Статистика посещаемости за месяц или диапазон месяцев.
+
+    Число визитов (всего, по категориям, по сотрудникам) — из месячных
+    сводок (monthly_visit_rollup): они аддитивны и есть и для архивных
+    месяцев. Уникальные ТТ между сотрудниками и месяцами не суммируются,
+    их считает _visited_locations по журналу визитов.
+    """
+    period_start, period_end = _month_range(month, month_to)
+
+    roll_q = (
+        select(
+            MonthlyVisitRollup.rep_id,
+            MonthlyVisitRollup.category,
+            func.sum(MonthlyVisitRollup.visits),
+        )
         .where(
-            VisitLog.visited_date >= month_start,
-            VisitLog.visited_date <= month_end,
+            MonthlyVisitRollup.month.between(period_start, period_end),
+            MonthlyVisitRollup.visits > 0,
         )
-        .options(selectinload(VisitLog.location))
+        .group_by(MonthlyVisitRollup.rep_id, MonthlyVisitRollup.category)
     )
-    result = await session.execute(stmt)
-    visits = result.scalars().all()
-
-    unique_locs = {v.location_id for v in visits}
-    unique_reps = {v.rep_id for v in visits}
-
-    # По категориям
+    if rep_id:
+        roll_q = roll_q.where(MonthlyVisitRollup.rep_id == rep_id)
+    # Категория «?» — ТТ без категории или не из справочника
     by_cat: dict = defaultdict(int)
-    by_rep_map: dict = defaultdict(lambda: {"visits": 0, "locs": set()})
-
-    for v in visits:
-        cat = v.location.category if v.location else "?"
-        by_cat[cat] += 1
-        by_rep_map[v.rep_id]["visits"] += 1
-        by_rep_map[v.rep_id]["locs"].add(v.location_id)
+    visits_by_rep: dict = defaultdict(int)
+    for row_rep_id, category, visits in (await session.execute(roll_q)).all():
+        by_cat[category] += visits
+        visits_by_rep[row_rep_id] += visits
 
+    unique_locs, locs_by_rep = await _visited_locations(session, period_start, period_end, rep_id)
     by_rep_list = [
         {
-            "rep_id": rep_id,
-            "total_visits": data["visits"],
-            "unique_locations": len(data["locs"]),
+            "rep_id": row_rep_id,
+            "total_visits": visits_by_rep[row_rep_id],
+            "unique_locations": locs_by_rep.get(row_rep_id, 0),
         }
-        for rep_id, data in by_rep_map.items()
+        for row_rep_id in sorted(visits_by_rep)
     ]
 
     return VisitStats(
         month=month,
-        total_visits=len(visits),
-        unique_locations=len(unique_locs),
-        unique_reps=len(unique_reps),
+        month_to=month_to,
+        rep_id=rep_id,
+        total_visits=sum(visits_by_rep.values()),
+        unique_locations=unique_locs,
+        unique_reps=len(visits_by_rep),
         by_category=dict(by_cat),
         by_rep=by_rep_list,
     )
 
 
+async def _visited_locations(
+    session: AsyncSession,
+    period_start: date,
+    period_end: date,
+    rep_id: Optional[str],
+) -> Tuple[int, Dict[str, int]]:
+    """
+    Уникальные ТТ с визитами за период: всего и по сотрудникам.
+
+    Горячие месяцы — COUNT DISTINCT по visit_log; если часть периода в
+    холодном архиве, уникальность считается по парам (сотрудник, ТТ) из
+    visit_log и VisitArchive.visited_pairs — payload архива не распаковывается.
+    """
+    filters = [VisitLog.visited_date.between(period_start, period_end)]
+    if rep_id:
+        filters.append(VisitLog.rep_id == rep_id)
+    archived = (await session.execute(
+        select(VisitArchive.month, VisitArchive.visited_pairs)
+        .where(VisitArchive.month.between(period_start, period_end))
+    )).all()
+
+    if not archived:
+        total_q = select(func.count(distinct(VisitLog.location_id))).where(*filters)
+        rep_q = (
+            select(VisitLog.rep_id, func.count(distinct(VisitLog.location_id)))
+            .where(*filters)
+            .group_by(VisitLog.rep_id)
+        )
+        total = (await session.execute(total_q)).scalar()
+        return total, dict((await session.execute(rep_q)).all())
+
+    pairs = set((await session.execute(
+        select(VisitLog.rep_id, VisitLog.location_id).where(*filters).distinct()
+    )).all())
+    for _, visited_pairs in archived:
+        pairs.update(
+            (pair_rep_id, location_id) for pair_rep_id, location_id in visited_pairs or []
+            if not rep_id or pair_rep_id == rep_id
+        )
+    by_rep: Dict[str, int] = defaultdict(int)
+    for row_rep_id, _ in pairs:
+        by_rep[row_rep_id] += 1
+    return len({location_id for _, location_id in pairs}), dict(by_rep)
+
+
 @router.get("/", response_model=List[VisitResponse])
 async def list_visits(
     month: str = Query(..., description="Месяц YYYY-MM"),
     rep_id: Optional[str] = Query(None),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """История фактических визитов с фильтрами."""
     try:
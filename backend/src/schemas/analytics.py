@@ -0,0 +1,54 @@
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class RollupCounters(BaseModel):
+    planned: int = 0
+    completed: int = 0
+    skipped: int = 0
+    cancelled: int = 0
+    visits: int = 0
+    onsite_minutes: int = 0
+
+
+class MonthlyRollupItem(RollupCounters):
+    month: date
+    rep_id: str
+    category: str
+    district: str
+    unique_tt: int
+    visited_tt: int
+    updated_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class MonthlyRollupResponse(BaseModel):
+    month_from: str
+    month_to: str
+    totals: RollupCounters
+    by_rep: Dict[str, RollupCounters]
+    by_category: Dict[str, RollupCounters]
+    groups: List[MonthlyRollupItem]
+
+
+class RollupRebuildResponse(BaseModel):
+    month: Optional[str]
+    groups: int
+
+
+class DurationQuantilesGroup(BaseModel):
+    key: Optional[str]
+    count: int
+    min: Optional[float]
+    max: Optional[float]
+    quantiles: Dict[str, Optional[float]]
+
+
+class DurationQuantilesResponse(BaseModel):
+    month_from: str
+    month_to: str
+    group_by: Optional[str]
+    groups: List[DurationQuantilesGroup]
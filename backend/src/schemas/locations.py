@@ -50,6 +50,8 @@ class UploadLocationsResponse(BaseModel):
     created: list[LocationResponse] = []
     errors: list[dict] = []
     skipped: list[str] = []
+    # Строки XLSX без координат: {row, name, confidence, method, matched}
+    geocoded: list[dict] = []
     total_processed: int = 0
 
 
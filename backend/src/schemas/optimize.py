@@ -51,8 +51,10 @@ class RouteVariant(BaseModel):
 
 class OptimizeVariantsRequest(BaseModel):
     location_ids: List[str]
-    model: str = "qwen"           # только одна модель за раз
+    model: str = "qwen"           # только одна модель за раз; auto — по латентности
     constraints: Optional[Dict] = Field(default_factory=dict)
+    # SLO ответа LLM для model="auto", мс (по умолчанию LLM_LATENCY_SLO_MS)
+    latency_slo_ms: Optional[int] = Field(default=None, gt=0)
 
 
 class OptimizeVariantsResponse(BaseModel):
@@ -30,6 +30,8 @@ class VisitResponse(BaseModel):
 
 class VisitStats(BaseModel):
     month: str
+    month_to: Optional[str] = None
+    rep_id: Optional[str] = None
     total_visits: int
     unique_locations: int
     unique_reps: int
@@ -0,0 +1,336 @@
+"""
+Месячные сводки визитов (таблица monthly_visit_rollup).
+
+Ключ сводки — (месяц, сотрудник, категория ТТ, район). Пересчёт идёт
+по паре (месяц, сотрудник): её строки плана и журнала визитов — это
+сотни записей по индексу rep_id + дата, поэтому сводку можно обновлять
+в той же транзакции, что меняет визиты (update_visit_status, импорт
+Excel, форс-мажор, генерация плана, CRUD-роутеры таблиц, удаление
+сотрудника или ТТ, смена категории/района ТТ), до commit. Так сводка никогда
+не расходится с сырыми таблицами, а уникальные ТТ считаются точно.
+
+Полная пересборка из сырых таблиц:
+    python -m src.services.analytics_rollup              # все месяцы
+    python -m src.services.analytics_rollup --month 2026-03
+"""
+
+import argparse
+import asyncio
+import logging
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date, datetime, time, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import ColumnElement, delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import (
+    Location,
+    MonthlyVisitRollup,
+    VisitArchive,
+    VisitLog,
+    VisitSchedule,
+)
+from src.utils.tdigest import TDigest, merge_digests
+
+logger = logging.getLogger("analytics_rollup")
+
+NO_CATEGORY = "?"
+NO_DISTRICT = ""
+
+# Статусы плана, для которых в сводке есть отдельный счётчик
+COUNTED_STATUSES = ("completed", "skipped", "cancelled")
+
+RollupKey = Tuple[date, str]  # (1-е число месяца, rep_id)
+
+
+def month_of(day: date) -> date:
+    return day.replace(day=1)
+
+
+def month_bounds(month: date) -> Tuple[date, date]:
+    _, last_day = monthrange(month.year, month.month)
+    return month, date(month.year, month.month, last_day)
+
+
+def parse_month(value: str) -> date:
+    """'YYYY-MM' → 1-е число месяца; ValueError при неверном формате."""
+    year, m = map(int, value.split("-"))
+    return date(year, m, 1)
+
+
+def onsite_minutes(time_in: Optional[time], time_out: Optional[time]) -> int:
+    """Минуты на точке; 0 если время не заполнено или некорректно."""
+    if not time_in or not time_out:
+        return 0
+    minutes = (time_out.hour * 60 + time_out.minute) - (time_in.hour * 60 + time_in.minute)
+    return minutes if minutes > 0 else 0
+
+
+def rollup_keys(*schedules: VisitSchedule) -> Set[RollupKey]:
+    """Пары (месяц, сотрудник), затронутые изменением визитов."""
+    return {
+        (month_of(s.planned_date), s.rep_id)
+        for s in schedules
+        if s is not None and s.planned_date and s.rep_id
+    }
+
+
+async def affected_rollup_keys(
+    session: AsyncSession,
+    schedule_where: ColumnElement[bool],
+    log_where: ColumnElement[bool],
+) -> Set[RollupKey]:
+    """
+    Пары (месяц, сотрудник) строк плана и журнала под условиями — собираются
+    до массового удаления/изменения, чтобы затем вызвать refresh_rollups.
+    """
+    keys: Set[RollupKey] = set()
+    for stmt in (
+        select(VisitSchedule.planned_date, VisitSchedule.rep_id).where(schedule_where).distinct(),
+        select(VisitLog.visited_date, VisitLog.rep_id).where(log_where).distinct(),
+    ):
+        for day, rep_id in (await session.execute(stmt)).all():
+            if day and rep_id:
+                keys.add((month_of(day), rep_id))
+    return keys
+
+
+def _group_key(category: Optional[str], district: Optional[str]) -> Tuple[str, str]:
+    return category or NO_CATEGORY, district or NO_DISTRICT
+
+
+async def _compute_groups(
+    session: AsyncSession, month: date, rep_id: str,
+) -> Dict[Tuple[str, str], dict]:
+    month_start, month_end = month_bounds(month)
+    groups: Dict[Tuple[str, str], dict] = defaultdict(lambda: {
+        "planned": 0, "completed": 0, "skipped": 0, "cancelled": 0,
+        "tt": set(), "visited": set(), "visits": 0, "onsite_minutes": 0,
+        "durations": [],
+    })
+
+    sched_rows = await session.execute(
+        select(
+            VisitSchedule.location_id,
+            VisitSchedule.status,
+            Location.category,
+            Location.district,
+        )
+        .outerjoin(Location, Location.id == VisitSchedule.location_id)
+        .where(
+            VisitSchedule.rep_id == rep_id,
+            VisitSchedule.planned_date.between(month_start, month_end),
+        )
+    )
+    for location_id, status, category, district in sched_rows.all():
+        group = groups[_group_key(category, district)]
+        group["planned"] += 1
+        if status in COUNTED_STATUSES:
+            group[status] += 1
+        group["tt"].add(location_id)
+
+    log_rows = await session.execute(
+        select(
+            VisitLog.location_id,
+            VisitLog.time_in,
+            VisitLog.time_out,
+            Location.category,
+            Location.district,
+        )
+        .outerjoin(Location, Location.id == VisitLog.location_id)
+        .where(
+            VisitLog.rep_id == rep_id,
+            VisitLog.visited_date.between(month_start, month_end),
+        )
+    )
+    for location_id, time_in, time_out, category, district in log_rows.all():
+        group = groups[_group_key(category, district)]
+        group["visits"] += 1
+        group["visited"].add(location_id)
+        minutes = onsite_minutes(time_in, time_out)
+        group["onsite_minutes"] += minutes
+        if minutes:
+            group["durations"].append(minutes)
+
+    return groups
+
+
+async def refresh_rollups(session: AsyncSession, keys: Iterable[RollupKey]) -> int:
+    """
+    Пересчитывает сводки для пар (месяц, сотрудник) внутри текущей транзакции.
+
+    Commit остаётся за вызывающим кодом. Возвращает кол-во записанных групп.
+    """
+    keys = set(keys)
+    if not keys:
+        return 0
+    # Архивные месяцы (src/services/archive.py) — сырых строк нет, сводки не трогаем
+    archived = set((await session.execute(
+        select(VisitArchive.month).where(VisitArchive.month.in_({m for m, _ in keys}))
+    )).scalars())
+    keys = sorted(key for key in keys if key[0] not in archived)
+    if not keys:
+        return 0
+    # Изменения визитов в сессии должны попасть в агрегирующие запросы
+    await session.flush()
+
+    now = datetime.now(timezone.utc)
+    written = 0
+    for month, rep_id in keys:
+        groups = await _compute_groups(session, month, rep_id)
+        await session.execute(
+            delete(MonthlyVisitRollup).where(
+                MonthlyVisitRollup.month == month,
+                MonthlyVisitRollup.rep_id == rep_id,
+            )
+        )
+        for (category, district), g in groups.items():
+            session.add(MonthlyVisitRollup(
+                month=month,
+                rep_id=rep_id,
+                category=category,
+                district=district,
+                planned=g["planned"],
+                completed=g["completed"],
+                skipped=g["skipped"],
+                cancelled=g["cancelled"],
+                unique_tt=len(g["tt"]),
+                visited_tt=len(g["visited"]),
+                visits=g["visits"],
+                onsite_minutes=g["onsite_minutes"],
+                duration_digest=(
+                    TDigest.from_values(g["durations"]).to_dict()
+                    if g["durations"] else None
+                ),
+                updated_at=now,
+            ))
+        written += len(groups)
+    await session.flush()
+    return written
+
+
+async def rebuild_rollups(session: AsyncSession, month: Optional[date] = None) -> int:
+    """Пересобирает сводки из сырых таблиц: за месяц или целиком."""
+    sched_q = select(VisitSchedule.planned_date, VisitSchedule.rep_id).distinct()
+    log_q = select(VisitLog.visited_date, VisitLog.rep_id).distinct()
+    wipe = delete(MonthlyVisitRollup).where(
+        MonthlyVisitRollup.month.not_in(select(VisitArchive.month))
+    )
+    if month is not None:
+        month_start, month_end = month_bounds(month)
+        sched_q = sched_q.where(VisitSchedule.planned_date.between(month_start, month_end))
+        log_q = log_q.where(VisitLog.visited_date.between(month_start, month_end))
+        wipe = wipe.where(MonthlyVisitRollup.month == month_start)
+
+    keys: Set[RollupKey] = set()
+    for day, rep_id in (await session.execute(sched_q)).all():
+        keys.add((month_of(day), rep_id))
+    for day, rep_id in (await session.execute(log_q)).all():
+        keys.add((month_of(day), rep_id))
+
+    await session.execute(wipe)
+    written = await refresh_rollups(session, keys)
+    logger.info(
+        "Rollups rebuilt: month=%s pairs=%d groups=%d",
+        month.isoformat() if month else "all", len(keys), written,
+    )
+    return written
+
+
+async def load_rollups(
+    session: AsyncSession,
+    month_from: date,
+    month_to: date,
+    rep_id: Optional[str] = None,
+) -> List[MonthlyVisitRollup]:
+    stmt = select(MonthlyVisitRollup).where(
+        MonthlyVisitRollup.month.between(month_from, month_to),
+    )
+    if rep_id:
+        stmt = stmt.where(MonthlyVisitRollup.rep_id == rep_id)
+    stmt = stmt.order_by(
+        MonthlyVisitRollup.month,
+        MonthlyVisitRollup.rep_id,
+        MonthlyVisitRollup.category,
+        MonthlyVisitRollup.district,
+    )
+    return list((await session.execute(stmt)).scalars().all())
+
+
+async def load_duration_quantiles(
+    session: AsyncSession,
+    month_from: date,
+    month_to: date,
+    quantiles: Iterable[float],
+    group_by: Optional[str] = None,
+    rep_id: Optional[str] = None,
+    category: Optional[str] = None,
+    district: Optional[str] = None,
+) -> List[dict]:
+    """
+    Квантили длительности визитов за диапазон месяцев.
+
+    Читает только скетчи сводок и сливает их по group_by
+    (rep_id | category | district | None — общий итог).
+    """
+    group_col = getattr(MonthlyVisitRollup, group_by) if group_by else None
+    stmt = select(
+        group_col if group_col is not None else MonthlyVisitRollup.month,
+        MonthlyVisitRollup.duration_digest,
+    ).where(
+        MonthlyVisitRollup.month.between(month_from, month_to),
+        MonthlyVisitRollup.duration_digest.is_not(None),
+    )
+    if rep_id:
+        stmt = stmt.where(MonthlyVisitRollup.rep_id == rep_id)
+    if category:
+        stmt = stmt.where(MonthlyVisitRollup.category == category)
+    if district is not None:
+        stmt = stmt.where(MonthlyVisitRollup.district == district)
+
+    digests: Dict[Optional[str], List[dict]] = defaultdict(list)
+    for key, digest in (await session.execute(stmt)).all():
+        digests[key if group_by else None].append(digest)
+
+    quantiles = list(quantiles)
+    result = []
+    for key in sorted(digests, key=lambda k: (k is None, k or "")):
+        merged = merge_digests(digests[key])
+        result.append({
+            "key": key,
+            "count": len(merged),
+            "min": merged.min,
+            "max": merged.max,
+            "quantiles": {q: round(merged.quantile(q), 1) for q in quantiles},
+        })
+    return result
+
+
+async def _rebuild_cli(month: Optional[date]) -> int:
+    from src.database.models import engine, new_session
+
+    try:
+        async with new_session() as session:
+            written = await rebuild_rollups(session, month)
+            await session.commit()
+    finally:
+        await engine.dispose()
+    return written
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Пересборка месячных сводок визитов")
+    parser.add_argument("--month", default=None, help="Месяц YYYY-MM (по умолчанию — все)")
+    args = parser.parse_args()
+
+    month = parse_month(args.month) if args.month else None
+    written = asyncio.run(_rebuild_cli(month))
+    print(f"Rollup groups written: {written}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(main())
@@ -0,0 +1,426 @@
+"""
+Холодный архив закрытых месяцев (таблица visit_archive).
+
+Месяцы старше ARCHIVE_HORIZON_MONTHS переносятся из visit_schedule /
+visit_log в архив: план и журнал месяца — один JSON, сжатый zlib.
+Горячие таблицы (и их индексы) остаются только с рабочими месяцами;
+на PostgreSQL секции месяца удаляются целиком (src/database/partitions.py).
+
+Чтение насквозь: /schedule/, /export/schedule и /insights для
+архивного месяца берут строки из load_archived_month — это
+несохраняемые ORM-объекты VisitSchedule / VisitLog с подгруженными
+location и rep, так что код ответа не меняется. Для горячих месяцев
+проверка архива — один поиск по первичному ключу.
+
+Архивный месяц только читается: запись в него (генерация плана, визиты,
+импорт, переносы) отклоняется через ensure_hot_months — иначе новые
+горячие строки были бы скрыты чтением из архива. Чтобы изменить
+месяц — restore.
+Месячные сводки (monthly_visit_rollup) в архиве не нуждаются и остаются.
+
+Ссылки из горячих месяцев на план архивного (visit_log.schedule_id у
+визита, отмеченного в следующем месяце; schedule_id записей стеша)
+обнуляются, а в архив пишутся как links — restore ставит их обратно.
+
+    python -m src.services.archive run [--horizon 12]
+    python -m src.services.archive month --month 2024-01
+    python -m src.services.archive restore --month 2024-01
+    python -m src.services.archive list
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import zlib
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, not_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from src.database.models import (
+    Location,
+    SalesRep,
+    SkippedVisitStash,
+    VisitArchive,
+    VisitLog,
+    VisitSchedule,
+)
+from src.database.partitions import drop_month, ensure_partitions, is_partitioned
+from src.services.analytics_rollup import month_bounds, month_of
+
+logger = logging.getLogger("archive")
+
+SCHEDULE_FIELDS = ("id", "location_id", "rep_id", "planned_date", "status", "created_at")
+LOG_FIELDS = (
+    "id", "schedule_id", "location_id", "rep_id", "visited_date",
+    "time_in", "time_out", "notes", "created_at",
+)
+_DATE_FIELDS = {"planned_date", "visited_date"}
+_TIME_FIELDS = {"time_in", "time_out"}
+_DATETIME_FIELDS = {"created_at"}
+
+# Ссылка на план архивного месяца из другого месяца: (таблица, id строки, колонка, schedule_id)
+Link = Tuple[str, str, str, str]
+_LINK_MODELS = {model.__tablename__: model for model in (VisitLog, SkippedVisitStash)}
+
+
+class ArchiveError(ValueError):
+    """Месяц нельзя заархивировать или восстановить."""
+
+
+class ArchivedMonthError(ArchiveError):
+    """Запись в архивный месяц (роуты отвечают 409)."""
+
+
+@dataclass
+class ArchivedMonth:
+    month: date
+    schedules: List[VisitSchedule] = field(default_factory=list)
+    logs: List[VisitLog] = field(default_factory=list)
+    links: List[Link] = field(default_factory=list)
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, (date, time)):  # datetime — подкласс date
+        return value.isoformat()
+    return value
+
+
+def _decode_value(name: str, value: Any) -> Any:
+    if value is None:
+        return None
+    if name in _DATE_FIELDS:
+        return date.fromisoformat(value)
+    if name in _TIME_FIELDS:
+        return time.fromisoformat(value)
+    if name in _DATETIME_FIELDS:
+        return datetime.fromisoformat(value)
+    return value
+
+
+def pack_month(
+    schedules: Sequence[VisitSchedule],
+    logs: Sequence[VisitLog],
+    links: Sequence[Link] = (),
+) -> bytes:
+    """План и журнал месяца → JSON (строки — списки значений полей); сжатие — у вызывающего."""
+    data = {
+        "schedule_fields": SCHEDULE_FIELDS,
+        "schedules": [[_encode_value(getattr(s, f)) for f in SCHEDULE_FIELDS] for s in schedules],
+        "log_fields": LOG_FIELDS,
+        "logs": [[_encode_value(getattr(lg, f)) for f in LOG_FIELDS] for lg in logs],
+        "links": [list(link) for link in links],
+    }
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def unpack_month(payload: bytes) -> tuple[List[VisitSchedule], List[VisitLog], List[Link]]:
+    """
+    Обратное к pack_month (после zlib.decompress) — несохраняемые ORM-объекты
+    и ссылки из других месяцев (в архивах до их появления — пусто).
+    """
+    data = json.loads(payload)
+
+    def build(model, fields, rows):
+        return [
+            model(**{f: _decode_value(f, v) for f, v in zip(fields, row)})
+            for row in rows
+        ]
+
+    return (
+        build(VisitSchedule, data["schedule_fields"], data["schedules"]),
+        build(VisitLog, data["log_fields"], data["logs"]),
+        [tuple(link) for link in data.get("links", [])],
+    )
+
+
+def archive_cutoff(horizon_months: int, today: Optional[date] = None) -> date:
+    """Первый горячий месяц: текущий и horizon_months - 1 предыдущих остаются."""
+    month = month_of(today or date.today())
+    index = month.year * 12 + month.month - 1 - max(horizon_months - 1, 0)
+    return date(index // 12, index % 12 + 1, 1)
+
+
+async def is_archived(session: AsyncSession, month: date) -> bool:
+    return await session.get(VisitArchive, month_of(month)) is not None
+
+
+async def archived_months(session: AsyncSession, days: Iterable[Optional[date]]) -> List[date]:
+    """Архивные месяцы среди месяцев указанных дней."""
+    months = {month_of(day) for day in days if day is not None}
+    if not months:
+        return []
+    return sorted((await session.execute(
+        select(VisitArchive.month).where(VisitArchive.month.in_(months))
+    )).scalars())
+
+
+async def ensure_hot_months(session: AsyncSession, days: Iterable[Optional[date]]) -> None:
+    """ArchivedMonthError, если какой-то день попадает в архивный месяц."""
+    archived = await archived_months(session, days)
+    if archived:
+        names = ", ".join(f"{month:%Y-%m}" for month in archived)
+        raise ArchivedMonthError(
+            f"Месяц {names} в архиве — изменения только после restore "
+            f"(python -m src.services.archive restore --month {archived[0]:%Y-%m})"
+        )
+
+
+async def load_archived_month(session: AsyncSession, month: date) -> Optional[ArchivedMonth]:
+    """Строки архивного месяца или None, если месяц горячий."""
+    archive = (await session.execute(
+        select(VisitArchive).where(VisitArchive.month == month_of(month))
+    )).scalar_one_or_none()
+    if archive is None:
+        return None
+
+    schedules, logs, links = unpack_month(zlib.decompress(archive.payload))
+
+    # Справочники остаются горячими; связи ставим без событий ORM,
+    # чтобы объекты архива не попали в сессию
+    loc_ids = {s.location_id for s in schedules} | {lg.location_id for lg in logs}
+    rep_ids = {s.rep_id for s in schedules} | {lg.rep_id for lg in logs}
+    locations = {
+        loc.id: loc for loc in (await session.execute(
+            select(Location).where(Location.id.in_(loc_ids))
+        )).scalars()
+    } if loc_ids else {}
+    reps = {
+        rep.id: rep for rep in (await session.execute(
+            select(SalesRep).where(SalesRep.id.in_(rep_ids))
+        )).scalars()
+    } if rep_ids else {}
+    for item in [*schedules, *logs]:
+        set_committed_value(item, "location", locations.get(item.location_id))
+        set_committed_value(item, "rep", reps.get(item.rep_id))
+
+    return ArchivedMonth(month=archive.month, schedules=schedules, logs=logs, links=links)
+
+
+def _month_schedule_ids(month_start: date, month_end: date):
+    return select(VisitSchedule.id).where(
+        VisitSchedule.planned_date.between(month_start, month_end)
+    )
+
+
+async def _external_links(session: AsyncSession, month: date) -> List[Link]:
+    """Ссылки строк других месяцев на план месяца — их обнулит _remove_hot_month."""
+    month_start, month_end = month_bounds(month)
+    schedule_ids = _month_schedule_ids(month_start, month_end)
+    queries = [(
+        VisitLog.schedule_id,
+        select(VisitLog.id, VisitLog.schedule_id).where(
+            VisitLog.schedule_id.in_(schedule_ids),
+            not_(VisitLog.visited_date.between(month_start, month_end)),
+        ),
+    )]
+    for column in (SkippedVisitStash.visit_schedule_id, SkippedVisitStash.resolved_schedule_id):
+        queries.append((
+            column, select(SkippedVisitStash.id, column).where(column.in_(schedule_ids)),
+        ))
+
+    links: List[Link] = []
+    for column, stmt in queries:
+        for row_id, schedule_id in (await session.execute(stmt.order_by(column))).all():
+            links.append((column.table.name, row_id, column.key, schedule_id))
+    return links
+
+
+async def _restore_links(session: AsyncSession, links: Sequence[Link]) -> None:
+    """Возвращает ссылки, если строка ещё есть и колонку с тех пор не переназначили."""
+    for table, row_id, column, schedule_id in links:
+        model = _LINK_MODELS[table]
+        await session.execute(
+            update(model)
+            .where(model.id == row_id, getattr(model, column).is_(None))
+            .values({column: schedule_id})
+        )
+
+
+async def _remove_hot_month(session: AsyncSession, month: date) -> None:
+    month_start, month_end = month_bounds(month)
+    # Ссылки обнуляются до DROP секций: подзапрос должен ещё видеть план месяца
+    schedule_ids = _month_schedule_ids(month_start, month_end)
+    await session.execute(
+        update(VisitLog).where(VisitLog.schedule_id.in_(schedule_ids)).values(schedule_id=None)
+    )
+    for column in (SkippedVisitStash.visit_schedule_id, SkippedVisitStash.resolved_schedule_id):
+        await session.execute(
+            update(SkippedVisitStash).where(column.in_(schedule_ids)).values({column: None})
+        )
+
+    conn = await session.connection()
+    if await conn.run_sync(is_partitioned, "visit_schedule"):
+        # Секции месяца — DROP; строки из DEFAULT удалит DELETE ниже
+        await conn.run_sync(drop_month, month_start)
+    await session.execute(
+        delete(VisitLog).where(VisitLog.visited_date.between(month_start, month_end))
+    )
+    await session.execute(
+        delete(VisitSchedule).where(VisitSchedule.planned_date.between(month_start, month_end))
+    )
+
+
+async def archive_month(session: AsyncSession, month: date) -> VisitArchive:
+    """
+    Переносит месяц в архив внутри текущей транзакции (commit — за вызывающим).
+
+    ArchiveError — если месяц уже в архиве.
+    """
+    month_start, month_end = month_bounds(month_of(month))
+    if await is_archived(session, month_start):
+        raise ArchiveError(f"Месяц {month_start:%Y-%m} уже в архиве")
+
+    schedules = (await session.execute(
+        select(VisitSchedule)
+        .where(VisitSchedule.planned_date.between(month_start, month_end))
+        .order_by(
+            VisitSchedule.planned_date,
+            VisitSchedule.rep_id,
+            VisitSchedule.created_at,
+            VisitSchedule.id,
+        )
+    )).scalars().all()
+    logs = (await session.execute(
+        select(VisitLog)
+        .where(VisitLog.visited_date.between(month_start, month_end))
+        .order_by(VisitLog.visited_date, VisitLog.rep_id, VisitLog.id)
+    )).scalars().all()
+
+    links = await _external_links(session, month_start)
+    raw = pack_month(schedules, logs, links)
+    archive = VisitArchive(
+        month=month_start,
+        schedule_count=len(schedules),
+        log_count=len(logs),
+        raw_bytes=len(raw),
+        payload=zlib.compress(raw, 9),
+        visited_pairs=[list(pair) for pair in sorted({(lg.rep_id, lg.location_id) for lg in logs})],
+    )
+    for item in [*logs, *schedules]:
+        session.expunge(item)
+    await _remove_hot_month(session, month_start)
+    session.add(archive)
+    await session.flush()
+    logger.info(
+        "Archived %s: schedules=%d logs=%d bytes=%d→%d",
+        month_start.strftime("%Y-%m"), archive.schedule_count, archive.log_count,
+        archive.raw_bytes, len(archive.payload),
+    )
+    return archive
+
+
+async def restore_month(session: AsyncSession, month: date) -> ArchivedMonth:
+    """Возвращает архивный месяц в горячие таблицы (commit — за вызывающим)."""
+    archive = await session.get(VisitArchive, month_of(month))
+    if archive is None:
+        raise ArchiveError(f"Месяц {month_of(month):%Y-%m} не в архиве")
+
+    schedules, logs, links = unpack_month(zlib.decompress(archive.payload))
+    # Секции месяца были удалены при архивации — создаём заново
+    conn = await session.connection()
+    await conn.run_sync(ensure_partitions, 0, archive.month)
+    session.add_all(schedules)
+    await session.flush()
+    session.add_all(logs)
+    await session.delete(archive)
+    await session.flush()
+    await _restore_links(session, links)
+    return ArchivedMonth(month=archive.month, schedules=schedules, logs=logs, links=links)
+
+
+async def archive_closed_months(
+    session: AsyncSession,
+    horizon_months: int,
+    today: Optional[date] = None,
+) -> List[date]:
+    """
+    Архивирует все месяцы с горячими данными раньше горизонта.
+
+    Каждый месяц — в своей транзакции (commit внутри).
+    """
+    cutoff = archive_cutoff(horizon_months, today)
+    days = set((await session.execute(
+        select(VisitSchedule.planned_date).where(VisitSchedule.planned_date < cutoff).distinct()
+    )).scalars())
+    days |= set((await session.execute(
+        select(VisitLog.visited_date).where(VisitLog.visited_date < cutoff).distinct()
+    )).scalars())
+
+    archived: List[date] = []
+    for month in sorted({month_of(d) for d in days}):
+        if await is_archived(session, month):
+            logger.warning(
+                "Month %s is archived but has hot rows, skipping", month.strftime("%Y-%m"),
+            )
+            continue
+        await archive_month(session, month)
+        await session.commit()
+        archived.append(month)
+    return archived
+
+
+async def list_archives(session: AsyncSession) -> List[Dict[str, Any]]:
+    rows = (await session.execute(
+        select(
+            VisitArchive.month,
+            VisitArchive.schedule_count,
+            VisitArchive.log_count,
+            VisitArchive.raw_bytes,
+            VisitArchive.archived_at,
+        ).order_by(VisitArchive.month)
+    )).all()
+    return [row._asdict() for row in rows]
+
+
+async def _cli(args: argparse.Namespace) -> None:
+    from src.config import settings
+    from src.database.models import engine, new_session
+    from src.services.analytics_rollup import parse_month
+
+    try:
+        async with new_session() as session:
+            if args.command == "run":
+                horizon = settings.archive_horizon_months if args.horizon is None else args.horizon
+                months = await archive_closed_months(session, horizon)
+                names = ", ".join(m.strftime("%Y-%m") for m in months)
+                print(f"Archived months: {names or 'none'}")
+            elif args.command == "month":
+                await archive_month(session, parse_month(args.month))
+                await session.commit()
+                print(f"Archived {args.month}")
+            elif args.command == "restore":
+                restored = await restore_month(session, parse_month(args.month))
+                await session.commit()
+                print(
+                    f"Restored {args.month}: {len(restored.schedules)} schedules, "
+                    f"{len(restored.logs)} logs"
+                )
+            else:
+                for item in await list_archives(session):
+                    print(f"{item['month']:%Y-%m}  schedules={item['schedule_count']}"
+                          f"  logs={item['log_count']}  raw_bytes={item['raw_bytes']}")
+    finally:
+        await engine.dispose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Архив закрытых месяцев визитов")
+    parser.add_argument("command", choices=["run", "month", "restore", "list"])
+    parser.add_argument("--month", help="Месяц YYYY-MM (для month/restore)")
+    parser.add_argument("--horizon", type=int, default=None,
+                        help="Сколько последних месяцев оставить горячими (run)")
+    args = parser.parse_args()
+    if args.command in ("month", "restore") and not args.month:
+        parser.error("--month обязателен для month/restore")
+    asyncio.run(_cli(args))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(main())
@@ -22,6 +22,8 @@ from src.services.schedule_planner import (
     VISIT_DURATION_MIN,
     _estimate_route_hours,
 )
+from src.services.analytics_rollup import refresh_rollups, rollup_keys
+from src.services.archive import ensure_hot_months
 
 logger = logging.getLogger("force_majeure")
 
@@ -127,6 +129,7 @@ class ForceMajeureService:
         affected_tt_ids = [s.location_id for s in affected_schedules]
 
         redistributed_to: List[Dict] = []
+        new_schedules: List[VisitSchedule] = []
 
         if affected_tt_ids:
             # --- 3. Активные сотрудники (кроме пострадавшего) ---
@@ -176,12 +179,14 @@ class ForceMajeureService:
                         continue
                     # Создаём новые плановые записи
                     for loc_id in loc_ids:
-                        self.db.add(VisitSchedule(
+                        new_sched = VisitSchedule(
                             location_id=loc_id,
                             rep_id=target_rep.id,
                             planned_date=target_date,
                             status="rescheduled",
-                        ))
+                        )
+                        self.db.add(new_sched)
+                        new_schedules.append(new_sched)
                     redistributed_to.append({
                         "rep_id": target_rep.id,
                         "rep_name": target_rep.name,
@@ -198,6 +203,10 @@ class ForceMajeureService:
             rep.status = "sick"
 
         # --- 6. Сохраняем событие ---
+        # Архивный месяц только читается: ArchivedMonthError → 409 в роуте
+        await ensure_hot_months(
+            self.db, [event_date, *(s.planned_date for s in new_schedules)]
+        )
         event = ForceMajeureEvent(
             type=fm_type,
             rep_id=rep_id,
@@ -208,6 +217,9 @@ class ForceMajeureService:
             return_time=return_time,
         )
         self.db.add(event)
+        await refresh_rollups(
+            self.db, rollup_keys(*affected_schedules, *new_schedules)
+        )
         await self.db.commit()
         await self.db.refresh(event)
 
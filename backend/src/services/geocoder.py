@@ -0,0 +1,262 @@
+"""
+Геокодер названий районов и населённых пунктов для импорта ТТ.
+
+Используется при загрузке XLSX без координат: строка сопоставляется
+со справочником (газеттиром) по нормализованным токенам.
+
+Схема:
+- нормализация: нижний регистр, ё → е, выбрасываем служебные слова
+  («район», «г.о.», «с.», «ул.» …) и числа;
+- стемминг: отрезаем типовые окончания («-ский», «-ово», «-ка» …),
+  поэтому «Ардатово», «Ардатовский р-н» и «ардатовский» дают один ключ;
+- индекс: dict по полному ключу + dict токен → записи + отсортированный
+  список токенов для поиска по префиксу (bisect, O(log n));
+- если ничего не найдено — детерминированный разброс вокруг центра
+  региона (хэш от названия), чтобы повторный импорт давал те же точки.
+
+Справочник Мордовии встроен; для других регионов его можно расширить
+JSON-файлом (settings.geocoder_gazetteer_path):
+    {"center": [lat, lon], "places": {"Название": [lat, lon], ...}}
+"""
+
+import bisect
+import hashlib
+import json
+import logging
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.config import settings
+
+logger = logging.getLogger("geocoder")
+
+# Центр Саранска — запасные координаты если название не найдено в справочнике
+DEFAULT_CENTER: Tuple[float, float] = (54.1871, 45.1749)
+# Радиус детерминированного разброса вокруг центра (в градусах)
+FALLBACK_SPREAD_DEG = 0.02
+
+# Справочник координат районов и городов Республики Мордовия.
+# Варианты написания («… район», «дубёнский») покрываются нормализацией.
+MORDOVIA_GAZETTEER: Dict[str, Tuple[float, float]] = {
+    "г.о. Саранск":                (54.1871, 45.1749),
+    "Ардатовский район":           (54.8490, 46.2360),
+    "Атюрьевский район":           (54.0310, 43.6820),
+    "Атяшевский район":            (54.5980, 45.8880),
+    "Большеберезниковский район":  (54.2670, 45.7650),
+    "Большеигнатовский район":     (54.4810, 44.8710),
+    "Дубёнский район":             (54.2650, 46.0880),
+    "Ельниковский район":          (54.3900, 43.5550),
+    "Зубово-Полянский район":      (54.0520, 42.8310),
+    "Инсарский район":             (53.8760, 44.3770),
+    "Ичалковский район":           (54.1260, 46.5840),
+    "Кадошкинский район":          (54.0200, 43.5360),
+    "Ковылкинский район":          (53.9060, 43.9190),
+    "Кочкуровский район":          (54.0500, 45.5710),
+    "Краснослободский район":      (54.4190, 43.7770),
+    "Лямбирский район":            (54.2350, 45.6250),
+    "Ромодановский район":         (54.4300, 45.3710),
+    "Рузаевский район":            (54.0570, 44.9520),
+    "Старошайговский район":       (54.3500, 44.2580),
+    "Темниковский район":          (54.6360, 43.1990),
+    "Теньгушевский район":         (54.8440, 43.6140),
+    "Торбеевский район":           (54.0880, 43.0920),
+    "Чамзинский район":            (54.2310, 46.2890),
+}
+
+# Служебные слова адресов — не несут информации о месте
+_STOPWORDS = frozenset({
+    "г", "о", "го", "гор", "город", "городской", "округ",
+    "р", "н", "рн", "район", "муниципальный", "мо",
+    "с", "село", "д", "деревня", "п", "пос", "поселок", "рп", "пгт",
+    "ул", "улица", "пр", "просп", "проспект", "пер", "переулок",
+    "дом", "кв", "стр", "корп",
+    "обл", "область", "респ", "республика", "рм", "мордовия",
+})
+
+# Окончания, которые отрезаем при стемминге (длинные — первыми)
+_SUFFIXES: Tuple[str, ...] = (
+    "ского", "скому", "ским", "ских", "ском", "ской", "скую",
+    "ский", "ская", "ское", "ские", "ск",
+    "ого", "ому", "ими", "ыми",
+    "ий", "ый", "ой", "ая", "яя", "ое", "ее", "ые", "ие", "ых", "их",
+    "ом", "ем", "ка", "ки", "ку", "ке",
+    "а", "о", "е", "у", "ы", "и", "я", "ь", "й",
+)
+_MIN_STEM_LEN = 4
+_STEM_PASSES = 2
+_MIN_PREFIX_LEN = 4
+
+# Уверенность по способу сопоставления
+CONFIDENCE_EXACT = 1.0
+CONFIDENCE_TOKEN_BASE = 0.5
+CONFIDENCE_TOKEN_SPAN = 0.4
+CONFIDENCE_PREFIX = 0.4
+CONFIDENCE_FALLBACK = 0.0
+
+_TOKEN_RE = re.compile(r"[a-zа-я]+")
+
+
+@dataclass(frozen=True)
+class GeocodeResult:
+    """Результат геокодирования одной строки."""
+
+    lat: float
+    lon: float
+    confidence: float
+    method: str               # exact | token | prefix | fallback
+    matched: Optional[str]    # каноническое название из справочника
+
+    def as_dict(self) -> dict:
+        return {
+            "lat": self.lat,
+            "lon": self.lon,
+            "confidence": self.confidence,
+            "method": self.method,
+            "matched": self.matched,
+        }
+
+
+def _stem(token: str) -> str:
+    for _ in range(_STEM_PASSES):
+        for suffix in _SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= _MIN_STEM_LEN:
+                token = token[: -len(suffix)]
+                break
+        else:
+            break
+    return token
+
+
+def normalize_tokens(name: str) -> List[str]:
+    """Название → список стемов без служебных слов (порядок сохраняется)."""
+    text = (name or "").lower().replace("ё", "е")
+    stems: List[str] = []
+    for token in _TOKEN_RE.findall(text):
+        if token in _STOPWORDS:
+            continue
+        stem = _stem(token)
+        if stem not in stems:
+            stems.append(stem)
+    return stems
+
+
+class Geocoder:
+    """Индекс справочника: полный ключ, токены и префиксы."""
+
+    def __init__(
+        self,
+        places: Dict[str, Tuple[float, float]],
+        center: Tuple[float, float] = DEFAULT_CENTER,
+    ):
+        self.center = center
+        self._by_key: Dict[str, Tuple[str, Tuple[float, float]]] = {}
+        self._by_token: Dict[str, List[str]] = {}
+        self._entry_tokens: Dict[str, Tuple[str, ...]] = {}
+        for name, coords in places.items():
+            self._index(name, coords)
+        self._sorted_tokens: List[str] = sorted(self._by_token)
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def add(self, name: str, coords: Iterable[float]) -> None:
+        self._index(name, coords)
+        self._sorted_tokens = sorted(self._by_token)
+
+    def _index(self, name: str, coords: Iterable[float]) -> None:
+        tokens = normalize_tokens(name)
+        if not tokens:
+            return
+        lat, lon = (float(c) for c in coords)
+        key = " ".join(tokens)
+        # Более поздняя запись (например, из файла региона) перекрывает встроенную
+        self._by_key[key] = (name, (lat, lon))
+        self._entry_tokens[key] = tuple(tokens)
+        for token in tokens:
+            keys = self._by_token.setdefault(token, [])
+            if key not in keys:
+                keys.append(key)
+
+    def lookup(self, name: str) -> Optional[GeocodeResult]:
+        """Ищет название в справочнике; None — если совпадений нет."""
+        tokens = normalize_tokens(name)
+        if not tokens:
+            return None
+
+        key = " ".join(tokens)
+        if key in self._by_key:
+            return self._result(key, CONFIDENCE_EXACT, "exact")
+
+        # Запись подходит, если все её токены присутствуют в строке
+        query = set(tokens)
+        candidates = {k for t in tokens for k in self._by_token.get(t, ())}
+        full = [k for k in candidates if query.issuperset(self._entry_tokens[k])]
+        if full:
+            best = min(full, key=lambda k: (-len(self._entry_tokens[k]), k))
+            coverage = len(self._entry_tokens[best]) / len(query)
+            confidence = CONFIDENCE_TOKEN_BASE + CONFIDENCE_TOKEN_SPAN * coverage
+            return self._result(best, round(confidence, 2), "token")
+
+        # Усечённые названия: «Ардат.» → ардатов…
+        for token in tokens:
+            if len(token) < _MIN_PREFIX_LEN:
+                continue
+            idx = bisect.bisect_left(self._sorted_tokens, token)
+            if idx < len(self._sorted_tokens) and self._sorted_tokens[idx].startswith(token):
+                best = min(self._by_token[self._sorted_tokens[idx]])
+                return self._result(best, CONFIDENCE_PREFIX, "prefix")
+        return None
+
+    def geocode(self, name: str) -> GeocodeResult:
+        """Как lookup, но без совпадения возвращает детерминированную точку у центра."""
+        return self.lookup(name) or self.fallback(name)
+
+    def fallback(self, name: str) -> GeocodeResult:
+        seed = " ".join(normalize_tokens(name)) or (name or "").strip().lower()
+        digest = hashlib.blake2b(seed.encode("utf-8"), digest_size=8).digest()
+        u_lat = int.from_bytes(digest[:4], "big") / 0xFFFFFFFF
+        u_lon = int.from_bytes(digest[4:], "big") / 0xFFFFFFFF
+        return GeocodeResult(
+            lat=round(self.center[0] + (u_lat * 2 - 1) * FALLBACK_SPREAD_DEG, 6),
+            lon=round(self.center[1] + (u_lon * 2 - 1) * FALLBACK_SPREAD_DEG, 6),
+            confidence=CONFIDENCE_FALLBACK,
+            method="fallback",
+            matched=None,
+        )
+
+    def _result(self, key: str, confidence: float, method: str) -> GeocodeResult:
+        name, (lat, lon) = self._by_key[key]
+        return GeocodeResult(
+            lat=lat, lon=lon, confidence=confidence, method=method, matched=name,
+        )
+
+
+def load_gazetteer_file(path: str | Path) -> Tuple[Optional[Tuple[float, float]], Dict[str, Tuple[float, float]]]:
+    """Читает JSON-справочник региона: {"center": [lat, lon], "places": {...}}."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    if not isinstance(data, dict) or not isinstance(data.get("places"), dict):
+        raise ValueError(f"Gazetteer file {path} must contain a 'places' object")
+    center = data.get("center")
+    places = {str(name): (float(c[0]), float(c[1])) for name, c in data["places"].items()}
+    return (tuple(center) if center else None), places
+
+
+@lru_cache(maxsize=1)
+def get_geocoder() -> Geocoder:
+    """Индекс строится один раз на процесс."""
+    places: Dict[str, Tuple[float, float]] = dict(MORDOVIA_GAZETTEER)
+    center = DEFAULT_CENTER
+    path = settings.geocoder_gazetteer_path
+    if path:
+        try:
+            file_center, file_places = load_gazetteer_file(path)
+            places.update(file_places)
+            if file_center:
+                center = (float(file_center[0]), float(file_center[1]))
+            logger.info("Gazetteer %s loaded: %d places", path, len(file_places))
+        except (OSError, ValueError) as exc:
+            logger.warning("Could not load gazetteer %s: %s", path, exc)
+    return Geocoder(places, center=center)
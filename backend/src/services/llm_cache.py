@@ -0,0 +1,205 @@
+"""
+Кэш ответов локальных LLM в таблице llm_result_cache.
+
+Промпт оценки вариантов (_construct_evaluation_prompt) зависит только от
+названий вариантов и округлённых метрик, поэтому повторное открытие того
+же дня даёт тот же промпт — и тот же ответ. Ключ — sha256 от версии
+кэша, модели, задачи и промпта с нормализованными пробелами.
+
+Попадание — один SELECT по первичному ключу и UPDATE счётчика: модель
+не загружается и инференс не запускается. Записи живут LLM_CACHE_TTL_S;
+при превышении LLM_CACHE_MAX_ENTRIES вытесняются давно не
+использованные. Пустые ответы (сбой модели) не кэшируются. Ошибка кэша
+не ломает запрос — оценка просто идёт через модель.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.database.models import LLMResultCache
+
+logger = logging.getLogger("llm_cache")
+
+# Меняется при смене формата промпта/ответа — старые записи перестают совпадать
+CACHE_VERSION = 1
+TASK_EVALUATE_VARIANTS = "evaluate_variants"
+
+
+class CacheStats:
+    """Счётчики кэша с запуска процесса (потокобезопасно)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.stores = 0
+            self.evictions = 0
+            self.errors = 0
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "errors": self.errors,
+            }
+
+
+cache_stats = CacheStats()
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split())
+
+
+def cache_key(model_id: str, task: str, prompt: str) -> str:
+    raw = "\x00".join((str(CACHE_VERSION), model_id, task, normalize_prompt(prompt)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def get_cached(
+    session: AsyncSession,
+    model_id: str,
+    task: str,
+    prompt: str,
+    now: Optional[datetime] = None,
+) -> Optional[Any]:
+    """Ответ из кэша или None; попадание обновляет hits и last_used_at (commit — за вызывающим)."""
+    now = now or datetime.now(timezone.utc)
+    key = cache_key(model_id, task, prompt)
+    result = (await session.execute(
+        select(LLMResultCache.result)
+        .where(LLMResultCache.key == key, LLMResultCache.expires_at > now)
+    )).scalar_one_or_none()
+    if result is None:
+        cache_stats.add(misses=1)
+        return None
+    await session.execute(
+        update(LLMResultCache)
+        .where(LLMResultCache.key == key)
+        .values(hits=LLMResultCache.hits + 1, last_used_at=now)
+    )
+    cache_stats.add(hits=1)
+    return result
+
+
+async def store(
+    session: AsyncSession,
+    model_id: str,
+    task: str,
+    prompt: str,
+    result: Any,
+    now: Optional[datetime] = None,
+) -> None:
+    """Сохраняет ответ и вытесняет истёкшие / лишние записи (commit — за вызывающим)."""
+    now = now or datetime.now(timezone.utc)
+    await session.merge(LLMResultCache(
+        key=cache_key(model_id, task, prompt),
+        model_id=model_id,
+        task=task,
+        result=result,
+        hits=0,
+        created_at=now,
+        expires_at=now + timedelta(seconds=settings.llm_cache_ttl_s),
+        last_used_at=now,
+    ))
+    await session.flush()
+    cache_stats.add(stores=1)
+    cache_stats.add(evictions=await evict(session, settings.llm_cache_max_entries, now))
+
+
+async def evict(session: AsyncSession, max_entries: int, now: Optional[datetime] = None) -> int:
+    """Удаляет истёкшие записи и самые давно использованные сверх max_entries."""
+    now = now or datetime.now(timezone.utc)
+    expired = (await session.execute(
+        delete(LLMResultCache).where(LLMResultCache.expires_at <= now)
+    )).rowcount or 0
+
+    total = (await session.execute(select(func.count()).select_from(LLMResultCache))).scalar() or 0
+    overflow = total - max_entries
+    if overflow <= 0:
+        return expired
+    oldest = select(LLMResultCache.key).order_by(
+        LLMResultCache.last_used_at, LLMResultCache.key,
+    ).limit(overflow)
+    evicted = (await session.execute(
+        delete(LLMResultCache).where(LLMResultCache.key.in_(oldest))
+    )).rowcount or 0
+    return expired + evicted
+
+
+async def _evaluate_with_model(client, variants, on_model_call) -> List[Dict[str, Any]]:
+    started = time.perf_counter()
+    evaluation = await client.evaluate_variants(variants)
+    if on_model_call is not None:
+        on_model_call((time.perf_counter() - started) * 1000, evaluation)
+    return evaluation
+
+
+async def evaluate_variants_cached(
+    session: AsyncSession,
+    client,
+    variants: List[Dict[str, Any]],
+    on_model_call: Optional[Callable[[float, List[Dict[str, Any]]], None]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    client.evaluate_variants с кэшем по (модель, промпт оценки).
+    on_model_call(латентность мс, ответ) вызывается, только если ответ дала модель.
+    """
+    if not variants or not settings.llm_cache_enabled:
+        return await _evaluate_with_model(client, variants, on_model_call)
+
+    prompt = client._construct_evaluation_prompt(variants)
+    try:
+        cached = await get_cached(session, client.model_name, TASK_EVALUATE_VARIANTS, prompt)
+        await session.commit()
+        if cached is not None:
+            return cached
+    except Exception as exc:
+        cache_stats.add(errors=1)
+        logger.warning("LLM cache lookup failed: %s", exc)
+        await session.rollback()
+
+    evaluation = await _evaluate_with_model(client, variants, on_model_call)
+    if evaluation:
+        try:
+            await store(session, client.model_name, TASK_EVALUATE_VARIANTS, prompt, evaluation)
+            await session.commit()
+        except Exception as exc:
+            cache_stats.add(errors=1)
+            logger.warning("LLM cache store failed: %s", exc)
+            await session.rollback()
+    return evaluation
+
+
+async def cache_status(session: AsyncSession) -> Dict[str, Any]:
+    """Счётчики процесса + размер таблицы — для /metrics/llm-cache."""
+    entries = (await session.execute(select(func.count()).select_from(LLMResultCache))).scalar() or 0
+    return {
+        **cache_stats.snapshot(),
+        "entries": entries,
+        "max_entries": settings.llm_cache_max_entries,
+        "ttl_s": settings.llm_cache_ttl_s,
+        "enabled": settings.llm_cache_enabled,
+    }
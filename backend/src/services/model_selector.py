@@ -1,45 +1,395 @@
 """
 Логика выбора модели для оптимизации маршрута (ML-6).
 
-Схема:
-- Primary: всегда qwen (QwenClient);
-- Fallback: llama (LlamaClient), если qwen недоступен
-или результат не устраивает.
+Каждый вызов LLM в /optimize/variants пишет в таблицу metrics строку с
+task="evaluate_variants": модель, число точек, латентность и качество
+ответа (доля вариантов, получивших pros и cons). По последним
+LLM_SELECTOR_WINDOW замерам на (модель, размер запроса) селектор держит
+скользящую статистику и для нового запроса предсказывает время ответа:
+p90 латентности корзины плюс ожидание в очереди инференса модели
+(глубина очереди × медиана).
 
-Этот модуль только объявляет primary (qwen). Фактический переход на llama
-происходит в клиентах/роутах при ошибках или деградации качества.
+Неудачные вызовы (качество 0: модель грузится, очередь полна, ошибка —
+обычно мгновенный []) в перцентили латентности не входят, иначе
+перегруженная модель выглядела бы самой быстрой; они учитываются
+только в success_rate и quality_avg.
+
+Выбор (model="auto"):
+- из моделей, у которых прогноз укладывается в SLO запроса
+  (LLM_LATENCY_SLO_MS или latency_slo_ms) и качество не ниже
+  LLM_SELECTOR_MIN_QUALITY, берётся самая быстрая;
+- модель без статистики (< LLM_SELECTOR_MIN_SAMPLES замеров) считается
+  допустимой — иначе статистика для неё никогда не появится; среди
+  таких приоритет у qwen;
+- если не подходит ни одна — слой LLM пропускается (варианты только
+  от алгоритмов).
+
+Решения (с прогнозами по всем моделям и фактической латентностью)
+хранятся в памяти процесса — контрфактический отчёт в
+/metrics/model-selection.
 """
 
-from typing import Optional
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.database.models import Metric
+
+logger = logging.getLogger(__name__)
 
 # Идентификаторы моделей, совпадают с роутами/клиентами: /qwen, /llama
 MODEL_QWEN = "qwen"
 MODEL_LLAMA = "llama"
+# Порядок — приоритет при отсутствии статистики
+MODELS = (MODEL_QWEN, MODEL_LLAMA)
+MODEL_AUTO = "auto"
 
-# Пороги и режимы оставлены на будущее (если логика станет сложнее)
+# Границы корзин размера запроса (число точек): small ≤ 20 < medium ≤ 100 < large
 THRESHOLD_SMALL = 20
 THRESHOLD_LARGE = 100
+# Корзина → (нижняя граница, не включая; верхняя, включая)
+SIZE_BUCKETS = {
+    "small": (None, THRESHOLD_SMALL),
+    "medium": (THRESHOLD_SMALL, THRESHOLD_LARGE),
+    "large": (THRESHOLD_LARGE, None),
+}
 
 CONSTRAINT_URGENT = "urgent"
 CONSTRAINT_QUALITY = "quality"
 CONSTRAINT_RELIABILITY = "reliability"
 
+TASK_EVALUATE_VARIANTS = "evaluate_variants"
+# Сколько решений держать для отчёта
+DECISION_LOG_SIZE = 500
+
+
+def size_bucket(num_locations: int) -> str:
+    if num_locations <= THRESHOLD_SMALL:
+        return "small"
+    if num_locations <= THRESHOLD_LARGE:
+        return "medium"
+    return "large"
+
+
+def _percentile(values: Sequence[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def bucket_stats(samples: List[Tuple[float, float]]) -> Dict[str, Any]:
+    """
+    Сводка по замерам [(латентность мс, качество 0–100)]. Перцентили —
+    только по успешным вызовам (качество > 0); без них — None.
+    """
+    latencies = [latency for latency, quality in samples if quality > 0]
+    qualities = [quality for _, quality in samples]
+    return {
+        "count": len(samples),
+        "successes": len(latencies),
+        "p50_ms": round(_percentile(latencies, 0.5), 1) if latencies else None,
+        "p90_ms": round(_percentile(latencies, 0.9), 1) if latencies else None,
+        "quality_avg": round(sum(qualities) / len(qualities), 1),
+        "success_rate": round(len(latencies) / len(qualities), 3),
+    }
+
+
+def _rank(
+    predictions: Dict[str, Optional[Dict[str, Any]]],
+    slo_ms: float,
+    time_constraint: Optional[str],
+) -> Tuple[Optional[str], str]:
+    """(модель или None, причина) по прогнозам моделей."""
+    fitting = [
+        model for model, p in predictions.items()
+        if p is not None
+        and p["predicted_ms"] is not None
+        and p["predicted_ms"] <= slo_ms
+        and p["quality_avg"] >= settings.llm_selector_min_quality
+    ]
+    unknown = [model for model, p in predictions.items() if p is None]
+
+    if fitting:
+        if time_constraint == CONSTRAINT_QUALITY:
+            model = max(
+                fitting,
+                key=lambda m: (predictions[m]["quality_avg"], -predictions[m]["predicted_ms"]),
+            )
+            return model, "лучшее качество среди моделей в пределах SLO"
+        if time_constraint == CONSTRAINT_RELIABILITY:
+            model = max(
+                fitting,
+                key=lambda m: (predictions[m]["success_rate"], -predictions[m]["predicted_ms"]),
+            )
+            return model, "наибольшая доля успешных ответов в пределах SLO"
+        fastest = min(fitting, key=lambda m: predictions[m]["predicted_ms"])
+        return fastest, "самая быстрая модель в пределах SLO"
+    if unknown:
+        return unknown[0], "мало замеров — модель пробуется для накопления статистики"
+    return None, "ни одна модель не укладывается в SLO — только алгоритмы"
+
+
+def request_slo_ms(slo_ms: Optional[float], time_constraint: Optional[str]) -> float:
+    slo_ms = float(slo_ms or settings.llm_latency_slo_ms)
+    return slo_ms / 2 if time_constraint == CONSTRAINT_URGENT else slo_ms
+
+
+class ModelSelector:
+    """Скользящая статистика по (модель, корзина) и журнал решений (потокобезопасно)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+            self._refreshed_at: Optional[float] = None
+            self._decisions: deque = deque(maxlen=DECISION_LOG_SIZE)
+
+    # ── Статистика ──────────────────────────────────────────────────────────
+
+    def load_samples(self, rows: List[Tuple[str, int, float, float]]) -> None:
+        """rows: (модель, число точек, латентность мс, качество), новые первыми."""
+        grouped: Dict[Tuple[str, str], List[Tuple[float, float]]] = {}
+        for model, num_locations, latency_ms, quality in rows:
+            samples = grouped.setdefault((model, size_bucket(num_locations)), [])
+            if len(samples) < settings.llm_selector_window:
+                samples.append((float(latency_ms), float(quality)))
+        with self._lock:
+            self._stats = {key: bucket_stats(samples) for key, samples in grouped.items()}
+            self._refreshed_at = time.monotonic()
+
+    def is_stale(self) -> bool:
+        with self._lock:
+            refreshed_at = self._refreshed_at
+        if refreshed_at is None:
+            return True
+        return time.monotonic() - refreshed_at > settings.llm_selector_refresh_s
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {f"{model}/{bucket}": dict(s) for (model, bucket), s in self._stats.items()}
+
+    # ── Выбор ───────────────────────────────────────────────────────────────
+
+    def predict(
+        self, model: str, num_locations: int, queue_depth: int = 0,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Прогноз латентности модели для запроса; None — мало замеров.
+        predicted_ms = None — в окне нет ни одного успешного вызова.
+        """
+        with self._lock:
+            stats = self._stats.get((model, size_bucket(num_locations)))
+        if not stats or stats["count"] < settings.llm_selector_min_samples:
+            return None
+        predicted_ms = None
+        if stats["successes"]:
+            predicted_ms = round(stats["p90_ms"] + queue_depth * stats["p50_ms"], 1)
+        return {
+            "predicted_ms": predicted_ms,
+            "quality_avg": stats["quality_avg"],
+            "success_rate": stats["success_rate"],
+            "samples": stats["count"],
+        }
+
+    def choose(
+        self,
+        num_locations: int,
+        slo_ms: Optional[float] = None,
+        time_constraint: Optional[str] = None,
+        queue_depths: Optional[Dict[str, int]] = None,
+    ) -> Dict[str, Any]:
+        """Решение: {"id", "model" (None — без LLM), "reason", "predictions", ...}."""
+        slo_ms = request_slo_ms(slo_ms, time_constraint)
+        queue_depths = queue_depths or {}
+        predictions = {
+            model: self.predict(model, num_locations, queue_depths.get(model, 0))
+            for model in MODELS
+        }
+        model, reason = _rank(predictions, slo_ms, time_constraint)
+
+        decision = {
+            "id": uuid.uuid4().hex,
+            "at": datetime.now(timezone.utc).isoformat(),
+            "num_locations": num_locations,
+            "bucket": size_bucket(num_locations),
+            "slo_ms": slo_ms,
+            "time_constraint": time_constraint,
+            "model": model,
+            "reason": reason,
+            "predictions": predictions,
+            "actual_ms": None,
+            "actual_quality": None,
+        }
+        with self._lock:
+            self._decisions.append(decision)
+        return decision
+
+    def observe(self, decision_id: str, latency_ms: float, quality: float) -> None:
+        """Фактический результат выбранной модели — для отчёта."""
+        with self._lock:
+            for decision in reversed(self._decisions):
+                if decision["id"] == decision_id:
+                    decision["actual_ms"] = round(latency_ms, 1)
+                    decision["actual_quality"] = round(quality, 1)
+                    return
+
+    # ── Отчёт ───────────────────────────────────────────────────────────────
+
+    def report(self, limit: int = 50) -> Dict[str, Any]:
+        """
+        Контрфактический отчёт: что выбрано, что предсказывалось для
+        каждой модели и сколько запросов уложились бы в SLO, если бы
+        всегда использовалась одна модель.
+        """
+        with self._lock:
+            decisions = [dict(d) for d in self._decisions]
+
+        chosen: Dict[str, int] = {}
+        observed = [d for d in decisions if d["actual_ms"] is not None]
+        counterfactual = {
+            model: {"predicted": 0, "predicted_within_slo": 0, "unknown": 0} for model in MODELS
+        }
+        for d in decisions:
+            key = d["model"] or "none"
+            chosen[key] = chosen.get(key, 0) + 1
+            for model, p in d["predictions"].items():
+                if p is None:
+                    counterfactual[model]["unknown"] += 1
+                    continue
+                counterfactual[model]["predicted"] += 1
+                if p["predicted_ms"] is not None and p["predicted_ms"] <= d["slo_ms"]:
+                    counterfactual[model]["predicted_within_slo"] += 1
+
+        return {
+            "decisions_total": len(decisions),
+            "chosen": chosen,
+            "llm_skipped": chosen.get("none", 0),
+            "observed": len(observed),
+            # Неудачный вызов (качество 0) в SLO не укладывается, как бы быстро ни вернулся
+            "observed_within_slo": sum(
+                1 for d in observed if d["actual_quality"] > 0 and d["actual_ms"] <= d["slo_ms"]
+            ),
+            "counterfactual": counterfactual,
+            "stats": self.stats(),
+            "recent": decisions[-limit:][::-1],
+        }
+
+
+selector = ModelSelector()
+
+
+async def refresh_stats(session: AsyncSession, force: bool = False) -> None:
+    """Перечитывает последние замеры LLM из metrics (не чаще LLM_SELECTOR_REFRESH_S)."""
+    if not force and not selector.is_stale():
+        return
+    since = datetime.now(timezone.utc) - timedelta(days=settings.llm_selector_history_days)
+    rows: List[Tuple[str, int, float, float]] = []
+    # Окно — на каждую (модель, корзину): поток мелких запросов не вытесняет крупные
+    for model in MODELS:
+        for low, high in SIZE_BUCKETS.values():
+            stmt = (
+                select(
+                    Metric.model_name,
+                    Metric.num_locations,
+                    Metric.response_time_ms,
+                    Metric.quality_score,
+                )
+                .where(
+                    Metric.task == TASK_EVALUATE_VARIANTS,
+                    Metric.model_name == model,
+                    Metric.timestamp >= since,
+                )
+                .order_by(Metric.timestamp.desc())
+                .limit(settings.llm_selector_window)
+            )
+            if low is not None:
+                stmt = stmt.where(Metric.num_locations > low)
+            if high is not None:
+                stmt = stmt.where(Metric.num_locations <= high)
+            rows.extend(tuple(row) for row in (await session.execute(stmt)).all())
+    selector.load_samples(rows)
+
+
+def _queue_depths() -> Dict[str, int]:
+    from src.models.inference_worker import inference_status
+
+    return {name: status["queue_depth"] for name, status in inference_status().items()}
+
+
+async def select_model(
+    session: AsyncSession,
+    num_locations: int,
+    slo_ms: Optional[float] = None,
+    time_constraint: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Выбор модели для запроса (model="auto"); ошибка чтения статистики не ломает запрос."""
+    try:
+        await refresh_stats(session)
+    except Exception as exc:
+        logger.warning("Model selector stats refresh failed: %s", exc)
+        await session.rollback()
+    return selector.choose(num_locations, slo_ms, time_constraint, _queue_depths())
+
+
+def evaluation_quality(evaluation: List[Dict[str, Any]], variant_ids: Sequence[Any]) -> float:
+    """Качество ответа LLM: доля вариантов с непустыми pros и cons, 0–100."""
+    if not variant_ids:
+        return 0.0
+    complete = {item.get("id") for item in evaluation if item.get("pros") and item.get("cons")}
+    return round(100.0 * sum(1 for vid in variant_ids if vid in complete) / len(variant_ids), 1)
+
+
+async def record_llm_call(
+    session: AsyncSession,
+    model: str,
+    num_locations: int,
+    latency_ms: float,
+    quality: float,
+    decision_id: Optional[str] = None,
+) -> None:
+    """Пишет замер вызова LLM в metrics (commit — здесь; ошибка только логируется)."""
+    if decision_id:
+        selector.observe(decision_id, latency_ms, quality)
+    try:
+        session.add(Metric(
+            model_name=model,
+            task=TASK_EVALUATE_VARIANTS,
+            num_locations=num_locations,
+            response_time_ms=int(latency_ms),
+            quality_score=quality,
+            cost=0.0,
+        ))
+        await session.commit()
+    except Exception as exc:
+        logger.warning("Could not record LLM metric: %s", exc)
+        await session.rollback()
+
 
 def select_best_model(
     num_locations: int,
     time_constraint: Optional[str] = None,
 ) -> str:
     """
-    Возвращает primary-модель для оптимизации маршрута.
-
-    Текущая стратегия:
-    - всегда используем qwen как основную модель;
-    - fallback на llama реализован на уровне клиентов/роутов
-      (при ошибке или неудовлетворительном результате qwen).
+    Модель для запроса по уже загруженной статистике (без обращения к БД
+    и без записи в журнал решений).
 
-    Аргументы оставлены на будущее (для возможного усложнения логики).
+    Если ни одна модель не укладывается в SLO, возвращается primary (qwen):
+    вызывающий сам решает, звать ли LLM. Полный выбор с пропуском слоя
+    LLM — select_model().
     """
-    return MODEL_QWEN
+    predictions = {model: selector.predict(model, num_locations) for model in MODELS}
+    model, _ = _rank(predictions, request_slo_ms(None, time_constraint), time_constraint)
+    return model or MODEL_QWEN
 
 
 def get_model_recommendation(
@@ -61,6 +411,18 @@ def _reason_text(
     num_locations: int, time_constraint: Optional[str],
         model: str) -> str:
     """Краткое обоснование выбора для логов и API."""
+    prediction = selector.predict(model, num_locations)
+    predicted_ms = prediction["predicted_ms"] if prediction else None
     if model == MODEL_LLAMA:
-        return "fallback — Llama после отказа/низкого качества Qwen"
+        if predicted_ms is None:
+            return "Llama — мало замеров, модель пробуется; fallback — Qwen"
+        return (
+            f"Llama — быстрее в пределах SLO для {size_bucket(num_locations)} запросов "
+            f"(прогноз {predicted_ms:.0f} мс); fallback — Qwen"
+        )
+    if predicted_ms is not None:
+        return (
+            f"primary — Qwen (прогноз {predicted_ms:.0f} мс); "
+            "fallback при сбоях/деградации качества — Llama"
+        )
     return "primary — Qwen; fallback при сбоях/деградации качества — Llama"
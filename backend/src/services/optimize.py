@@ -2,7 +2,7 @@ import logging
 import time
 import uuid
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -17,16 +17,20 @@ from src.models.geo_utils import (
     haversine,
     infer_category,
 )
-from src.models.llama_client import LlamaClient
-from src.models.qwen_client import QwenClient
+from src.models.llm_client import create_client
 from src.models.schemas import (
     Location as PydanticLocation,
     Route as PydanticRoute,
 )
 from src.schemas.vehicle import Vehicle 
 from src.services.model_selector import (
+    MODEL_AUTO,
+    evaluation_quality,
     get_model_recommendation,
+    record_llm_call,
+    select_model,
 )
+from src.services.llm_cache import evaluate_variants_cached
 from src.services.quality_evaluator import evaluate_route_quality
 from src.services.routing import RoutingService
 from src.services.schedule_planner import VISIT_DURATION_MIN
@@ -39,8 +43,8 @@ logger = logging.getLogger("optimizer")
 class Optimizer:
     def __init__(self, db_session: AsyncSession):
         self.db = db_session
-        self.qwen_client = QwenClient()
-        self.llama_client = LlamaClient()
+        self.qwen_client = create_client("qwen")
+        self.llama_client = create_client("llama")
         self.max_locations_per_prompt = 40
         self.routing_service = RoutingService()
 
@@ -375,17 +379,45 @@ class Optimizer:
         vehicle: Optional[Vehicle] = None,
         model: str = "qwen",
         transport_mode: str = "car",
+        latency_slo_ms: Optional[int] = None,
     ):
         """
         Генерирует несколько детерминированных кандидатов маршрута,
         затем выбирает один лучший вариант и возвращает только его.
-        БД не используется — результат возвращается напрямую.
+        Маршрут в БД не сохраняется (пишутся только кэш и замеры LLM).
+
+        model="auto" — модель выбирает model_selector по прогнозу
+        латентности и latency_slo_ms; если не подходит ни одна, pros/cons
+        не запрашиваются.
         """
-        from src.schemas.optimize import (
-            OptimizeVariantsResponse,
-            RouteVariant,
-            RouteVariantMetrics,
-        )
+        async for event, data in self.iter_variants(
+            db_locations, vehicle, model, transport_mode, latency_slo_ms,
+        ):
+            if event == "done":
+                return data
+        raise RuntimeError("iter_variants finished without result")
+
+    async def iter_variants(
+        self,
+        db_locations: List[DBLocation],
+        vehicle: Optional[Vehicle] = None,
+        model: str = "qwen",
+        transport_mode: str = "car",
+        latency_slo_ms: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Фазы generate_variants по мере готовности — для SSE
+        (/optimize/variants/stream):
+
+        - ("candidate", {...}) — метрики каждого алгоритмического варианта;
+        - ("best", RouteVariant) — лучший вариант, ещё без pros/cons;
+        - ("evaluation", {...}) — pros/cons от LLM (или пустые);
+        - ("done", OptimizeVariantsResponse) — итог, как у generate_variants.
+
+        Если потребитель прекращает чтение (клиент отключился), отмена
+        доходит до ожидания инференса и останавливает генерацию модели.
+        """
+        from src.schemas.optimize import OptimizeVariantsResponse
 
         start_time_ms = int(time.time() * 1000)
 
@@ -437,7 +469,7 @@ class Optimizer:
                 {**baseline, "constraints_satisfied": True},
                 {**real, "constraints_satisfied": True},
             )
-            variants_data.append({
+            variant = {
                 "id": vc["id"],
                 "name": vc["name"],
                 "description": vc["description"],
@@ -451,15 +483,48 @@ class Optimizer:
                 },
                 "pros": [],
                 "cons": [],
-            })
+            }
+            variants_data.append(variant)
+            yield "candidate", {
+                "id": variant["id"],
+                "name": variant["name"],
+                "algorithm": variant["algorithm"],
+                "metrics": variant["metrics"],
+            }
+
+        # Лучший вариант не зависит от pros/cons — отдаём его до LLM
+        best_variant = min(
+            variants_data,
+            key=lambda variant: (
+                -variant["metrics"]["quality_score"],
+                variant["metrics"]["distance_km"],
+                variant["metrics"]["time_hours"],
+                variant["metrics"]["cost_rub"],
+                variant["id"],
+            ),
+        )
+        yield "best", self._best_route_variant(best_variant)
 
         # ── LLM: генерируем pros/cons (graceful fallback при ошибке) ───────────
         llm_success = False
+        llm_model, decision_id = model, None
+        if model == MODEL_AUTO:
+            decision = await select_model(self.db, len(db_locations), latency_slo_ms)
+            llm_model, decision_id = decision["model"], decision["id"]
+            logger.info("model_selector: %s (%s)", llm_model, decision["reason"])
+        model_calls = []
         try:
-            client = (
-                self.qwen_client if model == "qwen" else self.llama_client
-            )
-            evaluation = await client.evaluate_variants(variants_data)
+            if llm_model is None:
+                evaluation = []
+            else:
+                client = (
+                    self.qwen_client if llm_model == "qwen" else self.llama_client
+                )
+                # Тот же набор вариантов — ответ из кэша, без загрузки модели
+                evaluation = await evaluate_variants_cached(
+                    self.db, client, variants_data,
+                    on_model_call=lambda ms, answer: model_calls.append((ms, answer)),
+                )
             if evaluation:
                 eval_by_id = {item["id"]: item for item in evaluation}
                 for v in variants_data:
@@ -471,40 +536,45 @@ class Optimizer:
         except Exception as exc:
             logger.warning("LLM evaluate_variants failed: %s", exc)
 
-        best_variant = min(
-            variants_data,
-            key=lambda variant: (
-                -variant["metrics"]["quality_score"],
-                variant["metrics"]["distance_km"],
-                variant["metrics"]["time_hours"],
-                variant["metrics"]["cost_rub"],
-                variant["id"],
-            ),
-        )
-
-        response_variants = [
-            RouteVariant(
-                id=1,
-                name="Лучший маршрут",
-                description=(
-                    f"{best_variant['name']}. "
-                    "Выбран автоматически как лучший вариант по качеству и метрикам."
-                ),
-                algorithm=best_variant["algorithm"],
-                pros=best_variant["pros"],
-                cons=best_variant["cons"],
-                locations=[loc.ID for loc in best_variant["locations_ordered"]],
-                metrics=RouteVariantMetrics(**best_variant["metrics"]),
+        variant_ids = [v["id"] for v in variants_data]
+        for latency_ms, answer in model_calls:
+            await record_llm_call(
+                self.db, llm_model, len(db_locations), latency_ms,
+                evaluation_quality(answer, variant_ids), decision_id,
             )
-        ]
 
-        return OptimizeVariantsResponse(
-            variants=response_variants,
-            model_used=model,
+        yield "evaluation", {
+            "model_used": llm_model or "none",
+            "llm_evaluation_success": llm_success,
+            "pros": best_variant["pros"],
+            "cons": best_variant["cons"],
+        }
+
+        yield "done", OptimizeVariantsResponse(
+            variants=[self._best_route_variant(best_variant)],
+            model_used=llm_model or "none",
             response_time_ms=int(time.time() * 1000) - start_time_ms,
             llm_evaluation_success=llm_success,
         )
 
+    @staticmethod
+    def _best_route_variant(best_variant: Dict[str, Any]):
+        from src.schemas.optimize import RouteVariant, RouteVariantMetrics
+
+        return RouteVariant(
+            id=1,
+            name="Лучший маршрут",
+            description=(
+                f"{best_variant['name']}. "
+                "Выбран автоматически как лучший вариант по качеству и метрикам."
+            ),
+            algorithm=best_variant["algorithm"],
+            pros=best_variant["pros"],
+            cons=best_variant["cons"],
+            locations=[loc.ID for loc in best_variant["locations_ordered"]],
+            metrics=RouteVariantMetrics(**best_variant["metrics"]),
+        )
+
     # ─── Сохранение выбранного варианта в БД ─────────────────────────────────────
 
     async def confirm_variant(
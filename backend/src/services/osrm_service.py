@@ -4,8 +4,6 @@ import logging
 import os
 from typing import List, Optional, Tuple
 
-import requests
-
 logger = logging.getLogger("osrm_service")
 
 
@@ -30,6 +28,8 @@ def osrm_trip_order(
     url = osrm_url.rstrip("/") + f"/trip/v1/driving/{coord_str}"
     params = {"source": "first", "roundtrip": "false", "overview": "false"}
     try:
+        import requests
+
         r = requests.get(url, params=params, timeout=timeout_s)
         r.raise_for_status()
         payload = r.json()
@@ -0,0 +1,134 @@
+"""
+Экспорт метрик в формате Prometheus (GET /metrics/prometheus).
+
+Кроме метрик процесса из src/utils/metrics.py (HTTP-латентность по
+маршрутам из AdvancedMiddleware, длительность операций timed_log)
+сюда в момент чтения переводятся счётчики подсистем, которые уже
+ведут свою статистику: пул соединений БД, очереди инференса LLM, кэш
+оценок LLM и кэш префикса промптов. Гистограммы подсистем копятся в мс
+— при экспорте границы переводятся в секунды.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from src.utils.metrics import MetricFamily, histogram_samples, registry, render
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LLM_OUTCOMES = ("completed", "failed", "rejected", "expired", "timeouts", "cancelled")
+CACHE_EVENTS = ("hits", "misses", "stores", "evictions", "errors")
+
+
+def _histogram_ms(
+    name: str,
+    help: str,
+    labels: Dict[str, str],
+    histogram_ms: Dict[str, int],
+    sum_ms: float,
+    family: Optional[MetricFamily] = None,
+) -> MetricFamily:
+    """Кумулятивная гистограмма {граница_мс: кол-во, "+Inf": кол-во} в секундах."""
+    family = family or MetricFamily(name, "histogram", help)
+    bounds = [float(bound) / 1000 for bound in histogram_ms if bound != "+Inf"]
+    family.samples.extend(
+        histogram_samples(name, labels, bounds, list(histogram_ms.values()), sum_ms / 1000),
+    )
+    return family
+
+
+def db_pool_families(status: Dict[str, Any]) -> List[MetricFamily]:
+    families = [
+        MetricFamily(f"db_pool_{key}", "gauge", help, [(f"db_pool_{key}", {}, status[key])])
+        for key, help in (
+            ("size", "Configured connection pool size"),
+            ("checked_out", "Connections currently checked out"),
+            ("overflow", "Overflow connections currently open"),
+        )
+        if key in status
+    ]
+    if "checkouts" in status:
+        families += [
+            MetricFamily("db_pool_checkouts", "counter", "Connection checkouts",
+                         [("db_pool_checkouts_total", {}, status["checkouts"])]),
+            MetricFamily("db_pool_timeouts", "counter", "Connection checkouts that timed out",
+                         [("db_pool_timeouts_total", {}, status["timeouts"])]),
+            _histogram_ms("db_pool_checkout_wait_seconds", "Time to get a connection from the pool",
+                          {}, status["wait_histogram_ms"], status["wait_sum_ms"]),
+        ]
+    return families
+
+
+def llm_queue_families(status: Dict[str, Dict[str, Any]]) -> List[MetricFamily]:
+    depth = MetricFamily("llm_queue_depth", "gauge", "LLM requests waiting or running")
+    limit = MetricFamily("llm_queue_max", "gauge", "LLM inference queue limit")
+    outcomes = MetricFamily(
+        "llm_inference_requests", "counter", "LLM inference requests by outcome",
+    )
+    wait = MetricFamily(
+        "llm_queue_wait_seconds", "histogram", "Time LLM requests wait in the queue",
+    )
+    run = MetricFamily("llm_inference_duration_seconds", "histogram", "LLM inference duration")
+    for model, snapshot in sorted(status.items()):
+        labels = {"model": model}
+        depth.samples.append(("llm_queue_depth", labels, snapshot["queue_depth"]))
+        limit.samples.append(("llm_queue_max", labels, snapshot["queue_max"]))
+        for outcome in LLM_OUTCOMES:
+            outcomes.samples.append(
+                ("llm_inference_requests_total", {**labels, "outcome": outcome}, snapshot[outcome]),
+            )
+        _histogram_ms(wait.name, wait.help, labels, snapshot["wait_histogram_ms"],
+                      snapshot["wait_sum_ms"], wait)
+        _histogram_ms(run.name, run.help, labels, snapshot["run_histogram_ms"],
+                      snapshot["run_sum_ms"], run)
+    return [depth, limit, outcomes, wait, run]
+
+
+def llm_cache_families(stats: Dict[str, Any]) -> List[MetricFamily]:
+    return [
+        MetricFamily("llm_cache_events", "counter", "LLM evaluation cache events", [
+            ("llm_cache_events_total", {"event": event}, stats[event]) for event in CACHE_EVENTS
+        ]),
+        MetricFamily("llm_cache_hit_ratio", "gauge", "LLM evaluation cache hit ratio since start",
+                     [("llm_cache_hit_ratio", {}, stats["hit_rate"])]),
+    ]
+
+
+def prompt_cache_families(status: Dict[str, Any]) -> List[MetricFamily]:
+    lookups = MetricFamily("llm_prompt_cache_lookups", "counter", "Prompt prefix cache lookups")
+    hits = MetricFamily("llm_prompt_cache_hits", "counter", "Prompt prefix cache hits")
+    tokens = MetricFamily(
+        "llm_prompt_cache_reused_tokens", "counter", "Prompt tokens reused from the cache",
+    )
+    ratio = MetricFamily(
+        "llm_prompt_cache_hit_ratio", "gauge", "Prompt prefix cache hit ratio since load",
+    )
+    size = MetricFamily("llm_prompt_cache_size_bytes", "gauge", "Prompt prefix cache memory")
+    for model, info in sorted(status["models"].items()):
+        labels = {"model": model}
+        lookups.samples.append(("llm_prompt_cache_lookups_total", labels, info["lookups"]))
+        hits.samples.append(("llm_prompt_cache_hits_total", labels, info["hits"]))
+        tokens.samples.append((
+            "llm_prompt_cache_reused_tokens_total", labels, info["reused_tokens"],
+        ))
+        ratio.samples.append((
+            "llm_prompt_cache_hit_ratio", labels,
+            round(info["hits"] / info["lookups"], 4) if info["lookups"] else 0.0,
+        ))
+        size.samples.append(("llm_prompt_cache_size_bytes", labels, info["size_mb"] * 1024 * 1024))
+    return [lookups, hits, tokens, ratio, size]
+
+
+def render_metrics() -> str:
+    """Все метрики процесса в текстовом формате Prometheus."""
+    from src.database.models import engine
+    from src.database.pool import pool_status
+    from src.models.inference_worker import inference_status
+    from src.models.prompt_cache import prompt_cache_status
+    from src.services.llm_cache import cache_stats
+
+    families = registry.collect()
+    families += db_pool_families(pool_status(engine))
+    families += llm_queue_families(inference_status())
+    families += llm_cache_families(cache_stats.snapshot())
+    families += prompt_cache_families(prompt_cache_status())
+    return render(families)
@@ -2,8 +2,6 @@ import logging
 import os
 from typing import Any, Sequence, Optional
 
-import httpx
-
 from src.models.geo_utils import (
     detect_region_info,
     estimate_fuel_cost, # Оставляем как фолбэк, если машина не передана
@@ -121,6 +119,8 @@ class RoutingService:
         )
 
         try:
+            import httpx
+
             async with httpx.AsyncClient(timeout=self.timeout) as client:
                 response = await client.get(url)
                 response.raise_for_status()
@@ -0,0 +1,211 @@
+"""
+Счётчики и гистограммы процесса в текстовом формате Prometheus.
+
+Запись идёт на горячем пути (каждый HTTP-запрос, каждый timed_log),
+поэтому она дешёвая: серия ищется по кортежу значений меток в dict,
+корзина — bisect по границам, а под короткой блокировкой серии только
+прибавляются числа. Форматирование — только при чтении
+(GET /metrics/prometheus).
+
+Метрики подсистем, у которых уже есть свои счётчики (пул БД, очереди
+инференса, кэши), не дублируются: их переводят в формат Prometheus
+коллекторы в момент чтения (src/services/prometheus.py).
+"""
+
+import math
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Границы корзин по умолчанию, с (последняя — +Inf)
+DEFAULT_BUCKETS_S = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+@dataclass
+class MetricFamily:
+    """Метрика с сэмплами, готовая к выводу."""
+
+    name: str
+    type: str
+    help: str
+    samples: List[Sample] = field(default_factory=list)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render(families: Iterable[MetricFamily]) -> str:
+    """Текстовый формат Prometheus 0.0.4."""
+    lines = []
+    for family in families:
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.type}")
+        for name, labels, value in family.samples:
+            if labels:
+                pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{pairs}}} {_format_value(value)}")
+            else:
+                lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def histogram_samples(
+    name: str,
+    labels: Dict[str, str],
+    bounds: Sequence[float],
+    cumulative: Sequence[float],
+    total: float,
+) -> List[Sample]:
+    """Сэмплы гистограммы по кумулятивным счётчикам (len(bounds) + 1, с +Inf)."""
+    samples: List[Sample] = [
+        (f"{name}_bucket", {**labels, "le": _format_value(bound)}, count)
+        for bound, count in zip(list(bounds) + [math.inf], cumulative)
+    ]
+    samples.append((f"{name}_sum", labels, total))
+    samples.append((f"{name}_count", labels, cumulative[-1] if cumulative else 0))
+    return samples
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(_Metric):
+    type = "counter"
+    _suffix = "_total"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0]
+            series[0] += amount
+
+    def collect(self) -> MetricFamily:
+        with self._lock:
+            samples = [
+                (self.name + self._suffix, self._labels(key), series[0])
+                for key, series in self._series.items()
+            ]
+        return MetricFamily(self.name, self.type, self.help, samples)
+
+
+class Gauge(Counter):
+    type = "gauge"
+    _suffix = ""
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS_S,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [счётчики корзин (не кумулятивные)..., сумма]
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def collect(self) -> MetricFamily:
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        samples: List[Sample] = []
+        for key, series in snapshot.items():
+            cumulative, running = [], 0
+            for count in series[:-1]:
+                running += count
+                cumulative.append(running)
+            samples.extend(histogram_samples(
+                self.name, self._labels(key), self.buckets, cumulative, series[-1],
+            ))
+        return MetricFamily(self.name, self.type, self.help, samples)
+
+
+class Registry:
+    """Метрики процесса по имени."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Повторный импорт модуля (reload в тестах) — та же метрика
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))  # type: ignore[return-value]
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None,
+    ) -> Histogram:
+        return self._register(  # type: ignore[return-value]
+            Histogram(name, help, labelnames, buckets or DEFAULT_BUCKETS_S),
+        )
+
+    def collect(self) -> List[MetricFamily]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [metric.collect() for metric in metrics]
+
+
+registry = Registry()
@@ -0,0 +1,59 @@
+"""
+Опциональные тяжёлые зависимости: проверка наличия без импорта и
+загрузка при первом использовании.
+
+llama_cpp (LLM-клиенты), openpyxl (Excel), httpx/requests (дорожный
+роутер, OSRM) не импортируются при старте приложения: has_module()
+смотрит только find_spec, а require() импортирует модуль в момент
+первого вызова. Отсутствие пакета ломает только свой эндпоинт, а не
+весь API.
+"""
+
+import importlib
+import importlib.util
+from functools import lru_cache
+from types import ModuleType
+from typing import Dict
+
+# Модуль → пакет для pip install
+INSTALL_HINTS = {
+    "llama_cpp": "llama-cpp-python",
+    "openpyxl": "openpyxl",
+    "httpx": "httpx",
+    "requests": "requests",
+}
+
+# Подсистема → модуль, без которого она не работает
+FEATURES = {
+    "llm": "llama_cpp",
+    "xlsx": "openpyxl",
+    "road_router": "httpx",
+    "osrm": "requests",
+}
+
+
+class MissingDependency(ImportError):
+    """Опциональный пакет не установлен."""
+
+
+@lru_cache(maxsize=None)
+def has_module(name: str) -> bool:
+    """Есть ли модуль в окружении (без импорта)."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def require(name: str) -> ModuleType:
+    """Импортирует опциональный модуль; MissingDependency — если его нет."""
+    try:
+        return importlib.import_module(name)
+    except ImportError as exc:
+        package = INSTALL_HINTS.get(name.split(".")[0], name)
+        raise MissingDependency(f"{name} не установлен: pip install {package}") from exc
+
+
+def available_features() -> Dict[str, bool]:
+    """Доступность подсистем — для /health."""
+    return {feature: has_module(module) for feature, module in FEATURES.items()}
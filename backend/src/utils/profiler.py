@@ -0,0 +1,185 @@
+"""
+Профилирование отдельных запросов по требованию.
+
+Жалобу «месячный вид тормозит» не воспроизвести локально, поэтому
+AdvancedMiddleware умеет снять профиль конкретного запроса в проде:
+
+- заголовок X-Profile: <PROFILING_TOKEN> или ?profile=<PROFILING_TOKEN>;
+- каждый PROFILING_SAMPLE_N-й запрос (0 — выборка выключена).
+
+SamplingProfiler — фоновый поток, который раз в PROFILING_INTERVAL_MS
+снимает стек потока event loop (sys._current_frames) и копит
+collapsed stacks («f1;f2;f3 N») — формат flamegraph.pl и speedscope.
+Профиль сохраняется в PROFILING_DIR под X-Request-ID запроса и
+отдаётся через GET /admin/profiles/{request_id}.
+
+Ограничения: снимается поток event loop целиком — если одновременно
+шли другие запросы, их стеки тоже попадут в профиль; работа в пулах
+потоков (asyncio.to_thread, инференс LLM) видна как ожидание. Один
+профиль за раз: пока снимается один, остальные запросы не профилируются.
+
+Когда профилирование выключено (нет токена и PROFILING_SAMPLE_N=0),
+middleware не делает ничего сверх проверки двух настроек.
+"""
+
+import hmac
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.config import BASE_DIR, settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_PARAM = "profile"
+COLLAPSED_SUFFIX = ".collapsed"
+META_SUFFIX = ".json"
+
+# X-Request-ID — uuid4; имя файла строится только из него
+_REQUEST_ID_RE = re.compile(r"^[0-9a-f-]{36}$")
+
+_active = threading.Lock()
+_request_counter = itertools.count(1)
+
+
+class SamplingProfiler:
+    """Сэмплирующий профайлер одного потока (по умолчанию — текущего)."""
+
+    def __init__(self, interval_s: float, thread_id: Optional[int] = None):
+        self.interval_s = interval_s
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def profiling_enabled() -> bool:
+    return bool(settings.profiling_token) or settings.profiling_sample_n > 0
+
+
+def token_matches(token: Optional[str]) -> bool:
+    expected = settings.profiling_token
+    return bool(expected and token) and hmac.compare_digest(token, expected)
+
+
+def should_profile(headers, query_params) -> bool:
+    """Явный запрос с токеном или очередной 1-из-N."""
+    if token_matches(headers.get(PROFILE_HEADER) or query_params.get(PROFILE_QUERY_PARAM)):
+        return True
+    n = settings.profiling_sample_n
+    return n > 0 and next(_request_counter) % n == 0
+
+
+def try_start() -> Optional[SamplingProfiler]:
+    """Профайлер для текущего запроса или None, если уже снимается другой."""
+    if not _active.acquire(blocking=False):
+        return None
+    profiler = SamplingProfiler(settings.profiling_interval_ms / 1000)
+    profiler.start()
+    return profiler
+
+
+def finish(profiler: SamplingProfiler, request_id: str, meta: Dict[str, Any]) -> None:
+    try:
+        profiler.stop()
+    finally:
+        _active.release()
+    try:
+        save_profile(request_id, profiler, meta)
+    except OSError as exc:
+        logger.warning("Failed to store profile %s: %s", request_id, exc)
+
+
+def profiles_dir() -> Path:
+    return Path(settings.profiling_dir) if settings.profiling_dir else BASE_DIR / "profiles"
+
+
+def _path(request_id: str, suffix: str) -> Optional[Path]:
+    if not _REQUEST_ID_RE.match(request_id):
+        return None
+    return profiles_dir() / f"{request_id}{suffix}"
+
+
+def save_profile(request_id: str, profiler: SamplingProfiler, meta: Dict[str, Any]) -> None:
+    directory = profiles_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    collapsed_path = _path(request_id, COLLAPSED_SUFFIX)
+    meta_path = _path(request_id, META_SUFFIX)
+    if collapsed_path is None or meta_path is None:
+        return
+    collapsed_path.write_text(profiler.collapsed(), encoding="utf-8")
+    meta_path.write_text(json.dumps({
+        "request_id": request_id,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "samples": profiler.samples,
+        "interval_ms": settings.profiling_interval_ms,
+        **meta,
+    }, ensure_ascii=False), encoding="utf-8")
+    _prune(directory)
+    logger.info("Stored profile %s (%d samples)", request_id, profiler.samples)
+
+
+def _prune(directory: Path) -> None:
+    metas = sorted(directory.glob(f"*{META_SUFFIX}"), key=lambda p: p.stat().st_mtime)
+    for meta_path in metas[:max(0, len(metas) - settings.profiling_max_files)]:
+        meta_path.unlink(missing_ok=True)
+        meta_path.with_suffix(COLLAPSED_SUFFIX).unlink(missing_ok=True)
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Метаданные сохранённых профилей, новые первыми."""
+    directory = profiles_dir()
+    if not directory.is_dir():
+        return []
+    result = []
+    for meta_path in sorted(directory.glob(f"*{META_SUFFIX}"), key=lambda p: p.stat().st_mtime, reverse=True):
+        try:
+            result.append(json.loads(meta_path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+    return result
+
+
+def load_profile(request_id: str) -> Optional[str]:
+    """Collapsed stacks профиля или None."""
+    path = _path(request_id, COLLAPSED_SUFFIX)
+    if path is None or not path.is_file():
+        return None
+    return path.read_text(encoding="utf-8")
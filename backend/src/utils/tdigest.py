@@ -0,0 +1,147 @@
+"""
+Merging t-digest — компактный скетч распределения для квантилей.
+
+Хранит отсортированные центроиды (среднее, вес). Размер центроида
+ограничен масштабной функцией k1 (arcsin), поэтому хвосты (p90/p99)
+точнее середины, а число центроидов ≈ compression независимо от
+числа значений. Два скетча сливаются объединением центроидов со
+сжатием — квантили за несколько месяцев считаются без чтения строк.
+
+Сериализация в JSON-совместимый dict (см. to_dict / from_dict).
+"""
+
+import math
+from typing import Iterable, List, Optional, Tuple
+
+DEFAULT_COMPRESSION = 100
+# Сколько значений копим в буфере до сжатия (кратно compression)
+_BUFFER_FACTOR = 5
+
+
+class TDigest:
+    def __init__(self, compression: int = DEFAULT_COMPRESSION):
+        self.compression = compression
+        self._centroids: List[Tuple[float, float]] = []
+        self._buffer: List[Tuple[float, float]] = []
+        self.count = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    @classmethod
+    def from_values(cls, values: Iterable[float], compression: int = DEFAULT_COMPRESSION) -> "TDigest":
+        digest = cls(compression)
+        for value in values:
+            digest.add(value)
+        return digest
+
+    def __len__(self) -> int:
+        return int(self.count)
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        value = float(value)
+        self._buffer.append((value, weight))
+        self.count += weight
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self._buffer) >= self.compression * _BUFFER_FACTOR:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        """Вливает other в текущий скетч (other не меняется)."""
+        if not other.count:
+            return self
+        self._buffer.extend(other.centroids())
+        self.count += other.count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def centroids(self) -> List[Tuple[float, float]]:
+        self._compress()
+        return list(self._centroids)
+
+    def _q_limit(self, q: float) -> float:
+        # k1(q) = δ/(2π)·asin(2q−1); следующий центроид не шире k+1
+        k = self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+        angle = min((k + 1) * 2 * math.pi / self.compression, math.pi / 2)
+        return (math.sin(angle) + 1) / 2
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+        items = sorted(self._centroids + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in items)
+
+        merged: List[Tuple[float, float]] = []
+        cur_mean, cur_weight = items[0]
+        weight_so_far = 0.0
+        limit = total * self._q_limit(0.0)
+        for mean, weight in items[1:]:
+            if weight_so_far + cur_weight + weight <= limit:
+                cur_weight += weight
+                cur_mean += (mean - cur_mean) * weight / cur_weight
+            else:
+                merged.append((cur_mean, cur_weight))
+                weight_so_far += cur_weight
+                limit = total * self._q_limit(weight_so_far / total)
+                cur_mean, cur_weight = mean, weight
+        merged.append((cur_mean, cur_weight))
+        self._centroids = merged
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Оценка квантиля q ∈ [0, 1]; None для пустого скетча."""
+        centroids = self.centroids()
+        if not centroids:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        target = q * self.count
+        # Центр центроида i — на накопленном весе + w_i/2; между центрами — линейно
+        cumulative = 0.0
+        prev_center, prev_mean = 0.0, self.min
+        for mean, weight in centroids:
+            center = cumulative + weight / 2
+            if target < center:
+                if center == prev_center:
+                    return mean
+                frac = (target - prev_center) / (center - prev_center)
+                return prev_mean + (mean - prev_mean) * frac
+            prev_center, prev_mean = center, mean
+            cumulative += weight
+        # Правый хвост: между центром последнего центроида и max
+        if cumulative == prev_center:
+            return self.max
+        frac = (target - prev_center) / (cumulative - prev_center)
+        return prev_mean + (self.max - prev_mean) * frac
+
+    def to_dict(self) -> dict:
+        return {
+            "c": self.compression,
+            "n": self.count,
+            "min": self.min,
+            "max": self.max,
+            "m": [[round(mean, 3), weight] for mean, weight in self.centroids()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TDigest":
+        digest = cls(int(data.get("c", DEFAULT_COMPRESSION)))
+        digest._centroids = [(float(m), float(w)) for m, w in data.get("m", [])]
+        digest.count = float(data.get("n", sum(w for _, w in digest._centroids)))
+        digest.min = data.get("min")
+        digest.max = data.get("max")
+        return digest
+
+
+def merge_digests(items: Iterable[Optional[dict]], compression: int = DEFAULT_COMPRESSION) -> TDigest:
+    """Сливает сериализованные скетчи (None пропускаются)."""
+    result = TDigest(compression)
+    for data in items:
+        if data:
+            result.merge(TDigest.from_dict(data))
+    return result
@@ -1,20 +1,36 @@
 import asyncio
+import contextlib
 import functools
 import logging
 import time
 from typing import Any, Callable, Optional
 
+from src.utils.metrics import registry
+
 _last_timings: dict[str, float] = {}
 
 logger = logging.getLogger(__name__)
 
+# Распределение по меткам timed_log — для хвостов, а не только последнего замера
+OPERATION_SECONDS = registry.histogram(
+    "app_operation_duration_seconds",
+    "Duration of operations wrapped in timed_log",
+    ("label",),
+)
+OPERATION_ERRORS = registry.counter(
+    "app_operation_errors",
+    "Operations wrapped in timed_log that raised",
+    ("label",),
+)
+
 
 def get_last_timing(label: str) -> Optional[float]:
     return _last_timings.get(label)
 
 
 def timed_log(label: str, threshold_ms: Optional[float] = None) -> Callable:
-    """Decorator that logs execution time and stores it for /health.
+    """Decorator that logs execution time and stores it for /health
+    and the app_operation_duration_seconds histogram.
 
     threshold_ms: WARNING if exceeded. None → reads settings.perf_warn_threshold_ms.
     """
@@ -23,25 +39,39 @@ def timed_log(label: str, threshold_ms: Optional[float] = None) -> Callable:
             @functools.wraps(fn)
             async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
                 t0 = time.perf_counter()
+                failed = True
                 try:
-                    return await fn(*args, **kwargs)
+                    result = await fn(*args, **kwargs)
+                    failed = False
+                    return result
                 finally:
-                    _record(label, (time.perf_counter() - t0) * 1000, threshold_ms)
+                    _record(label, (time.perf_counter() - t0) * 1000, threshold_ms, failed)
             return async_wrapper
         else:
             @functools.wraps(fn)
             def sync_wrapper(*args: Any, **kwargs: Any) -> Any:
                 t0 = time.perf_counter()
+                failed = True
                 try:
-                    return fn(*args, **kwargs)
+                    result = fn(*args, **kwargs)
+                    failed = False
+                    return result
                 finally:
-                    _record(label, (time.perf_counter() - t0) * 1000, threshold_ms)
+                    _record(label, (time.perf_counter() - t0) * 1000, threshold_ms, failed)
             return sync_wrapper
     return decorator
 
 
-def _record(label: str, elapsed_ms: float, threshold_ms: Optional[float]) -> None:
+def _record(
+    label: str,
+    elapsed_ms: float,
+    threshold_ms: Optional[float],
+    failed: bool = False,
+) -> None:
     _last_timings[label] = round(elapsed_ms)
+    OPERATION_SECONDS.observe(elapsed_ms / 1000, label=label)
+    if failed:
+        OPERATION_ERRORS.inc(label=label)
     if threshold_ms is None:
         from src.config import settings as _s
         threshold_ms = _s.perf_warn_threshold_ms
@@ -49,3 +79,34 @@ def _record(label: str, elapsed_ms: float, threshold_ms: Optional[float]) -> Non
         logger.warning("%s finished in %.0f ms (threshold %.0f ms)", label, elapsed_ms, threshold_ms)
     else:
         logger.info("%s finished in %.0f ms", label, elapsed_ms)
+
+
+class PhaseTimer:
+    """Замер последовательных фаз (запуск приложения, миграции): фаза → мс.
+
+        timer = PhaseTimer("startup")
+        with timer.phase("schema"):
+            ...
+        timer.total_ms()
+    """
+
+    def __init__(self, label: str):
+        self.label = label
+        self.phases: dict[str, float] = {}
+        self._t0 = time.perf_counter()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = round((time.perf_counter() - t0) * 1000, 1)
+            self.phases[name] = elapsed_ms
+            logger.info("%s phase %s: %.1f ms", self.label, name, elapsed_ms)
+
+    def total_ms(self) -> float:
+        return round((time.perf_counter() - self._t0) * 1000, 1)
+
+    def summary(self) -> dict[str, Any]:
+        return {"total_ms": self.total_ms(), "phases": dict(self.phases)}
@@ -0,0 +1,181 @@
+"""
+Тесты месячных сводок визитов (src/services/analytics_rollup.py).
+
+Проверяют пересчёт по паре (месяц, сотрудник), совпадение
+инкрементального обновления с полной пересборкой и поддержку
+сводок в форс-мажоре. БД — SQLite (aiosqlite).
+"""
+
+from datetime import date, time
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from src.database.models import (  # noqa: E402
+    Base,
+    Location,
+    MonthlyVisitRollup,
+    SalesRep,
+    VisitLog,
+    VisitSchedule,
+)
+from src.services.analytics_rollup import (  # noqa: E402
+    NO_DISTRICT,
+    onsite_minutes,
+    rebuild_rollups,
+    refresh_rollups,
+    rollup_keys,
+)
+
+MARCH = date(2026, 3, 1)
+
+
+def _loc(id_, category, district):
+    return Location(
+        id=id_, name=id_, lat=54.0, lon=45.0,
+        time_window_start="09:00", time_window_end="18:00",
+        category=category, district=district,
+    )
+
+
+@pytest.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'rollup.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with factory() as session:
+        session.add_all([
+            SalesRep(id="r1", name="Иванов"),
+            SalesRep(id="r2", name="Петров"),
+            _loc("l1", "A", "Саранск"),
+            _loc("l2", "A", "Саранск"),
+            _loc("l3", "B", None),
+        ])
+        await session.flush()
+        session.add_all([
+            VisitSchedule(id="s1", location_id="l1", rep_id="r1",
+                          planned_date=date(2026, 3, 2), status="completed"),
+            VisitSchedule(id="s2", location_id="l1", rep_id="r1",
+                          planned_date=date(2026, 3, 16), status="planned"),
+            VisitSchedule(id="s3", location_id="l2", rep_id="r1",
+                          planned_date=date(2026, 3, 3), status="skipped"),
+            VisitSchedule(id="s4", location_id="l3", rep_id="r1",
+                          planned_date=date(2026, 3, 4), status="planned"),
+            VisitLog(id="v1", schedule_id="s1", location_id="l1", rep_id="r1",
+                     visited_date=date(2026, 3, 2),
+                     time_in=time(10, 0), time_out=time(10, 25)),
+        ])
+        await session.commit()
+
+    yield factory
+    await engine.dispose()
+
+
+async def _groups(session, rep_id="r1"):
+    rows = (await session.execute(
+        select(MonthlyVisitRollup).where(MonthlyVisitRollup.rep_id == rep_id)
+    )).scalars().all()
+    return {
+        (r.category, r.district): (
+            r.planned, r.completed, r.skipped, r.cancelled,
+            r.unique_tt, r.visited_tt, r.visits, r.onsite_minutes,
+        )
+        for r in rows
+    }
+
+
+def test_onsite_minutes():
+    assert onsite_minutes(time(9, 0), time(9, 40)) == 40
+    assert onsite_minutes(time(9, 0), time(8, 0)) == 0
+    assert onsite_minutes(None, time(8, 0)) == 0
+
+
+async def test_rebuild_groups_by_category_and_district(session_factory):
+    async with session_factory() as session:
+        written = await rebuild_rollups(session, MARCH)
+        await session.commit()
+        groups = await _groups(session)
+
+    assert written == 2
+    assert groups[("A", "Саранск")] == (3, 1, 1, 0, 2, 1, 1, 25)
+    assert groups[("B", NO_DISTRICT)] == (1, 0, 0, 0, 1, 0, 0, 0)
+
+
+async def test_refresh_follows_status_change(session_factory):
+    async with session_factory() as session:
+        await rebuild_rollups(session)
+        await session.commit()
+
+        sched = await session.get(VisitSchedule, "s4")
+        sched.status = "completed"
+        session.add(VisitLog(schedule_id="s4", location_id="l3", rep_id="r1",
+                             visited_date=sched.planned_date,
+                             time_in=time(11, 0), time_out=time(11, 30)))
+        await refresh_rollups(session, rollup_keys(sched))
+        await session.commit()
+        incremental = await _groups(session)
+
+    assert incremental[("B", NO_DISTRICT)] == (1, 1, 0, 0, 1, 1, 1, 30)
+
+    async with session_factory() as session:
+        await rebuild_rollups(session)
+        await session.commit()
+        assert await _groups(session) == incremental
+
+
+async def test_force_majeure_keeps_rollups_in_sync(session_factory):
+    from src.services.force_majeure_service import ForceMajeureService
+
+    async with session_factory() as session:
+        await rebuild_rollups(session)
+        await session.commit()
+
+        await ForceMajeureService(session).handle(
+            rep_id="r1", event_date=date(2026, 3, 16), fm_type="vehicle_breakdown",
+            description=None,
+        )
+        after_r1 = await _groups(session, "r1")
+        after_r2 = await _groups(session, "r2")
+
+    assert after_r1[("A", "Саранск")][3] == 1  # s2 отменён
+    assert after_r2[("A", "Саранск")][0] == 1  # перенесён к r2
+
+    async with session_factory() as session:
+        await rebuild_rollups(session)
+        await session.commit()
+        assert await _groups(session, "r1") == after_r1
+        assert await _groups(session, "r2") == after_r2
+
+
+async def test_duration_quantiles_merge_rollup_digests(session_factory):
+    from src.services.analytics_rollup import load_duration_quantiles
+
+    async with session_factory() as session:
+        session.add_all([
+            VisitLog(location_id="l3", rep_id="r2", visited_date=date(2026, 4, 7),
+                     time_in=time(9, 0), time_out=time(9, 45)),
+            VisitLog(location_id="l2", rep_id="r2", visited_date=date(2026, 4, 8),
+                     time_in=time(9, 0), time_out=time(9, 15)),
+        ])
+        await session.flush()
+        await rebuild_rollups(session)
+        await session.commit()
+
+        overall = await load_duration_quantiles(
+            session, MARCH, date(2026, 4, 1), [0.5],
+        )
+        by_rep = await load_duration_quantiles(
+            session, MARCH, date(2026, 4, 1), [0.5], group_by="rep_id",
+        )
+        march_only = await load_duration_quantiles(session, MARCH, MARCH, [0.5])
+
+    assert overall == [{"key": None, "count": 3, "min": 15.0, "max": 45.0,
+                        "quantiles": {0.5: 25.0}}]
+    assert [(g["key"], g["count"]) for g in by_rep] == [("r1", 1), ("r2", 2)]
+    assert march_only[0]["quantiles"][0.5] == 25.0
@@ -0,0 +1,231 @@
+"""
+Тесты холодного архива месяцев (src/services/archive.py).
+
+Проверяют, что после архивации горячие таблицы пусты, а /schedule/,
+/insights, /visits/stats и выгрузка читают месяц насквозь из архива с
+тем же результатом. БД — SQLite (aiosqlite).
+"""
+
+from datetime import date, time
+
+import pytest
+from fastapi import HTTPException
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import func, select  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from src.database.models import (  # noqa: E402
+    Base,
+    Location,
+    MonthlyVisitRollup,
+    SalesRep,
+    SkippedVisitStash,
+    VisitArchive,
+    VisitLog,
+    VisitSchedule,
+)
+from src.routes.insights import collect_insights  # noqa: E402
+from src.routes.schedule import _build_monthly_plan_response, resolve_stash_manual  # noqa: E402
+from src.routes.visits import create_visit, get_visit_stats  # noqa: E402
+from src.schemas.schedule import ResolveManualRequest  # noqa: E402
+from src.schemas.visits import VisitCreate  # noqa: E402
+from src.services.analytics_rollup import rebuild_rollups  # noqa: E402
+from src.services.archive import (  # noqa: E402
+    ArchiveError,
+    archive_closed_months,
+    archive_cutoff,
+    archive_month,
+    load_archived_month,
+    restore_month,
+)
+
+JAN = date(2025, 1, 1)
+
+
+def _loc(id_, category, district):
+    return Location(
+        id=id_, name=id_, lat=54.18, lon=45.17,
+        time_window_start="09:00", time_window_end="18:00",
+        category=category, district=district,
+    )
+
+
+@pytest.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'archive.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with factory() as session:
+        session.add_all([
+            SalesRep(id="r1", name="Иванов"),
+            SalesRep(id="r2", name="Петров"),
+            _loc("l1", "A", "Саранск"),
+            _loc("l2", "B", None),
+        ])
+        await session.flush()
+        session.add_all([
+            VisitSchedule(id="s1", location_id="l1", rep_id="r1",
+                          planned_date=date(2025, 1, 13), status="completed"),
+            VisitSchedule(id="s2", location_id="l2", rep_id="r2",
+                          planned_date=date(2025, 1, 14), status="skipped"),
+            VisitSchedule(id="s3", location_id="l1", rep_id="r1",
+                          planned_date=date(2025, 2, 3), status="planned"),
+            VisitLog(id="v1", schedule_id="s1", location_id="l1", rep_id="r1",
+                     visited_date=date(2025, 1, 13), time_in=time(10, 0), time_out=time(10, 20)),
+            SkippedVisitStash(id="k1", visit_schedule_id="s2", location_id="l2",
+                              rep_id="r2", original_date=date(2025, 1, 14)),
+        ])
+        await session.flush()
+        await rebuild_rollups(session)
+        await session.commit()
+
+    yield factory
+    await engine.dispose()
+
+
+async def _count(session, model):
+    return (await session.execute(select(func.count()).select_from(model))).scalar()
+
+
+def test_archive_cutoff():
+    assert archive_cutoff(12, date(2026, 10, 19)) == date(2025, 11, 1)
+    assert archive_cutoff(1, date(2026, 1, 5)) == date(2026, 1, 1)
+    assert archive_cutoff(3, date(2026, 2, 28)) == date(2025, 12, 1)
+
+
+async def _stats(session, month, month_to=None):
+    return await get_visit_stats(month=month, month_to=month_to, rep_id=None, session=session)
+
+
+async def test_archived_month_reads_through(session_factory, monkeypatch):
+    async with session_factory() as session:
+        plan_before = await _build_monthly_plan_response(session, "2025-01")
+        stats_before = await _stats(session, "2025-01", "2025-02")
+    insights_before = await collect_insights(session_factory, 2025, 1)
+
+    async with session_factory() as session:
+        archive = await archive_month(session, JAN)
+        await session.commit()
+        assert (archive.schedule_count, archive.log_count) == (2, 1)
+        assert archive.visited_pairs == [["r1", "l1"]]
+        assert len(archive.payload) < archive.raw_bytes
+
+        # Горячие таблицы — только февраль; ссылки на архивный план обнулены
+        assert await _count(session, VisitSchedule) == 1
+        assert await _count(session, VisitLog) == 0
+        assert (await session.get(SkippedVisitStash, "k1")).visit_schedule_id is None
+
+        plan_after = await _build_monthly_plan_response(session, "2025-01")
+        rep_plan = await _build_monthly_plan_response(session, "2025-01", rep_id="r2")
+        # Уникальные ТТ архивного месяца — из visited_pairs, без распаковки payload
+        with monkeypatch.context() as patched:
+            patched.setattr("src.services.archive.zlib.decompress", None)
+            stats_after = await _stats(session, "2025-01", "2025-02")
+    insights_after = await collect_insights(session_factory, 2025, 1)
+
+    assert plan_after == plan_before
+    assert stats_after == stats_before
+    assert (stats_after.total_visits, stats_after.unique_locations) == (1, 1)
+    assert [r.rep_id for r in rep_plan.routes] == ["r2"]
+    assert insights_after == insights_before
+
+
+async def test_archive_keeps_rollups_and_restores(session_factory):
+    async with session_factory() as session:
+        await archive_month(session, JAN)
+        await session.commit()
+        with pytest.raises(ArchiveError):
+            await archive_month(session, JAN)
+
+        # Полная пересборка не стирает сводки архивного месяца
+        await rebuild_rollups(session)
+        await session.commit()
+        months = set((await session.execute(select(MonthlyVisitRollup.month))).scalars())
+        assert months == {JAN, date(2025, 2, 1)}
+
+        restored = await restore_month(session, JAN)
+        await session.commit()
+        assert len(restored.schedules) == 2
+        assert await _count(session, VisitSchedule) == 3
+        assert await _count(session, VisitArchive) == 0
+        assert (await session.get(VisitLog, "v1")).time_out == time(10, 20)
+
+
+async def test_restore_brings_back_links_from_other_months(session_factory):
+    async with session_factory() as session:
+        # Пропущенный январский визит отмечен в феврале
+        session.add(VisitLog(id="v2", schedule_id="s2", location_id="l2", rep_id="r2",
+                             visited_date=date(2025, 2, 4)))
+        await session.commit()
+
+        archive = await archive_month(session, JAN)
+        await session.commit()
+        assert (await session.get(VisitLog, "v2")).schedule_id is None
+        assert (await session.get(SkippedVisitStash, "k1")).visit_schedule_id is None
+        assert sorted((await load_archived_month(session, JAN)).links) == [
+            ("skipped_visit_stash", "k1", "visit_schedule_id", "s2"),
+            ("visit_log", "v2", "schedule_id", "s2"),
+        ]
+        assert archive.log_count == 1
+
+        await restore_month(session, JAN)
+        await session.commit()
+
+    async with session_factory() as session:
+        assert (await session.get(VisitLog, "v2")).schedule_id == "s2"
+        assert (await session.get(VisitLog, "v1")).schedule_id == "s1"
+        assert (await session.get(SkippedVisitStash, "k1")).visit_schedule_id == "s2"
+
+
+async def test_writes_into_archived_month_are_rejected(session_factory):
+    async with session_factory() as session:
+        await archive_month(session, JAN)
+        await session.commit()
+        plan_before = await _build_monthly_plan_response(session, "2025-01")
+
+    async with session_factory() as session:
+        with pytest.raises(HTTPException) as exc_info:
+            await create_visit(
+                VisitCreate(location_id="l2", rep_id="r2", visited_date=date(2025, 1, 20)),
+                session=session,
+            )
+        assert exc_info.value.status_code == 409
+        with pytest.raises(HTTPException) as exc_info:
+            await resolve_stash_manual(
+                "k1", ResolveManualRequest(rep_id="r1", target_date=date(2025, 1, 27)), session=session,
+            )
+        assert exc_info.value.status_code == 409
+
+    async with session_factory() as session:
+        # Ни одной горячей строки в январе — чтение из архива ничего не прячет
+        assert await _count(session, VisitLog) == 0
+        assert await _count(session, VisitSchedule) == 1
+        assert await _build_monthly_plan_response(session, "2025-01") == plan_before
+
+        # После restore запись разрешена и попадает в архив при повторной архивации
+        await restore_month(session, JAN)
+        await session.commit()
+        await create_visit(
+            VisitCreate(location_id="l2", rep_id="r2", visited_date=date(2025, 1, 20)),
+            session=session,
+        )
+        archive = await archive_month(session, JAN)
+        await session.commit()
+        assert archive.log_count == 2
+        loaded = await load_archived_month(session, JAN)
+        assert sorted(lg.visited_date.day for lg in loaded.logs) == [13, 20]
+
+
+async def test_archive_closed_months_by_horizon(session_factory):
+    async with session_factory() as session:
+        archived = await archive_closed_months(session, 1, today=date(2025, 2, 10))
+        assert archived == [JAN]
+        assert await load_archived_month(session, date(2025, 2, 1)) is None
+
+        loaded = await load_archived_month(session, JAN)
+        assert [s.location.name for s in loaded.schedules] == ["l1", "l2"]
+        assert loaded.logs[0].rep.name == "Иванов"
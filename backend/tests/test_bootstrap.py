@@ -0,0 +1,84 @@
+"""
+Тесты подготовки/проверки схемы (src/database/bootstrap.py).
+
+Режим verify проверяет ревизию одним запросом к alembic_version;
+БД — SQLite (aiosqlite), alembic против неё не запускается.
+"""
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import event, text  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from src.database.bootstrap import (  # noqa: E402
+    SchemaRevisionMismatch,
+    _alembic_config,
+    ensure_compat_schema,
+    head_revision,
+    verify_schema,
+)
+from src.utils.timing import PhaseTimer  # noqa: E402
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'boot.db'}")
+    yield engine
+    await engine.dispose()
+
+
+async def test_head_revision_is_single_head(engine):
+    from alembic.script import ScriptDirectory
+
+    # Одна голова: ветвление миграций сломало бы режим verify
+    heads = ScriptDirectory.from_config(_alembic_config()).get_heads()
+    assert len(heads) == 1
+    assert head_revision() == heads[0]
+
+    # Без expected verify_schema сверяет с head по файлам миграций
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+        await conn.execute(text("INSERT INTO alembic_version VALUES (:head)"), {"head": heads[0]})
+    assert await verify_schema(engine) == heads[0]
+
+
+async def test_verify_schema_is_one_query(engine):
+    with pytest.raises(SchemaRevisionMismatch, match="missing"):
+        await verify_schema(engine, expected="013_add_hot_query_indexes")
+
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+        await conn.execute(text("INSERT INTO alembic_version VALUES ('012_add_visit_archive')"))
+    with pytest.raises(SchemaRevisionMismatch, match="012_add_visit_archive"):
+        await verify_schema(engine, expected="013_add_hot_query_indexes")
+
+    async with engine.begin() as conn:
+        await conn.execute(text("UPDATE alembic_version SET version_num = '013_add_hot_query_indexes'"))
+    statements = []
+    event.listen(
+        engine.sync_engine, "before_cursor_execute",
+        lambda conn, cursor, sql, params, context, many: statements.append(sql),
+    )
+    assert await verify_schema(engine, expected="013_add_hot_query_indexes") == "013_add_hot_query_indexes"
+    assert statements == ["SELECT version_num FROM alembic_version"]
+
+
+async def test_compat_schema_survives_failing_alter(engine):
+    # SQLite не знает ADD COLUMN IF NOT EXISTS — ошибка не должна рвать транзакцию
+    async with engine.begin() as conn:
+        await ensure_compat_schema(conn)
+        assert (await conn.execute(text("SELECT COUNT(*) FROM locations"))).scalar() == 0
+
+
+def test_phase_timer_records_phases():
+    timer = PhaseTimer("startup")
+    with timer.phase("schema"):
+        pass
+    with pytest.raises(RuntimeError):
+        with timer.phase("seed"):
+            raise RuntimeError("boom")
+    summary = timer.summary()
+    assert list(summary["phases"]) == ["schema", "seed"]
+    assert summary["total_ms"] >= sum(summary["phases"].values())
@@ -0,0 +1,149 @@
+"""
+Тесты универсальных CRUD-роутеров (src/routes/cruddata.py):
+keyset-пагинация, проекция fields=, индексные фильтры, bulk POST,
+пересчёт месячных сводок при записи визитов.
+
+Приложение с одним роутером, сессия — SQLite (aiosqlite), запросы через
+httpx.ASGITransport в том же event loop.
+"""
+
+from datetime import date
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from sqlalchemy import event, select  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from src.database.models import (  # noqa: E402
+    Base,
+    Location,
+    MonthlyVisitRollup,
+    SalesRep,
+    VisitSchedule,
+    get_session,
+)
+from src.routes.cruddata import (  # noqa: E402
+    create_crud_router,
+    decode_cursor,
+    encode_cursor,
+    filterable_columns,
+)
+
+
+@pytest.fixture
+async def client(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'crud.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with factory() as session:
+        session.add_all([
+            SalesRep(id="r1", name="Иванов"),
+            SalesRep(id="r2", name="Петров"),
+            Location(id="l1", name="l1", lat=54.0, lon=45.0,
+                     time_window_start="09:00", time_window_end="18:00"),
+        ])
+        await session.commit()
+
+    statements = []
+    event.listen(
+        engine.sync_engine, "before_cursor_execute",
+        lambda conn, cursor, sql, params, context, many: statements.append(sql),
+    )
+
+    async def override_session():
+        async with factory() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(create_crud_router(VisitSchedule, "visit-schedule"))
+    app.dependency_overrides[get_session] = override_session
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        http.statements = statements
+        http.session_factory = factory
+        yield http
+    await engine.dispose()
+
+
+def _rows(count, rep_id="r1"):
+    return [
+        {"id": f"{rep_id}-{i:02d}", "location_id": "l1", "rep_id": rep_id,
+         "planned_date": f"2026-03-{i + 1:02d}", "status": "planned"}
+        for i in range(count)
+    ]
+
+
+def test_cursor_roundtrip_and_filterable_columns():
+    assert decode_cursor(encode_cursor(["2026-03-01T10:00:00", "a"])) == ["2026-03-01T10:00:00", "a"]
+    assert filterable_columns(VisitSchedule) == ["id", "location_id", "planned_date", "rep_id"]
+
+
+async def test_bulk_create_is_one_insert(client):
+    client.statements.clear()
+    resp = await client.post("/visit-schedule", json=_rows(5) + _rows(3, "r2"))
+
+    assert resp.status_code == 200
+    assert len(resp.json()["data"]) == 8
+    assert resp.json()["data"][0]["created_at"] is not None  # Python-default применён
+    inserts = [sql for sql in client.statements if sql.startswith("INSERT INTO visit_schedule")]
+    assert len(inserts) == 1
+
+    bad = await client.post("/visit-schedule", json=[{"id": "x", "bogus": 1}])
+    assert bad.status_code == 400
+
+
+async def _planned_by_rep(client) -> dict:
+    async with client.session_factory() as session:
+        rows = (await session.execute(
+            select(MonthlyVisitRollup.rep_id, MonthlyVisitRollup.month, MonthlyVisitRollup.planned)
+        )).all()
+    return {(rep_id, month.month): planned for rep_id, month, planned in rows}
+
+
+async def test_writes_keep_rollups_in_sync(client):
+    await client.post("/visit-schedule", json=_rows(3))
+    await client.post("/visit-schedule", json={**_rows(1, "r2")[0], "id": "single"})
+    assert await _planned_by_rep(client) == {("r1", 3): 3, ("r2", 3): 1}
+
+    # Перенос на другого сотрудника и месяц — пересчёт и старой, и новой пары
+    resp = await client.put("/visit-schedule/r1-00", json={"rep_id": "r2", "planned_date": "2026-04-01"})
+    assert resp.status_code == 200
+    assert await _planned_by_rep(client) == {("r1", 3): 2, ("r2", 3): 1, ("r2", 4): 1}
+
+    assert (await client.delete("/visit-schedule/single")).status_code == 200
+    assert await _planned_by_rep(client) == {("r1", 3): 2, ("r2", 4): 1}
+
+
+async def test_keyset_pages_projection_and_filters(client):
+    await client.post("/visit-schedule", json=_rows(5) + _rows(3, "r2"))
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, "fields": "id,planned_date", "rep_id": "r1"}
+        if cursor:
+            params["cursor"] = cursor
+        page = (await client.get("/visit-schedule", params=params)).json()
+        seen += page["visit-schedule"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert [row["id"] for row in seen] == [f"r1-{i:02d}" for i in range(5)]
+    assert set(seen[0]) == {"id", "planned_date"}
+
+    select_sql = [sql for sql in client.statements if sql.startswith("SELECT")][-1]
+    assert "status" not in select_sql.split("FROM")[0]
+
+    by_date = (await client.get(
+        "/visit-schedule", params={"planned_date": "2026-03-02", "order_by": "created_at"},
+    )).json()["visit-schedule"]
+    assert {row["id"] for row in by_date} == {"r1-01", "r2-01"}
+    assert by_date[0]["planned_date"] == date(2026, 3, 2).isoformat()
+
+    assert (await client.get("/visit-schedule", params={"status": "planned"})).status_code == 400
+    assert (await client.get("/visit-schedule", params={"fields": "nope"})).status_code == 400
@@ -0,0 +1,83 @@
+"""
+Тесты настроек пула соединений и телеметрии пула (src/database/pool.py).
+"""
+
+import pytest
+from sqlalchemy import text
+
+from src.config import Settings
+from src.database.pool import (
+    CHECKOUT_BUCKETS_MS,
+    InstrumentedAsyncQueuePool,
+    PoolStats,
+    engine_options,
+    pool_status,
+)
+
+PG_URL = "postgresql+asyncpg://u:p@localhost:5432/t2"
+
+
+def test_engine_options_from_settings():
+    settings = Settings(
+        db_pool_size=3, db_max_overflow=2, db_pool_timeout_s=1.5,
+        db_pool_recycle_s=60, db_pool_pre_ping=False,
+        db_statement_cache_size=0, db_statement_timeout_ms=5000,
+    )
+    options = engine_options(settings, PG_URL)
+
+    assert options["poolclass"] is InstrumentedAsyncQueuePool
+    assert options["pool_size"] == 3
+    assert options["max_overflow"] == 2
+    assert options["pool_timeout"] == 1.5
+    assert options["pool_recycle"] == 60
+    assert options["pool_pre_ping"] is False
+    assert options["connect_args"] == {
+        "prepared_statement_cache_size": 0,
+        "statement_cache_size": 0,
+        "server_settings": {"statement_timeout": "5000"},
+    }
+
+
+def test_statement_timeout_disabled_by_default():
+    options = engine_options(Settings(), PG_URL)
+    assert "server_settings" not in options["connect_args"]
+    assert "connect_args" not in engine_options(Settings(), "sqlite+aiosqlite:///x.db")
+
+
+def test_pool_stats_histogram_is_cumulative():
+    stats = PoolStats()
+    for wait_ms in (0.5, 3, 3, 700, 20000):
+        stats.observe(wait_ms)
+    stats.observe_timeout()
+    snap = stats.snapshot()
+
+    assert snap["checkouts"] == 5
+    assert snap["timeouts"] == 1
+    assert snap["wait_max_ms"] == 20000
+    hist = snap["wait_histogram_ms"]
+    assert list(hist)[-1] == "+Inf"
+    assert len(hist) == len(CHECKOUT_BUCKETS_MS) + 1
+    assert hist["1"] == 1 and hist["5"] == 3 and hist["1000"] == 4 and hist["+Inf"] == 5
+
+
+async def test_instrumented_pool_records_checkouts(tmp_path):
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}"
+    options = engine_options(Settings(db_pool_size=2, db_max_overflow=0), url)
+    engine = create_async_engine(url, **options)
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            busy = pool_status(engine)
+        idle = pool_status(engine)
+    finally:
+        await engine.dispose()
+
+    assert busy["class"] == "InstrumentedAsyncQueuePool"
+    assert busy["checked_out"] == 1
+    assert busy["size"] == 2
+    assert idle["checked_out"] == 0
+    assert idle["checkouts"] == 1
+    assert idle["wait_histogram_ms"]["+Inf"] == 1
@@ -0,0 +1,132 @@
+"""
+Тесты маршрутизации чтений на read-реплику (src/database/replica.py).
+
+Вместо Postgres-реплики — два файла SQLite: «primary» и «replica»
+с разными данными, чтобы было видно, откуда читал эндпоинт.
+"""
+
+from datetime import date
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from fastapi import Response  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+import src.database.replica as replica  # noqa: E402
+from src.database.models import Base, Location, SalesRep, VisitLog  # noqa: E402
+from src.database.replica import (  # noqa: E402
+    PRIMARY,
+    READ_TARGET_HEADER,
+    REPLICA,
+    ReplicaRouter,
+    get_read_session,
+)
+from src.routes.visits import get_visit_stats  # noqa: E402
+from src.services.analytics_rollup import rebuild_rollups  # noqa: E402
+
+
+async def _make_db(path, visits: int):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with factory() as s:
+        s.add_all([
+            SalesRep(id="r1", name="Иванов"),
+            Location(id="l1", name="l1", lat=54.0, lon=45.0, category="A",
+                     time_window_start="09:00", time_window_end="18:00"),
+        ])
+        await s.flush()
+        s.add_all([
+            VisitLog(location_id="l1", rep_id="r1", visited_date=date(2026, 2, day + 1))
+            for day in range(visits)
+        ])
+        await s.flush()
+        await rebuild_rollups(s)
+        await s.commit()
+    return engine, factory
+
+
+@pytest.fixture
+async def dbs(tmp_path):
+    # На primary 3 визита, реплика «отстала» и видит только 1
+    primary_engine, primary_factory = await _make_db(tmp_path / "primary.db", 3)
+    replica_engine, _ = await _make_db(tmp_path / "replica.db", 1)
+    yield primary_factory, replica_engine
+    await primary_engine.dispose()
+    await replica_engine.dispose()
+
+
+def _request(headers=None) -> Request:
+    raw = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+async def _stats_via_dependency(headers=None):
+    response = Response()
+    dependency = get_read_session(_request(headers), response)
+    session = await dependency.__anext__()
+    try:
+        stats = await get_visit_stats(month="2026-02", month_to=None, rep_id=None, session=session)
+    finally:
+        await dependency.aclose()
+    return stats.total_visits, response.headers[READ_TARGET_HEADER]
+
+
+async def test_without_replica_reads_go_to_primary(dbs):
+    primary_factory, _ = dbs
+    router = ReplicaRouter(primary_factory)
+
+    factory, target = await router.choose()
+    assert factory is primary_factory and target == PRIMARY
+    assert router.status() == {"configured": False, "reads": router.reads}
+
+
+async def test_dependency_routes_to_replica_and_honours_read_your_writes(dbs, monkeypatch):
+    primary_factory, replica_engine = dbs
+    monkeypatch.setattr(replica, "replica_router", ReplicaRouter(primary_factory, replica_engine))
+
+    assert await _stats_via_dependency() == (1, REPLICA)
+    assert await _stats_via_dependency({"X-Read-Your-Writes": "1"}) == (3, PRIMARY)
+
+    reads = replica.replica_router.reads
+    assert reads[REPLICA] == 1 and reads["read_your_writes"] == 1
+
+
+async def test_lagging_replica_falls_back_to_primary(dbs, monkeypatch):
+    primary_factory, replica_engine = dbs
+    router = ReplicaRouter(primary_factory, replica_engine, max_lag_s=5.0, check_interval_s=60)
+
+    async def lag_30s(conn):
+        return 30.0
+
+    monkeypatch.setattr(replica, "measure_replica_lag", lag_30s)
+    _, target = await router.choose()
+    assert target == PRIMARY
+    assert router.status()["lag_s"] == 30.0 and router.reads["fallback"] == 1
+
+    # Результат проверки кэшируется: реплика догнала, но до интервала не перепроверяем
+    async def no_lag(conn):
+        return 0.0
+
+    monkeypatch.setattr(replica, "measure_replica_lag", no_lag)
+    assert (await router.choose())[1] == PRIMARY
+    assert await router.check(force=True) is True
+    assert (await router.choose())[1] == REPLICA
+
+
+async def test_unavailable_replica_falls_back_to_primary(dbs, tmp_path):
+    primary_factory, _ = dbs
+    broken = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    router = ReplicaRouter(primary_factory, broken)
+    try:
+        factory, target = await router.choose()
+    finally:
+        await broken.dispose()
+
+    assert factory is primary_factory and target == PRIMARY
+    status = router.status()
+    assert status["healthy"] is False and status["last_error"]
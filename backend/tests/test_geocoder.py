@@ -0,0 +1,125 @@
+"""
+Unit-тесты для геокодера импорта ТТ (src/services/geocoder.py).
+
+Проверяют нормализацию/стемминг, уверенность сопоставления,
+детерминированный fallback и расширение справочника из файла.
+"""
+
+import io
+import json
+
+import pytest
+
+from src.services.geocoder import (
+    CONFIDENCE_EXACT,
+    DEFAULT_CENTER,
+    FALLBACK_SPREAD_DEG,
+    MORDOVIA_GAZETTEER,
+    Geocoder,
+    load_gazetteer_file,
+    normalize_tokens,
+)
+
+
+@pytest.fixture
+def geocoder():
+    return Geocoder(MORDOVIA_GAZETTEER)
+
+
+class TestNormalization:
+    def test_stopwords_and_yo(self):
+        assert normalize_tokens("Дубёнский район") == normalize_tokens("дубенский")
+        assert normalize_tokens("г.о. Саранск") == normalize_tokens("Саранск")
+
+    def test_town_and_district_share_stem(self):
+        assert normalize_tokens("Ардатово") == normalize_tokens("Ардатовский р-н")
+        assert normalize_tokens("Зубова Поляна") == normalize_tokens("Зубово-Полянский район")
+
+
+class TestLookup:
+    def test_exact_match(self, geocoder):
+        result = geocoder.lookup("ардатовский район")
+        assert result.method == "exact"
+        assert result.confidence == CONFIDENCE_EXACT
+        assert (result.lat, result.lon) == MORDOVIA_GAZETTEER["Ардатовский район"]
+        assert result.matched == "Ардатовский район"
+
+    def test_token_match_has_lower_confidence(self, geocoder):
+        result = geocoder.lookup("Рузаевский район, с. Перхляй, ул. Ленина 5")
+        assert result.method == "token"
+        assert 0.0 < result.confidence < CONFIDENCE_EXACT
+        assert result.matched == "Рузаевский район"
+
+    def test_prefix_match(self, geocoder):
+        result = geocoder.lookup("Ковылк.")
+        assert result.method == "prefix"
+        assert result.matched == "Ковылкинский район"
+
+    def test_unknown_returns_none(self, geocoder):
+        assert geocoder.lookup("Неизвестное место") is None
+        assert geocoder.lookup("") is None
+
+
+class TestFallback:
+    def test_fallback_is_deterministic(self, geocoder):
+        first = geocoder.geocode("Магазин у дороги")
+        second = Geocoder(MORDOVIA_GAZETTEER).geocode("магазин  у дороги")
+        assert first == second
+        assert first.method == "fallback"
+        assert first.confidence == 0.0
+
+    def test_fallback_stays_near_center(self, geocoder):
+        for name in ("ТТ-1", "ТТ-2", "Киоск", "Ларёк"):
+            result = geocoder.fallback(name)
+            assert abs(result.lat - DEFAULT_CENTER[0]) <= FALLBACK_SPREAD_DEG
+            assert abs(result.lon - DEFAULT_CENTER[1]) <= FALLBACK_SPREAD_DEG
+
+
+def test_gazetteer_file_extends_index(tmp_path):
+    path = tmp_path / "penza.json"
+    path.write_text(json.dumps({
+        "center": [53.195, 45.018],
+        "places": {"Бессоновский район": [53.29, 45.07]},
+    }, ensure_ascii=False), encoding="utf-8")
+
+    center, places = load_gazetteer_file(path)
+    geocoder = Geocoder({**MORDOVIA_GAZETTEER, **places}, center=center)
+
+    assert geocoder.lookup("Бессоновка").matched == "Бессоновский район"
+    assert geocoder.lookup("Инсарский район").method == "exact"
+    fallback = geocoder.fallback("нет такого")
+    assert abs(fallback.lat - 53.195) <= FALLBACK_SPREAD_DEG
+
+
+def test_parse_xlsx_reimport_gives_same_coords():
+    from openpyxl import Workbook
+    from src.routes.locations import _parse_xlsx
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Наименование района", "Категория"])
+    ws.append(["Темниковский район", "A"])
+    ws.append(["Безымянная ТТ", "B"])
+    buf = io.BytesIO()
+    wb.save(buf)
+    content = buf.getvalue()
+
+    first = _parse_xlsx(content)
+    second = _parse_xlsx(content)
+
+    assert [(r["lat"], r["lon"]) for r in first] == [(r["lat"], r["lon"]) for r in second]
+    assert first[0]["geocode"]["method"] == "exact"
+    assert first[1]["geocode"]["method"] == "fallback"
+
+
+def test_geocode_row_prefers_confident_district_over_name_prefix():
+    from src.routes.locations import _geocode_row
+
+    # «Ковылк.» в названии — слабый префикс (0.4), район указан точно
+    row = {"name": "Ковылк. магазин", "district": "Темниковский район"}
+    result = _geocode_row(row)
+    assert result.matched == "Темниковский район"
+    assert result.confidence == CONFIDENCE_EXACT
+
+    # Без района название всё ещё используется
+    assert _geocode_row({"name": "Ковылк. магазин"}).matched == "Ковылкинский район"
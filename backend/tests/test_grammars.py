@@ -0,0 +1,85 @@
+"""
+Тесты ограниченной декодировки (src/models/grammars.py): схемы ответов,
+построение GBNF-грамматик и передача grammar в llama.cpp клиентами.
+"""
+
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.config import settings
+from src.models.grammars import (
+    evaluation_max_tokens,
+    evaluation_schema,
+    json_schema_grammar,
+    route_max_tokens,
+    route_schema,
+)
+
+
+def test_route_schema_pins_ids_and_length():
+    schema = route_schema(["l1", "l2", "l3"])
+    sequence = schema["properties"]["locations_sequence"]
+    assert sequence["items"] == {"enum": ["l1", "l2", "l3"]}
+    assert sequence["minItems"] == sequence["maxItems"] == 3
+    assert schema["additionalProperties"] is False
+    assert route_max_tokens(3, 512) == 512
+    assert route_max_tokens(50, 512) == 696
+
+
+def test_evaluation_schema_one_entry_per_variant():
+    schema = evaluation_schema([1, 2])
+    assert schema["minItems"] == schema["maxItems"] == 2
+    assert schema["items"]["properties"]["id"] == {"enum": [1, 2]}
+    assert schema["items"]["properties"]["pros"]["minItems"] == 2
+    # Лимит вмещает 3 варианта × 6 фраз по MAX_POINT_CHARS
+    assert evaluation_max_tokens(1, 512) == 512
+    assert evaluation_max_tokens(3, 512) == 3 * (6 * 44 + 16) + 16
+
+
+def test_grammar_is_built_and_cached(monkeypatch):
+    pytest.importorskip("llama_cpp")
+    monkeypatch.setattr(settings, "llm_constrained_decoding", True)
+
+    grammar = json_schema_grammar(route_schema(["loc-1", "loc-2"]))
+    assert grammar is not None
+    assert '\\"loc-1\\"' in grammar._grammar
+    assert json_schema_grammar(route_schema(["loc-1", "loc-2"])) is grammar
+
+    monkeypatch.setattr(settings, "llm_constrained_decoding", False)
+    assert json_schema_grammar(route_schema(["loc-1", "loc-2"])) is None
+
+
+async def test_qwen_client_decodes_with_grammar(monkeypatch):
+    monkeypatch.setattr(settings, "llm_constrained_decoding", True)
+    monkeypatch.setattr(settings, "llm_prompt_cache_mb", 0)
+    from src.models.qwen_client import QwenClient
+
+    locations = []
+    for i in range(3):
+        loc = MagicMock()
+        loc.model_dump.return_value = {"ID": f"l{i}", "name": f"ТТ {i}", "lat": 54.1 + i / 100,
+                                       "lon": 45.1, "priority": "A"}
+        locations.append(loc)
+
+    llm = MagicMock()
+    llm.create_chat_completion.return_value = {"choices": [{"message": {"content": json.dumps({
+        "locations_sequence": ["l0", "l2", "l1"], "total_distance_km": 3.5,
+        "total_time_hours": 0.8, "total_cost_rub": 24.5,
+    })}}]}
+    grammar = object()
+    with patch("src.models.qwen_client.settings") as mock_settings, \
+         patch("src.models.qwen_client.Llama", return_value=llm), \
+         patch("src.models.qwen_client.json_schema_grammar", return_value=grammar) as build:
+        mock_settings.qwen_model_id = "qwen.gguf"
+        mock_settings.get_model_path.return_value = "/path/to/qwen.gguf"
+        QwenClient._llm = None
+        route = await QwenClient().generate_route(locations)
+
+    QwenClient._llm = None
+    assert route.total_distance_km == 3.5
+    assert llm.create_chat_completion.call_count == 1
+    assert llm.create_chat_completion.call_args.kwargs["grammar"] is grammar
+    schema = build.call_args.args[0]
+    assert schema["properties"]["locations_sequence"]["items"]["enum"] == ["l0", "l1", "l2"]
@@ -0,0 +1,66 @@
+"""
+Бюджет холодного старта: профиль `python -X importtime -c "import main"`.
+
+Тяжёлые опциональные подсистемы (llama_cpp, openpyxl, httpx, requests)
+не должны грузиться при импорте приложения, а сам импорт — укладываться
+в STARTUP_IMPORT_BUDGET_MS (по умолчанию 3000 мс с запасом на шумный CI).
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "3000"))
+LAZY_MODULES = ("llama_cpp", "openpyxl", "httpx", "requests", "numpy")
+
+
+def _import_profile(module: str) -> dict[str, tuple[int, int]]:
+    """Модуль → (self, cumulative) в мкс по выводу -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, timeout=120,
+    )
+    if proc.returncode != 0:
+        pytest.skip(f"import {module} failed: {proc.stderr.strip().splitlines()[-1:]}")
+
+    profile = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+@pytest.fixture(scope="module")
+def main_profile():
+    return _import_profile("main")
+
+
+@pytest.mark.parametrize("module", LAZY_MODULES)
+def test_heavy_dependency_is_not_imported_at_startup(main_profile, module):
+    assert module not in main_profile, f"{module} imported eagerly by main"
+
+
+def test_startup_import_budget(main_profile):
+    total_ms = main_profile["main"][1] / 1000
+    slowest = sorted(
+        ((cum, name) for name, (_, cum) in main_profile.items() if name.startswith("src.")),
+        reverse=True,
+    )[:5]
+    assert total_ms <= IMPORT_BUDGET_MS, (
+        f"import main took {total_ms:.0f} ms > {IMPORT_BUDGET_MS:.0f} ms; slowest: "
+        + ", ".join(f"{name}={cum / 1000:.0f}ms" for cum, name in slowest)
+    )
+
+
+def test_missing_optional_dependency_is_reported_on_use():
+    from src.utils.optional_deps import MissingDependency, has_module, require
+
+    assert not has_module("definitely_not_installed_pkg")
+    with pytest.raises(MissingDependency, match="pip install"):
+        require("definitely_not_installed_pkg")
@@ -0,0 +1,119 @@
+"""
+Тесты исполнителя инференса (src/models/inference_worker.py):
+строгая очерёдность вызовов модели, ограничение очереди, дедлайны
+и отображение отказов в ошибки клиентов.
+"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.models.inference_worker import (
+    InferenceDeadlineError,
+    InferenceQueueFullError,
+    InferenceWorker,
+)
+
+
+@pytest.fixture
+def worker():
+    worker = InferenceWorker("test", max_queue=3)
+    yield worker
+    worker.shutdown()
+
+
+async def test_calls_are_serialized_on_one_thread(worker):
+    active, peak, threads = [0], [0], set()
+    lock = threading.Lock()
+
+    def infer():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            threads.add(threading.current_thread().name)
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return "ok"
+
+    results = await asyncio.gather(*(worker.run(infer, timeout_s=5) for _ in range(3)))
+
+    assert results == ["ok"] * 3
+    assert peak[0] == 1
+    assert len(threads) == 1 and threads.pop().startswith("llm-test")
+    stats = worker.snapshot()
+    assert (stats["completed"], stats["queue_depth"], stats["max_depth"]) == (3, 0, 3)
+
+
+async def test_full_queue_is_rejected(worker):
+    release = threading.Event()
+    pending = [asyncio.ensure_future(worker.run(release.wait, timeout_s=5)) for _ in range(3)]
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(InferenceQueueFullError):
+        await worker.run(lambda: "late", timeout_s=5)
+
+    release.set()
+    assert await asyncio.gather(*pending) == [True] * 3
+    assert worker.snapshot()["rejected"] == 1
+
+
+async def test_deadline_expires_in_queue_without_running(worker):
+    release = threading.Event()
+    calls = []
+    blocker = asyncio.ensure_future(worker.run(release.wait, timeout_s=5))
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(InferenceDeadlineError):
+        await worker.run(lambda: calls.append("ran"), timeout_s=0.1)
+
+    release.set()
+    await blocker
+    await asyncio.sleep(0.05)
+    assert calls == []
+    stats = worker.snapshot()
+    assert stats["timeouts"] == 1 and stats["queue_depth"] == 0
+
+
+async def test_admission_uses_observed_latency(worker):
+    await worker.run(lambda: time.sleep(0.2), timeout_s=5)
+    release = threading.Event()
+    blocker = asyncio.ensure_future(worker.run(release.wait, timeout_s=5))
+    await asyncio.sleep(0.05)
+
+    # Один запрос в работе (~0.2 с по наблюдениям) — дедлайн 0.05 с заведомо не успеть
+    with pytest.raises(InferenceQueueFullError, match="expected queue wait"):
+        await worker.run(lambda: "x", timeout_s=0.05)
+
+    release.set()
+    await blocker
+
+
+async def test_qwen_queue_full_is_rate_limit_without_retries():
+    from src.models.exceptions import QwenRateLimitError
+    from src.models.qwen_client import QwenClient
+
+    busy = MagicMock()
+
+    async def reject(*args, **kwargs):
+        raise InferenceQueueFullError("full")
+
+    busy.run.side_effect = reject
+    with patch("src.models.qwen_client.settings") as mock_settings, \
+         patch("src.models.qwen_client.Llama"), \
+         patch("src.models.qwen_client.get_worker", return_value=busy):
+        mock_settings.qwen_model_id = "qwen.gguf"
+        mock_settings.get_model_path.return_value = "/path/to/qwen.gguf"
+        QwenClient._llm = None
+        client = QwenClient()
+        location = MagicMock()
+        location.model_dump.return_value = {"ID": "l1", "name": "A", "lat": 54.1, "lon": 45.1, "priority": "A"}
+
+        with pytest.raises(QwenRateLimitError):
+            await client.generate_route([location])
+        assert busy.run.call_count == 1
+        assert await client.evaluate_variants([{"id": 1, "name": "v", "metrics": {}}]) == []
+    QwenClient._llm = None
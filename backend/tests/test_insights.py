@@ -0,0 +1,124 @@
+"""
+Тесты агрегации GET /insights (src/routes/insights.py).
+
+Считаем на небольшом наборе в SQLite (aiosqlite) и сверяем
+с ответом, посчитанным вручную.
+"""
+
+from datetime import date
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from src.database.models import (  # noqa: E402
+    Base,
+    ForceMajeureEvent,
+    Location,
+    SalesRep,
+    VisitLog,
+    VisitSchedule,
+)
+from src.routes.insights import collect_insights  # noqa: E402
+
+
+def _loc(id_, category, district):
+    return Location(
+        id=id_, name=id_, lat=54.0, lon=45.0,
+        time_window_start="09:00", time_window_end="18:00",
+        category=category, district=district,
+    )
+
+
+@pytest.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'insights.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with factory() as session:
+        session.add_all([
+            SalesRep(id="r1", name="Иванов"),
+            SalesRep(id="r2", name="Петров"),
+            _loc("l1", "A", "Саранск"),
+            _loc("l2", "A", "Рузаевский район"),
+            _loc("l3", "B", "Саранск"),
+            _loc("l4", None, None),
+        ])
+        await session.flush()
+        session.add_all([
+            VisitSchedule(id="s1", location_id="l1", rep_id="r1", planned_date=date(2026, 3, 2)),
+            VisitSchedule(id="s2", location_id="l1", rep_id="r1", planned_date=date(2026, 3, 16)),
+            VisitSchedule(id="s3", location_id="l3", rep_id="r2", planned_date=date(2026, 3, 3)),
+            # Другой месяц — не учитывается
+            VisitSchedule(id="s4", location_id="l2", rep_id="r2", planned_date=date(2026, 4, 1)),
+            VisitLog(id="v1", location_id="l1", rep_id="r1", visited_date=date(2026, 3, 2)),
+            VisitLog(id="v2", location_id="l1", rep_id="r1", visited_date=date(2026, 3, 16)),
+            VisitLog(id="v3", location_id="l3", rep_id="r2", visited_date=date(2026, 3, 3)),
+            ForceMajeureEvent(id="f1", type="illness", rep_id="r2", event_date=date(2026, 3, 10)),
+        ])
+        await session.commit()
+
+    yield factory
+    await engine.dispose()
+
+
+async def test_collect_insights_counts(session_factory):
+    data = await collect_insights(session_factory, 2026, 3)
+
+    assert data["month"] == "2026-03"
+    assert data["total_tt"] == 4
+    assert data["coverage_pct"] == 50.0
+    assert data["visits_this_month"] == {"planned": 3, "completed": 3, "completion_rate": 100.0}
+    assert data["by_category"]["A"] == {"total": 2, "planned": 2, "completed": 1, "pct": 50.0}
+    assert data["by_category"]["B"] == {"total": 1, "planned": 1, "completed": 1, "pct": 100.0}
+    assert data["by_category"]["D"]["total"] == 0
+    assert data["by_district"] == [
+        {"district": "Неизвестно", "total": 1, "coverage_pct": 0.0},
+        {"district": "Рузаевский район", "total": 1, "coverage_pct": 0.0},
+        {"district": "Саранск", "total": 2, "coverage_pct": 100.0},
+    ]
+    assert data["rep_activity"] == [
+        {"rep_id": "r1", "rep_name": "Иванов", "outings_count": 2, "tt_visited": 1},
+        {"rep_id": "r2", "rep_name": "Петров", "outings_count": 1, "tt_visited": 1},
+    ]
+    assert data["force_majeure_count"] == 1
+
+
+async def test_collect_insights_caps_connections(session_factory, monkeypatch):
+    from src.config import settings
+
+    monkeypatch.setattr(settings, "insights_max_parallel_queries", 2)
+    open_sessions, peak = 0, 0
+
+    class CountingSession:
+        def __init__(self):
+            self._session = session_factory()
+
+        async def __aenter__(self):
+            nonlocal open_sessions, peak
+            open_sessions += 1
+            peak = max(peak, open_sessions)
+            return await self._session.__aenter__()
+
+        async def __aexit__(self, *exc):
+            nonlocal open_sessions
+            open_sessions -= 1
+            return await self._session.__aexit__(*exc)
+
+    data = await collect_insights(CountingSession, 2026, 3)
+    assert data == await collect_insights(session_factory, 2026, 3)
+    assert peak == 2
+
+
+async def test_collect_insights_empty_month(session_factory):
+    data = await collect_insights(session_factory, 2025, 1)
+
+    assert data["total_tt"] == 4
+    assert data["coverage_pct"] == 0.0
+    assert data["visits_this_month"]["completion_rate"] == 0.0
+    assert data["rep_activity"] == []
+    assert data["force_majeure_count"] == 0
@@ -0,0 +1,113 @@
+"""
+Тесты кэша ответов LLM (src/services/llm_cache.py): попадание без
+инференса, TTL, вытеснение по размеру, статистика. БД — SQLite (aiosqlite).
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import func, select  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from src.config import settings  # noqa: E402
+from src.database.models import Base, LLMResultCache  # noqa: E402
+from src.services.llm_cache import (  # noqa: E402
+    cache_key,
+    cache_stats,
+    evaluate_variants_cached,
+    get_cached,
+    store,
+)
+
+VARIANTS = [
+    {"id": 1, "name": "Кратчайший", "metrics": {"distance_km": 18.24, "time_hours": 2.1, "cost_rub": 130}},
+    {"id": 2, "name": "По приоритету", "metrics": {"distance_km": 21.7, "time_hours": 2.4, "cost_rub": 152}},
+]
+EVALUATION = [
+    {"id": 1, "pros": ["короче"], "cons": ["пробки"]},
+    {"id": 2, "pros": ["A раньше"], "cons": ["дольше"]},
+]
+
+
+class FakeClient:
+    """Клиент с промптом как у QwenClient; считает вызовы модели."""
+
+    def __init__(self, model_name="qwen.gguf", answer=EVALUATION):
+        from src.models.qwen_client import QwenClient
+
+        self.model_name = model_name
+        self.answer = answer
+        self.calls = 0
+        self._construct_evaluation_prompt = QwenClient._construct_evaluation_prompt.__get__(self)
+
+    def _get_generator(self):
+        raise AssertionError("model must not be loaded on a cache hit")
+
+    async def evaluate_variants(self, variants):
+        self.calls += 1
+        return self.answer
+
+
+@pytest.fixture
+async def session(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'cache.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    cache_stats.reset()
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+
+async def test_second_evaluation_is_served_from_cache(session):
+    client = FakeClient()
+    first = await evaluate_variants_cached(session, client, VARIANTS)
+    second = await evaluate_variants_cached(session, client, VARIANTS)
+
+    assert first == second == EVALUATION
+    assert client.calls == 1
+    stats = cache_stats.snapshot()
+    assert (stats["hits"], stats["misses"], stats["stores"], stats["hit_rate"]) == (1, 1, 1, 0.5)
+    row = (await session.execute(select(LLMResultCache))).scalar_one()
+    assert row.hits == 1 and row.task == "evaluate_variants"
+
+    # Другая модель — другой ключ
+    other = FakeClient(model_name="llama.gguf")
+    await evaluate_variants_cached(session, other, VARIANTS)
+    assert other.calls == 1
+
+
+async def test_key_normalizes_whitespace_and_empty_answers_are_not_cached(session):
+    assert cache_key("m", "t", "a  b\n c") == cache_key("m", "t", " a b c ")
+    assert cache_key("m", "t", "a b") != cache_key("m2", "t", "a b")
+
+    failing = FakeClient(answer=[])
+    assert await evaluate_variants_cached(session, failing, VARIANTS) == []
+    assert await evaluate_variants_cached(session, failing, VARIANTS) == []
+    assert failing.calls == 2
+
+
+async def test_ttl_and_size_bounded_eviction(session, monkeypatch):
+    monkeypatch.setattr(settings, "llm_cache_ttl_s", 60)
+    monkeypatch.setattr(settings, "llm_cache_max_entries", 2)
+    t0 = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+
+    await store(session, "m", "t", "p1", ["one"], now=t0)
+    await store(session, "m", "t", "p2", ["two"], now=t0 + timedelta(seconds=1))
+    # p1 использована позже p2 — при переполнении вытесняется p2
+    assert await get_cached(session, "m", "t", "p1", now=t0 + timedelta(seconds=2)) == ["one"]
+    await store(session, "m", "t", "p3", ["three"], now=t0 + timedelta(seconds=3))
+
+    now = t0 + timedelta(seconds=4)
+    assert await get_cached(session, "m", "t", "p2", now=now) is None
+    assert await get_cached(session, "m", "t", "p1", now=now) == ["one"]
+    count = (await session.execute(select(func.count()).select_from(LLMResultCache))).scalar()
+    assert count == 2
+    assert cache_stats.snapshot()["evictions"] == 1
+
+    # TTL: через минуту после записи ответ уже не отдаётся
+    assert await get_cached(session, "m", "t", "p3", now=t0 + timedelta(seconds=62)) == ["three"]
+    assert await get_cached(session, "m", "t", "p1", now=t0 + timedelta(seconds=61)) is None
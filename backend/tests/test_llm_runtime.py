@@ -0,0 +1,70 @@
+"""
+Тесты параметров загрузки локальных моделей (src/models/llm_runtime.py).
+"""
+
+import json
+
+from src.config import settings
+from src.models.llm_runtime import (
+    DEFAULT_N_CTX,
+    auto_n_ctx,
+    load_model,
+    resolve_n_ctx,
+    runtime_status,
+)
+
+
+class FakeLlama:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+
+def _write_profile(path, use_mock=False):
+    path.write_text(json.dumps({
+        "use_mock": use_mock,
+        "models": {"qwen": {"route": [1400, 2000, 3100], "evaluation": [700, 800]}},
+    }))
+    return str(path)
+
+
+def test_auto_n_ctx_from_p99_with_headroom_and_bounds():
+    assert auto_n_ctx([1000, 3100, 2000], 1.25, 2048, 32768) == 4096
+    assert auto_n_ctx([300], 1.25, 2048, 32768) == 2048
+    assert auto_n_ctx([40000], 1.25, 2048, 32768) == 32768
+
+
+def test_resolve_n_ctx_sources(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "qwen_n_ctx", 6144)
+    assert resolve_n_ctx("qwen") == (6144, "settings")
+
+    monkeypatch.setattr(settings, "qwen_n_ctx", 0)
+    monkeypatch.setattr(settings, "llm_prompt_profile_path", _write_profile(tmp_path / "p.json"))
+    assert resolve_n_ctx("qwen") == (4096, "profile")
+    # Для llama в профиле нет замеров
+    monkeypatch.setattr(settings, "llama_n_ctx", 0)
+    assert resolve_n_ctx("llama") == (DEFAULT_N_CTX, "default")
+
+    # Профиль из --mock не используется
+    monkeypatch.setattr(settings, "llm_prompt_profile_path", _write_profile(tmp_path / "m.json", use_mock=True))
+    assert resolve_n_ctx("qwen") == (DEFAULT_N_CTX, "default")
+
+
+def test_load_model_applies_settings_and_reports_status(monkeypatch):
+    monkeypatch.setattr(settings, "llama_n_ctx", 4096)
+    monkeypatch.setattr(settings, "llama_n_threads", 2)
+    monkeypatch.setattr(settings, "llm_use_mlock", True)
+    monkeypatch.setattr(settings, "llm_kv_cache_type", "q8_0")
+
+    llm = load_model("llama", FakeLlama, "/models/llama.gguf")
+
+    assert llm.kwargs["model_path"] == "/models/llama.gguf"
+    assert (llm.kwargs["n_ctx"], llm.kwargs["n_threads"], llm.kwargs["n_threads_batch"]) == (4096, 2, 2)
+    assert llm.kwargs["use_mlock"] is True
+    assert llm.kwargs["type_k"] == llm.kwargs["type_v"] == 8
+    assert llm.kwargs["flash_attn"] is True
+
+    status = runtime_status()
+    assert status["rss_mb"] > 0
+    info = status["models"]["llama"]
+    assert (info["n_ctx"], info["n_ctx_source"], info["kv_cache_type"]) == (4096, "settings", "q8_0")
+    assert info["load_s"] >= 0
@@ -0,0 +1,78 @@
+"""
+Тесты заглушки LLM (src/models/mock_client.py): выбор через LLM_BACKEND,
+валидные ответы, воспроизводимая латентность, ошибки и таймауты.
+"""
+
+import pytest
+
+from src.config import settings
+from src.models.exceptions import LlamaServerError, QwenTimeoutError
+from src.models.inference_worker import get_worker
+from src.models.llm_client import create_client
+from src.models.mock_client import MockLLMClient, draw, reset_calls
+from src.models.schemas import Location
+
+LOCATIONS = [
+    Location(ID=f"l{i}", name=f"ТТ {i}", address=f"ул. {i}", lat=54.1 + i / 50, lon=45.1 + i / 50,
+             time_window_start="09:00", time_window_end="18:00", priority="ABC"[i])
+    for i in range(3)
+]
+VARIANTS = [
+    {"id": 1, "name": "Кратчайший", "metrics": {"distance_km": 18.2, "time_hours": 2.4, "cost_rub": 130}},
+    {"id": 2, "name": "По приоритету", "metrics": {"distance_km": 21.7, "time_hours": 2.1, "cost_rub": 152}},
+]
+
+
+@pytest.fixture(autouse=True)
+def mock_backend(monkeypatch):
+    monkeypatch.setattr(settings, "llm_backend", "mock")
+    monkeypatch.setattr(settings, "qwen_mock_latency_ms", 10.0)
+    monkeypatch.setattr(settings, "llama_mock_latency_ms", 10.0)
+    monkeypatch.setattr(settings, "llm_mock_latency_sigma", 0.0)
+    reset_calls()
+    yield
+    reset_calls()
+
+
+def test_latency_sequence_is_reproducible(monkeypatch):
+    monkeypatch.setattr(settings, "llm_mock_latency_sigma", 0.5)
+    monkeypatch.setattr(settings, "llm_mock_failure_rate", 0.3)
+    first = [draw("qwen") for _ in range(20)]
+    reset_calls()
+    assert [draw("qwen") for _ in range(20)] == first
+    assert len({latency for latency, _ in first}) == 20
+    assert {outcome for _, outcome in first} == {"ok", "failure"}
+
+
+async def test_mock_answers_match_client_contract():
+    client = create_client("qwen")
+    assert isinstance(client, MockLLMClient)
+
+    route = await client.generate_route(LOCATIONS)
+    assert [loc.ID for loc in route.locations] == ["l0", "l1", "l2"]
+    assert route.total_distance_km > 0 and route.model_used == "mock-qwen"
+
+    evaluation = await client.evaluate_variants(VARIANTS)
+    assert evaluation == [
+        {"id": 1, "pros": ["Самый короткий путь", "Дешевле остальных"], "cons": ["Дольше остальных"]},
+        {"id": 2, "pros": ["Быстрее остальных"], "cons": ["Самый длинный путь", "Дороже остальных"]},
+    ]
+    # Промпт оценки тот же, что у QwenClient, — ключ кэша меняет только model_name
+    assert "Option 1 (Кратчайший)" in client._construct_evaluation_prompt(VARIANTS)
+
+
+async def test_injected_failures_and_timeouts(monkeypatch):
+    monkeypatch.setattr(settings, "llm_mock_failure_rate", 1.0)
+    llama = create_client("llama")
+    with pytest.raises(LlamaServerError):
+        await llama.generate_route(LOCATIONS)
+    assert await llama.evaluate_variants(VARIANTS) == []
+
+    monkeypatch.setattr(settings, "llm_mock_failure_rate", 0.0)
+    monkeypatch.setattr(settings, "llm_mock_timeout_rate", 1.0)
+    qwen = create_client("qwen")
+    qwen.timeout = 0.2
+    timeouts = get_worker("qwen").snapshot()["timeouts"]
+    with pytest.raises(QwenTimeoutError):
+        await qwen.generate_route(LOCATIONS)
+    assert get_worker("qwen").snapshot()["timeouts"] == timeouts + 1
@@ -1,6 +1,6 @@
 """
-Unit-тесты для выбора модели (ML-6): select_best_model и get_model_recommendation.
-Модели: только qwen (primary) и llama (fallback).
+Unit-тесты для выбора модели (ML-6): select_best_model, get_model_recommendation
+и выбор по латентности (ModelSelector). Без статистики primary — qwen.
 """
 
 import pytest
@@ -12,14 +12,25 @@ from src.services.model_selector import (
     CONSTRAINT_URGENT,
     CONSTRAINT_QUALITY,
     CONSTRAINT_RELIABILITY,
+    evaluation_quality,
+    record_llm_call,
+    refresh_stats,
+    selector,
 )
 
 
+@pytest.fixture(autouse=True)
+def fresh_selector():
+    selector.reset()
+    yield
+    selector.reset()
+
+
 class TestSelectBestModel:
-    """Проверка логики select_best_model: всегда primary = qwen."""
+    """Проверка логики select_best_model без статистики: primary = qwen."""
 
-    def test_always_qwen_for_any_input(self):
-        """Для любых num_locations и time_constraint селектор возвращает qwen."""
+    def test_always_qwen_without_statistics(self):
+        """Без замеров для любых num_locations и time_constraint селектор возвращает qwen."""
         for n in (0, 1, 10, 50, 150):
             for c in (None, CONSTRAINT_URGENT, CONSTRAINT_QUALITY, CONSTRAINT_RELIABILITY):
                 assert select_best_model(n, c) == MODEL_QWEN
@@ -35,3 +46,139 @@ class TestGetModelRecommendation:
         assert "reason" in r and len(r["reason"]) > 0
         assert "Qwen" in r["reason"]
         assert "Llama" in r["reason"] or "fallback" in r["reason"].lower()
+
+
+def _samples(model, n, latency_ms, quality=100.0, count=10):
+    return [(model, n, latency_ms + i, quality) for i in range(count)]
+
+
+class TestLatencyAwareSelection:
+    """Выбор по прогнозу латентности (p90 корзины + очередь) и SLO запроса."""
+
+    def test_fastest_model_within_slo(self):
+        selector.load_samples(_samples(MODEL_QWEN, 10, 40_000) + _samples(MODEL_LLAMA, 12, 6_000))
+        decision = selector.choose(10, slo_ms=30_000)
+        assert decision["model"] == MODEL_LLAMA
+        assert decision["predictions"][MODEL_QWEN]["predicted_ms"] > 30_000
+        assert select_best_model(10) == MODEL_LLAMA
+        # Для средних маршрутов статистики нет — primary
+        assert select_best_model(50) == MODEL_QWEN
+
+    def test_skips_llm_when_nothing_fits(self):
+        selector.load_samples(_samples(MODEL_QWEN, 10, 9_000) + _samples(MODEL_LLAMA, 10, 6_000))
+        decision = selector.choose(10, slo_ms=5_000)
+        assert decision["model"] is None
+        assert "только алгоритмы" in decision["reason"]
+        # urgent — половина SLO по умолчанию (30 с)
+        assert selector.choose(10, time_constraint=CONSTRAINT_URGENT)["model"] == MODEL_LLAMA
+
+    def test_queue_and_quality_are_considered(self):
+        selector.load_samples(_samples(MODEL_QWEN, 10, 4_000) + _samples(MODEL_LLAMA, 10, 6_000, quality=30.0))
+        # Llama быстрее не бывает, но качество ниже порога
+        assert selector.choose(10, slo_ms=10_000)["model"] == MODEL_QWEN
+        # Очередь qwen: 2 × p50 ожидания сверху — не укладывается, llama не годится по качеству
+        decision = selector.choose(10, slo_ms=10_000, queue_depths={MODEL_QWEN: 2})
+        assert decision["model"] is None
+
+    def test_unknown_model_is_explored(self):
+        selector.load_samples(_samples(MODEL_QWEN, 10, 50_000))
+        decision = selector.choose(10, slo_ms=30_000)
+        assert decision["model"] == MODEL_LLAMA
+        assert decision["predictions"][MODEL_LLAMA] is None
+
+    def test_failed_calls_do_not_lower_latency(self):
+        # Перегруженная qwen: мгновенные [] не делают её «самой быстрой»
+        selector.load_samples(
+            _samples(MODEL_QWEN, 10, 40_000) + _samples(MODEL_QWEN, 10, 5, quality=0.0, count=30)
+            + _samples(MODEL_LLAMA, 10, 6_000)
+        )
+        stats = selector.stats()["qwen/small"]
+        assert (stats["count"], stats["successes"]) == (40, 10)
+        assert stats["p50_ms"] >= 40_000
+        assert stats["success_rate"] == 0.25
+        assert selector.choose(10, slo_ms=30_000)["model"] == MODEL_LLAMA
+
+        # Только неудачи — прогноза латентности нет, модель не выбирается
+        selector.load_samples(_samples(MODEL_QWEN, 10, 5, quality=0.0))
+        decision = selector.choose(10, slo_ms=30_000)
+        assert decision["predictions"][MODEL_QWEN]["predicted_ms"] is None
+        assert decision["model"] == MODEL_LLAMA
+
+    def test_counterfactual_report(self):
+        selector.load_samples(_samples(MODEL_QWEN, 10, 40_000) + _samples(MODEL_LLAMA, 10, 6_000))
+        first = selector.choose(10, slo_ms=30_000)
+        selector.choose(10, slo_ms=1_000)
+        selector.observe(first["id"], 5_500, 100.0)
+
+        report = selector.report()
+        assert report["decisions_total"] == 2
+        assert report["chosen"] == {MODEL_LLAMA: 1, "none": 1}
+        assert report["llm_skipped"] == 1
+        assert (report["observed"], report["observed_within_slo"]) == (1, 1)
+        assert report["counterfactual"][MODEL_QWEN]["predicted_within_slo"] == 0
+        assert report["counterfactual"][MODEL_LLAMA]["predicted_within_slo"] == 1
+        assert report["recent"][-1]["actual_ms"] == 5_500
+
+
+class TestSelectorStatsFromMetrics:
+    """Статистика читается из таблицы metrics (замеры record_llm_call)."""
+
+    async def test_record_and_refresh(self, tmp_path):
+        pytest.importorskip("aiosqlite")
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        from src.database.models import Base
+
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'metrics.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+            for i in range(6):
+                await record_llm_call(session, MODEL_LLAMA, 8, 3_000 + i, 100.0)
+            await record_llm_call(session, MODEL_QWEN, 8, 70_000, 0.0)
+            await refresh_stats(session, force=True)
+        await engine.dispose()
+
+        stats = selector.stats()
+        assert stats["llama/small"]["count"] == 6
+        assert stats["qwen/small"]["success_rate"] == 0.0
+        assert selector.choose(8, slo_ms=10_000)["model"] == MODEL_LLAMA
+
+    async def test_refresh_windows_each_bucket(self, tmp_path, monkeypatch):
+        pytest.importorskip("aiosqlite")
+        from datetime import datetime, timedelta, timezone
+
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        from src.config import settings
+        from src.database.models import Base, Metric
+        from src.services.model_selector import TASK_EVALUATE_VARIANTS
+
+        monkeypatch.setattr(settings, "llm_selector_window", 5)
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'metrics.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        now = datetime.now(timezone.utc)
+        async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+            # Крупные — старше; за ними поток из 30 мелких
+            session.add_all(
+                Metric(model_name=MODEL_QWEN, task=TASK_EVALUATE_VARIANTS, num_locations=n,
+                       response_time_ms=ms, quality_score=100.0, cost=0.0,
+                       timestamp=now - timedelta(minutes=minutes))
+                for minutes, n, ms in (
+                    [(100 + i, 150, 60_000) for i in range(5)]
+                    + [(i, 8, 3_000) for i in range(30)]
+                )
+            )
+            await session.commit()
+            await refresh_stats(session, force=True)
+        await engine.dispose()
+
+        stats = selector.stats()
+        assert stats["qwen/small"]["count"] == 5
+        assert stats["qwen/large"]["count"] == 5
+
+    def test_evaluation_quality(self):
+        answer = [{"id": 1, "pros": ["a"], "cons": ["b"]}, {"id": 2, "pros": [], "cons": ["b"]}]
+        assert evaluation_quality(answer, [1, 2]) == 50.0
+        assert evaluation_quality([], [1, 2]) == 0.0
@@ -0,0 +1,108 @@
+"""
+Тесты помесячных секций visit_schedule / visit_log (src/database/partitions.py).
+
+DDL проверяется на записывающем «соединении» с диалектом postgresql;
+на SQLite функции обслуживания секций ничего не делают.
+"""
+
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from src.database.partitions import (
+    create_month_partition,
+    default_partition_name,
+    drop_month,
+    ensure_partitions,
+    months_from,
+    partition_name,
+)
+
+
+class RecordingConnection:
+    """Пишет SQL в список; to_regclass отвечает по множеству existing."""
+
+    def __init__(self, existing=(), partitioned=("visit_schedule", "visit_log")):
+        self.dialect = SimpleNamespace(name="postgresql")
+        self.existing = set(existing)
+        self.partitioned = set(partitioned)
+        self.sql = []
+
+    def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        params = params or {}
+        if sql.startswith("SELECT to_regclass"):
+            value = params["name"] if params["name"] in self.existing else None
+        elif "pg_partitioned_table" in sql:
+            value = 1 if params["table"] in self.partitioned else None
+        else:
+            self.sql.append(sql)
+            value = None
+            if sql.startswith("CREATE TABLE"):
+                self.existing.add(sql.split()[5 if "IF NOT EXISTS" in sql else 2])
+        return SimpleNamespace(scalar=lambda: value)
+
+
+def test_partition_names_and_months():
+    assert partition_name("visit_schedule", date(2026, 3, 17)) == "visit_schedule_y2026m03"
+    assert default_partition_name("visit_log") == "visit_log_default"
+    assert months_from(date(2026, 11, 20), 3) == [
+        date(2026, 11, 1), date(2026, 12, 1), date(2027, 1, 1),
+    ]
+    with pytest.raises(ValueError):
+        partition_name("locations", date(2026, 3, 1))
+
+
+def test_create_partition_without_default():
+    conn = RecordingConnection()
+    assert create_month_partition(conn, "visit_log", date(2026, 12, 1)) is True
+    assert conn.sql == [
+        "CREATE TABLE visit_log_y2026m12 PARTITION OF visit_log "
+        "FOR VALUES FROM ('2026-12-01') TO ('2027-01-01')",
+    ]
+    assert create_month_partition(conn, "visit_log", date(2026, 12, 1)) is False
+
+
+def test_create_partition_moves_rows_out_of_default():
+    conn = RecordingConnection(existing={"visit_schedule_default"})
+    create_month_partition(conn, "visit_schedule", date(2026, 5, 1))
+
+    assert conn.sql[0].startswith("CREATE TABLE visit_schedule_y2026m05 (LIKE visit_schedule")
+    assert "DELETE FROM visit_schedule_default WHERE planned_date >= '2026-05-01' " \
+           "AND planned_date < '2026-06-01' RETURNING *" in conn.sql[1]
+    assert conn.sql[2] == (
+        "ALTER TABLE visit_schedule ATTACH PARTITION visit_schedule_y2026m05 "
+        "FOR VALUES FROM ('2026-05-01') TO ('2026-06-01')"
+    )
+
+
+def test_ensure_partitions_creates_default_and_future_months():
+    conn = RecordingConnection(existing={"visit_log_y2026m03"}, partitioned={"visit_log"})
+    created = ensure_partitions(conn, months_ahead=2, start=date(2026, 3, 9))
+
+    assert created == ["visit_log_y2026m04", "visit_log_y2026m05"]
+    assert conn.sql[0] == "CREATE TABLE IF NOT EXISTS visit_log_default PARTITION OF visit_log DEFAULT"
+
+
+def test_drop_month_clears_schedule_refs_and_drops_partitions():
+    conn = RecordingConnection(existing={"visit_log_y2024m01", "visit_schedule_y2024m01"})
+    assert drop_month(conn, date(2024, 1, 1)) == ["visit_log_y2024m01", "visit_schedule_y2024m01"]
+
+    assert conn.sql[0] == "ALTER TABLE visit_log DETACH PARTITION visit_log_y2024m01"
+    assert conn.sql[1].startswith("UPDATE visit_log SET schedule_id = NULL")
+    assert conn.sql[-2:] == ["DROP TABLE visit_log_y2024m01", "DROP TABLE visit_schedule_y2024m01"]
+    assert not any(sql.startswith("DELETE") for sql in conn.sql)
+
+
+async def test_sqlite_is_noop(tmp_path):
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from src.database.partitions import ensure_month_partitions
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'p.db'}")
+    try:
+        assert await ensure_month_partitions(engine, 3) == []
+    finally:
+        await engine.dispose()
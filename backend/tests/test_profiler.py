@@ -0,0 +1,85 @@
+"""
+Тесты профилирования запросов по требованию (src/utils/profiler.py,
+AdvancedMiddleware, /admin/profiles).
+"""
+
+import itertools
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.config import settings
+from src.middleware.main import AdvancedMiddleware
+from src.routes.profiles import router as profiles_router
+from src.utils import profiler
+
+TOKEN = "s3cret"
+
+
+def _busy_month_view(ms: float) -> int:
+    deadline, n = time.perf_counter() + ms / 1000, 0
+    while time.perf_counter() < deadline:
+        n += 1
+    return n
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "profiling_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "profiling_interval_ms", 1.0)
+    monkeypatch.setattr(profiler, "_request_counter", itertools.count(1))
+
+    app = FastAPI()
+    app.add_middleware(AdvancedMiddleware)
+    app.include_router(profiles_router)
+
+    @app.get("/schedule/month")
+    async def month_view():
+        return {"n": _busy_month_view(60)}
+
+    return TestClient(app)
+
+
+def test_disabled_by_default(client, tmp_path):
+    assert not profiler.profiling_enabled()
+    response = client.get("/schedule/month", headers={"X-Profile": TOKEN})
+    assert "X-Profiled" not in response.headers
+    assert list(tmp_path.iterdir()) == []
+    # Без токена в настройках админ-эндпоинты закрыты
+    assert client.get("/admin/profiles", headers={"X-Profile": TOKEN}).status_code == 403
+
+
+def test_profile_on_demand_is_stored_by_request_id(client, monkeypatch):
+    monkeypatch.setattr(settings, "profiling_token", TOKEN)
+
+    assert "X-Profiled" not in client.get("/schedule/month", headers={"X-Profile": "wrong"}).headers
+    response = client.get("/schedule/month", params={"profile": TOKEN})
+    assert response.headers["X-Profiled"] == "1"
+    request_id = response.headers["X-Request-ID"]
+
+    assert client.get(f"/admin/profiles/{request_id}").status_code == 403
+    listed = client.get("/admin/profiles", headers={"X-Profile": TOKEN}).json()["profiles"]
+    assert [(p["request_id"], p["route"], p["status"]) for p in listed] == [
+        (request_id, "/schedule/month", 200),
+    ]
+    assert listed[0]["samples"] > 0
+
+    collapsed = client.get(f"/admin/profiles/{request_id}", headers={"X-Profile": TOKEN}).text
+    hot = max(collapsed.splitlines(), key=lambda line: int(line.rsplit(" ", 1)[1]))
+    assert "month_view" in hot and "_busy_month_view" in hot
+    assert client.get("/admin/profiles/..%2F..%2Fetc%2Fpasswd", headers={"X-Profile": TOKEN}).status_code == 404
+
+
+def test_sampling_one_in_n(client, monkeypatch):
+    monkeypatch.setattr(settings, "profiling_sample_n", 3)
+    monkeypatch.setattr(settings, "profiling_max_files", 1)
+
+    profiled = [
+        "X-Profiled" in client.get("/schedule/month").headers for _ in range(6)
+    ]
+    assert profiled == [False, False, True, False, False, True]
+    # Старые профили вытесняются сверх PROFILING_MAX_FILES
+    monkeypatch.setattr(settings, "profiling_token", TOKEN)
+    assert len(client.get("/admin/profiles", headers={"X-Profile": TOKEN}).json()["profiles"]) == 1
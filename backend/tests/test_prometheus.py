@@ -0,0 +1,93 @@
+"""
+Тесты метрик в формате Prometheus: гистограммы/счётчики (src/utils/metrics.py),
+timed_log, HTTP-латентность из AdvancedMiddleware и экспорт подсистем.
+"""
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.middleware.main import HTTP_REQUEST_SECONDS, AdvancedMiddleware
+from src.models.inference_worker import InferenceWorker
+from src.services.prometheus import llm_cache_families, llm_queue_families
+from src.utils.metrics import Registry, render
+from src.utils.timing import OPERATION_ERRORS, OPERATION_SECONDS, timed_log
+
+
+def test_histogram_and_counter_exposition():
+    registry = Registry()
+    latency = registry.histogram("op_seconds", "Op latency", ("label",), buckets=(0.1, 1.0))
+    errors = registry.counter("op_errors", "Op errors", ("label",))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        latency.observe(value, label='a"b')
+    errors.inc(label="x")
+
+    text = render(registry.collect())
+
+    assert "# TYPE op_seconds histogram" in text
+    assert 'op_seconds_bucket{label="a\\"b",le="0.1"} 1' in text
+    assert 'op_seconds_bucket{label="a\\"b",le="1"} 3' in text
+    assert 'op_seconds_bucket{label="a\\"b",le="+Inf"} 4' in text
+    assert 'op_seconds_sum{label="a\\"b"} 4.25' in text
+    assert 'op_seconds_count{label="a\\"b"} 4' in text
+    assert 'op_errors_total{label="x"} 1' in text
+
+
+def test_timed_log_feeds_histogram_and_errors():
+    OPERATION_SECONDS.clear()
+    OPERATION_ERRORS.clear()
+
+    @timed_log("prom_test")
+    def work(fail=False):
+        if fail:
+            raise ValueError("boom")
+
+    work()
+    try:
+        work(fail=True)
+    except ValueError:
+        pass
+
+    text = render([OPERATION_SECONDS.collect(), OPERATION_ERRORS.collect()])
+    assert 'app_operation_duration_seconds_count{label="prom_test"} 2' in text
+    assert 'app_operation_errors_total{label="prom_test"} 1' in text
+
+
+def test_http_latency_is_labelled_by_route_template():
+    HTTP_REQUEST_SECONDS.clear()
+    app = FastAPI()
+    app.add_middleware(AdvancedMiddleware)
+
+    @app.get("/routes/{route_id}")
+    async def get_route(route_id: str):
+        return {"id": route_id}
+
+    client = TestClient(app)
+    for route_id in ("r1", "r2", "r3"):
+        assert client.get(f"/routes/{route_id}").status_code == 200
+    client.get("/missing")
+
+    text = render([HTTP_REQUEST_SECONDS.collect()])
+    assert 'http_request_duration_seconds_count{method="GET",route="/routes/{route_id}",status="200"} 3' in text
+    assert 'route="unmatched",status="404"' in text
+
+
+def test_subsystem_snapshots_are_exported_in_seconds():
+    worker = InferenceWorker("qwen", max_queue=3)
+    worker.wait_buckets[2] = 2  # два ожидания в (250, 500] мс
+    worker.wait_sum_ms = 800.0
+    worker.completed = 2
+
+    text = render(
+        llm_queue_families({"qwen": worker.snapshot()})
+        + llm_cache_families({"hits": 3, "misses": 1, "hit_rate": 0.75,
+                              "stores": 1, "evictions": 0, "errors": 0})
+    )
+    worker.shutdown()
+
+    assert 'llm_queue_max{model="qwen"} 3' in text
+    assert 'llm_inference_requests_total{model="qwen",outcome="completed"} 2' in text
+    assert 'llm_queue_wait_seconds_bucket{model="qwen",le="0.25"} 0' in text
+    assert 'llm_queue_wait_seconds_bucket{model="qwen",le="0.5"} 2' in text
+    assert 'llm_queue_wait_seconds_sum{model="qwen"} 0.8' in text
+    assert 'llm_cache_events_total{event="hits"} 3' in text
+    assert "llm_cache_hit_ratio 0.75" in text
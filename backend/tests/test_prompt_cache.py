@@ -0,0 +1,133 @@
+"""
+Тесты кэша общего префикса промптов (src/models/prompt_cache.py).
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from src.config import settings
+from src.models.prompt_cache import (
+    EVALUATION_SYSTEM_PROMPT,
+    _attached,
+    attach_prompt_cache,
+    cached_chat_completion,
+    evaluation_messages,
+    prompt_cache_stats,
+    prompt_cache_status,
+    route_messages,
+)
+
+np = pytest.importorskip("numpy")
+
+
+class FakeLlama:
+    """
+    Модель-заглушка: токен — символ, разметка как в ChatML, логиты
+    n_batch × n_vocab. Как llama.cpp, пропускает общий с контекстом префикс
+    (кроме последнего токена промпта) и считает вычисленные токены.
+    """
+
+    N_CTX, N_BATCH, N_VOCAB = 2048, 64, 1000
+
+    def __init__(self, state_size_per_token=256):
+        self.input_ids = np.zeros(self.N_CTX, dtype=np.intc)
+        self.n_tokens = 0
+        self.evaluated = 0
+        self.calls = 0
+        self.loads = 0
+        self.state_size_per_token = state_size_per_token
+
+    def create_chat_completion(self, messages, max_tokens, **kwargs):
+        self.calls += 1
+        prompt = "".join(f"<{m['role']}>{m['content']}</>" for m in messages) + "<assistant>"
+        tokens = [ord(c) for c in prompt]
+        shared = 0
+        for a, b in zip(self.input_ids[: self.n_tokens], tokens[:-1]):
+            if a != b:
+                break
+            shared += 1
+        self.evaluated += len(tokens) - shared
+        tokens += [ord("[")] * max_tokens
+        self.input_ids[: len(tokens)] = tokens
+        self.n_tokens = len(tokens)
+        return {"choices": [{"message": {"content": "["}}]}
+
+    def save_state(self):
+        return SimpleNamespace(
+            scores=np.zeros((min(self.n_tokens, self.N_BATCH), self.N_VOCAB), dtype=np.single),
+            input_ids=self.input_ids.copy(),
+            n_tokens=self.n_tokens,
+            llama_state_size=self.n_tokens * self.state_size_per_token,
+        )
+
+    def load_state(self, state):
+        self.loads += 1
+        self.input_ids = state.input_ids.copy()
+        self.n_tokens = state.n_tokens
+
+
+def _alternate(llm, model, rounds=3):
+    for i in range(rounds):
+        for messages in (route_messages(f"точки {i}"), evaluation_messages(f"варианты {i}")):
+            cached_chat_completion(llm, model, messages, max_tokens=4)
+
+
+def test_attach_respects_capacity_setting(monkeypatch):
+    monkeypatch.setattr(settings, "llm_prompt_cache_mb", 0)
+    assert attach_prompt_cache(FakeLlama(), "qwen") is False
+    assert "qwen" not in prompt_cache_status()["models"]
+
+    monkeypatch.setattr(settings, "llm_prompt_cache_mb", 64)
+    assert attach_prompt_cache(FakeLlama(), "qwen") is True
+    assert prompt_cache_status()["models"]["qwen"]["size_mb"] == 0
+
+
+def test_prefix_state_is_restored_when_templates_alternate(monkeypatch):
+    monkeypatch.setattr(settings, "llm_prompt_cache_mb", 0)
+    plain = FakeLlama()
+    attach_prompt_cache(plain, "llama")
+    _alternate(plain, "llama")
+
+    monkeypatch.setattr(settings, "llm_prompt_cache_mb", 64)
+    prompt_cache_stats.reset()
+    llm = FakeLlama()
+    attach_prompt_cache(llm, "llama")
+    _alternate(llm, "llama")
+
+    # По две пробы на шаблон — один раз; дальше состояние только восстанавливается
+    assert llm.calls == 6 + 4
+    stats = prompt_cache_status()["models"]["llama"]
+    # Первые обращения застают свой префикс в контексте сразу после проб — не попадания
+    assert (stats["lookups"], stats["hits"]) == (6, 4)
+    assert llm.loads == 4
+    # Попадание переиспользует префикс за вычетом того, что и так было в контексте
+    shared = len("<system>You are a ")
+    prefixes = [len(f"<system>{m[0]['content']}</><user>") for m in (route_messages(""), evaluation_messages(""))]
+    assert stats["reused_tokens"] == sum(2 * (n - shared) for n in prefixes)
+    # Вместе с пробами вычислено меньше токенов, чем без кэша
+    assert llm.evaluated < plain.evaluated
+
+    # В кэше — логиты одной строки, а не n_batch × n_vocab
+    cache = _attached["llama"]
+    entry = cache.get(EVALUATION_SYSTEM_PROMPT)
+    assert entry.state.scores.shape == (1, FakeLlama.N_VOCAB)
+    assert cache.cache_size == sum(
+        e.state.llama_state_size + e.state.scores.nbytes + e.state.input_ids.nbytes
+        for e in (entry, cache.get(route_messages("")[0]["content"]))
+    )
+
+
+def test_state_over_capacity_is_not_cached(monkeypatch):
+    monkeypatch.setattr(settings, "llm_prompt_cache_mb", 1)
+    prompt_cache_stats.reset()
+    llm = FakeLlama(state_size_per_token=1024 * 1024)
+    attach_prompt_cache(llm, "qwen")
+    _alternate(llm, "qwen")
+
+    # Пробы — один раз на шаблон, состояния не сохранены и не восстанавливаются
+    assert llm.calls == 6 + 4
+    assert llm.loads == 0
+    assert prompt_cache_status()["models"]["qwen"] == {
+        "lookups": 0, "hits": 0, "reused_tokens": 0, "size_mb": 0.0,
+    }
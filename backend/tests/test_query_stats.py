@@ -0,0 +1,120 @@
+"""
+Тесты счётчика SQL-запросов (src/database/query_stats.py): формы
+выражений, бюджеты запросов, заголовки X-DB-* и предупреждение о N+1.
+БД — SQLite (aiosqlite).
+"""
+
+import logging
+from datetime import date, timedelta
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import select, text  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from src.database.models import Base, SalesRep, VisitSchedule  # noqa: E402
+from src.database.query_stats import (  # noqa: E402
+    QueryBudgetExceeded,
+    instrument_engine,
+    query_budget,
+    statement_shape,
+)
+from src.middleware.main import AdvancedMiddleware  # noqa: E402
+from src.routes.schedule import _reschedule_skipped_visit  # noqa: E402
+from src.services.schedule_planner import MAX_TT_PER_DAY  # noqa: E402
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'queries.db'}")
+    instrument_engine(engine)
+    instrument_engine(engine)  # повторное подключение не удваивает счёт
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+def test_statement_shape_ignores_parameter_values():
+    assert statement_shape("SELECT *\n  FROM t WHERE id IN (?, ?, ?) AND a = ?") == \
+        statement_shape("SELECT * FROM t WHERE id IN (?) AND a = ?")
+    assert statement_shape("SELECT 1 FROM t WHERE id = $1 AND x IN ($2, $3)") == \
+        "SELECT 1 FROM t WHERE id = ? AND x IN (?)"
+
+
+async def test_budget_counts_statements_and_repeats(engine):
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_factory() as session:
+        with query_budget(max_queries=4, max_repeats=3) as stats:
+            for rep_id in ("r1", "r2", "r3"):
+                await session.execute(select(SalesRep).where(SalesRep.id == rep_id))
+            await session.execute(text("SELECT 1"))
+        assert stats.count == 4 and stats.time_ms > 0
+        assert stats.repeated(3)[0][1] == 3
+
+        with pytest.raises(QueryBudgetExceeded, match="3x repeated query"):
+            with query_budget(max_queries=10, max_repeats=1):
+                for rep_id in ("r1", "r2", "r3"):
+                    await session.execute(select(SalesRep).where(SalesRep.id == rep_id))
+
+
+async def test_reschedule_skipped_visit_query_budget(engine):
+    """
+    _find_slot проверяет дни по одному: запрос COUNT на каждый рабочий
+    день до первого свободного. Бюджет фиксирует текущее поведение —
+    рост числа запросов (или новый цикл) заметит этот тест.
+    """
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    monday = date(2026, 3, 2)
+    async with session_factory() as session:
+        session.add(SalesRep(id="r1", name="Иванов"))
+        # Пн–Пт заняты полностью, свободный слот — следующий понедельник
+        for day in range(5):
+            for n in range(MAX_TT_PER_DAY):
+                session.add(VisitSchedule(
+                    id=f"v{day}-{n}", location_id=f"l{n}", rep_id="r1",
+                    planned_date=monday + timedelta(days=day),
+                ))
+        await session.commit()
+
+    skipped = VisitSchedule(id="s", location_id="l0", rep_id="r1", planned_date=monday - timedelta(days=1))
+    async with session_factory() as session:
+        with query_budget(max_queries=7) as stats:
+            await _reschedule_skipped_visit(session, skipped)
+
+    # 1 запрос праздников + COUNT на 5 занятых дней и на найденный
+    assert stats.count == 7
+    shape, repeats = stats.repeated(5)[0]
+    assert repeats == 6 and "count(*)" in shape.lower()
+
+
+def test_middleware_reports_db_headers_and_n_plus_one(engine, monkeypatch, caplog):
+    from src.config import settings
+
+    monkeypatch.setattr(settings, "db_repeat_warn_threshold", 5)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    app = FastAPI()
+    app.add_middleware(AdvancedMiddleware)
+
+    @app.get("/reps/{count}")
+    async def reps(count: int):
+        async with session_factory() as session:
+            for n in range(count):
+                await session.execute(select(SalesRep).where(SalesRep.id == f"r{n}"))
+        return {}
+
+    client = TestClient(app)
+    with caplog.at_level(logging.WARNING, logger="src.middleware.main"):
+        few = client.get("/reps/2")
+        many = client.get("/reps/6")
+
+    assert few.headers["X-DB-Queries"] == "2"
+    assert few.headers["X-DB-Time"].endswith("ms")
+    assert many.headers["X-DB-Queries"] == "6"
+    warnings = [r.getMessage() for r in caplog.records if "N+1" in r.getMessage()]
+    assert len(warnings) == 1 and warnings[0].startswith("Possible N+1: 6×")
+    assert "/reps/{count}" in warnings[0]
@@ -81,7 +81,7 @@ def build_pydantic_location(location_id: str, name: str, lat: float, lon: float)
 async def test_confirm_variant_saves_route_id_and_snapshot_metrics():
     db = FakeDbSession()
 
-    with patch("src.services.optimize.QwenClient"), patch("src.services.optimize.LlamaClient"), patch(
+    with patch("src.services.optimize.create_client"), patch(
         "src.services.optimize.RoutingService"
     ):
         optimizer = Optimizer(db)
@@ -122,7 +122,7 @@ async def test_confirm_variant_saves_route_id_and_snapshot_metrics():
 async def test_optimize_saves_comparison_snapshot_metrics():
     db = FakeDbSession()
 
-    with patch("src.services.optimize.QwenClient"), patch("src.services.optimize.LlamaClient"), patch(
+    with patch("src.services.optimize.create_client"), patch(
         "src.services.optimize.RoutingService"
     ), patch("src.services.optimize.get_model_recommendation", return_value={"model": "qwen"}):
         optimizer = Optimizer(db)
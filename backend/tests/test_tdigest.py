@@ -0,0 +1,63 @@
+"""
+Unit-тесты t-digest скетча (src/utils/tdigest.py).
+"""
+
+import json
+import random
+
+import pytest
+
+from src.utils.tdigest import TDigest, merge_digests
+
+
+def _exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@pytest.fixture
+def durations():
+    rnd = random.Random(7)
+    return [max(1, int(rnd.lognormvariate(3.0, 0.5))) for _ in range(20000)]
+
+
+def test_empty_digest():
+    digest = TDigest()
+    assert digest.quantile(0.5) is None
+    assert len(digest) == 0
+
+
+def test_small_inputs_are_exact():
+    digest = TDigest.from_values([10, 20, 30])
+    assert digest.quantile(0.5) == 20
+    assert digest.quantile(0) == 10
+    assert digest.quantile(1) == 30
+
+
+def test_quantiles_close_to_exact(durations):
+    digest = TDigest.from_values(durations)
+    for q in (0.5, 0.9, 0.99):
+        assert digest.quantile(q) == pytest.approx(_exact_quantile(durations, q), abs=1.5)
+    assert len(digest.centroids()) <= digest.compression
+
+
+def test_merge_matches_single_digest(durations):
+    parts = [
+        TDigest.from_values(durations[i:i + 2000]).to_dict()
+        for i in range(0, len(durations), 2000)
+    ]
+    merged = merge_digests(parts)
+    whole = TDigest.from_values(durations)
+
+    assert len(merged) == len(durations)
+    assert merged.min == min(durations) and merged.max == max(durations)
+    for q in (0.5, 0.9):
+        assert merged.quantile(q) == pytest.approx(whole.quantile(q), abs=1.5)
+
+
+def test_serialization_roundtrip(durations):
+    digest = TDigest.from_values(durations)
+    data = json.loads(json.dumps(digest.to_dict()))
+    restored = TDigest.from_dict(data)
+    assert len(restored) == len(digest)
+    assert restored.quantile(0.9) == pytest.approx(digest.quantile(0.9), abs=0.01)
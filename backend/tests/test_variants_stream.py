@@ -0,0 +1,78 @@
+"""
+Тесты потоковой генерации вариантов (/optimize/variants/stream): порядок
+фаз Optimizer.iter_variants и отмена инференса при отключении клиента.
+"""
+
+import asyncio
+import threading
+from unittest.mock import AsyncMock, patch
+
+from src.database.models import Location as DBLocation
+from src.models.inference_worker import InferenceWorker
+from src.routes.optimize import _sse_event
+from src.services.optimize import Optimizer
+
+LOCATIONS = [
+    DBLocation(
+        id=f"l{i}", name=f"ТТ {i}", lat=54.1 + i / 100, lon=45.1, category=category,
+        time_window_start="09:00", time_window_end="18:00",
+    )
+    for i, category in enumerate("ABC")
+]
+EVALUATION = [
+    {"id": 1, "pros": ["короче"], "cons": ["пробки"]},
+    {"id": 2, "pros": ["A раньше"], "cons": ["дольше"]},
+    {"id": 3, "pros": ["баланс"], "cons": []},
+]
+
+
+async def test_phases_are_streamed_in_order():
+    optimizer = Optimizer(db_session=None)
+    metrics = {"distance_km": 12.0, "time_minutes": 90.0, "cost_rub": 100.0}
+
+    with patch.object(optimizer, "_calculate_real_metrics", AsyncMock(return_value=metrics)), \
+         patch("src.services.optimize.evaluate_variants_cached", AsyncMock(return_value=EVALUATION)), \
+         patch("src.services.optimize.record_llm_call", AsyncMock()):
+        events = [phase async for phase in optimizer.iter_variants(LOCATIONS)]
+
+    names = [event for event, _ in events]
+    assert names == ["candidate"] * 3 + ["best", "evaluation", "done"]
+    assert [data["algorithm"] for _, data in events[:3]] == ["greedy", "priority_first", "balanced"]
+
+    best, evaluation, done = (data for _, data in events[3:])
+    # До LLM лучший вариант уходит без pros/cons
+    assert best.pros == [] and best.algorithm == "greedy"
+    assert evaluation == {
+        "model_used": "qwen",
+        "llm_evaluation_success": True,
+        "pros": ["короче"],
+        "cons": ["пробки"],
+    }
+    assert done.variants[0].pros == ["короче"]
+    assert _sse_event("best", best).startswith('event: best\ndata: {"id": 1, "name": "Лучший маршрут"')
+
+
+async def test_cancelled_request_stops_inference():
+    worker = InferenceWorker("test", max_queue=2)
+    started, cancel = threading.Event(), threading.Event()
+
+    def generate():
+        # Как stopping_criteria llama.cpp: генерация идёт, пока не выставлен cancel
+        started.set()
+        assert cancel.wait(timeout=5)
+        return "stopped"
+
+    task = asyncio.create_task(worker.run(generate, timeout_s=10, cancel=cancel))
+    assert await asyncio.to_thread(started.wait, 5)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+    assert cancel.is_set()
+    await asyncio.sleep(0.05)
+    snapshot = worker.snapshot()
+    assert snapshot["cancelled"] == 1
+    assert snapshot["running"] is False and snapshot["queue_depth"] == 0
+    worker.shutdown()
@@ -0,0 +1,104 @@
+"""
+Тесты GET /visits/stats: счётчики из месячных сводок, уникальные ТТ по
+журналу, диапазон месяцев, фильтр по сотруднику; сводки после удаления
+сотрудника/ТТ и смены категории.
+"""
+
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from src.database.models import Base, Location, SalesRep, VisitLog  # noqa: E402
+from src.routes.locations import delete_location, update_location  # noqa: E402
+from src.routes.reps import delete_rep  # noqa: E402
+from src.routes.visits import _month_range, get_visit_stats  # noqa: E402
+from src.schemas.locations import LocationUpdate  # noqa: E402
+from src.services.analytics_rollup import rebuild_rollups  # noqa: E402
+
+
+@pytest.fixture
+async def session(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'visits.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with factory() as s:
+        s.add_all([
+            SalesRep(id="r1", name="Иванов"),
+            SalesRep(id="r2", name="Петров"),
+            Location(id="l1", name="l1", lat=54.0, lon=45.0, category="A",
+                     time_window_start="09:00", time_window_end="18:00"),
+            Location(id="l2", name="l2", lat=54.0, lon=45.0, category="B",
+                     time_window_start="09:00", time_window_end="18:00"),
+        ])
+        await s.flush()
+        s.add_all([
+            VisitLog(location_id="l1", rep_id="r1", visited_date=date(2026, 1, 12)),
+            VisitLog(location_id="l1", rep_id="r1", visited_date=date(2026, 2, 3)),
+            VisitLog(location_id="l2", rep_id="r1", visited_date=date(2026, 2, 4)),
+            VisitLog(location_id="l2", rep_id="r2", visited_date=date(2026, 2, 5)),
+            VisitLog(location_id="l2", rep_id="r2", visited_date=date(2026, 4, 1)),
+        ])
+        await s.flush()
+        await rebuild_rollups(s)
+        await s.commit()
+        yield s
+    await engine.dispose()
+
+
+async def test_single_month(session):
+    stats = await get_visit_stats(month="2026-02", month_to=None, rep_id=None, session=session)
+    assert stats.total_visits == 3
+    assert stats.unique_locations == 2
+    assert stats.unique_reps == 2
+    assert stats.by_category == {"A": 1, "B": 2}
+    assert stats.by_rep == [
+        {"rep_id": "r1", "total_visits": 2, "unique_locations": 2},
+        {"rep_id": "r2", "total_visits": 1, "unique_locations": 1},
+    ]
+
+
+async def test_month_range_and_rep_filter(session):
+    stats = await get_visit_stats(month="2026-01", month_to="2026-04", rep_id="r1", session=session)
+    assert stats.month_to == "2026-04"
+    assert stats.total_visits == 3
+    assert stats.unique_locations == 2
+    assert stats.unique_reps == 1
+    assert stats.by_category == {"A": 2, "B": 1}
+
+
+def test_month_range_validation():
+    assert _month_range("2026-02", None) == (date(2026, 2, 1), date(2026, 2, 28))
+    assert _month_range("2025-11", "2026-01") == (date(2025, 11, 1), date(2026, 1, 31))
+    with pytest.raises(HTTPException):
+        _month_range("2026-03", "2026-01")
+    with pytest.raises(HTTPException):
+        _month_range("март", None)
+
+
+async def test_delete_rep_refreshes_rollups(session):
+    await delete_rep(rep_id="r2", force=True, session=session)
+    stats = await get_visit_stats(month="2026-02", month_to="2026-04", rep_id=None, session=session)
+    assert stats.total_visits == 2
+    assert stats.unique_reps == 1
+    assert stats.by_category == {"A": 1, "B": 1}
+
+
+async def test_delete_location_refreshes_rollups(session):
+    await delete_location(location_id="l2", force=True, session=session)
+    stats = await get_visit_stats(month="2026-02", month_to="2026-04", rep_id=None, session=session)
+    assert stats.total_visits == 1
+    assert stats.by_category == {"A": 1}
+    assert stats.by_rep == [{"rep_id": "r1", "total_visits": 1, "unique_locations": 1}]
+
+
+async def test_category_change_regroups_rollups(session):
+    await update_location(location_id="l2", data=LocationUpdate(category="A"), session=session)
+    stats = await get_visit_stats(month="2026-02", month_to=None, rep_id=None, session=session)
+    assert stats.by_category == {"A": 3}
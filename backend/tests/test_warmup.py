@@ -0,0 +1,87 @@
+"""
+Тесты фонового прогрева моделей (src/models/warmup.py): загрузка вне
+event loop, состояния loading/ready и деградация запросов во время загрузки.
+"""
+
+import asyncio
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.config import settings
+from src.models.exceptions import QwenUnavailableError
+from src.models.qwen_client import QwenClient
+from src.models.warmup import (
+    model_state,
+    reset_states,
+    warm_up,
+    warmup_models,
+    warmup_status,
+)
+
+VARIANTS = [{"id": 1, "name": "Кратчайший", "metrics": {"distance_km": 18.2, "time_hours": 2.1, "cost_rub": 130}}]
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    QwenClient._llm = None
+    reset_states()
+    yield
+    QwenClient._llm = None
+    reset_states()
+
+
+def test_warmup_models_from_settings(monkeypatch):
+    monkeypatch.setattr(settings, "llm_warmup_models", " Qwen, llama ,")
+    assert warmup_models() == ["qwen", "llama"]
+    monkeypatch.setattr(settings, "llm_warmup_models", "")
+    assert warmup_models() == []
+
+
+async def test_requests_degrade_while_model_loads(monkeypatch):
+    # Пробы префиксов — в test_prompt_cache.py
+    monkeypatch.setattr(settings, "llm_prompt_cache_mb", 0)
+    loaded = threading.Event()
+    llm = MagicMock()
+
+    def slow_llama(**kwargs):
+        # Загрузка идёт в отдельном потоке, пока тест работает в event loop
+        assert loaded.wait(timeout=5)
+        return llm
+
+    location = MagicMock()
+    location.model_dump.return_value = {"ID": "l0", "name": "ТТ", "lat": 54.1, "lon": 45.1, "priority": "A"}
+
+    with patch("src.models.qwen_client.settings") as mock_settings, \
+         patch("src.models.qwen_client.Llama", side_effect=slow_llama):
+        mock_settings.qwen_model_id = "qwen.gguf"
+        mock_settings.get_model_path.return_value = "/path/to/qwen.gguf"
+
+        task = asyncio.create_task(warm_up(["qwen"]))
+        await asyncio.sleep(0.05)
+        assert model_state("qwen") == "loading"
+
+        client = QwenClient()
+        # Без ожидания загрузки: pros/cons нет, прямой маршрут — 503
+        assert await asyncio.wait_for(client.evaluate_variants(VARIANTS), 1) == []
+        with pytest.raises(QwenUnavailableError):
+            await asyncio.wait_for(client.generate_route([location]), 1)
+
+        loaded.set()
+        assert await task == {"qwen": "ready"}
+
+    assert QwenClient._llm is llm
+    # Прогрев: по одному токену на шаблон маршрута и оценки
+    calls = llm.create_chat_completion.call_args_list
+    assert [c.kwargs["max_tokens"] for c in calls] == [1, 1]
+    assert model_state("qwen") == "ready"
+    assert warmup_status()["states"]["qwen"]["load_s"] >= 0
+
+
+async def test_failed_load_is_reported():
+    with patch("src.models.qwen_client.settings") as mock_settings:
+        mock_settings.qwen_model_id = "missing.gguf"
+        mock_settings.get_model_path.side_effect = FileNotFoundError("missing.gguf")
+        assert await warm_up(["qwen"]) == {"qwen": "failed"}
+    assert "not found" in warmup_status()["states"]["qwen"]["error"]
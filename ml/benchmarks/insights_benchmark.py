@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк GET /insights: агрегация в Python vs GROUP BY в БД.
+
+Генерирует синтетический месяц (по умолчанию 100k плановых визитов),
+считает ответ двумя способами и сверяет результаты:
+- python  — прежний алгоритм: все ТТ/визиты месяца грузятся в ORM-объекты
+            и считаются через defaultdict;
+- sql     — src.routes.insights.collect_insights (GROUP BY, параллельные запросы).
+
+Usage:
+    python ml/benchmarks/insights_benchmark.py
+    python ml/benchmarks/insights_benchmark.py --visits 100000 --iterations 3
+    python ml/benchmarks/insights_benchmark.py --database-url postgresql+asyncpg://.../t2_bench
+
+По умолчанию используется временная SQLite (нужен aiosqlite). Для Postgres
+укажите ОТДЕЛЬНУЮ пустую базу — таблицы создаются и заполняются заново.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+import uuid
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "backend"))
+
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+
+from src.database.models import (  # noqa: E402
+    Base,
+    ForceMajeureEvent,
+    Location,
+    SalesRep,
+    VisitLog,
+    VisitSchedule,
+)
+from src.routes.insights import collect_insights  # noqa: E402
+
+DISTRICTS = [
+    "г.о. Саранск", "Рузаевский район", "Ковылкинский район", "Лямбирский район",
+    "Ардатовский район", "Чамзинский район", "Темниковский район", "Инсарский район",
+]
+CATEGORIES = ["A", "B", "C", "D"]
+
+
+async def legacy_insights(session, year: int, m: int) -> dict:
+    """Прежняя реализация /insights: всё грузится в Python."""
+    _, last_day = monthrange(year, m)
+    month_start = date(year, m, 1)
+    month_end = date(year, m, last_day)
+
+    all_locations = (await session.execute(select(Location))).scalars().all()
+    total_tt = len(all_locations)
+    loc_map = {loc.id: loc for loc in all_locations}
+
+    schedules = (await session.execute(select(VisitSchedule).where(
+        VisitSchedule.planned_date >= month_start,
+        VisitSchedule.planned_date <= month_end,
+    ))).scalars().all()
+    total_planned = len(schedules)
+
+    visits = (await session.execute(
+        select(VisitLog)
+        .where(VisitLog.visited_date >= month_start, VisitLog.visited_date <= month_end)
+        .options(selectinload(VisitLog.rep))
+    )).scalars().all()
+    total_completed = len(visits)
+
+    completion_rate = round(total_completed / total_planned * 100, 1) if total_planned else 0.0
+    planned_loc_ids = {s.location_id for s in schedules}
+    coverage_pct = round(len(planned_loc_ids) / total_tt * 100, 1) if total_tt else 0.0
+
+    cat_totals, cat_planned, cat_completed = defaultdict(int), defaultdict(int), defaultdict(set)
+    for loc in all_locations:
+        cat_totals[loc.category or "?"] += 1
+    for sched in schedules:
+        loc = loc_map.get(sched.location_id)
+        if loc:
+            cat_planned[loc.category or "?"] += 1
+    for visit in visits:
+        loc = loc_map.get(visit.location_id)
+        if loc:
+            cat_completed[loc.category or "?"].add(visit.location_id)
+    by_category = {}
+    for cat in CATEGORIES:
+        total_c = cat_totals.get(cat, 0)
+        completed_c = len(cat_completed.get(cat, set()))
+        by_category[cat] = {
+            "total": total_c,
+            "planned": cat_planned.get(cat, 0),
+            "completed": completed_c,
+            "pct": round(completed_c / total_c * 100, 1) if total_c else 0.0,
+        }
+
+    district_totals, district_planned_locs = defaultdict(int), defaultdict(set)
+    for loc in all_locations:
+        district_totals[loc.district or "Неизвестно"] += 1
+    for sched in schedules:
+        loc = loc_map.get(sched.location_id)
+        if loc:
+            district_planned_locs[loc.district or "Неизвестно"].add(sched.location_id)
+    by_district = [
+        {
+            "district": dist,
+            "total": district_totals[dist],
+            "coverage_pct": round(
+                len(district_planned_locs.get(dist, set())) / district_totals[dist] * 100, 1
+            ),
+        }
+        for dist in sorted(district_totals)
+    ]
+
+    rep_map = {r.id: r.name for r in (await session.execute(select(SalesRep))).scalars().all()}
+    rep_outings, rep_locs = defaultdict(set), defaultdict(set)
+    for visit in visits:
+        rep_outings[visit.rep_id].add(visit.visited_date)
+        rep_locs[visit.rep_id].add(visit.location_id)
+    rep_activity = [
+        {
+            "rep_id": rep_id,
+            "rep_name": rep_map.get(rep_id, rep_id),
+            "outings_count": len(dates),
+            "tt_visited": len(rep_locs[rep_id]),
+        }
+        for rep_id, dates in sorted(rep_outings.items())
+    ]
+
+    fm_count = len((await session.execute(select(ForceMajeureEvent).where(
+        ForceMajeureEvent.event_date >= month_start,
+        ForceMajeureEvent.event_date <= month_end,
+    ))).scalars().all())
+
+    return {
+        "month": f"{year:04d}-{m:02d}",
+        "total_tt": total_tt,
+        "coverage_pct": coverage_pct,
+        "visits_this_month": {
+            "planned": total_planned,
+            "completed": total_completed,
+            "completion_rate": completion_rate,
+        },
+        "by_category": by_category,
+        "by_district": by_district,
+        "rep_activity": rep_activity,
+        "force_majeure_count": fm_count,
+    }
+
+
+async def seed(engine, year: int, m: int, n_visits: int, n_locations: int, n_reps: int) -> None:
+    rnd = random.Random(42)
+    _, last_day = monthrange(year, m)
+    days = [date(year, m, 1) + timedelta(days=i) for i in range(last_day)]
+
+    reps = [{"id": str(uuid.uuid4()), "name": f"Сотрудник {i + 1}", "status": "active",
+             "home_lat": 54.1871, "home_lon": 45.1749} for i in range(n_reps)]
+    locations = [{
+        "id": str(uuid.uuid4()), "name": f"ТТ {i + 1}",
+        "lat": 54.0 + rnd.random(), "lon": 44.0 + rnd.random() * 2,
+        "time_window_start": "09:00", "time_window_end": "18:00",
+        "category": rnd.choice(CATEGORIES), "district": rnd.choice(DISTRICTS),
+    } for i in range(n_locations)]
+    schedules, visits = [], []
+    for _ in range(n_visits):
+        sched_id = str(uuid.uuid4())
+        loc = rnd.choice(locations)
+        rep = rnd.choice(reps)
+        day = rnd.choice(days)
+        done = rnd.random() < 0.8
+        schedules.append({"id": sched_id, "location_id": loc["id"], "rep_id": rep["id"],
+                          "planned_date": day, "status": "completed" if done else "planned"})
+        if done:
+            visits.append({"id": str(uuid.uuid4()), "schedule_id": sched_id,
+                           "location_id": loc["id"], "rep_id": rep["id"], "visited_date": day})
+    events = [{"id": str(uuid.uuid4()), "type": "illness", "rep_id": rnd.choice(reps)["id"],
+               "event_date": rnd.choice(days), "affected_tt_ids": [], "redistributed_to": []}
+              for _ in range(max(1, n_reps // 4))]
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        for table, rows in (
+            (SalesRep.__table__, reps),
+            (Location.__table__, locations),
+            (VisitSchedule.__table__, schedules),
+            (VisitLog.__table__, visits),
+            (ForceMajeureEvent.__table__, events),
+        ):
+            for i in range(0, len(rows), 5000):
+                await conn.execute(table.insert(), rows[i:i + 5000])
+
+
+async def _timed(coro_factory, iterations: int):
+    timings, result = [], None
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        result = await coro_factory()
+        timings.append((time.perf_counter() - t0) * 1000.0)
+    return result, {
+        "min_ms": round(min(timings), 2),
+        "avg_ms": round(sum(timings) / len(timings), 2),
+        "max_ms": round(max(timings), 2),
+    }
+
+
+async def run_benchmark(database_url: str, n_visits: int, n_locations: int,
+                        n_reps: int, iterations: int, year: int = 2026, m: int = 3) -> dict:
+    engine = create_async_engine(database_url)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    try:
+        t0 = time.perf_counter()
+        await seed(engine, year, m, n_visits, n_locations, n_reps)
+        seed_ms = (time.perf_counter() - t0) * 1000.0
+
+        async def python_side():
+            async with session_factory() as session:
+                return await legacy_insights(session, year, m)
+
+        legacy, legacy_stats = await _timed(python_side, iterations)
+        pushed, sql_stats = await _timed(lambda: collect_insights(session_factory, year, m), iterations)
+    finally:
+        await engine.dispose()
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "database": engine.url.get_backend_name(),
+        "visits": n_visits,
+        "locations": n_locations,
+        "reps": n_reps,
+        "iterations": iterations,
+        "seed_ms": round(seed_ms, 2),
+        "python": legacy_stats,
+        "sql": sql_stats,
+        "speedup": round(legacy_stats["avg_ms"] / sql_stats["avg_ms"], 2) if sql_stats["avg_ms"] else None,
+        "results_match": legacy == pushed,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк агрегации /insights")
+    parser.add_argument("--database-url", default=None,
+                        help="URL отдельной БД (по умолчанию — временная SQLite)")
+    parser.add_argument("--visits", type=int, default=100_000)
+    parser.add_argument("--locations", type=int, default=3_000)
+    parser.add_argument("--reps", type=int, default=25)
+    parser.add_argument("--iterations", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite+aiosqlite:///{Path(tmp) / 'insights_bench.db'}"
+        payload = asyncio.run(run_benchmark(url, args.visits, args.locations, args.reps, args.iterations))
+
+    out_json = BENCH_DIR / "insights_benchmark_results.json"
+    out_json.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(json.dumps(payload, indent=2, ensure_ascii=False))
+    print(f"Saved: {out_json}")
+    return 0 if payload["results_match"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -652,6 +652,421 @@ def run_benchmark(
     
     return benchmark_results
 
+# ─── Ограниченная декодировка (grammar) против свободной генерации ─────────────
+#
+# Для клиентов backend (QwenClient, LlamaClient) сравниваются два режима:
+# free — JSON «по просьбе» с повторами generate_route, grammar — генерация по
+# GBNF-грамматике из JSON-схемы ответа (LLM_CONSTRAINED_DECODING). Метрики:
+# попыток на успешный ответ, успешность, латентность (среднее, p50, p95).
+
+DECODING_MODES = ("free", "grammar")
+# Доля испорченных ответов заглушки без грамматики (--mock)
+MOCK_FREEFORM_FAILURE_RATE = 0.35
+
+DECODING_VARIANTS = [
+    {"id": 1, "name": "Кратчайший", "metrics": {"distance_km": 18.2, "time_hours": 2.1, "cost_rub": 130}},
+    {"id": 2, "name": "По приоритету", "metrics": {"distance_km": 21.7, "time_hours": 2.4, "cost_rub": 152}},
+    {"id": 3, "name": "Сбалансированный", "metrics": {"distance_km": 19.9, "time_hours": 2.2, "cost_rub": 139}},
+]
+
+
+class MockGGUF:
+    """
+    Заглушка llama.cpp для --decoding --mock: с грамматикой всегда валидный
+    JSON, без неё — с вероятностью failure_rate типичные поломки малых моделей
+    (markdown-обёртка, COMPUTE вместо чисел, оборванный массив, текст вместо JSON).
+    """
+
+    def __init__(self, seed: int, failure_rate: float = MOCK_FREEFORM_FAILURE_RATE):
+        import random
+
+        self.rng = random.Random(seed)
+        self.failure_rate = failure_rate
+
+    def create_chat_completion(self, messages, grammar=None, **kwargs):
+        time.sleep(0.005)
+        if "route optimizer" in messages[0]["content"]:
+            ids = [loc["id"] for loc in TEST_LOCATIONS]
+            valid = json.dumps({
+                "locations_sequence": ids, "total_distance_km": 24.5,
+                "total_time_hours": 2.5, "total_cost_rub": 171.5,
+            })
+        else:
+            valid = json.dumps([
+                {"id": v["id"], "pros": ["короткий пробег", "мало пересадок"],
+                 "cons": ["пробки в центре", "поздний финиш"]}
+                for v in DECODING_VARIANTS
+            ], ensure_ascii=False)
+
+        content = valid
+        if grammar is None and self.rng.random() < self.failure_rate:
+            content = self.rng.choice([
+                "```json\n" + valid.replace("24.5", "COMPUTE") + "\n```",
+                valid[: len(valid) // 2],
+                "Оптимальный маршрут: начните с первой точки и двигайтесь по кругу.",
+            ])
+        return {"choices": [{"message": {"content": content}}]}
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _decoding_summary(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    successes = [s for s in samples if s["success"]]
+    latencies = [s["latency_ms"] for s in samples]
+    attempts = sum(s["attempts"] for s in samples)
+    return {
+        "calls": len(samples),
+        "successes": len(successes),
+        "success_rate": round(len(successes) / len(samples) * 100, 2) if samples else 0.0,
+        "attempts_per_success": round(attempts / len(successes), 2) if successes else None,
+        "latency_avg_ms": round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+        "latency_p50_ms": round(_percentile(latencies, 0.5), 1),
+        "latency_p95_ms": round(_percentile(latencies, 0.95), 1),
+    }
+
+
+def run_decoding_benchmark(num_iterations: int = 5, use_mock: bool = False) -> Dict[str, Any]:
+    """
+    Попытки на успех и латентность generate_route / evaluate_variants
+    клиентов backend в режимах free и grammar. Результат — decoding_results.json.
+    """
+    import asyncio
+    from unittest.mock import patch
+
+    from src.config import settings
+    from src.models import llama_client as llama_module
+    from src.models import qwen_client as qwen_module
+    from src.models.grammars import json_schema_grammar, route_schema
+    from src.models.schemas import Location as RouteLocation
+
+    if json_schema_grammar(route_schema(["probe"])) is None:
+        logger.warning("Грамматика недоступна (нет llama_cpp?) — режим grammar совпадёт с free")
+
+    locations = [
+        RouteLocation(
+            ID=loc["id"], name=loc["name"], address=loc["address"], lat=loc["lat"], lon=loc["lon"],
+            time_window_start="09:00", time_window_end="18:00", priority="ABCD"[i % 4],
+        )
+        for i, loc in enumerate(TEST_LOCATIONS)
+    ]
+    clients = {"qwen": (qwen_module, qwen_module.QwenClient), "llama": (llama_module, llama_module.LlamaClient)}
+    results: Dict[str, Any] = {
+        "timestamp": datetime.now().isoformat(),
+        "num_iterations": num_iterations,
+        "use_mock": use_mock,
+        "models": {},
+    }
+
+    async def measure(client, task: str) -> Dict[str, Any]:
+        llm = client._get_generator()
+        calls = [0]
+        original = llm.create_chat_completion
+
+        def counted(*args, **kwargs):
+            calls[0] += 1
+            return original(*args, **kwargs)
+
+        llm.create_chat_completion = counted
+        t0 = time.perf_counter()
+        try:
+            if task == "route":
+                await client.generate_route(locations)
+                success = True
+            else:
+                evaluation = await client.evaluate_variants(DECODING_VARIANTS)
+                success = {item["id"] for item in evaluation} == {v["id"] for v in DECODING_VARIANTS}
+        except Exception as exc:
+            logger.info("    %s: %s", task, exc)
+            success = False
+        finally:
+            llm.create_chat_completion = original
+        return {
+            "task": task,
+            "success": success,
+            "attempts": calls[0],
+            "latency_ms": (time.perf_counter() - t0) * 1000,
+        }
+
+    for model_id, (module, client_cls) in clients.items():
+        model_results: Dict[str, Any] = {}
+        for mode in DECODING_MODES:
+            settings.llm_constrained_decoding = mode == "grammar"
+            client_cls._llm = None
+            if use_mock:
+                patcher = patch.object(module, "Llama", lambda **kw: MockGGUF(seed=42))
+            else:
+                patcher = patch.object(module, "Llama", module.Llama)
+            with patcher:
+                client = client_cls()
+                if use_mock:
+                    client.model_path = client.model_path or "mock.gguf"
+                try:
+                    client._get_generator()
+                except Exception as exc:
+                    logger.warning("%s недоступна: %s", model_id, exc)
+                    model_results = {"error": str(exc)}
+                    break
+                samples = []
+                for iteration in range(num_iterations):
+                    for task in ("route", "evaluation"):
+                        samples.append(asyncio.run(measure(client, task)))
+            model_results[mode] = {
+                task: _decoding_summary([s for s in samples if s["task"] == task])
+                for task in ("route", "evaluation")
+            }
+            for task, summary in model_results[mode].items():
+                logger.info(
+                    "%s %-7s %-10s attempts/success=%s success=%.0f%% avg=%.0fms p95=%.0fms",
+                    model_id, mode, task, summary["attempts_per_success"], summary["success_rate"],
+                    summary["latency_avg_ms"], summary["latency_p95_ms"],
+                )
+        client_cls._llm = None
+        results["models"][model_id] = model_results
+
+    settings.llm_constrained_decoding = True
+    results_file = BENCH_DIR / "decoding_results.json"
+    with open(results_file, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    logger.info("Результаты сохранены в: %s", results_file)
+    return results
+
+
+
+# ---------------------------------------------------------------------------
+# --prefix-cache: время до первого токена с RAM-кэшем префикса и без него.
+# Запросы маршрута и оценки чередуются, как в /optimize, поэтому без кэша
+# общий системный префикс каждый раз вычисляется заново.
+
+PREFIX_CACHE_MODES = ("off", "ram")
+# Стоимость вычисления одного «токена» промпта заглушкой (--mock), с
+MOCK_PROMPT_TOKEN_COST_S = 0.00002
+
+
+class MockPrefixGGUF:
+    """
+    Заглушка llama.cpp для --prefix-cache --mock: время ответа пропорционально
+    невычисленной части промпта (символ = токен). Как llama.cpp, переиспользует
+    общий префикс с текущим контекстом; save_state/load_state — для кэша
+    префиксов backend.
+    """
+
+    def __init__(self):
+        self.input_ids: List[int] = []
+        self.n_tokens = 0
+
+    def create_chat_completion(self, messages, max_tokens=1, **kwargs):
+        tokens = [ord(c) for c in "".join(f"<{m['role']}>{m['content']}" for m in messages)]
+        reused = len(os.path.commonprefix([self.input_ids[: self.n_tokens], tokens[:-1]]))
+        time.sleep((len(tokens) - reused) * MOCK_PROMPT_TOKEN_COST_S)
+        self.input_ids = tokens + [ord("{")] * max_tokens
+        self.n_tokens = len(self.input_ids)
+        return {"choices": [{"message": {"content": "{"}}]}
+
+    def save_state(self):
+        from types import SimpleNamespace
+
+        return SimpleNamespace(
+            input_ids=list(self.input_ids), n_tokens=self.n_tokens, scores=None,
+            llama_state_size=self.n_tokens * 1024,
+        )
+
+    def load_state(self, state):
+        self.input_ids = list(state.input_ids)
+        self.n_tokens = state.n_tokens
+
+
+def run_prefix_cache_benchmark(num_iterations: int = 5, use_mock: bool = False) -> Dict[str, Any]:
+    """
+    TTFT (генерация одного токена) промптов generate_route / evaluate_variants
+    клиентов backend без кэша префикса и с ним. Результат —
+    prefix_cache_results.json.
+    """
+    from unittest.mock import patch
+
+    from src.config import settings
+    from src.models import llama_client as llama_module
+    from src.models import qwen_client as qwen_module
+    from src.models.prompt_cache import (
+        cached_chat_completion,
+        evaluation_messages,
+        prompt_cache_status,
+        route_messages,
+    )
+
+    cache_mb = settings.llm_prompt_cache_mb or 512
+    locations_data = [
+        {"ID": loc["id"], "name": loc["name"], "lat": loc["lat"], "lon": loc["lon"], "priority": "ABCD"[i % 4]}
+        for i, loc in enumerate(TEST_LOCATIONS)
+    ]
+    clients = {"qwen": (qwen_module, qwen_module.QwenClient), "llama": (llama_module, llama_module.LlamaClient)}
+    results: Dict[str, Any] = {
+        "timestamp": datetime.now().isoformat(),
+        "num_iterations": num_iterations,
+        "use_mock": use_mock,
+        "models": {},
+    }
+
+    for model_id, (module, client_cls) in clients.items():
+        model_results: Dict[str, Any] = {}
+        for mode in PREFIX_CACHE_MODES:
+            settings.llm_prompt_cache_mb = cache_mb if mode == "ram" else 0
+            client_cls._llm = None
+            if use_mock:
+                patcher = patch.object(module, "Llama", lambda **kw: MockPrefixGGUF())
+            else:
+                patcher = patch.object(module, "Llama", module.Llama)
+            with patcher:
+                client = client_cls()
+                if use_mock:
+                    client.model_path = client.model_path or "mock.gguf"
+                try:
+                    llm = client._get_generator()
+                except Exception as exc:
+                    logger.warning("%s недоступна: %s", model_id, exc)
+                    model_results = {"error": str(exc)}
+                    break
+                samples: Dict[str, List[float]] = {"route": [], "evaluation": []}
+                for iteration in range(num_iterations):
+                    # Общий только префикс: точки и метрики меняются от запроса к запросу
+                    shift = iteration % len(locations_data)
+                    variants = [
+                        {**v, "metrics": {**v["metrics"], "distance_km": v["metrics"]["distance_km"] + iteration}}
+                        for v in DECODING_VARIANTS
+                    ]
+                    prompts = {
+                        "route": route_messages(
+                            client._construct_prompt(locations_data[shift:] + locations_data[:shift], None),
+                        ),
+                        "evaluation": evaluation_messages(client._construct_evaluation_prompt(variants)),
+                    }
+                    for task, messages in prompts.items():
+                        t0 = time.perf_counter()
+                        cached_chat_completion(llm, model_id, messages, max_tokens=1, temperature=0.0)
+                        samples[task].append((time.perf_counter() - t0) * 1000)
+            model_results[mode] = {
+                task: {
+                    "first_ms": round(values[0], 1),
+                    "ttft_avg_ms": round(sum(values) / len(values), 1),
+                    "ttft_p50_ms": round(_percentile(values, 0.5), 1),
+                    "ttft_p95_ms": round(_percentile(values, 0.95), 1),
+                }
+                for task, values in samples.items()
+            }
+            if mode == "ram":
+                model_results[mode]["prompt_cache"] = prompt_cache_status()["models"].get(model_id)
+            for task, summary in model_results[mode].items():
+                if task in samples:
+                    logger.info(
+                        "%s %-4s %-10s ttft avg=%.0fms p50=%.0fms first=%.0fms",
+                        model_id, mode, task, summary["ttft_avg_ms"], summary["ttft_p50_ms"], summary["first_ms"],
+                    )
+        client_cls._llm = None
+        results["models"][model_id] = model_results
+
+    settings.llm_prompt_cache_mb = cache_mb
+    results_file = BENCH_DIR / "prefix_cache_results.json"
+    with open(results_file, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    logger.info("Результаты сохранены в: %s", results_file)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# --prompt-profile: длины запросов (промпт + лимит ответа) в токенах каждой
+# модели. По этому профилю backend подбирает n_ctx при <MODEL>_N_CTX=0
+# (backend/src/models/llm_runtime.py).
+
+PROFILE_STOP_COUNTS = (5, 10, 20, 30, 40, 50)
+PROFILE_VARIANT_COUNTS = (2, 3, 4, 5)
+# Служебные токены чат-шаблона на одно сообщение
+CHAT_TEMPLATE_OVERHEAD = 8
+# Лимит ответа evaluate_variants в клиентах
+EVALUATION_MAX_TOKENS = 512
+
+
+def _synthetic_locations(n: int) -> List[Dict[str, Any]]:
+    """n точек вокруг центра TEST_LOCATIONS (детерминированно)."""
+    import random
+
+    rng = random.Random(n)
+    lat0, lon0 = TEST_LOCATIONS[0]["lat"], TEST_LOCATIONS[0]["lon"]
+    return [
+        {
+            "ID": f"store-{i + 1}",
+            "name": f"Магазин {i + 1}",
+            "lat": round(lat0 + rng.uniform(-0.08, 0.08), 6),
+            "lon": round(lon0 + rng.uniform(-0.12, 0.12), 6),
+            "priority": "ABCD"[i % 4],
+        }
+        for i in range(n)
+    ]
+
+
+def run_prompt_profile(use_mock: bool = False) -> Dict[str, Any]:
+    """
+    Считает токены промптов generate_route (5–50 точек) и evaluate_variants
+    (2–5 вариантов) токенизатором каждой модели. Результат — prompt_profile.json.
+    """
+    from src.models import llama_client as llama_module
+    from src.models import qwen_client as qwen_module
+    from src.models.grammars import route_max_tokens
+    from src.models.prompt_cache import evaluation_messages, route_messages
+    from src.utils.optional_deps import require
+
+    clients = {"qwen": qwen_module.QwenClient, "llama": llama_module.LlamaClient}
+    profile: Dict[str, Any] = {
+        "timestamp": datetime.now().isoformat(),
+        "use_mock": use_mock,
+        "stop_counts": list(PROFILE_STOP_COUNTS),
+        "variant_counts": list(PROFILE_VARIANT_COUNTS),
+        "models": {},
+    }
+
+    for model_id, client_cls in clients.items():
+        client = client_cls()
+        if use_mock:
+            def count(text: str) -> int:
+                return len(text) // 3
+        else:
+            if not client.model_path:
+                logger.warning("%s недоступна: нет GGUF-файла", model_id)
+                continue
+            tokenizer = require("llama_cpp").Llama(model_path=client.model_path, vocab_only=True, verbose=False)
+
+            def count(text: str, tokenizer=tokenizer) -> int:
+                return len(tokenizer.tokenize(text.encode("utf-8"), add_bos=False))
+
+        def request_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+            return sum(count(m["content"]) + CHAT_TEMPLATE_OVERHEAD for m in messages) + max_tokens
+
+        route = [
+            request_tokens(
+                route_messages(client._construct_prompt(_synthetic_locations(n), None)),
+                route_max_tokens(n, 1024),
+            )
+            for n in PROFILE_STOP_COUNTS
+        ]
+        evaluation = []
+        for k in PROFILE_VARIANT_COUNTS:
+            variants = [
+                {**DECODING_VARIANTS[i % len(DECODING_VARIANTS)], "id": i + 1} for i in range(k)
+            ]
+            evaluation.append(request_tokens(
+                evaluation_messages(client._construct_evaluation_prompt(variants)), EVALUATION_MAX_TOKENS,
+            ))
+        profile["models"][model_id] = {"route": route, "evaluation": evaluation}
+        logger.info("%s: route %s, evaluation %s токенов", model_id, route, evaluation)
+
+    results_file = BENCH_DIR / "prompt_profile.json"
+    with open(results_file, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2, ensure_ascii=False)
+    logger.info("Профиль сохранён в: %s", results_file)
+    return profile
 
 def main():
     """Точка входа: парсинг аргументов и вызов run_benchmark."""
@@ -675,9 +1090,34 @@ def main():
         action="store_true",
         help="Гнать бенчмарк по клиентам backend (GigaChat, Cotype, T-Pro)",
     )
+    parser.add_argument(
+        "--decoding",
+        action="store_true",
+        help="Сравнить свободную и ограниченную (grammar) декодировку клиентов backend",
+    )
+    parser.add_argument(
+        "--prefix-cache",
+        action="store_true",
+        help="Сравнить время до первого токена клиентов backend без кэша префикса и с ним",
+    )
+    parser.add_argument(
+        "--prompt-profile",
+        action="store_true",
+        help="Записать длины промптов в токенах для авто-подбора n_ctx в backend",
+    )
 
     args = parser.parse_args()
 
+    if args.decoding:
+        run_decoding_benchmark(num_iterations=args.iterations, use_mock=args.mock)
+        return 0
+    if args.prefix_cache:
+        run_prefix_cache_benchmark(num_iterations=args.iterations, use_mock=args.mock)
+        return 0
+    if args.prompt_profile:
+        run_prompt_profile(use_mock=args.mock)
+        return 0
+
     results = run_benchmark(
         num_iterations=args.iterations,
         use_mock=args.mock,